@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+"""
+STEP/IGES 后台导入：多个文件在进程池中并行读取和转换（取消时直接终止），拓扑索引和三角剖分在工作线程中进行
+
+转换并剖分后的主形状以 OCCT 二进制 BRep 格式缓存（见 ShapeCache），再次导入未修改的文件时跳过转换和剖分。
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from OCC.Core.BRep import BRep_Builder
+from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
+from OCC.Core.BinTools import bintools_Read, bintools_Write
+from OCC.Core.IFSelect import IFSelect_RetDone
+from OCC.Core.IGESControl import IGESControl_Reader
+from OCC.Core.STEPControl import STEPControl_Reader
+from OCC.Core.TopAbs import (
+    TopAbs_COMPOUND, TopAbs_COMPSOLID, TopAbs_SOLID,
+    TopAbs_SHELL, TopAbs_FACE, TopAbs_WIRE, TopAbs_EDGE, TopAbs_VERTEX
+)
+from OCC.Core.TopoDS import TopoDS_Compound, TopoDS_Shape
+
+from cad_topology import ShapeTopology
+from harness_cache import DEFAULT_CACHE_DIR, HarnessCache, file_digest
+
+# 全局日志器
+logger = logging.getLogger("cad_import")
+
+_SHAPE_TYPE_NAMES = {
+    TopAbs_COMPOUND: "复合体 (Compound)",
+    TopAbs_COMPSOLID: "复合实体 (CompSolid)",
+    TopAbs_SOLID: "实体 (Solid)",
+    TopAbs_SHELL: "壳 (Shell)",
+    TopAbs_FACE: "面 (Face)",
+    TopAbs_WIRE: "线框 (Wire)",
+    TopAbs_EDGE: "边 (Edge)",
+    TopAbs_VERTEX: "顶点 (Vertex)",
+}
+
+# 三角剖分精度预设：名称 -> (线性偏差, 角度偏差/弧度)，线性偏差与模型单位相同（mm）
+MESH_PRESETS = {
+    "粗糙": (2.0, 0.8),
+    "标准": (0.5, 0.5),
+    "精细": (0.1, 0.2),
+}
+DEFAULT_MESH_PRESET = "标准"
+
+# 每次并行剖分的面数（每批完成后报告进度、检查取消）
+MESH_BATCH_SIZE = 256
+
+# 等待读取子进程时检查取消标志的间隔（秒）
+POLL_INTERVAL = 0.1
+
+# 形状缓存的默认大小上限（MB），可用环境变量 CAD_CACHE_MAX_MB 覆盖
+DEFAULT_SHAPE_CACHE_MAX_BYTES = int(os.environ.get("CAD_CACHE_MAX_MB", "2048")) * 1024 * 1024
+
+# 形状缓存格式版本：读取或剖分方式变化时递增
+SHAPE_CACHE_VERSION = 1
+
+
+def shape_type_name(shape):
+    """获取形状类型的用户友好名称"""
+    try:
+        st = shape.ShapeType()
+        return _SHAPE_TYPE_NAMES.get(st, f"形状 (Type {st})")
+    except Exception:
+        return "未知形状"
+
+
+def read_cad_file(file_path, file_format):
+    """读取 STEP/IGES 文件，返回转换后的主形状（多个形状时合并为复合体）"""
+    if file_format == "STEP":
+        reader = STEPControl_Reader()
+    elif file_format == "IGES":
+        reader = IGESControl_Reader()
+    else:
+        raise ValueError(f"不支持的文件格式: {file_format}")
+
+    read_status = reader.ReadFile(file_path)
+    logger.info(f"ReadFile 状态: {read_status}")
+    if read_status != IFSelect_RetDone:
+        raise RuntimeError(f"读取{file_format}文件失败 (状态: {read_status})")
+
+    num_roots = reader.NbRootsForTransfer()
+    logger.info(f"文件中根的数量: {num_roots}")
+    if num_roots == 0:
+        raise RuntimeError(f"{file_format} 文件中没有找到可转换的根。文件可能为空或格式无效。")
+    if not reader.TransferRoots():
+        raise RuntimeError(f"转换{file_format}文件根失败。")
+
+    num_shapes = reader.NbShapes()
+    logger.info(f"转换后的形状数量: {num_shapes}")
+    if num_shapes == 0:
+        raise RuntimeError(f"转换{file_format}文件后未生成任何形状。")
+    if num_shapes == 1:
+        shape = reader.Shape(1)
+    else:
+        # 如果有多个形状，创建一个复合体
+        shape = TopoDS_Compound()
+        builder = BRep_Builder()
+        builder.MakeCompound(shape)
+        for i in range(1, num_shapes + 1):
+            sub_shape = reader.Shape(i)
+            if sub_shape and not sub_shape.IsNull():
+                builder.Add(shape, sub_shape)
+            else:
+                logger.warning(f"跳过转换结果中的空形状索引 {i}")
+
+    if shape.IsNull():
+        raise RuntimeError(f"从{file_format}文件获取的最终形状为空。")
+    return shape
+
+
+def merge_shapes(shapes):
+    """把多个形状合并为一个复合体（只有一个形状时直接返回它）"""
+    shapes = list(shapes)
+    if len(shapes) == 1:
+        return shapes[0]
+    compound = TopoDS_Compound()
+    builder = BRep_Builder()
+    builder.MakeCompound(compound)
+    for shape in shapes:
+        builder.Add(compound, shape)
+    return compound
+
+
+def mesh_faces(faces, linear_deflection, angular_deflection, batch_size=MESH_BATCH_SIZE):
+    """
+    按批对面做三角剖分，每完成一批产生已剖分的面数
+
+    每批的面合并为一个复合体，由 BRepMesh_IncrementalMesh 以并行模式剖分。
+    三角剖分保存在面（TShape）上，共享这些面的形状显示时直接使用，不会在首次绘制时重新剖分。
+    """
+    builder = BRep_Builder()
+    for start in range(0, len(faces), batch_size):
+        compound = TopoDS_Compound()
+        builder.MakeCompound(compound)
+        for face in faces[start:start + batch_size]:
+            builder.Add(compound, face)
+        BRepMesh_IncrementalMesh(compound, linear_deflection, False, angular_deflection, True)
+        yield min(start + batch_size, len(faces))
+
+
+class ShapeCache(HarnessCache):
+    """
+    转换后主形状的磁盘缓存（OCCT 二进制 BRep 格式，包含三角剖分）
+
+    键为源文件内容哈希、文件格式和剖分精度，源文件修改后自然失效；
+    总大小超过上限时按最近使用时间淘汰（与解析结果缓存共用目录，分别计算大小）。
+    """
+
+    suffix = ".bbrep"
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_SHAPE_CACHE_MAX_BYTES):
+        super().__init__(cache_dir, max_bytes)
+
+    def key(self, file_path, file_format, deflection):
+        """计算缓存键：源文件内容、格式、剖分精度和缓存版本的 SHA-256"""
+        linear_deflection, angular_deflection = deflection
+        return file_digest(
+            file_path, f"{file_format}:{linear_deflection}:{angular_deflection}:{SHAPE_CACHE_VERSION}")
+
+    def path(self, key, file_format):
+        return self._path(key, file_format.lower())
+
+    def load_shape(self, key, file_format):
+        """读取缓存的形状；未命中或缓存损坏时返回 None"""
+        path = self.path(key, file_format)
+        if not os.path.exists(path):
+            return None
+        shape = TopoDS_Shape()
+        try:
+            loaded = bintools_Read(shape, path)
+        except Exception as e:
+            logger.warning(f"读取形状缓存出错: {e}")
+            loaded = False
+        if not loaded or shape.IsNull():
+            logger.warning(f"形状缓存文件损坏，已忽略: {path}")
+            self._remove(path)
+            return None
+        os.utime(path)  # 更新最近使用时间
+        logger.info(f"从缓存读取形状: {path}")
+        return shape
+
+    def store_shape(self, key, file_format, shape):
+        """写入形状（先写临时文件再替换），然后按大小上限淘汰"""
+        if key is None:
+            return
+        path = self.path(key, file_format)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if not bintools_Write(shape, temp_path):
+                raise OSError("bintools_Write 失败")
+            os.replace(temp_path, path)
+            logger.info(f"已写入形状缓存: {path}")
+        except OSError as e:
+            logger.warning(f"写入形状缓存失败: {e}")
+            self._remove(temp_path)
+            return
+        self.evict()
+
+
+def _read_to_brep(index, file_path, file_format, deflection, cache, brep_path, results):
+    """
+    读取子进程的入口，结果 (文件序号, 成功, 错误信息, 缓存键, 是否命中缓存) 放入 results
+
+    先计算缓存键（哈希大文件也在子进程中并行进行）；缓存中已有该文件时直接返回，
+    否则读取并转换文件，把主形状写入二进制 BRep 文件。cache 为 None 时不使用缓存。
+    """
+    key = None
+    try:
+        if cache is not None:
+            try:
+                key = cache.key(file_path, file_format, deflection)
+            except OSError as e:
+                logger.warning(f"无法读取文件计算哈希: {e}")
+            if key is not None and os.path.exists(cache.path(key, file_format)):
+                results.put((index, True, "", key, True))
+                return
+        shape = read_cad_file(file_path, file_format)
+        if not bintools_Write(shape, brep_path):
+            raise RuntimeError("写入临时 BRep 文件失败")
+        results.put((index, True, "", key, False))
+    except Exception as e:
+        results.put((index, False, str(e), key, False))
+
+
+class CadImportWorker(QThread):
+    """
+    在后台线程中导入一个或多个 STEP/IGES 文件
+
+    ReadFile / TransferRoots 是不可中断的 OCC 调用，因此每个文件在单独的子进程中读取和转换，
+    最多 max_workers 个进程并行，结果以 BRep 文件传回；取消时直接终止所有子进程。
+    每个文件读取完成后立即在本线程中建立拓扑索引（ShapeTopology）并按 deflection（线性偏差, 角度偏差）
+    并行剖分所有面（期间继续调度等待中的文件），每批面检查一次取消标志。
+    进度、各文件的主形状和拓扑索引通过信号发回界面线程，导入期间已加载的模型保持可用。
+    单个文件失败不影响其他文件，只有全部失败时才发出 failed。
+    给出 cache（ShapeCache）时，命中缓存的文件跳过转换和剖分，未命中的文件剖分后写入缓存。
+    """
+
+    progress = pyqtSignal(int, str)  # 百分比, 说明
+    shape_loaded = pyqtSignal(int, object)  # 文件序号, 转换得到的主形状
+    topology_ready = pyqtSignal(int, object)  # 文件序号, ShapeTopology
+    file_failed = pyqtSignal(int, str)  # 文件序号, 错误信息
+    completed = pyqtSignal(object)  # {文件序号: 主形状}，至少一个文件成功
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, files, deflection=MESH_PRESETS[DEFAULT_MESH_PRESET], max_workers=None, cache=None,
+                 parent=None):
+        super().__init__(parent)
+        self.files = list(files)  # [(file_path, file_format), ...]
+        self.deflection = deflection
+        self.cache = cache
+        self.max_workers = max(1, min(len(self.files), max_workers or os.cpu_count() or 1))
+        self.errors = {}  # 文件序号 -> 错误信息
+        self._cancel_requested = False
+        self._context = multiprocessing.get_context("spawn")
+        self._results = None
+        self._temp_dir = None
+        self._waiting = []  # 尚未启动的文件序号
+        self._running = {}  # 文件序号 -> 读取子进程
+        self._crashed = []  # [(文件序号, 退出码)]，异常退出、没有结果的子进程
+        self._uncached = {}  # 缓存损坏、需要重新转换的文件序号 -> 缓存键
+        self._finished_files = 0
+
+    def cancel(self):
+        """请求取消：立即终止所有读取子进程，分析阶段在下一个子形状处停止"""
+        self._cancel_requested = True
+        for process in list(self._running.values()):
+            if process.is_alive():
+                process.terminate()
+
+    def run(self):
+        self._temp_dir = tempfile.mkdtemp(prefix="cad_import_")
+        shapes = {}
+        try:
+            self.progress.emit(5, f"正在读取 {len(self.files)} 个文件（{self.max_workers} 个进程）...")
+            for index, shape, key, from_cache in self._read_shapes():
+                self._check_cancelled()
+                logger.info(f"{self.files[index][0]} 主形状类型: {shape_type_name(shape)}")
+                self.shape_loaded.emit(index, shape)
+                faces = self._analyze(index, shape)
+                if not from_cache:
+                    # 缓存中的形状已带有相同精度的三角剖分
+                    self._mesh(index, faces)
+                    if self.cache is not None:
+                        self.cache.store_shape(key, self.files[index][1], shape)
+                shapes[index] = shape
+                self._file_done(f"已导入 {os.path.basename(self.files[index][0])}")
+            self._check_cancelled()
+            if not shapes:
+                raise RuntimeError("\n".join(self.errors.values()) or "没有可导入的文件")
+            self.completed.emit(shapes)
+        except InterruptedError:
+            logger.warning(f"用户取消了 {len(self.files)} 个文件的导入")
+            self.cancelled.emit()
+        except Exception as e:
+            logger.exception(f"导入CAD文件时发生异常: {e}")
+            self.failed.emit(str(e))
+        finally:
+            for process in self._running.values():
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+            self._running = {}
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+
+    def _check_cancelled(self):
+        if self._cancel_requested:
+            raise InterruptedError("用户取消导入")
+
+    def _brep_path(self, index):
+        return os.path.join(self._temp_dir, f"{index}.brep")
+
+    def _progress_value(self):
+        return 5 + 90 * self._finished_files // len(self.files)
+
+    def _file_done(self, text):
+        self._finished_files += 1
+        self.progress.emit(self._progress_value(), f"{text} ({self._finished_files}/{len(self.files)})")
+
+    def _fail(self, index, message):
+        file_path = self.files[index][0]
+        logger.error(f"导入 {file_path} 失败: {message}")
+        self.errors[index] = f"{os.path.basename(file_path)}: {message}"
+        self.file_failed.emit(index, message)
+        self._file_done(f"{os.path.basename(file_path)} 导入失败")
+
+    def _schedule(self):
+        """回收已结束的读取子进程，并在空出的位置上启动等待中的文件"""
+        for index, process in list(self._running.items()):
+            if not process.is_alive():
+                process.join()
+                del self._running[index]
+                if process.exitcode != 0:
+                    # 正常退出的进程在退出前已把结果放入队列
+                    self._crashed.append((index, process.exitcode))
+        while self._waiting and len(self._running) < self.max_workers and not self._cancel_requested:
+            index = self._waiting.pop(0)
+            file_path, file_format = self.files[index]
+            cache = None if index in self._uncached else self.cache
+            process = self._context.Process(
+                target=_read_to_brep,
+                args=(index, file_path, file_format, self.deflection, cache, self._brep_path(index), self._results),
+                daemon=True)
+            process.start()
+            self._running[index] = process
+
+    def _read_shapes(self):
+        """并行读取和转换所有文件，按完成顺序产生 (文件序号, 主形状, 缓存键, 是否来自缓存)"""
+        self._results = self._context.Queue()
+        self._waiting = list(range(len(self.files)))
+        remaining = set(self._waiting)
+        while remaining:
+            self._check_cancelled()
+            self._schedule()
+            while self._crashed:
+                index, exitcode = self._crashed.pop()
+                if index in remaining:
+                    remaining.discard(index)
+                    self._fail(index, f"读取进程意外退出 (退出码 {exitcode})")
+            try:
+                index, succeeded, message, key, cache_hit = self._results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if not succeeded:
+                remaining.discard(index)
+                self._fail(index, message)
+                continue
+
+            self._check_cancelled()
+            if cache_hit:
+                shape = self.cache.load_shape(key, self.files[index][1])
+                if shape is None:
+                    # 缓存文件在检查之后被删除或已损坏：不使用缓存重新转换
+                    self._uncached[index] = key
+                    self._waiting.append(index)
+                    continue
+                remaining.discard(index)
+                yield index, shape, key, True
+                continue
+
+            remaining.discard(index)
+            brep_path = self._brep_path(index)
+            shape = TopoDS_Shape()
+            loaded = bintools_Read(shape, brep_path)
+            os.remove(brep_path)
+            if not loaded or shape.IsNull():
+                self._fail(index, f"从{self.files[index][1]}文件获取的最终形状为空。")
+                continue
+            yield index, shape, key or self._uncached.get(index), False
+
+    def _analyze(self, index, shape):
+        """建立文件的拓扑索引（各类别的唯一子形状在 C++ 中一次收集）并发回界面，返回其中的面"""
+        topology = ShapeTopology(index, shape)
+        logger.info(f"{self.files[index][0]} 中找到 {topology.count()} 个唯一子形状")
+        self._check_cancelled()
+        self.topology_ready.emit(index, topology)
+        return topology.shapes(TopAbs_FACE)
+
+    def _mesh(self, index, faces):
+        """并行剖分一个文件的所有面，使显示时不需要再计算三角剖分"""
+        file_basename = os.path.basename(self.files[index][0])
+        linear_deflection, angular_deflection = self.deflection
+        logger.info(f"剖分 {file_basename} 的 {len(faces)} 个面 (线性偏差 {linear_deflection}, 角度偏差 {angular_deflection})")
+        for meshed in mesh_faces(faces, linear_deflection, angular_deflection):
+            self._check_cancelled()
+            self._schedule()
+            self.progress.emit(self._progress_value(), f"正在剖分 {file_basename}: {meshed}/{len(faces)} 个面")
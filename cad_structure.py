@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+"""
+STEP 产品结构的快速读取和按需转换
+
+StepStructure 用 STEPCAFControl_Reader 只解析文件（ReadFile），不转换几何：
+产品（PRODUCT_DEFINITION）、装配关系（NEXT_ASSEMBLY_USAGE_OCCURRENCE）、名称和颜色（STYLED_ITEM）
+直接从解析得到的 STEP 模型中读取，用于在树中显示装配结构。
+之后只转换用户选择的根或子装配的几何（TransferEntity），避免对整个文件执行 TransferRoots。
+
+同一个产品可以在装配中被多次使用，树中的每一项对应一次使用（实例），由实例路径区分：
+(根产品的实体编号, 第一级装配关系的实体编号, ..., 本实例的装配关系的实体编号)。
+转换得到的是产品自身坐标系中的几何，再按路径上每个装配关系的定位
+（CONTEXT_DEPENDENT_SHAPE_REPRESENTATION 中带变换的表示关系）依次变换到根产品的坐标系。
+"""
+import logging
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from OCC.Core.IFSelect import IFSelect_RetDone
+from OCC.Core.Quantity import Quantity_Color
+from OCC.Core.STEPCAFControl import STEPCAFControl_Reader
+from OCC.Core.STEPConstruct import STEPConstruct_Styles
+from OCC.Core.StepBasic import StepBasic_ProductDefinition
+from OCC.Core.StepGeom import StepGeom_Axis2Placement3d
+from OCC.Core.StepRepr import (
+    StepRepr_NextAssemblyUsageOccurrence, StepRepr_Representation,
+    StepRepr_ShapeRepresentationRelationshipWithTransformation
+)
+from OCC.Core.StepShape import (
+    StepShape_ContextDependentShapeRepresentation, StepShape_ShapeDefinitionRepresentation,
+    StepShape_ShapeRepresentationRelationship
+)
+from OCC.Core.StepToGeom import StepToGeom
+from OCC.Core.StepVisual import StepVisual_StyledItem
+from OCC.Core.TopAbs import TopAbs_FACE
+from OCC.Core.TopLoc import TopLoc_Location
+from OCC.Core.gp import gp_Ax3, gp_Trsf
+
+from cad_import import MESH_PRESETS, DEFAULT_MESH_PRESET, mesh_faces
+from cad_topology import ShapeTopology
+
+# 全局日志器
+logger = logging.getLogger("cad_structure")
+
+# 导入格式下拉框中“只读取产品结构”的选项
+STEP_STRUCTURE_FORMAT = "STEP (仅结构)"
+
+# 产品树条目的 ID 前缀（与导入形状的 ID 不冲突）
+_PRODUCT_PREFIX = "product_"
+
+# 按实体类型名称分派（DynamicType().Name()，每个实体只取一次类型）
+_PRODUCT_DEFINITION_TYPES = {
+    "StepBasic_ProductDefinition",
+    "StepBasic_ProductDefinitionWithAssociatedDocuments",
+}
+_STYLED_ITEM_TYPES = {
+    "StepVisual_StyledItem",
+    "StepVisual_OverRidingStyledItem",
+    "StepVisual_ContextDependentOverRidingStyledItem",
+}
+_NAUO_TYPE = "StepRepr_NextAssemblyUsageOccurrence"
+_SDR_TYPE = "StepShape_ShapeDefinitionRepresentation"
+# 装配关系的定位（组件的表示 -> 装配体的表示，经由带变换的表示关系）
+_CDSR_TYPE = "StepShape_ContextDependentShapeRepresentation"
+# 不带变换的表示关系（同一产品的不同表示）；带变换的关系是装配定位，不能合并
+_SRR_TYPE = "StepShape_ShapeRepresentationRelationship"
+
+
+def product_id(path):
+    """产品实例在树中的条目 ID（path 为实例路径）"""
+    return _PRODUCT_PREFIX + "_".join(str(number) for number in path)
+
+
+def parse_product_id(item_id):
+    """返回条目 ID 对应的实例路径（元组），不是产品条目时返回 None"""
+    if not isinstance(item_id, str) or not item_id.startswith(_PRODUCT_PREFIX):
+        return None
+    try:
+        return tuple(int(number) for number in item_id[len(_PRODUCT_PREFIX):].split("_"))
+    except ValueError:
+        return None
+
+
+def is_sub_path(path, other):
+    """path 是否为 other 本身或其祖先实例（other 的几何包含在 path 的几何中）"""
+    return other[:len(path)] == path
+
+
+def _text(hstring):
+    """TCollection_HAsciiString -> str（空句柄返回空字符串）"""
+    try:
+        return hstring.ToCString()
+    except AttributeError:
+        return ""
+
+
+class StepProduct:
+    """STEP 文件中的一个产品（零件或装配体）"""
+    __slots__ = ("number", "definition", "name", "children", "color")
+
+    def __init__(self, number, definition, name):
+        self.number = number  # PRODUCT_DEFINITION 的实体编号
+        self.definition = definition  # StepBasic_ProductDefinition
+        self.name = name
+        self.children = []  # [(实例名称, 装配关系的实体编号, StepProduct), ...]
+        self.color = None  # Quantity_Color 或 None
+
+    def label(self, instance_name=None, loaded=False):
+        """树中显示的文本：实例名称 (产品名称) [组件数] #颜色（loaded 为该实例的几何是否已加载）"""
+        text = self.name or f"#{self.number}"
+        if instance_name and instance_name != self.name:
+            text = f"{instance_name} ({text})"
+        if self.children:
+            text += f" [装配体: {len(self.children)} 个组件]"
+        if self.color is not None:
+            red, green, blue = (round(value * 255) for value in (self.color.Red(), self.color.Green(), self.color.Blue()))
+            text += f" #{red:02X}{green:02X}{blue:02X}"
+        if loaded:
+            text += " (已加载)"
+        return text
+
+
+class StepStructure:
+    """只解析、不转换几何的 STEP 文件：产品树、名称和颜色，并按需转换单个产品的几何"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.reader = STEPCAFControl_Reader()
+        self.reader.SetNameMode(True)
+        self.reader.SetColorMode(True)
+        self.products = {}  # 实体编号 -> StepProduct
+        self.roots = []  # 不属于任何装配体的产品
+        self.loaded = set()  # 几何已转换的实例路径
+        self._model = None
+        self._nauos = {}  # 装配关系的实体编号 -> StepRepr_NextAssemblyUsageOccurrence
+        self._cdsrs = {}  # 装配关系的实体编号 -> 其定位 (StepShape_ContextDependentShapeRepresentation)
+        self._representation_products = {}  # 表示的实体编号 -> 产品实体编号
+        self._placements = {}  # 装配关系的实体编号 -> gp_Trsf（组件坐标系 -> 装配体坐标系）
+
+    def read(self):
+        """解析文件并建立产品树（不调用 TransferRoots）"""
+        status = self.reader.ReadFile(self.file_path)
+        logger.info(f"ReadFile 状态: {status}")
+        if status != IFSelect_RetDone:
+            raise RuntimeError(f"读取STEP文件失败 (状态: {status})")
+
+        model = self._model = self.reader.Reader().WS().Model()
+        nauos, sdrs, srrs, cdsrs, styled_items = [], [], [], [], []
+        for number in range(1, model.NbEntities() + 1):
+            entity = model.Value(number)
+            type_name = entity.DynamicType().Name()
+            if type_name in _PRODUCT_DEFINITION_TYPES:
+                definition = StepBasic_ProductDefinition.DownCast(entity)
+                self.products[number] = StepProduct(number, definition, self._product_name(definition))
+            elif type_name == _NAUO_TYPE:
+                nauos.append(StepRepr_NextAssemblyUsageOccurrence.DownCast(entity))
+            elif type_name == _SDR_TYPE:
+                sdrs.append(StepShape_ShapeDefinitionRepresentation.DownCast(entity))
+            elif type_name == _SRR_TYPE:
+                srrs.append(StepShape_ShapeRepresentationRelationship.DownCast(entity))
+            elif type_name == _CDSR_TYPE:
+                cdsrs.append(StepShape_ContextDependentShapeRepresentation.DownCast(entity))
+            elif type_name in _STYLED_ITEM_TYPES:
+                styled_items.append(StepVisual_StyledItem.DownCast(entity))
+
+        used = set()
+        for nauo in nauos:
+            parent = self.products.get(model.Number(nauo.RelatingProductDefinition()))
+            child = self.products.get(model.Number(nauo.RelatedProductDefinition()))
+            if parent is None or child is None:
+                continue
+            number = model.Number(nauo)
+            self._nauos[number] = nauo
+            parent.children.append((_text(nauo.Name()) or _text(nauo.Id()), number, child))
+            used.add(child.number)
+        self.roots = [product for number, product in self.products.items() if number not in used]
+
+        for cdsr in cdsrs:
+            try:
+                relationship = cdsr.RepresentedProductRelation().Definition().ProductDefinitionRelationship()
+            except AttributeError:
+                continue
+            if relationship is not None:
+                self._cdsrs.setdefault(model.Number(relationship), cdsr)
+
+        self._representation_products = self._read_representations(model, sdrs, srrs)
+        self._read_colors(model, styled_items)
+        logger.info(f"{self.file_path}: {len(self.products)} 个产品，{len(self.roots)} 个根，"
+                    f"{len(nauos)} 个装配关系，{len(styled_items)} 个样式")
+
+    def product(self, path):
+        """实例路径对应的产品"""
+        if len(path) == 1:
+            return self.products[path[0]]
+        return self.products[self._model.Number(self._nauos[path[-1]].RelatedProductDefinition())]
+
+    def children(self, path):
+        """实例的组件：[(实例名称, 组件的实例路径, StepProduct), ...]"""
+        return [(name, path + (number,), child) for name, number, child in self.product(path).children]
+
+    def overlapping(self, path):
+        """与 path 的几何重叠的已加载实例（path 本身、其祖先或其组件），祖先在前"""
+        return sorted((other for other in self.loaded if is_sub_path(other, path) or is_sub_path(path, other)),
+                      key=len)
+
+    def _product_name(self, definition):
+        try:
+            product = definition.Formation().OfProduct()
+            return _text(product.Name()) or _text(product.Id())
+        except AttributeError:
+            return ""
+
+    def _read_representations(self, model, sdrs, srrs):
+        """每个形状表示所属的产品：表示的实体编号 -> 产品实体编号"""
+        representation_products = {}
+        for sdr in sdrs:
+            try:
+                definition = sdr.Definition().PropertyDefinition().Definition().ProductDefinition()
+                representation = sdr.UsedRepresentation()
+            except AttributeError:
+                continue
+            if definition is not None and representation is not None:
+                representation_products[model.Number(representation)] = model.Number(definition)
+
+        # 同一产品的其他表示（例如 ADVANCED_BREP_SHAPE_REPRESENTATION）通过表示关系关联
+        changed = True
+        while changed:
+            changed = False
+            for srr in srrs:
+                first, second = model.Number(srr.Rep1()), model.Number(srr.Rep2())
+                if first in representation_products and second not in representation_products:
+                    representation_products[second] = representation_products[first]
+                    changed = True
+                elif second in representation_products and first not in representation_products:
+                    representation_products[first] = representation_products[second]
+                    changed = True
+        return representation_products
+
+    def _read_colors(self, model, styled_items):
+        """把 STYLED_ITEM 的表面颜色对应到产品（经由产品的形状表示及其几何项），每个产品取第一个颜色"""
+        item_products = {}  # 几何项的实体编号 -> 产品实体编号
+        for representation_number, product_number in self._representation_products.items():
+            representation = StepRepr_Representation.DownCast(model.Value(representation_number))
+            items = representation.Items() if representation is not None else None
+            if items is None:
+                continue
+            for i in range(1, items.Length() + 1):
+                item_products.setdefault(model.Number(items.Value(i)), product_number)
+
+        for styled_item in styled_items:
+            product = self.products.get(item_products.get(model.Number(styled_item.Item())))
+            if product is None or product.color is not None:
+                continue
+            product.color = self._surface_color(styled_item)
+
+    def _surface_color(self, styled_item):
+        """STYLED_ITEM 的表面填充颜色，没有时返回 None"""
+        try:
+            for i in range(1, styled_item.NbStyles() + 1):
+                assignment = styled_item.StylesValue(i)
+                for j in range(1, assignment.NbStyles() + 1):
+                    usage = assignment.StylesValue(j).SurfaceStyleUsage()
+                    if usage is None:
+                        continue
+                    side = usage.Style()
+                    for k in range(1, side.NbStyles() + 1):
+                        fill_area = side.StylesValue(k).SurfaceStyleFillArea()
+                        if fill_area is None:
+                            continue
+                        fill = fill_area.FillArea()
+                        for m in range(1, fill.NbFillStyles() + 1):
+                            colour = fill.FillStylesValue(m).FillAreaStyleColour()
+                            if colour is None:
+                                continue
+                            color = Quantity_Color()
+                            if STEPConstruct_Styles.DecodeColor(colour.FillColour(), color):
+                                return color
+        except Exception as e:
+            logger.debug(f"解析样式颜色失败: {e}")
+        return None
+
+    def placement(self, number):
+        """
+        装配关系 number 的定位：组件坐标系 -> 装配体坐标系（没有定位或无法解析时为恒等变换）
+
+        与 STEPControl_ActorRead 相同：由带变换的表示关系中的两个 AXIS2_PLACEMENT_3D 计算，
+        表示关系的 Rep1 属于装配体（方向与装配关系相反）时取逆。
+        坐标由 StepToGeom 转换，单位与转换得到的几何一致，因此在 TransferEntity 之后调用。
+        """
+        trsf = self._placements.get(number)
+        if trsf is not None:
+            return trsf
+        trsf = gp_Trsf()
+        cdsr = self._cdsrs.get(number)
+        relation = None
+        if cdsr is not None:
+            relation = StepRepr_ShapeRepresentationRelationshipWithTransformation.DownCast(cdsr.RepresentationRelation())
+        transformation = None
+        if relation is not None:
+            transformation = relation.TransformationOperator().ItemDefinedTransformation()
+        if transformation is None:
+            logger.warning(f"装配关系 #{number} 没有可用的定位，按恒等变换处理")
+        else:
+            origin = StepGeom_Axis2Placement3d.DownCast(transformation.TransformItem1())
+            target = StepGeom_Axis2Placement3d.DownCast(transformation.TransformItem2())
+            if origin is None or target is None:
+                logger.warning(f"装配关系 #{number} 的定位不是 AXIS2_PLACEMENT_3D，按恒等变换处理")
+            else:
+                trsf.SetTransformation(gp_Ax3(StepToGeom.MakeAxis2Placement(target).Ax2()),
+                                       gp_Ax3(StepToGeom.MakeAxis2Placement(origin).Ax2()))
+                parent = self._model.Number(self._nauos[number].RelatingProductDefinition())
+                if self._representation_products.get(self._model.Number(relation.Rep1())) == parent:
+                    trsf.Invert()
+        self._placements[number] = trsf
+        return trsf
+
+    def transfer(self, path):
+        """
+        只转换一个产品实例（根或子装配，包括其所有组件）的几何，返回位于根产品坐标系中的主形状
+
+        TransferEntity 只转换产品定义，得到的是产品自身坐标系中的几何，
+        再按路径上从根到该实例的各装配关系的定位依次变换。
+        """
+        product = self.product(path)
+        reader = self.reader.Reader()
+        reader.ClearShapes()
+        if not reader.TransferEntity(product.definition):
+            raise RuntimeError(f"转换产品 {product.name or product.number} 失败。")
+        shape = reader.OneShape()
+        if shape is None or shape.IsNull():
+            raise RuntimeError(f"产品 {product.name or product.number} 没有几何。")
+        if len(path) > 1:
+            trsf = gp_Trsf()
+            for number in path[1:]:
+                trsf.Multiply(self.placement(number))
+            shape = shape.Moved(TopLoc_Location(trsf))
+        return shape
+
+
+class StepStructureWorker(QThread):
+    """在后台线程中解析 STEP 文件的产品结构（ReadFile 不可中断，取消时丢弃结果）"""
+
+    completed = pyqtSignal(object)  # StepStructure
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, file_path, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self._cancel_requested = False
+
+    def cancel(self):
+        self._cancel_requested = True
+
+    def run(self):
+        try:
+            structure = StepStructure(self.file_path)
+            structure.read()
+            if self._cancel_requested:
+                self.cancelled.emit()
+                return
+            self.completed.emit(structure)
+        except Exception as e:
+            logger.exception(f"读取STEP产品结构时发生异常: {e}")
+            self.failed.emit(str(e))
+
+
+class StepTransferWorker(QThread):
+    """
+    在后台线程中按需转换所选产品的几何，并建立拓扑索引、按 deflection 剖分
+
+    products 为 [(实例路径, 拓扑序号), ...]；每个产品之间和每批面检查一次取消标志。
+    """
+
+    progress = pyqtSignal(int, str)  # 百分比, 说明
+    product_loaded = pyqtSignal(object, object, object)  # 实例路径, 主形状, ShapeTopology
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, structure, products, deflection=MESH_PRESETS[DEFAULT_MESH_PRESET], parent=None):
+        super().__init__(parent)
+        self.structure = structure
+        self.products = list(products)
+        self.deflection = deflection
+        self._cancel_requested = False
+
+    def cancel(self):
+        self._cancel_requested = True
+
+    def _check_cancelled(self):
+        if self._cancel_requested:
+            raise InterruptedError("用户取消转换")
+
+    def run(self):
+        try:
+            linear_deflection, angular_deflection = self.deflection
+            for i, (path, topology_index) in enumerate(self.products):
+                self._check_cancelled()
+                product = self.structure.product(path)
+                name = product.name or f"#{product.number}"
+                base = 100 * i // len(self.products)
+                self.progress.emit(base, f"正在转换 {name} 的几何...")
+                shape = self.structure.transfer(path)
+                topology = ShapeTopology(topology_index, shape)
+                faces = topology.shapes(TopAbs_FACE)
+                for meshed in mesh_faces(faces, linear_deflection, angular_deflection):
+                    self._check_cancelled()
+                    self.progress.emit(base, f"正在剖分 {name}: {meshed}/{len(faces)} 个面")
+                self.structure.loaded.add(path)
+                self.product_loaded.emit(path, shape, topology)
+        except InterruptedError:
+            logger.warning("用户取消了产品几何的转换")
+            self.cancelled.emit()
+        except Exception as e:
+            logger.exception(f"转换产品几何时发生异常: {e}")
+            self.failed.emit(str(e))
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+导入 CAD 模型的拓扑索引和按需展开的层级浏览（复合体 → 实体 → 壳 → 面 → 边）
+
+每个文件的各类别子形状在 C++ 中一次性收集到 TopTools_IndexedMapOfShape，
+形状 ID 为 “类别_文件序号_映射序号”，ID 与形状之间的互查为常数时间，不需要为每个子形状创建 Python 对象；
+某个形状的下一级子形状只在用户展开它时才用 TopExp_Explorer 枚举，枚举结果保存在有上限的 LRU 缓存中。
+"""
+import logging
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from OCC.Core.TopAbs import TopAbs_COMPOUND, TopAbs_COMPSOLID, TopAbs_SOLID, TopAbs_SHELL, TopAbs_FACE, TopAbs_EDGE
+from OCC.Core.TopExp import TopExp_Explorer, topexp_MapShapes, topexp_MapShapesAndAncestors
+from OCC.Core.TopTools import TopTools_IndexedDataMapOfShapeListOfShape, TopTools_IndexedMapOfShape
+
+# 全局日志器
+logger = logging.getLogger("cad_topology")
+
+# 导入后在树中列出的子形状类别（按层级从上到下）
+SUBSHAPE_CATEGORIES = {
+    TopAbs_SOLID: "实体 (Solid)",
+    TopAbs_SHELL: "壳 (Shell)",
+    TopAbs_FACE: "面 (Face)",
+    # TopAbs_WIRE: "线框 (Wire)", # 通常是面的一部分，可能添加噪声
+    TopAbs_EDGE: "边 (Edge)",
+}
+
+# 形状 ID 的类别前缀
+_ID_PREFIXES = {shape_type: name.split(' ')[0].lower() for shape_type, name in SUBSHAPE_CATEGORIES.items()}
+_PREFIX_TYPES = {prefix: shape_type for shape_type, prefix in _ID_PREFIXES.items()}
+_LEVELS = list(SUBSHAPE_CATEGORIES)
+
+# 默认缓存多少个已展开形状的子形状列表
+DEFAULT_MAX_EXPANDED = 512
+
+
+def parse_shape_id(shape_id):
+    """把形状 ID 拆分为 (形状类型, 文件序号, 映射序号)；不是导入形状的 ID 时返回 None"""
+    if not isinstance(shape_id, str):
+        return None
+    parts = shape_id.split('_')
+    if len(parts) != 3 or parts[0] not in _PREFIX_TYPES:
+        return None
+    try:
+        return _PREFIX_TYPES[parts[0]], int(parts[1]), int(parts[2])
+    except ValueError:
+        return None
+
+
+def has_subshapes(shape):
+    """形状在层级中是否还有下一级（边是叶子）"""
+    return shape.ShapeType() < TopAbs_EDGE
+
+
+class ShapeTopology:
+    """一个导入文件的拓扑索引：各类别子形状的 TopTools_IndexedMapOfShape"""
+
+    def __init__(self, file_index, shape):
+        self.file_index = file_index
+        self.shape = shape
+        self._maps = {}
+        for shape_type in SUBSHAPE_CATEGORIES:
+            shape_map = TopTools_IndexedMapOfShape()
+            topexp_MapShapes(shape, shape_type, shape_map)
+            self._maps[shape_type] = shape_map
+        self._ancestors = {}  # (子类型, 祖先类型) -> TopTools_IndexedDataMapOfShapeListOfShape，拾取时才建立
+        self._top_level = None
+
+    def count(self, shape_type=None):
+        """某一类别（默认所有类别）的唯一子形状数量"""
+        if shape_type is not None:
+            return self._maps[shape_type].Extent()
+        return sum(shape_map.Extent() for shape_map in self._maps.values())
+
+    def shapes(self, shape_type):
+        """按映射顺序返回某一类别的所有子形状"""
+        shape_map = self._maps[shape_type]
+        return [shape_map.FindKey(i) for i in range(1, shape_map.Extent() + 1)]
+
+    def shape_id(self, shape):
+        """返回子形状的 ID，不属于本文件的已登记类别时返回 None"""
+        shape_map = self._maps.get(shape.ShapeType())
+        if shape_map is None:
+            return None
+        number = shape_map.FindIndex(shape)
+        if number == 0:
+            return None
+        return f"{_ID_PREFIXES[shape.ShapeType()]}_{self.file_index}_{number}"
+
+    def find(self, shape_type, number):
+        shape_map = self._maps[shape_type]
+        if not 1 <= number <= shape_map.Extent():
+            return None
+        return shape_map.FindKey(number)
+
+    def ids(self):
+        for shape_type, shape_map in self._maps.items():
+            prefix = _ID_PREFIXES[shape_type]
+            for number in range(1, shape_map.Extent() + 1):
+                yield f"{prefix}_{self.file_index}_{number}"
+
+    def children(self, shape):
+        """
+        用 TopExp_Explorer 枚举 shape 的下一级子形状，返回 [(ID, 形状), ...]
+
+        依次枚举比 shape 低的各类别，每一类别跳过已包含在上一类别中的形状
+        （例如复合体下只列出不属于任何实体的壳、不属于任何壳的面），同一形状只列出一次。
+        """
+        result = []
+        seen = set()
+        previous = None
+        for shape_type in _LEVELS:
+            if shape_type <= shape.ShapeType():
+                continue
+            if previous is None:
+                explorer = TopExp_Explorer(shape, shape_type)
+            else:
+                explorer = TopExp_Explorer(shape, shape_type, previous)
+            while explorer.More():
+                current = explorer.Current()
+                shape_id = self.shape_id(current)
+                if shape_id is not None and shape_id not in seen:
+                    seen.add(shape_id)
+                    result.append((shape_id, current))
+                explorer.Next()
+            previous = shape_type
+        return result
+
+    def top_level(self):
+        """文件树分支的第一级：根为复合体时是它的子形状，否则是根形状本身"""
+        if self._top_level is None:
+            if self.shape.ShapeType() in (TopAbs_COMPOUND, TopAbs_COMPSOLID):
+                self._top_level = self.children(self.shape)
+            else:
+                self._top_level = [(self.shape_id(self.shape), self.shape)]
+        return self._top_level
+
+    def parent(self, shape):
+        """返回层级中包含 shape 的上一级形状（与 children 的规则一致），位于第一级时返回 None"""
+        shape_type = shape.ShapeType()
+        for parent_type in reversed(_LEVELS):
+            if parent_type >= shape_type:
+                continue
+            key = (shape_type, parent_type)
+            ancestors = self._ancestors.get(key)
+            if ancestors is None:
+                ancestors = TopTools_IndexedDataMapOfShapeListOfShape()
+                topexp_MapShapesAndAncestors(self.shape, shape_type, parent_type, ancestors)
+                self._ancestors[key] = ancestors
+            if ancestors.Contains(shape):
+                parents = ancestors.FindFromKey(shape)
+                if parents.Extent() > 0:
+                    return parents.First()
+        return None
+
+
+class TopologyBrowser(Mapping):
+    """
+    所有导入文件的形状 ID -> TopoDS_Shape 映射，并按需枚举层级中的子形状
+
+    作为只读字典使用时只根据 ID 查询拓扑索引，不会为所有子形状建立字典。
+    children() 的结果保存在最多 max_expanded 项的 LRU 缓存中，
+    淘汰时调用 on_evict(shape_id)，界面可以借此卸载已折叠的树节点。
+    """
+
+    def __init__(self, max_expanded=DEFAULT_MAX_EXPANDED, on_evict=None):
+        self.max_expanded = max_expanded
+        self.on_evict = on_evict
+        self.topologies = {}  # 文件序号 -> ShapeTopology
+        self._children = OrderedDict()  # 形状 ID -> [(ID, 形状), ...]
+
+    def add(self, topology):
+        self.topologies[topology.file_index] = topology
+
+    # --- Mapping 接口 ---
+    def __getitem__(self, shape_id):
+        parsed = parse_shape_id(shape_id)
+        topology = self.topologies.get(parsed[1]) if parsed is not None else None
+        shape = topology.find(parsed[0], parsed[2]) if topology is not None else None
+        if shape is None:
+            raise KeyError(shape_id)
+        return shape
+
+    def __iter__(self):
+        for topology in self.topologies.values():
+            yield from topology.ids()
+
+    def __len__(self):
+        return sum(topology.count() for topology in self.topologies.values())
+
+    # --- 层级浏览 ---
+    def shape_id(self, shape):
+        for topology in self.topologies.values():
+            shape_id = topology.shape_id(shape)
+            if shape_id is not None:
+                return shape_id
+        return None
+
+    def top_level(self, file_index):
+        return self.topologies[file_index].top_level()
+
+    def children(self, shape_id):
+        """返回形状的下一级子形状 [(ID, 形状), ...]，最近使用的结果保存在 LRU 缓存中"""
+        cached = self._children.get(shape_id)
+        if cached is not None:
+            self._children.move_to_end(shape_id)
+            return cached
+        topology = self.topologies[parse_shape_id(shape_id)[1]]
+        cached = self._children[shape_id] = topology.children(self[shape_id])
+        while len(self._children) > self.max_expanded:
+            evicted, _ = self._children.popitem(last=False)
+            logger.debug(f"子形状缓存已满，淘汰: {evicted}")
+            if self.on_evict is not None:
+                self.on_evict(evicted)
+        return cached
+
+    def path(self, shape_id):
+        """返回从第一级到 shape_id 的上一级为止的祖先 ID 列表（定位树中尚未展开的条目时逐级展开）"""
+        topology = self.topologies[parse_shape_id(shape_id)[1]]
+        ancestors = []
+        shape = topology.parent(self[shape_id])
+        while shape is not None:
+            ancestors.append(topology.shape_id(shape))
+            shape = topology.parent(shape)
+        ancestors.reverse()
+        return ancestors
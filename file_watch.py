@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+源文件监视：文件内容变化（保存、覆盖或被替换）后发出一次 changed 信号
+
+编辑器和 Excel 保存时通常先删除或重命名原文件再写入新文件，QFileSystemWatcher 随之失去对该路径的监视，
+因此同时监视所在目录，并在每次变化后重新登记文件路径。一次保存会触发多个事件，
+这里等文件安静 DEFAULT_DEBOUNCE_MS 毫秒后比较修改时间和大小，只有真正变化时才发出信号。
+"""
+import logging
+import os
+
+from PyQt5.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+
+# 全局日志器
+logger = logging.getLogger("file_watch")
+
+# 最后一个文件事件之后等待多久再检查（毫秒）
+DEFAULT_DEBOUNCE_MS = 800
+
+
+def file_signature(file_path):
+    """文件的 (修改时间, 大小)，文件不存在时返回 None"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class SourceFileWatcher(QObject):
+    """监视单个源文件，内容变化时发出 changed(文件路径)"""
+
+    changed = pyqtSignal(str)
+
+    def __init__(self, parent=None, debounce_ms=DEFAULT_DEBOUNCE_MS):
+        super().__init__(parent)
+        self.file_path = None
+        self._signature = None
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._on_event)
+        self._watcher.directoryChanged.connect(self._on_event)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(debounce_ms)
+        self._timer.timeout.connect(self._check)
+
+    def watch(self, file_path):
+        """开始监视 file_path（替换之前监视的文件）"""
+        self.stop()
+        self.file_path = os.path.abspath(file_path)
+        self._signature = file_signature(self.file_path)
+        self._watcher.addPath(os.path.dirname(self.file_path))
+        self._watcher.addPath(self.file_path)
+        logger.info(f"开始监视文件: {self.file_path}")
+
+    def stop(self):
+        """停止监视"""
+        self._timer.stop()
+        paths = self._watcher.files() + self._watcher.directories()
+        if paths:
+            self._watcher.removePaths(paths)
+        if self.file_path is not None:
+            logger.info(f"停止监视文件: {self.file_path}")
+        self.file_path = None
+        self._signature = None
+
+    def is_watching(self):
+        return self.file_path is not None
+
+    def _on_event(self, path):
+        # 目录中其他文件的变化也会触发，这里只重新计时，是否真正变化由 _check 比较文件状态决定
+        if self.file_path is not None:
+            self._timer.start()
+
+    def _check(self):
+        if self.file_path is None:
+            return
+        signature = file_signature(self.file_path)
+        if signature is None:
+            # 文件被删除（或正在被替换）：不轮询，等新文件写入目录时的 directoryChanged 事件再检查
+            logger.info(f"文件暂时不存在，等待重新创建: {self.file_path}")
+            return
+        if self.file_path not in self._watcher.files():
+            self._watcher.addPath(self.file_path)
+        if signature == self._signature:
+            return
+        self._signature = signature
+        logger.info(f"检测到文件变化: {self.file_path}")
+        self.changed.emit(self.file_path)
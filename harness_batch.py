@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+无界面的线束批量转换：把 Excel / XML 线束文件转换为 STEP / IGES / glTF / STL
+
+    python harness_batch.py 输入文件或目录... -o 输出目录 [--format step iges gltf stl] [--mode solid|centerline] [-j 进程数]
+
+解析使用与可视化程序相同的 harness_data / harness_cache，几何与 draw_segments 相同
+（PrimitiveInstancer 的节点球体和线段圆柱体），也可以用 harness_export 只导出中心线；
+glTF / STL 网格由 harness_mesh 直接从坐标数组生成，不经过 B-rep。
+每个文件在进程池中独立转换，输出几何文件和同名的 JSON 摘要（数量、各阶段耗时、错误信息），
+全部完成后在输出目录写入 batch_summary.json；有文件转换失败时以状态码 1 退出。
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from OCC.Core.BRep import BRep_Builder
+from OCC.Core.IFSelect import IFSelect_RetDone
+from OCC.Core.IGESControl import IGESControl_Writer
+from OCC.Core.Interface import Interface_Static_SetCVal
+from OCC.Core.STEPControl import STEPControl_Writer, STEPControl_AsIs
+from OCC.Core.TopoDS import TopoDS_Compound
+
+from harness_cache import HarnessCache
+from harness_data import build_harness, harness_columns, iter_xml_nets, read_excel_file, XmlHarnessAccumulator
+from harness_export import build_centerline_document, write_centerline_step, write_centerline_iges
+from harness_geometry import MIN_SEGMENT_LENGTH, XML_MIN_SEGMENT_LENGTH, PrimitiveInstancer
+from harness_mesh import harness_meshes, segment_arrays, write_glb, write_stl
+
+# 全局日志器
+logger = logging.getLogger("harness_batch")
+
+# 输入文件扩展名 -> 数据类型
+INPUT_KINDS = {".xlsx": "xlsx", ".xls": "xlsx", ".xml": "xml"}
+
+# 各数据类型的 (节点球体半径, 线段圆柱体半径)，与两个可视化程序一致
+PRIMITIVE_RADII = {"xlsx": (40.0, 30.0), "xml": (25.0, 5.0)}
+
+# 各数据类型不绘制的线段长度阈值，与两个可视化程序一致
+MIN_SEGMENT_LENGTHS = {"xlsx": MIN_SEGMENT_LENGTH, "xml": XML_MIN_SEGMENT_LENGTH}
+
+# 中心线导出时的分组键（Excel 按 Section，XML 按 Net）
+GROUP_KEYS = {"xlsx": "section", "xml": "net"}
+
+# 输出格式 -> 文件扩展名
+OUTPUT_EXTENSIONS = {"step": ".step", "iges": ".igs", "gltf": ".glb", "stl": ".stl"}
+
+# 由三角网格写出的格式（其余格式写出 B-rep）
+MESH_FORMATS = ("gltf", "stl")
+
+# glTF 中线段和节点的颜色，与界面默认颜色一致
+MESH_COLORS = {"segments": (0.0, 0.0, 1.0), "nodes": (1.0, 0.0, 0.0)}
+
+EXPORT_MODES = ("solid", "centerline")
+
+SUMMARY_FILE = "batch_summary.json"
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def load_harness(file_path, kind, cache=None):
+    """读取线束文件，返回 (unique_nodes, [(start, end), ...], link_data, 统计信息)"""
+    if kind == "xlsx":
+        if cache is not None:
+            columns = cache.load_harness_columns(file_path, read_excel_file)
+        else:
+            columns = harness_columns(read_excel_file(file_path))
+        harness = build_harness(columns)
+        stats = {'bad_cells': len(harness['bad_cells'])}
+        return harness['unique_nodes'], harness['segments'], harness['link_data'], stats
+
+    accumulator = XmlHarnessAccumulator()
+    nets = cache.iter_xml_nets(file_path) if cache is not None else iter_xml_nets(file_path)
+    net_count = 0
+    for root_tag, net, _ in nets:
+        accumulator.add_net(root_tag, net)
+        net_count += 1
+    segments = [(start, end) for start, end, _ in accumulator.segments]
+    return accumulator.unique_nodes, segments, accumulator.link_data, {'nets': net_count}
+
+
+def build_solid_shape(unique_nodes, segments, primitives):
+    """与 draw_segments 相同：每个节点一个球体实例、每条线段一个圆柱体实例，合并为一个复合体"""
+    compound = TopoDS_Compound()
+    builder = BRep_Builder()
+    builder.MakeCompound(compound)
+    for node_pos in unique_nodes.values():
+        builder.Add(compound, primitives.sphere(node_pos))
+    skipped = 0
+    for idx, (start, end) in enumerate(segments):
+        cylinder = primitives.segment_cylinder(start, end, idx)
+        if cylinder is None:
+            skipped += 1
+            continue
+        builder.Add(compound, cylinder)
+    return compound, skipped
+
+
+def write_step(shape, file_path):
+    writer = STEPControl_Writer()
+    Interface_Static_SetCVal("write.step.schema", "AP203")
+    if not writer.Transfer(shape, STEPControl_AsIs):
+        return False
+    return writer.Write(file_path) == IFSelect_RetDone
+
+
+def write_iges(shape, file_path):
+    writer = IGESControl_Writer()
+    if not writer.AddShape(shape):
+        return False
+    return writer.Write(file_path)
+
+
+def convert_file(file_path, output_stem, formats, mode="solid", use_cache=True):
+    """
+    转换一个线束文件，写出几何文件和 JSON 摘要，返回摘要字典（在子进程中运行，不抛出异常）
+
+    output_stem 为不带扩展名的输出路径，几何文件为 output_stem + OUTPUT_EXTENSIONS 中的扩展名，摘要为 output_stem + .json。
+    """
+    started = time.perf_counter()
+    summary = {
+        'input': os.path.abspath(file_path),
+        'mode': mode,
+        'status': "failed",
+        'outputs': {},
+        'timings': {},
+    }
+    timings = summary['timings']
+    try:
+        kind = INPUT_KINDS.get(os.path.splitext(file_path)[1].lower())
+        if kind is None:
+            raise ValueError(f"不支持的文件类型: {file_path}")
+        summary['kind'] = kind
+
+        stage = time.perf_counter()
+        cache = HarnessCache() if use_cache else None
+        unique_nodes, segments, link_data, stats = load_harness(file_path, kind, cache)
+        timings['parse'] = round(time.perf_counter() - stage, 3)
+        summary.update(stats, nodes=len(unique_nodes), links=len(segments))
+
+        writers = {}
+        sphere_radius, cylinder_radius = PRIMITIVE_RADII[kind]
+        min_length = MIN_SEGMENT_LENGTHS[kind]
+        if any(file_format not in MESH_FORMATS for file_format in formats):
+            stage = time.perf_counter()
+            if mode == "centerline":
+                doc, edge_count, _ = build_centerline_document(link_data, GROUP_KEYS[kind])
+                summary['edges'] = edge_count
+                writers["step"] = lambda path: write_centerline_step(doc, path)
+                writers["iges"] = lambda path: write_centerline_iges(doc, path)
+            else:
+                primitives = PrimitiveInstancer(sphere_radius=sphere_radius, cylinder_radius=cylinder_radius,
+                                                min_length=min_length)
+                shape, skipped = build_solid_shape(unique_nodes, segments, primitives)
+                summary['skipped_segments'] = skipped
+                summary['prototypes'] = primitives.prototype_count()
+                writers["step"] = lambda path: write_step(shape, path)
+                writers["iges"] = lambda path: write_iges(shape, path)
+            timings['geometry'] = round(time.perf_counter() - stage, 3)
+
+        if any(file_format in MESH_FORMATS for file_format in formats):
+            stage = time.perf_counter()
+            starts, ends = segment_arrays(segments)
+            meshes = harness_meshes(starts, ends, list(unique_nodes.values()), cylinder_radius, sphere_radius,
+                                    min_length=min_length)
+            summary['triangles'] = sum(len(mesh) for mesh in meshes.values())
+            writers["gltf"] = lambda path: write_glb(path, meshes, MESH_COLORS)
+            writers["stl"] = lambda path: write_stl(path, list(meshes.values()))
+            timings['mesh'] = round(time.perf_counter() - stage, 3)
+
+        failed_formats = []
+        for file_format in formats:
+            stage = time.perf_counter()
+            output_path = output_stem + OUTPUT_EXTENSIONS[file_format]
+            ok = writers[file_format](output_path)
+            timings[f"write_{file_format}"] = round(time.perf_counter() - stage, 3)
+            if ok:
+                summary['outputs'][file_format] = {'path': output_path, 'bytes': os.path.getsize(output_path)}
+            else:
+                failed_formats.append(file_format)
+        if failed_formats:
+            raise RuntimeError(f"写入 {', '.join(failed_formats).upper()} 文件失败")
+        summary['status'] = "ok"
+    except Exception as e:
+        summary['error'] = f"{type(e).__name__}: {e}"
+        summary['traceback'] = traceback.format_exc()
+        logger.error(f"转换 {file_path} 失败: {e}")
+
+    timings['total'] = round(time.perf_counter() - started, 3)
+    try:
+        with open(output_stem + ".json", "w", encoding="utf-8") as stream:
+            json.dump(summary, stream, ensure_ascii=False, indent=2)
+    except OSError as e:
+        logger.error(f"写入摘要失败: {e}")
+    return summary
+
+
+def collect_inputs(paths):
+    """展开命令行给出的文件和目录（目录中按名称顺序取所有支持的文件，不递归）"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if os.path.splitext(name)[1].lower() in INPUT_KINDS:
+                    files.append(os.path.join(path, name))
+        else:
+            files.append(path)
+    return files
+
+
+def output_stems(files, output_dir):
+    """为每个输入文件分配输出路径（不带扩展名），同名文件追加序号"""
+    stems = []
+    used = set()
+    for file_path in files:
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        candidate, n = stem, 1
+        while candidate in used:
+            n += 1
+            candidate = f"{stem}_{n}"
+        used.add(candidate)
+        stems.append(os.path.join(output_dir, candidate))
+    return stems
+
+
+def _init_worker(log_level):
+    logging.basicConfig(level=log_level, format=LOG_FORMAT)
+
+
+def run_batch(files, output_dir, formats, mode="solid", max_workers=None, use_cache=True):
+    """在进程池中转换所有文件，写入 batch_summary.json 并返回各文件的摘要（与输入顺序一致）"""
+    os.makedirs(output_dir, exist_ok=True)
+    stems = output_stems(files, output_dir)
+    max_workers = max(1, min(len(files), max_workers or os.cpu_count() or 1))
+    logger.info(f"开始批量转换 {len(files)} 个文件（{max_workers} 个进程），输出目录: {output_dir}")
+
+    started = time.perf_counter()
+    summaries = [None] * len(files)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                             initializer=_init_worker, initargs=(logging.getLogger().level,)) as pool:
+        futures = {
+            pool.submit(convert_file, file_path, stem, formats, mode, use_cache): i
+            for i, (file_path, stem) in enumerate(zip(files, stems))
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                # 子进程异常退出（例如 OCC 崩溃）时 convert_file 无法返回摘要
+                summary = {'input': os.path.abspath(files[i]), 'mode': mode, 'status': "failed",
+                           'error': f"{type(e).__name__}: {e}", 'outputs': {}, 'timings': {}}
+            summaries[i] = summary
+            logger.info(f"[{done}/{len(files)}] {os.path.basename(files[i])}: {summary['status']} "
+                        f"({summary['timings'].get('total', 0):.2f}s)")
+
+    failed = [summary for summary in summaries if summary['status'] != "ok"]
+    report = {
+        'files': len(files),
+        'succeeded': len(files) - len(failed),
+        'failed': len(failed),
+        'mode': mode,
+        'formats': list(formats),
+        'workers': max_workers,
+        'elapsed': round(time.perf_counter() - started, 3),
+        'results': summaries,
+    }
+    with open(os.path.join(output_dir, SUMMARY_FILE), "w", encoding="utf-8") as stream:
+        json.dump(report, stream, ensure_ascii=False, indent=2)
+    logger.info(f"批量转换完成: 成功 {report['succeeded']}，失败 {report['failed']}，耗时 {report['elapsed']:.2f}s")
+    for summary in failed:
+        logger.error(f"失败: {summary['input']} - {summary.get('error')}")
+    return summaries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="线束文件（Excel / XML）批量转换为 STEP / IGES / glTF / STL")
+    parser.add_argument("inputs", nargs='+', help="输入文件或目录")
+    parser.add_argument("-o", "--output-dir", default="output", help="输出目录（默认 output）")
+    parser.add_argument("--format", nargs='+', choices=sorted(OUTPUT_EXTENSIONS), default=["step"],
+                        help="输出格式，可指定多个（默认 step；gltf / stl 为三角网格）")
+    parser.add_argument("--mode", choices=EXPORT_MODES, default="solid",
+                        help="STEP / IGES 的内容。solid: 节点球体和线段圆柱体；centerline: 只导出中心线和节点")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="并行进程数（默认 CPU 核数）")
+    parser.add_argument("--no-cache", action="store_true", help="不读取也不写入解析缓存")
+    parser.add_argument("--debug", action="store_true", help="输出调试日志")
+    args = parser.parse_args(argv)
+
+    log_level = logging.DEBUG if args.debug else logging.INFO
+    logging.basicConfig(level=log_level, format=LOG_FORMAT)
+
+    files = collect_inputs(args.inputs)
+    if not files:
+        logger.error("没有找到可转换的输入文件")
+        return 1
+    summaries = run_batch(files, args.output_dir, args.format, args.mode, args.jobs, not args.no_cache)
+    return 0 if all(summary['status'] == "ok" for summary in summaries) else 1
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+"""
+线束解析结果的磁盘缓存
+
+以“文件内容哈希 + 解析器版本”为键，把解析结果保存为 .npz（数值数组 + 字符串表），
+再次打开未修改的文件时直接读取缓存，跳过 openpyxl / XML 解析。缓存总大小超过上限时按最近使用时间淘汰。
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from harness_data import PARSER_VERSION, harness_columns, iter_xml_nets
+
+# 全局日志器
+logger = logging.getLogger("harness_cache")
+
+# 默认缓存目录，可用环境变量 HARNESS_CACHE_DIR 覆盖
+DEFAULT_CACHE_DIR = os.environ.get(
+    "HARNESS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "pythonocc-demo"))
+
+# 缓存目录的默认大小上限（字节）
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# 缓存文件格式版本：编码方式变化时递增
+CACHE_FORMAT_VERSION = 1
+
+# 读取文件计算哈希时的块大小
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+# 原始值列中每个元素的类型标记
+_KIND_NONE, _KIND_FLOAT, _KIND_INT, _KIND_STR = 0, 1, 2, 3
+
+# Excel 中原样保留的值列（可能同时包含数字和字符串）
+_XLSX_VALUE_COLUMNS = ('lengths', 'densities', 'safeties', 'routes', 'action_numbers')
+_XLSX_STRING_COLUMNS = ('link_names', 'ref_origine', 'ref_extremite', 'sections')
+
+
+def file_digest(file_path, kind):
+    """计算缓存键：文件内容、文件类型和解析器版本的 SHA-256"""
+    digest = hashlib.sha256(f"{kind}:{PARSER_VERSION}:{CACHE_FORMAT_VERSION}:".encode("utf-8"))
+    with open(file_path, "rb") as stream:
+        for block in iter(lambda: stream.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class StringTable:
+    """把字符串编码为整数下标，所有字符串只保存一份"""
+
+    def __init__(self, strings=None):
+        self.strings = [] if strings is None else list(strings)
+        self._codes = {value: code for code, value in enumerate(self.strings)}
+
+    def code(self, value):
+        """返回字符串的下标，None 编码为 -1"""
+        if value is None:
+            return -1
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.strings)
+            self._codes[value] = code
+            self.strings.append(value)
+        return code
+
+    def codes(self, values):
+        return np.array([self.code(value) for value in values], dtype=np.int32)
+
+    def value(self, code):
+        return None if code < 0 else self.strings[code]
+
+    def values(self, codes):
+        return [self.value(code) for code in codes.tolist()]
+
+    def array(self):
+        return np.array(self.strings, dtype=str)
+
+
+def _encode_values(values, table):
+    """把原始值列编码为 (类型标记, 数值, 字符串下标) 三个数组"""
+    kinds = np.zeros(len(values), dtype=np.int8)
+    numbers = np.zeros(len(values), dtype=np.float64)
+    codes = np.full(len(values), -1, dtype=np.int32)
+    for i, value in enumerate(values):
+        if value is None:
+            kinds[i] = _KIND_NONE
+        elif isinstance(value, (bool, np.bool_)):
+            kinds[i] = _KIND_STR
+            codes[i] = table.code(str(value))
+        elif isinstance(value, (int, np.integer)):
+            kinds[i] = _KIND_INT
+            numbers[i] = value
+        elif isinstance(value, (float, np.floating)):
+            kinds[i] = _KIND_FLOAT
+            numbers[i] = value
+        else:
+            kinds[i] = _KIND_STR
+            codes[i] = table.code(str(value))
+    return kinds, numbers, codes
+
+
+def _decode_values(kinds, numbers, codes, table):
+    """_encode_values 的逆操作"""
+    values = []
+    for kind, number, code in zip(kinds.tolist(), numbers.tolist(), codes.tolist()):
+        if kind == _KIND_FLOAT:
+            values.append(number)
+        elif kind == _KIND_INT:
+            values.append(int(number))
+        elif kind == _KIND_STR:
+            values.append(table.value(code))
+        else:
+            values.append(None)
+    return values
+
+
+def encode_harness_columns(columns):
+    """把 harness_data.harness_columns 的结果编码为可写入 .npz 的数组"""
+    table = StringTable()
+    arrays = {'coords': np.asarray(columns['coords'], dtype=np.float64)}
+    for name in _XLSX_STRING_COLUMNS:
+        arrays[name] = table.codes(columns[name])
+    for name in _XLSX_VALUE_COLUMNS:
+        kinds, numbers, codes = _encode_values(columns[name], table)
+        arrays[f"{name}_kind"] = kinds
+        arrays[f"{name}_number"] = numbers
+        arrays[f"{name}_code"] = codes
+
+    bad_cells = columns['bad_cells']
+    arrays['bad_rows'] = np.array([row for row, _, _ in bad_cells], dtype=np.int64)
+    arrays['bad_columns'] = table.codes([column for _, column, _ in bad_cells])
+    arrays['bad_values'] = table.codes([str(value) for _, _, value in bad_cells])
+    arrays['strings'] = table.array()
+    return arrays
+
+
+def decode_harness_columns(arrays):
+    """encode_harness_columns 的逆操作，返回与 harness_columns 相同结构的字典"""
+    table = StringTable(arrays['strings'].tolist())
+    columns = {'coords': arrays['coords']}
+    for name in _XLSX_STRING_COLUMNS:
+        columns[name] = np.array(table.values(arrays[name]), dtype=object)
+    for name in _XLSX_VALUE_COLUMNS:
+        columns[name] = _decode_values(
+            arrays[f"{name}_kind"], arrays[f"{name}_number"], arrays[f"{name}_code"], table)
+    columns['bad_cells'] = list(zip(
+        arrays['bad_rows'].tolist(), table.values(arrays['bad_columns']), table.values(arrays['bad_values'])))
+    return columns
+
+
+class XmlNetEncoder:
+    """
+    把 iter_xml_nets 产出的 Net 记录逐个编码
+
+    所有带坐标的点保存在 point_names / point_xyz 数组中，Network 保存在 network_* 数组中，
+    Net 的层次结构以 JSON 保存，其中只引用点和 Network 的下标。
+    """
+
+    def __init__(self, root_tag):
+        self.root_tag = root_tag
+        self.table = StringTable()
+        self.point_names = []
+        self.point_xyz = []
+        self.network_names = []
+        self.network_points = []
+        self.nets = []
+
+    def _point(self, point):
+        if point is None:
+            return -1
+        name, x, y, z = point
+        self.point_names.append(self.table.code(name))
+        self.point_xyz.append((x, y, z))
+        return len(self.point_xyz) - 1
+
+    def _points(self, points):
+        return None if points is None else [self._point(point) for point in points]
+
+    def _networks(self, networks):
+        """编码一组 Network，返回 [起始下标, 数量]"""
+        if networks is None:
+            return None
+        first = len(self.network_names)
+        for network in networks:
+            self.network_names.append(self.table.code(network['name']))
+            self.network_points.append((self._point(network['start']), self._point(network['end'])))
+        return [first, len(networks)]
+
+    def add(self, net):
+        self.nets.append({
+            'name': net['name'],
+            'devices': self._points(net['devices']),
+            'isoelectric_points': self._points(net['isoelectric_points']),
+            'total_network': self._networks(net['total_network']),
+            'connectors': self._points(net['connectors']),
+            'subnets': [{
+                'name': subnet['name'],
+                'connectors': self._points(subnet['connectors']),
+                'segements': [{
+                    'name': segement['name'],
+                    'route': segement['route'],
+                    'networks': self._networks(segement['networks']),
+                } for segement in subnet['segements']],
+            } for subnet in net['subnets']],
+        })
+
+    def arrays(self):
+        return {
+            'root_tag': np.array(self.root_tag or "", dtype=str),
+            'structure': np.array(json.dumps(self.nets, ensure_ascii=False), dtype=str),
+            'point_names': np.array(self.point_names, dtype=np.int32),
+            'point_xyz': np.array(self.point_xyz, dtype=np.float64).reshape(-1, 3),
+            'network_names': np.array(self.network_names, dtype=np.int32),
+            'network_points': np.array(self.network_points, dtype=np.int64).reshape(-1, 2),
+            'strings': self.table.array(),
+        }
+
+
+def decode_xml_nets(arrays):
+    """XmlNetEncoder 的逆操作，返回 (root_tag, [net_record, ...])"""
+    table = StringTable(arrays['strings'].tolist())
+    names = table.values(arrays['point_names'])
+    points = [(name, x, y, z) for name, (x, y, z) in zip(names, arrays['point_xyz'].tolist())]
+    network_names = table.values(arrays['network_names'])
+    network_points = arrays['network_points'].tolist()
+
+    def point(index):
+        return None if index < 0 else points[index]
+
+    def point_list(indices):
+        return None if indices is None else [point(index) for index in indices]
+
+    def networks(span):
+        if span is None:
+            return None
+        first, count = span
+        return [{
+            'name': network_names[i],
+            'start': point(network_points[i][0]),
+            'end': point(network_points[i][1]),
+        } for i in range(first, first + count)]
+
+    nets = []
+    for net in json.loads(str(arrays['structure'])):
+        nets.append({
+            'name': net['name'],
+            'devices': point_list(net['devices']),
+            'isoelectric_points': point_list(net['isoelectric_points']),
+            'total_network': networks(net['total_network']),
+            'connectors': tuple(point_list(net['connectors'])),
+            'subnets': [{
+                'name': subnet['name'],
+                'connectors': tuple(point_list(subnet['connectors'])),
+                'segements': [{
+                    'name': segement['name'],
+                    'route': None if segement['route'] is None else tuple(segement['route']),
+                    'networks': networks(segement['networks']),
+                } for segement in subnet['segements']],
+            } for subnet in net['subnets']],
+        })
+    root_tag = str(arrays['root_tag']) or None
+    return root_tag, nets
+
+
+class HarnessCache:
+    """按文件内容哈希保存解析结果的目录缓存（LRU 淘汰）"""
+
+    # 缓存文件扩展名；淘汰时只统计本类缓存的文件
+    suffix = ".npz"
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _path(self, key, kind):
+        return os.path.join(self.cache_dir, f"{kind}_{key}{self.suffix}")
+
+    def load(self, file_path, kind):
+        """读取缓存，返回 (key, arrays)；未命中时 arrays 为 None"""
+        try:
+            key = file_digest(file_path, kind)
+        except OSError as e:
+            logger.warning(f"无法读取文件计算哈希: {e}")
+            return None, None
+
+        path = self._path(key, kind)
+        if not os.path.exists(path):
+            logger.info(f"缓存未命中: {os.path.basename(file_path)}")
+            return key, None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+            os.utime(path)  # 更新最近使用时间
+            logger.info(f"从缓存读取: {os.path.basename(file_path)} ({path})")
+            return key, arrays
+        except Exception as e:
+            logger.warning(f"缓存文件损坏，已忽略: {path} ({e})")
+            self._remove(path)
+            return key, None
+
+    def store(self, key, kind, arrays):
+        """写入缓存（先写临时文件再替换，避免留下不完整的缓存），然后按大小上限淘汰"""
+        if key is None:
+            return
+        path = self._path(key, kind)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_path, "wb") as stream:
+                np.savez_compressed(stream, **arrays)
+            os.replace(temp_path, path)
+            logger.info(f"已写入缓存: {path}")
+        except OSError as e:
+            logger.warning(f"写入缓存失败: {e}")
+            self._remove(temp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        """缓存总大小超过上限时，删除最久未使用的文件"""
+        try:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(self.suffix):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        except OSError as e:
+            logger.warning(f"读取缓存目录失败: {e}")
+            return
+
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        # 最近写入的一项总是保留
+        for _, size, path in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            logger.info(f"缓存超过上限，删除: {path}")
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    # --- Excel ---
+    def load_harness_columns(self, file_path, read_dataframe):
+        """
+        返回 Excel 文件的 harness_columns 结果
+
+        命中缓存时直接解码；否则调用 read_dataframe(file_path) 读取数据框、取出各列并写入缓存。
+        """
+        started = time.perf_counter()
+        key, arrays = self.load(file_path, "xlsx")
+        if arrays is not None:
+            columns = decode_harness_columns(arrays)
+            logger.info(f"缓存读取耗时 {time.perf_counter() - started:.3f}s")
+            return columns
+
+        columns = harness_columns(read_dataframe(file_path))
+        self.store(key, "xlsx", encode_harness_columns(columns))
+        return columns
+
+    # --- XML ---
+    def iter_xml_nets(self, file_path):
+        """
+        与 harness_data.iter_xml_nets 相同的接口：产出 (root_tag, net_record, bytes_read)
+
+        命中缓存时从缓存中产出 Net 记录；否则流式解析文件，完整读取后写入缓存
+        （解析出错或调用方提前停止时不写入）。
+        """
+        key, arrays = self.load(file_path, "xml")
+        if arrays is not None:
+            root_tag, nets = decode_xml_nets(arrays)
+            file_size = os.path.getsize(file_path)
+            for i, net in enumerate(nets):
+                yield root_tag, net, file_size * (i + 1) // len(nets)
+            return
+
+        encoder = None
+        for root_tag, net, bytes_read in iter_xml_nets(file_path):
+            if encoder is None:
+                encoder = XmlNetEncoder(root_tag)
+            encoder.add(net)
+            yield root_tag, net, bytes_read
+
+        if encoder is not None:
+            self.store(key, "xml", encoder.arrays())
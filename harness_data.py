@@ -0,0 +1,450 @@
+# -*- coding: utf-8 -*-
+"""线束数据解析（不依赖 Qt/OCC，可被可视化程序和命令行工具共同使用）"""
+import logging
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+
+# 全局日志器
+logger = logging.getLogger("harness_data")
+
+# Excel 中的坐标列，顺序与 (start_point, end_point) 一致
+XLSX_COORD_COLUMNS = ["Xorigine", "Yorigine", "Zorigine", "Xextremite", "Yextremite", "Zextremite"]
+
+# 每个批次处理的行数（进度按批次汇报，而不是逐行）
+DEFAULT_CHUNK_SIZE = 2000
+
+# 解析结果的版本号：解析逻辑或输出结构变化时递增，使旧的缓存失效
+PARSER_VERSION = 1
+
+
+def coerce_coordinates(df, columns=XLSX_COORD_COLUMNS):
+    """
+    将坐标列一次性转换为 float64 数组
+
+    无法转换的单元格置为 NaN，并记录在 bad_cells 中 [(行号, 列名, 原始值), ...]。
+    缺失的列保持 0.0，与逐行解析时 row.get(col, 0.0) 的行为一致。
+    """
+    coords = np.zeros((len(df), len(columns)), dtype=np.float64)
+    bad_cells = []
+    for j, column in enumerate(columns):
+        if column not in df.columns:
+            logger.warning(f"数据中缺少坐标列 {column}，使用默认值 0.0")
+            continue
+        raw = df[column]
+        values = pd.to_numeric(raw, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        bad_rows = np.flatnonzero(np.isnan(values) & raw.notna().to_numpy())
+        for row in bad_rows:
+            bad_cells.append((int(row), column, raw.iloc[row]))
+        coords[:, j] = values
+    return coords, bad_cells
+
+
+def _string_column(df, name, default_prefix):
+    """读取字符串列；列不存在时使用 '<default_prefix>_<行索引>' 作为默认值"""
+    if name in df.columns:
+        return np.array([str(value) for value in df[name].tolist()], dtype=object)
+    return np.array([f"{default_prefix}_{label}" for label in df.index], dtype=object)
+
+
+def _value_column(df, name, default):
+    """读取原始值列（不做类型转换）；列不存在时使用默认值"""
+    if name in df.columns:
+        return df[name].tolist()
+    return [default] * len(df)
+
+
+def group_indices(codes, count):
+    """把 codes（0..count-1）相同的位置分组，返回每组按原顺序排列的索引数组列表"""
+    order = np.argsort(codes, kind="stable")
+    bounds = np.cumsum(np.bincount(codes, minlength=count))[:-1]
+    return np.split(order, bounds)
+
+
+def link_endpoints(link):
+    """返回链接两端的 (节点名称, 坐标)，兼容 Excel（origin/extremite）与 XML（start_node/end_node）两种结构"""
+    if 'origin' in link:
+        return ((link['origin']['ref'], link['origin']['coordinates']),
+                (link['extremite']['ref'], link['extremite']['coordinates']))
+    return (link['start_node'], link['start_pos']), (link['end_node'], link['end_pos'])
+
+
+def read_excel_file(xlsx_file):
+    """读取Excel文件为数据框（缓存未命中时调用）"""
+    logger.info(f"正在读取Excel文件: {xlsx_file}")
+    # Try specifying engine if default fails on some xlsx files
+    try:
+        df = pd.read_excel(xlsx_file, engine='openpyxl')
+    except ImportError:
+        logger.warning("openpyxl 未安装，尝试默认引擎")
+        df = pd.read_excel(xlsx_file)
+
+    logger.info(f"Excel读取成功，行数: {len(df)}, 列数: {len(df.columns)}")
+    logger.debug(f"列名: {df.columns.tolist()}")
+    return df
+
+
+def harness_columns(df):
+    """
+    从 Excel 数据框中一次性取出解析所需的各列
+
+    返回的字典只包含 NumPy 数组和基本类型的列表，可以直接写入缓存（见 harness_cache），
+    之后交给 build_harness 构建节点、线段和链接数据。
+    """
+    coords, bad_cells = coerce_coordinates(df)
+    return {
+        'coords': coords,
+        'bad_cells': bad_cells,
+        'link_names': _string_column(df, "Link Name", "Link"),
+        'ref_origine': _string_column(df, "refOrigine", "Origin"),
+        'ref_extremite': _string_column(df, "RefExtremite", "Extremite"),
+        'sections': np.array([str(value) for value in _value_column(df, "Section", "Default")], dtype=object),
+        'lengths': _value_column(df, "Length", 0.0),
+        'densities': _value_column(df, "Density", 0.0),
+        'safeties': _value_column(df, "Safety", ""),
+        'routes': _value_column(df, "Route", ""),
+        'action_numbers': _value_column(df, "Action Number", ""),
+    }
+
+
+def parse_harness_dataframe(df, chunk_size=DEFAULT_CHUNK_SIZE, progress_callback=None):
+    """按列解析 Excel 线束数据，等价于 build_harness(harness_columns(df), ...)"""
+    logger.info(f"开始按列解析数据框，行数: {len(df)}")
+    return build_harness(harness_columns(df), chunk_size, progress_callback)
+
+
+def build_harness(columns, chunk_size=DEFAULT_CHUNK_SIZE, progress_callback=None):
+    """
+    由 harness_columns 取出的列构建线束数据
+
+    Parameters:
+    -----------
+    columns : dict
+        harness_columns 的返回值（或从缓存中读取的同样结构）
+    chunk_size : int
+        构建链接数据时每个批次的行数
+    progress_callback : callable, optional
+        progress_callback(已处理行数, 总行数)，返回 False 表示用户取消
+
+    Returns:
+    --------
+    dict
+        segments / link_data / node_to_links / unique_nodes / section_indices 与界面原有结构一致，
+        另外附带 NumPy 数组形式的 node_refs、node_coords、starts、ends、origin_index、extremite_index，
+        以及无法解析的坐标单元格 bad_cells 和是否被取消 cancelled。
+    """
+    coords = columns['coords']
+    bad_cells = columns['bad_cells']
+    total = len(coords)
+    if bad_cells:
+        logger.warning(f"共有 {len(bad_cells)} 个坐标单元格无法解析，已置为 NaN")
+        for row, column, value in bad_cells[:20]:
+            logger.warning(f"  行 {row} 列 {column}: {value!r}")
+
+    link_names = columns['link_names']
+    ref_origine = columns['ref_origine']
+    ref_extremite = columns['ref_extremite']
+    sections = columns['sections']
+    lengths = columns['lengths']
+    densities = columns['densities']
+    safeties = columns['safeties']
+    routes = columns['routes']
+    action_numbers = columns['action_numbers']
+
+    # --- 按批次构建链接数据 ---
+    starts = coords[:, :3]
+    ends = coords[:, 3:]
+    start_list = [tuple(p) for p in starts.tolist()]
+    end_list = [tuple(p) for p in ends.tolist()]
+
+    segments = []
+    link_data = {}
+    cancelled = False
+    done = 0
+    while done < total:
+        stop = min(done + chunk_size, total)
+        for i in range(done, stop):
+            segments.append((start_list[i], end_list[i]))
+            link_data[i] = {
+                'name': link_names[i],
+                'origin': {
+                    'ref': ref_origine[i],
+                    'coordinates': start_list[i]
+                },
+                'extremite': {
+                    'ref': ref_extremite[i],
+                    'coordinates': end_list[i]
+                },
+                'length': lengths[i],
+                'density': densities[i],
+                'safety': safeties[i],
+                'route': routes[i],
+                'action_number': action_numbers[i],
+                'section': sections[i]
+            }
+        done = stop
+        if progress_callback is not None and progress_callback(done, total) is False:
+            logger.info(f"用户取消了数据解析，已处理 {done}/{total} 行")
+            cancelled = done < total
+            break
+
+    # 取消时只保留已处理的行
+    n = len(segments)
+    if n < total:
+        coords = coords[:n]
+        starts, ends = coords[:, :3], coords[:, 3:]
+        ref_origine, ref_extremite = ref_origine[:n], ref_extremite[:n]
+        sections = sections[:n]
+
+    # --- 节点去重：按首次出现顺序编号（与逐行解析时的插入顺序一致） ---
+    endpoint_refs = np.empty(2 * n, dtype=object)
+    endpoint_refs[0::2] = ref_origine
+    endpoint_refs[1::2] = ref_extremite
+    endpoint_points = np.empty((2 * n, 3), dtype=np.float64)
+    endpoint_points[0::2] = starts
+    endpoint_points[1::2] = ends
+
+    codes, node_refs = pd.factorize(endpoint_refs)
+    codes = codes.astype(np.int64)
+    node_refs = np.asarray(node_refs, dtype=object)
+    _, first_seen = np.unique(codes, return_index=True)
+    node_coords = endpoint_points[first_seen]
+    origin_index = codes[0::2]
+    extremite_index = codes[1::2]
+
+    # --- 节点到链接的映射 ---
+    endpoint_links = np.repeat(np.arange(n), 2)
+    node_to_links = {
+        ref: endpoint_links[positions].tolist()
+        for ref, positions in zip(node_refs.tolist(), group_indices(codes, len(node_refs)))
+    }
+    unique_nodes = dict(zip(node_refs.tolist(), (tuple(p) for p in node_coords.tolist())))
+
+    # --- section 分组 ---
+    section_codes, section_names = pd.factorize(sections)
+    section_indices = {
+        str(name): positions.tolist()
+        for name, positions in zip(section_names, group_indices(section_codes, len(section_names)))
+    }
+
+    logger.info(f"按列解析完成，共 {n} 条线段、{len(unique_nodes)} 个节点、{len(section_indices)} 个分组")
+    return {
+        'segments': segments,
+        'link_data': link_data,
+        'node_to_links': node_to_links,
+        'unique_nodes': unique_nodes,
+        'section_indices': section_indices,
+        'node_refs': node_refs,
+        'node_coords': node_coords,
+        'starts': starts,
+        'ends': ends,
+        'origin_index': origin_index,
+        'extremite_index': extremite_index,
+        'bad_cells': bad_cells,
+        'cancelled': cancelled,
+    }
+
+
+# --- XML (MultiDeviceNet / TwoDeviceNet) 流式解析 ---
+
+def _point_record(element, default_name, upper=False):
+    """读取带坐标的点元素，返回 (name, x, y, z)；元素不存在时返回 None"""
+    if element is None:
+        return None
+    keys = ("X", "Y", "Z") if upper else ("x", "y", "z")
+    return (
+        element.get("name", default_name),
+        float(element.get(keys[0], 0)),
+        float(element.get(keys[1], 0)),
+        float(element.get(keys[2], 0)),
+    )
+
+
+def _network_records(parent):
+    """读取 parent 下的所有 <Network>，返回 [{'name', 'start', 'end'}, ...]"""
+    records = []
+    for network in parent.findall("Network"):
+        records.append({
+            'name': network.get("name"),
+            'start': _point_record(network.find("StartPoint"), "未命名起点"),
+            'end': _point_record(network.find("EndPoint"), "未命名终点"),
+        })
+    return records
+
+
+def _connector_records(parent):
+    """读取 FromDeviceOrConnector / ToDeviceOrConnector，返回 (from, to)"""
+    return (
+        _point_record(parent.find("FromDeviceOrConnector"), "未命名起始设备"),
+        _point_record(parent.find("ToDeviceOrConnector"), "未命名终止设备"),
+    )
+
+
+def net_record(net):
+    """把一个 <Net> 元素转换为只包含基本类型的记录，之后即可释放该元素"""
+    devices = net.find("Devices")
+    iso_points = net.find("IsoelectricPoints")
+    total_network = net.find("TotalNetwork")
+
+    subnets = []
+    for subnet in net.findall("SubNet"):
+        segements = []
+        for segement in subnet.findall("Segement"):
+            net_start = segement.find("NetStartPoint")
+            net_end = segement.find("NetEndPoint")
+            route = None
+            if net_start is not None and net_end is not None:
+                route = (net_start.get("name", "未知起始设备"), net_end.get("name", "未知终止设备"))
+            segements.append({
+                'name': segement.get("name", "未命名段"),
+                'route': route,
+                'networks': _network_records(segement),
+            })
+        subnets.append({
+            'name': subnet.get("name", "未命名子网"),
+            'connectors': _connector_records(subnet),
+            'segements': segements,
+        })
+
+    return {
+        'name': net.get("name", "未命名网络"),
+        'devices': None if devices is None else [
+            _point_record(device, "未命名设备", upper=True) for device in devices.findall("Device")
+        ],
+        'isoelectric_points': None if iso_points is None else [
+            _point_record(point, "未命名等电位点", upper=True) for point in iso_points.findall("IsoelePt")
+        ],
+        'total_network': None if total_network is None else _network_records(total_network),
+        'connectors': _connector_records(net),
+        'subnets': subnets,
+    }
+
+
+def iter_xml_nets(file_path):
+    """
+    使用 iterparse 流式读取线束 XML
+
+    每个 <Net> 的结束标签到达时产出 (root_tag, net_record, bytes_read)，随后立即清除该元素，
+    因此内存占用只取决于最大的单个 Net，而不是整个文件。
+    MultiDeviceNet / TwoDeviceNet 只处理根节点下的 Net，其他格式处理任意层级的 Net。
+    """
+    with open(file_path, "rb") as stream:
+        root = None
+        root_tag = None
+        depth = 0
+        net_depth = 0  # 当前位于多少层 <Net> 内部
+        for event, element in ET.iterparse(stream, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if root is None:
+                    root = element
+                    root_tag = element.tag
+                if element.tag == "Net":
+                    net_depth += 1
+                continue
+
+            depth -= 1
+            if element.tag != "Net":
+                continue
+            net_depth -= 1
+            if root_tag in ("MultiDeviceNet", "TwoDeviceNet") and depth != 1:
+                continue
+
+            yield root_tag, net_record(element), stream.tell()
+
+            # 外层没有其他 Net 时才释放，避免通用格式中嵌套的 Net 丢失数据
+            if net_depth == 0:
+                element.clear()
+                if depth == 1:
+                    root.remove(element)
+
+
+def xml_root_tag(file_path):
+    """只读取 XML 的根节点名称"""
+    for _, element in ET.iterparse(file_path, events=("start",)):
+        return element.tag
+    return None
+
+
+class XmlHarnessAccumulator:
+    """把流式读取到的 Net 记录逐步汇总为节点、线段和链接数据"""
+
+    def __init__(self):
+        self.unique_nodes = {}  # 节点名称 -> (x, y, z)
+        self.segments = []  # [(start, end, segment_idx), ...]
+        self.link_data = {}  # segment_idx -> 链接信息
+        self.node_to_links = {}  # 节点名称 -> [segment_idx, ...]
+
+    def add_node(self, point):
+        """添加 (name, x, y, z) 节点（同名节点以最后一次出现的坐标为准）"""
+        name, x, y, z = point
+        self.unique_nodes[name] = (x, y, z)
+
+    def add_net(self, root_tag, net):
+        """
+        汇总一个 Net 记录中的节点和链接（不创建界面条目），返回其中每条 Network 的链接索引
+
+        返回的列表按 TotalNetwork、SubNet / Segement 中 Network 出现的顺序排列，缺少起点或终点的为 None，
+        可视化程序按同样的顺序创建树节点。
+        TwoDeviceNet 不读取 Devices / IsoelectricPoints，其他格式与 MultiDeviceNet 相同。
+        """
+        if root_tag != "TwoDeviceNet":
+            for device in net['devices'] or ():
+                self.add_node(device)
+            for iso_point in net['isoelectric_points'] or ():
+                self.add_node(iso_point)
+
+        if net['total_network'] is not None:
+            return [self.add_link(network, net['name'], "TotalNetwork") for network in net['total_network']]
+
+        links = []
+        self._add_connectors(net['connectors'])
+        for subnet in net['subnets']:
+            self._add_connectors(subnet['connectors'])
+            for segement in subnet['segements']:
+                for network in segement['networks']:
+                    links.append(self.add_link(network, net['name'], f"SubNet:{subnet['name']}", segement['name']))
+        return links
+
+    def _add_connectors(self, connectors):
+        for point in connectors:
+            if point is not None:
+                self.add_node(point)
+
+    def add_link(self, network, net_name, parent, segement=None):
+        """
+        添加一条 Network 链接并返回其索引；缺少起点或终点时返回 None
+
+        network 为 _network_records 生成的记录
+        """
+        segment_idx = len(self.segments)
+        if network['start'] is None or network['end'] is None:
+            return None
+
+        network_name = network['name'] or f"未命名网络{segment_idx}"
+        start_name, start_x, start_y, start_z = network['start']
+        end_name, end_x, end_y, end_z = network['end']
+
+        # 添加Start点和End点到节点列表
+        self.unique_nodes[start_name] = (start_x, start_y, start_z)
+        self.unique_nodes[end_name] = (end_x, end_y, end_z)
+
+        link_info = {
+            "type": "link",
+            "start_node": start_name,
+            "end_node": end_name,
+            "start_pos": (start_x, start_y, start_z),
+            "end_pos": (end_x, end_y, end_z),
+            "network_name": network_name,
+            "parent": parent,
+            "net": net_name,
+        }
+        if segement is not None:
+            link_info["segement"] = segement
+
+        self.segments.append(((start_x, start_y, start_z), (end_x, end_y, end_z), segment_idx))
+        self.link_data[segment_idx] = link_info
+        self.node_to_links.setdefault(start_name, []).append(segment_idx)
+        self.node_to_links.setdefault(end_name, []).append(segment_idx)
+        return segment_idx
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+两次解析结果之间的差异（用于源文件变化后的增量重新加载）
+
+链接以“链接名称 + 两端节点名称和坐标”为稳定键，节点以“名称 + 坐标”为键。
+键相同的链接和节点视为同一个对象，只是下标（shape_id）可能因为前面插入或删除了行而变化；
+键相同但其他属性（Section、Length 等）不同的链接记为修改。
+同一个键出现多次时按出现顺序一一配对。
+"""
+import logging
+import math
+
+from harness_data import link_endpoints
+
+# 全局日志器
+logger = logging.getLogger("harness_diff")
+
+# 比较坐标时保留的小数位数（消除浮点解析的微小差异）
+COORDINATE_DIGITS = 6
+
+
+def _point_key(point):
+    return tuple(round(float(value), COORDINATE_DIGITS) if math.isfinite(value) else None for value in point)
+
+
+def link_key(link):
+    """链接的稳定键：名称和两端的 (节点名称, 坐标)"""
+    name = link.get('name') or link.get('network_name')
+    (start_name, start), (end_name, end) = link_endpoints(link)
+    return name, start_name, _point_key(start), end_name, _point_key(end)
+
+
+def _same_value(a, b):
+    if isinstance(a, dict) and isinstance(b, dict):
+        return same_attributes(a, b)
+    if isinstance(a, (tuple, list)) and isinstance(b, (tuple, list)):
+        return len(a) == len(b) and all(_same_value(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return a == b
+
+
+def same_attributes(old, new):
+    """两条链接的所有属性是否相同（NaN 视为相等）"""
+    return old.keys() == new.keys() and all(_same_value(old[key], new[key]) for key in old)
+
+
+def match_keys(old_keys, new_keys):
+    """
+    按键配对两组对象
+
+    old_keys / new_keys 为 {id: key}，返回 (matched {旧 id: 新 id}, removed [旧 id], added [新 id])。
+    """
+    pending = {}
+    for old_id, key in old_keys.items():
+        pending.setdefault(key, []).append(old_id)
+    matched = {}
+    added = []
+    for new_id, key in new_keys.items():
+        candidates = pending.get(key)
+        if candidates:
+            matched[candidates.pop(0)] = new_id
+        else:
+            added.append(new_id)
+    removed = [old_id for old_id in old_keys if old_id not in matched]
+    return matched, removed, added
+
+
+class HarnessDiff:
+    """
+    diff_harness 的结果
+
+    link_map / node_map 为保留下来的链接和节点的 旧 shape_id -> 新 shape_id，
+    removed_* 为旧 shape_id，added_* 与 changed_links 为新 shape_id。
+    """
+
+    def __init__(self, link_map, removed_links, added_links, changed_links, node_map, removed_nodes, added_nodes):
+        self.link_map = link_map
+        self.removed_links = removed_links
+        self.added_links = added_links
+        self.changed_links = changed_links
+        self.node_map = node_map
+        self.removed_nodes = removed_nodes
+        self.added_nodes = added_nodes
+
+    def shape_map(self):
+        """所有保留下来的形状的 旧 shape_id -> 新 shape_id"""
+        return {**self.link_map, **self.node_map}
+
+    def is_empty(self):
+        """内容是否完全相同（包括每个对象的 shape_id 没有变化）"""
+        return not (self.removed_links or self.added_links or self.changed_links
+                    or self.removed_nodes or self.added_nodes) \
+            and all(old == new for old, new in self.shape_map().items())
+
+    def describe(self):
+        return (f"链接: 新增 {len(self.added_links)}、删除 {len(self.removed_links)}、修改 {len(self.changed_links)}；"
+                f"节点: 新增 {len(self.added_nodes)}、删除 {len(self.removed_nodes)}")
+
+
+def diff_harness(old_links, new_links, old_nodes, new_nodes):
+    """
+    比较两次解析得到的链接和节点
+
+    Parameters:
+    -----------
+    old_links, new_links : dict
+        link_data（链接索引 -> 链接信息），链接索引即线段的 shape_id
+    old_nodes, new_nodes : dict
+        节点名称 -> (节点 shape_id, 坐标)
+
+    Returns:
+    --------
+    HarnessDiff
+    """
+    link_map, removed_links, added_links = match_keys(
+        {index: link_key(link) for index, link in old_links.items()},
+        {index: link_key(link) for index, link in new_links.items()})
+    changed_links = [new for old, new in link_map.items() if not same_attributes(old_links[old], new_links[new])]
+
+    node_map, removed_nodes, added_nodes = match_keys(
+        {shape_id: (name, _point_key(point)) for name, (shape_id, point) in old_nodes.items()},
+        {shape_id: (name, _point_key(point)) for name, (shape_id, point) in new_nodes.items()})
+
+    diff = HarnessDiff(link_map, removed_links, added_links, changed_links, node_map, removed_nodes, added_nodes)
+    logger.info(f"重新加载差异: {diff.describe()}")
+    return diff
@@ -0,0 +1,640 @@
+# -*- coding: utf-8 -*-
+"""
+线束模型的分层显示：每个图层（Excel Section / XML Net）合并为一个复合体显示
+
+导入的 CAD 模型按顶层实体显示（CadModelDisplay），面和边通过 AIS 子形状选择模式拾取。
+"""
+import logging
+
+import numpy as np
+
+from OCC.Core.AIS import AIS_ColoredShape, AIS_Shape
+from OCC.Core.Aspect import Aspect_TOL_SOLID, Aspect_TOM_BALL
+from OCC.Core.BRep import BRep_Builder
+from OCC.Core.gp import gp_Pnt
+from OCC.Core.Graphic3d import (
+    Graphic3d_ArrayOfPoints, Graphic3d_ArrayOfSegments, Graphic3d_AspectLine3d,
+    Graphic3d_AspectMarker3d, Graphic3d_Structure
+)
+from OCC.Core.TopAbs import TopAbs_SOLID, TopAbs_FACE, TopAbs_EDGE
+from OCC.Core.TopoDS import TopoDS_Compound
+
+from harness_geometry import ShapeIndex
+
+# 全局日志器
+logger = logging.getLogger("harness_display")
+
+# 节点（球体）所在的图层名称
+NODE_LAYER = "__nodes__"
+
+# 显示模式
+DISPLAY_MODE_LAYERED = "分层复合体"
+DISPLAY_MODE_SHAPES = "独立形状"
+DISPLAY_MODE_CENTERLINE = "中心线"
+DISPLAY_MODES = [DISPLAY_MODE_LAYERED, DISPLAY_MODE_SHAPES, DISPLAY_MODE_CENTERLINE]
+
+# 中心线模式下点击拾取的像素容差
+PICK_TOLERANCE_PIXELS = 6
+
+# 导入 CAD 模型的拾取模式：名称 -> 选择的子形状类型
+CAD_SELECTION_MODES = {
+    "实体": TopAbs_SOLID,
+    "面": TopAbs_FACE,
+    "边": TopAbs_EDGE,
+}
+DEFAULT_CAD_SELECTION_MODE = "面"
+
+
+class LayeredShapeDisplay:
+    """
+    按图层把形状合并为 TopoDS_Compound，每个图层只创建一个 AIS_ColoredShape
+
+    图层内的单个形状仍然可以通过 shape_id 单独着色（SetCustomColor），
+    隐藏、显示或单独显示一个图层只需要一次 context 调用。
+    选择模式设置为实体（TopAbs_SOLID），点击时得到的是图层中的单个圆柱体或球体。
+    """
+
+    def __init__(self, context):
+        self.context = context
+        self.layers = {}  # 图层名称 -> AIS_ColoredShape
+        self.hidden = set()  # 已隐藏的图层
+        self._pending = {}  # 图层名称 -> [(shape_id, TopoDS_Shape), ...]，build 之前暂存
+        self._shapes = {}  # shape_id -> TopoDS_Shape
+        self._index = ShapeIndex()  # TopoDS_Shape -> shape_id
+        self._shape_layer = {}  # shape_id -> 图层名称
+        self._changed = set()  # 修改过颜色、需要重新显示的图层
+
+    def __contains__(self, shape_id):
+        return shape_id in self._shape_layer
+
+    def __len__(self):
+        return len(self._shape_layer)
+
+    def clear(self):
+        """从 context 中移除所有图层"""
+        for ais in self.layers.values():
+            self.context.Remove(ais, False)
+        self.layers = {}
+        self.hidden = set()
+        self._pending = {}
+        self._shapes = {}
+        self._index.clear()
+        self._shape_layer = {}
+        self._changed = set()
+
+    def add(self, layer, shape_id, shape):
+        """把形状加入图层（build 时才真正显示）"""
+        self._pending.setdefault(layer, []).append((shape_id, shape))
+        self._shapes[shape_id] = shape
+        self._index.add(shape, shape_id)
+        self._shape_layer[shape_id] = layer
+
+    def build(self, default_color, layer_colors=None):
+        """为每个图层创建复合体和 AIS_ColoredShape 并显示（不立即刷新视图）"""
+        layer_colors = layer_colors or {}
+        builder = BRep_Builder()
+        for layer, members in self._pending.items():
+            compound = TopoDS_Compound()
+            builder.MakeCompound(compound)
+            for _, shape in members:
+                builder.Add(compound, shape)
+
+            ais = AIS_ColoredShape(compound)
+            ais.SetColor(layer_colors.get(layer, default_color))
+            self.layers[layer] = ais
+            self._display(ais)
+            logger.debug(f"图层 {layer} 包含 {len(members)} 个形状")
+        logger.info(f"分层显示完成，共 {len(self._pending)} 个图层、{len(self._shapes)} 个形状")
+        self._pending = {}
+
+    def remove_layers(self, layers):
+        """从 context 中移除指定图层及其中的形状（之后可以重新 add / build 这些图层）"""
+        layers = set(layers)
+        for layer in layers:
+            ais = self.layers.pop(layer, None)
+            if ais is not None:
+                self.context.Remove(ais, False)
+            self.hidden.discard(layer)
+            self._pending.pop(layer, None)
+            self._changed.discard(layer)
+        for shape_id in [shape_id for shape_id, layer in self._shape_layer.items() if layer in layers]:
+            self._index.remove(self._shapes.pop(shape_id))
+            del self._shape_layer[shape_id]
+
+    def rekey(self, mapping):
+        """按 mapping（旧 shape_id -> 新 shape_id）修改其余图层中形状的 shape_id，不重新创建显示对象"""
+        self._shapes = {mapping.get(shape_id, shape_id): shape for shape_id, shape in self._shapes.items()}
+        self._shape_layer = {mapping.get(shape_id, shape_id): layer for shape_id, layer in self._shape_layer.items()}
+        self._index.rekey(mapping)
+
+    def _display(self, ais):
+        self.context.Display(ais, False)
+        # 按实体选择，使点击返回图层中的单个形状而不是整个复合体
+        self.context.Deactivate(ais)
+        self.context.Activate(ais, AIS_Shape.SelectionMode(TopAbs_SOLID), False)
+
+    # --- 查询 ---
+    def layer_of(self, shape_id):
+        return self._shape_layer.get(shape_id)
+
+    def shape_of(self, shape_id):
+        """shape_id 对应的 TopoDS_Shape，不在任何图层中时返回 None"""
+        return self._shapes.get(shape_id)
+
+    def layers_of(self, shape_ids):
+        """返回 shape_ids 所在的图层（保持首次出现的顺序）"""
+        layers = []
+        for shape_id in shape_ids:
+            layer = self._shape_layer.get(shape_id)
+            if layer is not None and layer not in layers:
+                layers.append(layer)
+        return layers
+
+    def shape(self, shape_id):
+        return self._shapes.get(shape_id)
+
+    def shape_id(self, selected_shape):
+        """根据选中的 TopoDS_Shape 查找 shape_id，找不到时返回 None"""
+        return self._index.get(selected_shape)
+
+    def pick(self, view, x, y):
+        """复合体通过 AIS 选择拾取（见 shape_id），这里总是返回 None"""
+        return None
+
+    # --- 着色 ---
+    def set_color(self, shape_id, color):
+        """单独设置图层中某个形状的颜色（需要调用 redisplay_changed 才会生效）"""
+        layer = self._shape_layer.get(shape_id)
+        if layer not in self.layers:
+            return False
+        self.layers[layer].SetCustomColor(self._shapes[shape_id], color)
+        self._changed.add(layer)
+        return True
+
+    def reset_color(self, shape_id):
+        """恢复为图层的默认颜色"""
+        layer = self._shape_layer.get(shape_id)
+        if layer not in self.layers:
+            return False
+        self.layers[layer].UnsetCustomAspects(self._shapes[shape_id], True)
+        self._changed.add(layer)
+        return True
+
+    def redisplay_changed(self):
+        """重新计算颜色有变化的图层（每个图层一次 Redisplay）"""
+        for layer in self._changed:
+            self.context.Redisplay(self.layers[layer], False)
+        changed = bool(self._changed)
+        self._changed = set()
+        return changed
+
+    # --- 可见性 ---
+    def hide(self, layers):
+        for layer in layers:
+            if layer in self.layers and layer not in self.hidden:
+                self.context.Erase(self.layers[layer], False)
+                self.hidden.add(layer)
+
+    def show(self, layers):
+        for layer in layers:
+            if layer in self.hidden:
+                self.hidden.discard(layer)
+                self._display(self.layers[layer])
+
+    def isolate(self, layers, keep=(NODE_LAYER,)):
+        """只显示指定图层（keep 中的图层，例如节点，保持原状）"""
+        layers = set(layers)
+        self.show([layer for layer in self.layers if layer in layers])
+        self.hide([layer for layer in self.layers if layer not in layers and layer not in keep])
+
+    def show_all(self):
+        self.show(list(self.hidden))
+
+
+class CadModelDisplay:
+    """
+    导入 CAD 模型的显示：每个顶层实体一个 AIS_ColoredShape，每个文件其余的顶层形状合并为一个
+
+    同一几何只显示（和剖分）一次，交互对象的数量为实体数而不是子形状数。
+    实体、面和边通过 AIS 子形状选择模式拾取，选中的子形状经 TopologyBrowser 解析为与树相同的形状 ID；
+    高亮时在所属对象上用 SetCustomColor 只修改该子形状的颜色。
+    """
+
+    def __init__(self, context):
+        self.context = context
+        self.objects = {}  # 对象键（顶层实体的形状 ID 或 rest_文件序号） -> AIS_ColoredShape
+        self.selection_type = CAD_SELECTION_MODES[DEFAULT_CAD_SELECTION_MODE]
+        self._browser = None
+        self._owners = {}  # 顶层形状 ID -> 对象键
+        self._changed = set()  # 修改过颜色、需要重新显示的对象键
+
+    def __contains__(self, shape_id):
+        return self._owner_key(shape_id) is not None
+
+    def __len__(self):
+        return len(self.objects)
+
+    def clear(self):
+        """从 context 中移除所有对象"""
+        for ais in self.objects.values():
+            self.context.Remove(ais, False)
+        self.objects = {}
+        self._browser = None
+        self._owners = {}
+        self._changed = set()
+
+    def build(self, browser, default_color):
+        """为 browser 中每个文件的顶层形状创建并显示 AIS 对象（不立即刷新视图），返回对象数量"""
+        self.clear()
+        for file_index in browser.topologies:
+            self.add_file(browser, file_index, default_color)
+        logger.info(f"导入模型显示完成，共 {len(self.objects)} 个交互对象、{len(browser)} 个子形状")
+        return len(self.objects)
+
+    def add_file(self, browser, file_index, color):
+        """追加显示 browser 中一个文件（拓扑索引）的顶层形状（不立即刷新视图）"""
+        self._browser = browser
+        builder = BRep_Builder()
+        rest_key = f"rest_{file_index}"
+        rest = None
+        for shape_id, shape in browser.top_level(file_index):
+            if shape.ShapeType() == TopAbs_SOLID:
+                self._add(shape_id, shape, color)
+                self._owners[shape_id] = shape_id
+                continue
+            if rest is None:
+                rest = TopoDS_Compound()
+                builder.MakeCompound(rest)
+            builder.Add(rest, shape)
+            self._owners[shape_id] = rest_key
+        if rest is not None:
+            self._add(rest_key, rest, color)
+
+    def _add(self, key, shape, color):
+        ais = AIS_ColoredShape(shape)
+        # 使用导入时并行生成的三角剖分，首次绘制时不再剖分
+        ais.Attributes().SetAutoTriangulation(False)
+        ais.SetColor(color)
+        self.objects[key] = ais
+        self.context.Display(ais, False)
+        self._activate(key, ais)
+
+    def _activate(self, key, ais):
+        self.context.Deactivate(ais)
+        selection_type = self.selection_type
+        if selection_type == TopAbs_SOLID and ais.Shape().ShapeType() != TopAbs_SOLID:
+            # 其余形状的复合体中没有实体，按面拾取
+            selection_type = TopAbs_FACE
+        self.context.Activate(ais, AIS_Shape.SelectionMode(selection_type), False)
+
+    def set_selection_type(self, selection_type):
+        """切换拾取的子形状类型（TopAbs_SOLID / TopAbs_FACE / TopAbs_EDGE）"""
+        self.selection_type = selection_type
+        for key, ais in self.objects.items():
+            self._activate(key, ais)
+
+    # --- 查询 ---
+    def _owner_key(self, shape_id):
+        """返回包含 shape_id 的 AIS 对象的键，不是已显示的导入形状时返回 None"""
+        browser = self._browser
+        if browser is None or shape_id not in browser:
+            return None
+        path = browser.path(shape_id)
+        return self._owners.get(path[0] if path else shape_id)
+
+    def shape_id(self, selected_shape):
+        """根据选中的实体、面或边查找形状 ID，找不到时返回 None"""
+        if self._browser is None:
+            return None
+        return self._browser.shape_id(selected_shape)
+
+    # --- 着色 ---
+    def set_color(self, shape_id, color):
+        """单独设置某个子形状的颜色（需要调用 redisplay_changed 才会生效）"""
+        key = self._owner_key(shape_id)
+        if key is None:
+            return False
+        self.objects[key].SetCustomColor(self._browser[shape_id], color)
+        self._changed.add(key)
+        return True
+
+    def reset_color(self, shape_id):
+        """恢复为对象的默认颜色"""
+        key = self._owner_key(shape_id)
+        if key is None:
+            return False
+        self.objects[key].UnsetCustomAspects(self._browser[shape_id], True)
+        self._changed.add(key)
+        return True
+
+    def redisplay_changed(self):
+        """重新计算颜色有变化的对象（每个对象一次 Redisplay）"""
+        for key in self._changed:
+            self.context.Redisplay(self.objects[key], False)
+        changed = bool(self._changed)
+        self._changed = set()
+        return changed
+
+
+class _CenterlineLayer:
+    """中心线模式下的一个图层：一个 Graphic3d_Structure 和一个图元数组"""
+    __slots__ = ("ids", "starts", "ends", "color", "structure", "group", "array", "aspect")
+
+    def __init__(self, ids, starts, ends, color):
+        self.ids = ids
+        self.starts = starts
+        self.ends = ends  # 点图层为 None
+        self.color = color
+        self.structure = None
+        self.group = None
+        self.array = None
+        self.aspect = None
+
+    def vertex_ranks(self, position):
+        """图层中第 position 个元素对应的顶点序号（从 1 开始）"""
+        if self.ends is None:
+            return (position + 1,)
+        return (2 * position + 1, 2 * position + 2)
+
+
+def ray_distances(origin, direction, starts, ends=None):
+    """
+    计算射线所在直线到每条线段（ends 为 None 时为每个点）的最近距离
+
+    返回 (distance, closest)，closest 为线段上离直线最近的点。
+    """
+    if ends is None:
+        closest = starts
+    else:
+        u = ends - starts
+        w0 = starts - origin
+        a = np.einsum("ij,ij->i", u, u)
+        b = u @ direction
+        d = np.einsum("ij,ij->i", u, w0)
+        e = w0 @ direction
+        denom = a - b * b
+        s = np.zeros(len(starts))
+        valid = denom > 1e-12
+        s[valid] = (b[valid] * e[valid] - d[valid]) / denom[valid]
+        # 距离沿线段是凸函数，把无约束解截断到 [0, 1] 即为线段上的最近点
+        s = np.clip(s, 0.0, 1.0)
+        closest = starts + s[:, None] * u
+    offset = closest - origin
+    along = offset @ direction
+    distance = np.linalg.norm(offset - along[:, None] * direction, axis=1)
+    return distance, closest
+
+
+class CenterlineDisplay:
+    """
+    中心线显示：每个图层的所有线段合并为一个 Graphic3d_ArrayOfSegments（节点为 Graphic3d_ArrayOfPoints）
+
+    不创建任何 B-rep 实体，也不需要三角剖分，每个图层只有一个 GPU 缓冲区。
+    单条线段的颜色通过顶点颜色修改；这些图元不参与 AIS 选择，拾取由 pick 根据点击射线计算。
+    接口与 LayeredShapeDisplay 一致，可以在界面中互换使用。
+    """
+
+    def __init__(self, view, line_width=2.0, point_scale=3.0):
+        self.view = view
+        self.line_width = line_width
+        self.point_scale = point_scale
+        self.layers = {}  # 图层名称 -> _CenterlineLayer
+        self.hidden = set()
+        self._pending = {}  # 图层名称 -> (ids, starts, ends)
+        self._shape_layer = {}  # shape_id -> (图层名称, 图层内位置)
+        self._changed = set()
+
+    def __contains__(self, shape_id):
+        return shape_id in self._shape_layer
+
+    def __len__(self):
+        return len(self._shape_layer)
+
+    def clear(self):
+        for layer in self.layers.values():
+            layer.structure.Erase()
+            layer.structure.Remove()
+        self.layers = {}
+        self.hidden = set()
+        self._pending = {}
+        self._shape_layer = {}
+        self._changed = set()
+
+    def add_segment(self, layer, shape_id, start, end):
+        ids, starts, ends = self._pending.setdefault(layer, ([], [], []))
+        self._shape_layer[shape_id] = (layer, len(ids))
+        ids.append(shape_id)
+        starts.append(start)
+        ends.append(end)
+
+    def add_point(self, layer, shape_id, point):
+        ids, points, _ = self._pending.setdefault(layer, ([], [], None))
+        self._shape_layer[shape_id] = (layer, len(ids))
+        ids.append(shape_id)
+        points.append(point)
+
+    def build(self, default_color, layer_colors=None):
+        """由暂存的端点数组为每个图层创建一个图元数组并显示（不立即刷新视图）"""
+        layer_colors = layer_colors or {}
+        manager = self.view.Viewer().StructureManager()
+        for name, (ids, starts, ends) in self._pending.items():
+            color = layer_colors.get(name, default_color)
+            layer = _CenterlineLayer(
+                ids,
+                np.asarray(starts, dtype=np.float64).reshape(-1, 3),
+                None if ends is None else np.asarray(ends, dtype=np.float64).reshape(-1, 3),
+                color,
+            )
+            if layer.ends is None:
+                layer.array = Graphic3d_ArrayOfPoints(len(ids), True)
+                for x, y, z in layer.starts.tolist():
+                    layer.array.AddVertex(gp_Pnt(x, y, z), color)
+                layer.aspect = Graphic3d_AspectMarker3d(Aspect_TOM_BALL, color, self.point_scale)
+            else:
+                layer.array = Graphic3d_ArrayOfSegments(2 * len(ids), 0, True)
+                for (x0, y0, z0), (x1, y1, z1) in zip(layer.starts.tolist(), layer.ends.tolist()):
+                    layer.array.AddVertex(gp_Pnt(x0, y0, z0), color)
+                    layer.array.AddVertex(gp_Pnt(x1, y1, z1), color)
+                layer.aspect = Graphic3d_AspectLine3d(color, Aspect_TOL_SOLID, self.line_width)
+
+            layer.structure = Graphic3d_Structure(manager)
+            layer.group = layer.structure.NewGroup()
+            self._fill_group(layer)
+            layer.structure.Display()
+            self.layers[name] = layer
+        logger.info(f"中心线显示完成，共 {len(self._pending)} 个图层、{len(self._shape_layer)} 个图元")
+        self._pending = {}
+
+    def _fill_group(self, layer):
+        layer.group.SetGroupPrimitivesAspect(layer.aspect)
+        layer.group.AddPrimitiveArray(layer.array)
+
+    def remove_layers(self, layers):
+        """移除指定图层的图元数组（之后可以重新 add_segment / add_point / build 这些图层）"""
+        layers = set(layers)
+        for name in layers:
+            layer = self.layers.pop(name, None)
+            if layer is not None:
+                layer.structure.Erase()
+                layer.structure.Remove()
+            self.hidden.discard(name)
+            self._pending.pop(name, None)
+            self._changed.discard(name)
+        self._shape_layer = {shape_id: entry for shape_id, entry in self._shape_layer.items() if entry[0] not in layers}
+
+    def rekey(self, mapping):
+        """按 mapping（旧 shape_id -> 新 shape_id）修改其余图层中图元的 shape_id，图元数组保持不变"""
+        for layer in self.layers.values():
+            layer.ids = [mapping.get(shape_id, shape_id) for shape_id in layer.ids]
+        self._shape_layer = {mapping.get(shape_id, shape_id): entry for shape_id, entry in self._shape_layer.items()}
+
+    # --- 查询 ---
+    def layer_of(self, shape_id):
+        entry = self._shape_layer.get(shape_id)
+        return None if entry is None else entry[0]
+
+    def layers_of(self, shape_ids):
+        layers = []
+        for shape_id in shape_ids:
+            layer = self.layer_of(shape_id)
+            if layer is not None and layer not in layers:
+                layers.append(layer)
+        return layers
+
+    def shape_id(self, selected_shape):
+        """中心线图元不参与 AIS 选择"""
+        return None
+
+    def pick(self, view, x, y, tolerance_pixels=PICK_TOLERANCE_PIXELS):
+        """返回屏幕坐标 (x, y) 处离观察者最近的线段或节点的 shape_id，没有命中时返回 None"""
+        if not self.layers:
+            return None
+        px, py, pz, vx, vy, vz = view.ConvertWithProj(int(x), int(y))
+        origin = np.array([px, py, pz])
+        direction = np.array([vx, vy, vz])
+        norm = np.linalg.norm(direction)
+        if norm == 0:
+            return None
+        direction /= norm
+        tolerance = view.Convert(int(tolerance_pixels))
+
+        best_id, best_depth = None, np.inf
+        for name, layer in self.layers.items():
+            if name in self.hidden or not layer.ids:
+                continue
+            distance, closest = ray_distances(origin, direction, layer.starts, layer.ends)
+            hits = np.flatnonzero(distance <= tolerance)
+            if hits.size == 0:
+                continue
+            # origin 位于近裁剪面上，离它最近的命中即为最前面的图元
+            depth = np.linalg.norm(closest[hits] - origin, axis=1)
+            k = int(np.argmin(depth))
+            if depth[k] < best_depth:
+                best_id, best_depth = layer.ids[hits[k]], depth[k]
+        return best_id
+
+    # --- 着色 ---
+    def _set_vertex_color(self, shape_id, color):
+        entry = self._shape_layer.get(shape_id)
+        if entry is None or entry[0] not in self.layers:
+            return False
+        layer = self.layers[entry[0]]
+        for rank in layer.vertex_ranks(entry[1]):
+            layer.array.SetVertexColor(rank, color)
+        self._changed.add(entry[0])
+        return True
+
+    def set_color(self, shape_id, color):
+        return self._set_vertex_color(shape_id, color)
+
+    def reset_color(self, shape_id):
+        entry = self._shape_layer.get(shape_id)
+        if entry is None or entry[0] not in self.layers:
+            return False
+        return self._set_vertex_color(shape_id, self.layers[entry[0]].color)
+
+    def redisplay_changed(self):
+        """重新上传颜色有变化的图层的图元数组"""
+        for name in self._changed:
+            layer = self.layers[name]
+            layer.group.Clear(False)
+            self._fill_group(layer)
+        changed = bool(self._changed)
+        self._changed = set()
+        return changed
+
+    # --- 可见性 ---
+    def hide(self, layers):
+        for name in layers:
+            if name in self.layers and name not in self.hidden:
+                self.layers[name].structure.Erase()
+                self.hidden.add(name)
+
+    def show(self, layers):
+        for name in layers:
+            if name in self.hidden:
+                self.hidden.discard(name)
+                self.layers[name].structure.Display()
+
+    def isolate(self, layers, keep=(NODE_LAYER,)):
+        layers = set(layers)
+        self.show([name for name in self.layers if name in layers])
+        self.hide([name for name in self.layers if name not in layers and name not in keep])
+
+    def show_all(self):
+        self.show(list(self.hidden))
+
+
+class HighlightState:
+    """
+    增量高亮：记录每个实体当前的高亮颜色编号，选择变化时只提交颜色真正改变的实体
+
+    实体在第一次被选中时分配槽位，colors[slot] 为其当前颜色编号（0 表示默认颜色），
+    selected 为当前选中的槽位数组。select 计算新旧选择的差集，
+    对每个颜色有变化的实体调用一次 apply(shape_id, color)（color 为 None 时恢复默认颜色），
+    视图由调用者在最后统一刷新一次。
+    """
+
+    def __init__(self, palette, code_of):
+        self.palette = palette  # 颜色编号 -> Quantity_Color（编号 0 为默认颜色，不需要提供）
+        self.code_of = code_of  # shape_id -> 高亮颜色编号
+        self.clear()
+
+    def clear(self):
+        """忘记所有高亮状态（显示对象重建、恢复默认颜色之后调用）"""
+        self._slots = {}  # shape_id -> 槽位
+        self._ids = []  # 槽位 -> shape_id
+        self.colors = np.zeros(64, dtype=np.uint8)
+        self.selected = np.zeros(0, dtype=np.int64)
+
+    def _slot_array(self, shape_ids):
+        slots = self._slots
+        for shape_id in shape_ids:
+            if shape_id not in slots:
+                slots[shape_id] = len(self._ids)
+                self._ids.append(shape_id)
+        if len(self._ids) > len(self.colors):
+            grown = np.zeros(max(len(self._ids), 2 * len(self.colors)), dtype=np.uint8)
+            grown[:len(self.colors)] = self.colors
+            self.colors = grown
+        return np.fromiter((slots[shape_id] for shape_id in shape_ids), dtype=np.int64, count=len(shape_ids))
+
+    def select(self, shape_ids, apply):
+        """把选择设置为 shape_ids，返回重新着色的实体数量"""
+        shape_ids = list(dict.fromkeys(shape_ids))  # 去重并保持顺序
+        new = self._slot_array(shape_ids)
+        target = np.fromiter((self.code_of(shape_id) for shape_id in shape_ids), dtype=np.uint8, count=len(shape_ids))
+
+        removed = np.setdiff1d(self.selected, new, assume_unique=True)
+        recolor = self.colors[new] != target
+        changed, codes = new[recolor], target[recolor]
+
+        for slot in removed.tolist():
+            apply(self._ids[slot], None)
+        for slot, code in zip(changed.tolist(), codes.tolist()):
+            apply(self._ids[slot], self.palette[code])
+
+        self.colors[removed] = 0
+        self.colors[changed] = codes
+        self.selected = new
+        return len(removed) + len(changed)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+线束中心线导出（STEP / IGES）
+
+每条链接导出为两端节点之间的一条直线边，节点导出为顶点，同一分组（Excel 的 Section、XML 的 Net）
+的边和顶点放在一个复合体中；链接名称和 link_data 中的属性写成子形状名称，节点名称写成顶点名称。
+与导出圆柱体和球体实体相比，文件中只有直线和点，文件大小和写入时间都小一个数量级以上。
+"""
+import logging
+import math
+
+from OCC.Core.BRep import BRep_Builder
+from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_MakeEdge, BRepBuilderAPI_MakeVertex
+from OCC.Core.IFSelect import IFSelect_RetDone
+from OCC.Core.IGESCAFControl import IGESCAFControl_Writer
+from OCC.Core.Interface import Interface_Static_SetCVal, Interface_Static_SetIVal
+from OCC.Core.STEPCAFControl import STEPCAFControl_Writer
+from OCC.Core.STEPControl import STEPControl_AsIs
+from OCC.Core.TCollection import TCollection_ExtendedString
+from OCC.Core.TDataStd import TDataStd_Name
+from OCC.Core.TDocStd import TDocStd_Document
+from OCC.Core.TopoDS import TopoDS_Compound
+from OCC.Core.XCAFDoc import XCAFDoc_DocumentTool_ShapeTool
+from OCC.Core.gp import gp_Pnt
+
+from harness_data import link_endpoints
+
+# 全局日志器
+logger = logging.getLogger("harness_export")
+
+# 导出格式选项中中心线模式的名称
+CENTERLINE_STEP_FORMAT = "STEP (中心线)"
+CENTERLINE_IGES_FORMAT = "IGES (中心线)"
+
+# 每处理多少条链接汇报一次进度
+PROGRESS_BATCH_SIZE = 2000
+
+# 不作为属性写出的 link_data 键（坐标已体现在几何中）
+_SKIPPED_KEYS = {'type', 'start_pos', 'end_pos'}
+
+
+def link_label(index, link, with_attributes=True):
+    """链接边的名称：链接名称，后面附加 “[键=值; ...]” 形式的属性"""
+    name = link.get('name') or link.get('network_name') or f"链接_{index}"
+    if not with_attributes:
+        return str(name)
+    attributes = []
+    for key, value in link.items():
+        if key in _SKIPPED_KEYS or key in ('name', 'network_name'):
+            continue
+        if isinstance(value, dict):
+            value = value.get('ref')
+        if value is None or isinstance(value, (tuple, list)):
+            continue
+        attributes.append(f"{key}={value}")
+    return f"{name} [{'; '.join(attributes)}]" if attributes else str(name)
+
+
+def group_links(link_data, group_key):
+    """按 link_data 中的 group_key（'section' 或 'net'）把链接分组，返回 {分组名称: [链接索引, ...]}"""
+    groups = {}
+    for index, link in link_data.items():
+        groups.setdefault(str(link.get(group_key) or "Default"), []).append(index)
+    return groups
+
+
+def _is_finite(point):
+    return all(math.isfinite(value) for value in point)
+
+
+def _set_name(label, name):
+    TDataStd_Name.Set(label, TCollection_ExtendedString(name, True))
+
+
+def build_centerline_document(link_data, group_key, with_attributes=True, progress_callback=None):
+    """
+    构建中心线的 XCAF 文档
+
+    Parameters:
+    -----------
+    link_data : dict
+        链接索引 -> 链接信息
+    group_key : str
+        分组使用的 link_data 键
+    with_attributes : bool
+        是否在边的名称中附加链接属性
+    progress_callback : callable, optional
+        progress_callback(已处理链接数, 总链接数)，返回 False 表示用户取消
+
+    Returns:
+    --------
+    (TDocStd_Document, int, int) 或 None
+        文档、导出的边数和顶点数；用户取消时返回 None
+    """
+    doc = TDocStd_Document(TCollection_ExtendedString("harness-centerline"))
+    shape_tool = XCAFDoc_DocumentTool_ShapeTool(doc.Main())
+    builder = BRep_Builder()
+
+    total = len(link_data)
+    done = 0
+    edge_count = 0
+    skipped = 0
+    vertices = {}  # 节点名称 -> TopoDS_Vertex，各分组共享同一个顶点
+
+    def vertex(name, point):
+        if name not in vertices:
+            vertices[name] = BRepBuilderAPI_MakeVertex(gp_Pnt(*point)).Vertex()
+        return vertices[name]
+
+    for group, indices in group_links(link_data, group_key).items():
+        compound = TopoDS_Compound()
+        builder.MakeCompound(compound)
+        edges = []
+        group_vertices = {}
+        for index in indices:
+            link = link_data[index]
+            (start_name, start), (end_name, end) = link_endpoints(link)
+            if _is_finite(start) and _is_finite(end):
+                make_edge = BRepBuilderAPI_MakeEdge(vertex(start_name, start), vertex(end_name, end))
+                if make_edge.IsDone():
+                    edge = make_edge.Edge()
+                    builder.Add(compound, edge)
+                    edges.append((edge, link_label(index, link, with_attributes)))
+                    group_vertices[start_name] = vertices[start_name]
+                    group_vertices[end_name] = vertices[end_name]
+                else:
+                    skipped += 1  # 两端重合的链接无法生成直线边
+            else:
+                skipped += 1
+            done += 1
+            if progress_callback is not None and done % PROGRESS_BATCH_SIZE == 0 and progress_callback(done, total) is False:
+                logger.info(f"用户取消了中心线导出，已处理 {done}/{total} 条链接")
+                return None
+
+        for vertex_shape in group_vertices.values():
+            builder.Add(compound, vertex_shape)
+        if not edges:
+            continue
+
+        label = shape_tool.AddShape(compound, False)
+        _set_name(label, group)
+        for edge, name in edges:
+            _set_name(shape_tool.AddSubShape(label, edge), name)
+        for name, vertex_shape in group_vertices.items():
+            _set_name(shape_tool.AddSubShape(label, vertex_shape), str(name))
+        edge_count += len(edges)
+
+    if progress_callback is not None:
+        progress_callback(total, total)
+    if skipped:
+        logger.warning(f"有 {skipped} 条链接的坐标无效或两端重合，未导出")
+    logger.info(f"中心线文档构建完成: {edge_count} 条边、{len(vertices)} 个顶点")
+    return doc, edge_count, len(vertices)
+
+
+def write_centerline_step(doc, file_path):
+    """把中心线文档写为 STEP 文件（AP214，带子形状名称），成功时返回 True"""
+    writer = STEPCAFControl_Writer()
+    writer.SetNameMode(True)
+    Interface_Static_SetCVal("write.step.schema", "AP214")
+    Interface_Static_SetIVal("write.stepcaf.subshapes.name", 1)
+    if not writer.Transfer(doc, STEPControl_AsIs):
+        logger.error("传输中心线文档到 STEP writer 失败")
+        return False
+    return writer.Write(file_path) == IFSelect_RetDone
+
+
+def write_centerline_iges(doc, file_path):
+    """把中心线文档写为 IGES 文件（带实体名称），成功时返回 True"""
+    writer = IGESCAFControl_Writer()
+    writer.SetNameMode(True)
+    if not writer.Transfer(doc):
+        logger.error("传输中心线文档到 IGES writer 失败")
+        return False
+    return writer.Write(file_path)
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""线束几何体的原型实例化：共享拓扑（和三角剖分）的节点球体与线段圆柱体"""
+import logging
+import math
+
+from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeCylinder, BRepPrimAPI_MakeSphere
+from OCC.Core.gp import gp_Ax2, gp_Ax3, gp_Dir, gp_Pnt, gp_Trsf, gp_Vec
+from OCC.Core.TopLoc import TopLoc_Location
+
+# 全局日志器
+logger = logging.getLogger("harness_geometry")
+
+# 圆柱体长度分桶的相对步长：同一桶内的线段共用一个原型，长度误差不超过步长的一半
+DEFAULT_LENGTH_TOLERANCE = 0.01
+
+# 小于该长度的线段不创建圆柱体
+MIN_SEGMENT_LENGTH = 1e-6
+
+# XML 数据沿用原来的阈值（线段短于 1e-5 时不绘制）
+XML_MIN_SEGMENT_LENGTH = 1e-5
+
+
+class PrimitiveInstancer:
+    """
+    球体和圆柱体的原型实例化
+
+    只创建一个位于原点的球体，以及每个长度桶一个沿 +Z 轴的圆柱体，
+    每个节点或线段只是带不同 TopLoc_Location 的同一原型（共享 TShape），
+    因此三角剖分只计算一次，构造时间和网格内存不再随节点、线段数量线性增长。
+    实例之间 IsSame() 仍然互不相同（位置不同），可以单独选择和着色。
+    """
+
+    def __init__(self, sphere_radius, cylinder_radius, length_tolerance=DEFAULT_LENGTH_TOLERANCE,
+                 min_length=MIN_SEGMENT_LENGTH):
+        self.sphere_radius = sphere_radius
+        self.cylinder_radius = cylinder_radius
+        self.min_length = min_length
+        self._log_step = math.log1p(length_tolerance)
+        self._sphere = None
+        self._cylinders = {}  # 长度桶编号 -> 原型圆柱体
+
+    def bucket(self, length):
+        """返回长度所在的桶编号和该桶原型的长度（几何分桶，相对误差有界）"""
+        index = round(math.log(length) / self._log_step)
+        return index, math.exp(index * self._log_step)
+
+    def sphere(self, center):
+        """返回位于 center 的球体实例"""
+        if self._sphere is None:
+            self._sphere = BRepPrimAPI_MakeSphere(gp_Pnt(0, 0, 0), self.sphere_radius).Shape()
+        trsf = gp_Trsf()
+        trsf.SetTranslation(gp_Vec(*center))
+        return self._sphere.Located(TopLoc_Location(trsf))
+
+    def cylinder(self, start, end):
+        """
+        返回连接 start 和 end 的圆柱体实例；线段短于 min_length 时返回 None
+
+        原型长度取自长度桶，实例以线段中点为中心放置，两端的误差各为一半。
+        """
+        dx, dy, dz = end[0] - start[0], end[1] - start[1], end[2] - start[2]
+        length = math.sqrt(dx * dx + dy * dy + dz * dz)
+        if not length >= self.min_length:
+            return None
+
+        index, bucket_length = self.bucket(length)
+        prototype = self._cylinders.get(index)
+        if prototype is None:
+            prototype = BRepPrimAPI_MakeCylinder(gp_Ax2(), self.cylinder_radius, bucket_length).Shape()
+            self._cylinders[index] = prototype
+
+        ux, uy, uz = dx / length, dy / length, dz / length
+        offset = (length - bucket_length) / 2
+        base = gp_Pnt(start[0] + ux * offset, start[1] + uy * offset, start[2] + uz * offset)
+        trsf = gp_Trsf()
+        trsf.SetDisplacement(gp_Ax3(), gp_Ax3(base, gp_Dir(ux, uy, uz)))
+        return prototype.Located(TopLoc_Location(trsf))
+
+    def segment_cylinder(self, start, end, idx):
+        """
+        线段 idx 的圆柱体实例（可视化程序和批量导出共用）；坐标无效或线段太短时记录警告并返回 None
+        """
+        cylinder = self.cylinder(start, end)
+        if cylinder is None:
+            logger.warning(f"线段 {idx} 坐标无效或长度小于 {self.min_length}，跳过绘制圆柱体")
+        return cylinder
+
+    def prototype_count(self):
+        """已创建的原型数量（球体 + 圆柱体长度桶）"""
+        return len(self._cylinders) + (self._sphere is not None)
+
+
+# TopoDS_Shape.HashCode 的上界
+_HASH_UPPER_BOUND = 2147483647
+
+
+class ShapeIndex:
+    """
+    TopoDS_Shape -> id 的索引
+
+    以 HashCode（由 TShape 和 Location 决定）分桶，桶内用 IsSame 区分，
+    查找选中形状对应的 id 为常数时间，而不是逐个比较所有 AIS 对象。
+    """
+
+    def __init__(self):
+        self._buckets = {}  # HashCode -> [(TopoDS_Shape, id), ...]
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def clear(self):
+        self._buckets = {}
+        self._count = 0
+
+    def add(self, shape, shape_id):
+        """登记形状；同一形状再次登记时更新其 id"""
+        bucket = self._buckets.setdefault(shape.HashCode(_HASH_UPPER_BOUND), [])
+        for i, (existing, _) in enumerate(bucket):
+            if existing.IsSame(shape):
+                bucket[i] = (shape, shape_id)
+                return
+        bucket.append((shape, shape_id))
+        self._count += 1
+
+    def remove(self, shape):
+        key = shape.HashCode(_HASH_UPPER_BOUND)
+        bucket = self._buckets.get(key)
+        if not bucket:
+            return
+        for i, (existing, _) in enumerate(bucket):
+            if existing.IsSame(shape):
+                del bucket[i]
+                self._count -= 1
+                break
+        if not bucket:
+            del self._buckets[key]
+
+    def get(self, shape, default=None):
+        """返回与 shape IsSame 的已登记形状的 id"""
+        for existing, shape_id in self._buckets.get(shape.HashCode(_HASH_UPPER_BOUND), ()):
+            if existing.IsSame(shape):
+                return shape_id
+        return default
+
+    def rekey(self, mapping):
+        """按 mapping（旧 id -> 新 id）修改已登记形状的 id，不在 mapping 中的 id 保持不变（不重新计算 HashCode）"""
+        for bucket in self._buckets.values():
+            for i, (shape, shape_id) in enumerate(bucket):
+                if shape_id in mapping:
+                    bucket[i] = (shape, mapping[shape_id])
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+重合节点合并与路径断口检测
+
+线束 XML 中名称不同、坐标相同（或在容差内）的点在 unique_nodes 中是不同的节点，
+会绘制出重复的球体，也会掩盖路径上真正的断口。merge_nodes 用空间哈希（harness_spatial.cluster_labels）
+按容差把节点聚类，每簇保留最先出现的节点作为代表；find_route_gaps 在合并后的拓扑上
+检查每个 Segement 中相邻的两条 Network 是否相接。
+"""
+import logging
+import math
+import os
+
+import numpy as np
+
+from harness_spatial import cluster_labels
+
+# 全局日志器
+logger = logging.getLogger("harness_merge")
+
+# 默认合并容差（与坐标同单位），可用环境变量覆盖；0 表示不合并
+DEFAULT_MERGE_TOLERANCE = float(os.environ.get("HARNESS_MERGE_TOLERANCE", "0.01"))
+
+# 报告中最多列出的簇和断口数量
+REPORT_LIMIT = 50
+
+
+class NodeMerge:
+    """
+    merge_nodes 的结果
+
+    nodes 为合并后的 unique_nodes（代表节点名称 -> 坐标，顺序与原节点首次出现的顺序一致），
+    representative 为被合并掉的节点名称 -> 代表节点名称，clusters 为 [(代表名称, [被合并的名称...], 最大偏差)]。
+    """
+
+    def __init__(self, tolerance):
+        self.tolerance = tolerance
+        self.nodes = {}
+        self.representative = {}
+        self.clusters = []
+
+    def resolve(self, name):
+        """节点名称 -> 合并后的节点名称"""
+        return self.representative.get(name, name)
+
+    def aliases(self):
+        """代表节点名称 -> 被合并到它的节点名称列表"""
+        return {node: merged for node, merged, _ in self.clusters}
+
+    def merge_links(self, node_to_links):
+        """把 node_to_links 合并到代表节点上（链接索引去重并保持顺序）"""
+        merged = {}
+        for name, links in node_to_links.items():
+            merged.setdefault(self.resolve(name), []).extend(links)
+        return {name: list(dict.fromkeys(links)) for name, links in merged.items()}
+
+
+def merge_nodes(unique_nodes, tolerance=DEFAULT_MERGE_TOLERANCE):
+    """按容差合并坐标重合的节点，返回 NodeMerge"""
+    result = NodeMerge(tolerance)
+    names = list(unique_nodes)
+    coords = np.array([unique_nodes[name] for name in names], dtype=np.float64).reshape(-1, 3)
+    labels = cluster_labels(coords, tolerance)
+
+    members = {}
+    for index, label in enumerate(labels.tolist()):
+        if index == label:
+            result.nodes[names[index]] = unique_nodes[names[index]]
+        else:
+            result.representative[names[index]] = names[label]
+            members.setdefault(label, []).append(index)
+
+    for label, indices in members.items():
+        deviation = float(np.linalg.norm(coords[indices] - coords[label], axis=1).max())
+        result.clusters.append((names[label], [names[i] for i in indices], deviation))
+
+    logger.info(f"节点合并完成（容差 {tolerance}）: {len(names)} 个节点合并为 {len(result.nodes)} 个，"
+                f"{len(result.clusters)} 个重合簇")
+    return result
+
+
+def find_route_gaps(link_data, resolve=None):
+    """
+    检查每个 Segement 中相邻的两条 Network 是否相接
+
+    XML 中 Network 的方向不固定（前一条的终点可能是后一条的终点），
+    因此相邻两条链接只要共用一个端点（合并后）即视为相接。
+    resolve 为节点名称的合并映射（NodeMerge.resolve）。返回断口列表，每项为字典：
+    net、segement、from_link、to_link、from_node、to_node（两条链接距离最近的一对端点）、distance。
+    """
+    resolve = resolve or (lambda name: name)
+    previous = {}  # (net, parent, segement) -> 上一条链接索引
+    gaps = []
+    for index, link in link_data.items():
+        if link.get('segement') is None:
+            continue
+        key = (link.get('net'), link.get('parent'), link['segement'])
+        last = previous.get(key)
+        previous[key] = index
+        if last is None:
+            continue
+        before = link_data[last]
+        ends_before = ((before['start_node'], before['start_pos']), (before['end_node'], before['end_pos']))
+        ends_after = ((link['start_node'], link['start_pos']), (link['end_node'], link['end_pos']))
+        if {resolve(name) for name, _ in ends_before} & {resolve(name) for name, _ in ends_after}:
+            continue
+        distance, from_node, to_node = min(
+            (math.dist(p, q), a, b) for a, p in ends_before for b, q in ends_after)
+        gaps.append({
+            'net': key[0],
+            'segement': key[2],
+            'from_link': last,
+            'to_link': index,
+            'from_node': from_node,
+            'to_node': to_node,
+            'distance': distance,
+        })
+    logger.info(f"路径断口检测完成: {len(gaps)} 个断口")
+    return gaps
+
+
+def format_merge_report(merge, gaps, limit=REPORT_LIMIT):
+    """合并簇和断口的文本报告"""
+    lines = [f"节点合并（容差 {merge.tolerance}）: {len(merge.representative)} 个节点合并到 {len(merge.clusters)} 个节点"]
+    for node, merged, deviation in merge.clusters[:limit]:
+        lines.append(f"- {node} ← {', '.join(merged)} (最大偏差 {deviation:.4g})")
+    if len(merge.clusters) > limit:
+        lines.append(f"... 以及其他 {len(merge.clusters) - limit} 个簇")
+
+    lines.append("")
+    lines.append(f"路径断口: {len(gaps)} 个")
+    for gap in gaps[:limit]:
+        lines.append(f"- Net {gap['net']} / Segement {gap['segement']}: 链接 {gap['from_link']} 的 {gap['from_node']} "
+                     f"→ 链接 {gap['to_link']} 的 {gap['to_node']} (距离 {gap['distance']:.4g})")
+    if len(gaps) > limit:
+        lines.append(f"... 以及其他 {len(gaps) - limit} 个断口")
+    return "\n".join(lines)
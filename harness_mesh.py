@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+线束三角网格的解析生成（NumPy）与二进制 glTF / STL 导出
+
+线段圆管和节点球体的网格直接由端点和节点坐标数组批量计算，不经过 B-rep 建模和 OCCT 三角剖分：
+每条线段是一个 sides 边形的侧面（两端由节点球体覆盖，不加端盖），每个节点是同一个单位球模板平移缩放后的副本。
+写出时顶点、法向和索引数组直接写入文件，不逐个三角形转换。
+"""
+import json
+import logging
+import struct
+
+import numpy as np
+
+# 全局日志器
+logger = logging.getLogger("harness_mesh")
+
+# 导出格式选项中网格格式的名称
+MESH_GLTF_FORMAT = "glTF (网格)"
+MESH_STL_FORMAT = "STL (网格)"
+
+# 圆管截面的边数、球体的纬线/经线分段数
+DEFAULT_TUBE_SIDES = 12
+DEFAULT_SPHERE_RINGS = 8
+DEFAULT_SPHERE_SECTORS = 12
+
+# 小于该长度的线段不生成圆管（与 harness_geometry.MIN_SEGMENT_LENGTH 一致）
+MIN_SEGMENT_LENGTH = 1e-6
+
+# glTF 以米为单位、Y 轴向上；线束坐标为毫米、Z 轴向上，由根节点的缩放和旋转换算
+DEFAULT_UNIT_SCALE = 0.001
+_Z_UP_TO_Y_UP = [-0.7071067811865476, 0.0, 0.0, 0.7071067811865476]
+
+_GLB_MAGIC = 0x46546C67
+_GLB_JSON = 0x4E4F534A
+_GLB_BIN = 0x004E4942
+_GL_FLOAT = 5126
+_GL_UNSIGNED_INT = 5125
+_GL_ARRAY_BUFFER = 34962
+_GL_ELEMENT_ARRAY_BUFFER = 34963
+
+
+class TriangleMesh:
+    """顶点 (N, 3) float32、法向 (N, 3) float32、三角形索引 (M, 3) uint32"""
+
+    __slots__ = ("vertices", "normals", "triangles")
+
+    def __init__(self, vertices, normals, triangles):
+        self.vertices = vertices
+        self.normals = normals
+        self.triangles = triangles
+
+    def __len__(self):
+        return len(self.triangles)
+
+
+def segment_arrays(segments):
+    """把 [(start, end, ...), ...] 转换为起点、终点两个 (n, 3) float64 数组"""
+    if not segments:
+        empty = np.empty((0, 3), dtype=np.float64)
+        return empty, empty
+    starts = np.array([segment[0] for segment in segments], dtype=np.float64)
+    ends = np.array([segment[1] for segment in segments], dtype=np.float64)
+    return starts, ends
+
+
+def _grid_triangles(rows, columns, row_stride):
+    """rows x columns 个四边形网格的三角形（每个四边形两个），返回 (2, rows, columns, 3) 的顶点编号"""
+    i = np.arange(rows)[:, None]
+    j = np.arange(columns)[None, :]
+    a = i * row_stride + j
+    b = a + row_stride
+    c = b + 1
+    d = a + 1
+    return np.stack([np.stack(np.broadcast_arrays(a, b, c), axis=-1),
+                     np.stack(np.broadcast_arrays(a, c, d), axis=-1)])
+
+
+def tube_mesh(starts, ends, radius, sides=DEFAULT_TUBE_SIDES, min_length=MIN_SEGMENT_LENGTH):
+    """
+    批量生成连接 starts[i] 与 ends[i] 的圆管侧面
+
+    每条线段 2 * (sides + 1) 个顶点（接缝处的顶点重复以便法向连续）、2 * sides 个三角形；
+    长度小于 min_length 或坐标无效的线段被跳过。
+    """
+    starts = np.asarray(starts, dtype=np.float64).reshape(-1, 3)
+    ends = np.asarray(ends, dtype=np.float64).reshape(-1, 3)
+    axis = ends - starts
+    lengths = np.linalg.norm(axis, axis=1)
+    valid = lengths >= min_length  # NaN 比较为 False
+    if not valid.all():
+        logger.debug(f"跳过 {np.count_nonzero(~valid)} 条过短或坐标无效的线段")
+        starts, ends, axis, lengths = starts[valid], ends[valid], axis[valid], lengths[valid]
+    count = len(starts)
+    direction = axis / lengths[:, None]
+
+    # 与方向不平行的辅助轴构造截面的正交基 (u, v)
+    helper = np.zeros_like(direction)
+    near_x = np.abs(direction[:, 0]) > 0.9
+    helper[~near_x, 0] = 1.0
+    helper[near_x, 1] = 1.0
+    u = np.cross(direction, helper)
+    u /= np.linalg.norm(u, axis=1)[:, None]
+    v = np.cross(direction, u)
+
+    angles = np.linspace(0.0, 2.0 * np.pi, sides + 1)
+    ring = (np.cos(angles)[None, :, None] * u[:, None, :]
+            + np.sin(angles)[None, :, None] * v[:, None, :])  # (count, sides + 1, 3)
+    normals = np.repeat(ring[:, None], 2, axis=1)  # (count, 2, sides + 1, 3)
+    vertices = np.stack([starts, ends], axis=1)[:, :, None, :] + radius * normals
+
+    per_tube = 2 * (sides + 1)
+    # 起点环在前、终点环在后，交换两个顶点使三角形朝外
+    template = _grid_triangles(1, sides, sides + 1).reshape(-1, 3)[:, [0, 2, 1]]
+    offsets = (np.arange(count, dtype=np.int64) * per_tube)[:, None, None]
+    triangles = template[None] + offsets
+    return TriangleMesh(vertices.reshape(-1, 3).astype(np.float32),
+                        normals.reshape(-1, 3).astype(np.float32),
+                        triangles.reshape(-1, 3).astype(np.uint32))
+
+
+def _unit_sphere(rings, sectors):
+    """单位球模板：(rings + 1) x (sectors + 1) 个经纬网格顶点，去掉两极处的退化三角形"""
+    polar = np.linspace(0.0, np.pi, rings + 1)[:, None]
+    azimuth = np.linspace(0.0, 2.0 * np.pi, sectors + 1)[None, :]
+    points = np.stack(np.broadcast_arrays(np.sin(polar) * np.cos(azimuth),
+                                          np.sin(polar) * np.sin(azimuth),
+                                          np.cos(polar)), axis=-1).reshape(-1, 3)
+    first, second = _grid_triangles(rings, sectors, sectors + 1)
+    triangles = np.concatenate([first[:-1].reshape(-1, 3), second[1:].reshape(-1, 3)])
+    return points, triangles
+
+
+def sphere_mesh(centers, radius, rings=DEFAULT_SPHERE_RINGS, sectors=DEFAULT_SPHERE_SECTORS):
+    """批量生成以 centers[i] 为球心的球体（同一个单位球模板的平移缩放副本）；坐标无效的节点被跳过"""
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1, 3)
+    centers = centers[np.isfinite(centers).all(axis=1)]
+    points, template = _unit_sphere(rings, sectors)
+    vertices = centers[:, None, :] + radius * points[None]
+    normals = np.broadcast_to(points, vertices.shape)
+    offsets = (np.arange(len(centers), dtype=np.int64) * len(points))[:, None, None]
+    triangles = template[None] + offsets
+    return TriangleMesh(vertices.reshape(-1, 3).astype(np.float32),
+                        normals.reshape(-1, 3).astype(np.float32),
+                        triangles.reshape(-1, 3).astype(np.uint32))
+
+
+def harness_meshes(starts, ends, node_coords, cylinder_radius, sphere_radius,
+                   sides=DEFAULT_TUBE_SIDES, rings=DEFAULT_SPHERE_RINGS, sectors=DEFAULT_SPHERE_SECTORS,
+                   min_length=MIN_SEGMENT_LENGTH):
+    """返回 {"segments": 圆管网格, "nodes": 球体网格}"""
+    tubes = tube_mesh(starts, ends, cylinder_radius, sides, min_length)
+    spheres = sphere_mesh(node_coords, sphere_radius, rings, sectors)
+    logger.info(f"网格生成完成: 圆管 {len(tubes)} 个三角形，球体 {len(spheres)} 个三角形")
+    return {"segments": tubes, "nodes": spheres}
+
+
+def write_stl(file_path, meshes):
+    """把若干网格写为一个二进制 STL 文件（面法向由三角形顶点计算），返回写入的字节数"""
+    record = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+    total = sum(len(mesh) for mesh in meshes)
+    with open(file_path, "wb") as stream:
+        stream.write(b"harness mesh".ljust(80, b"\0"))
+        stream.write(struct.pack("<I", total))
+        for mesh in meshes:
+            if not len(mesh):
+                continue
+            data = np.zeros(len(mesh), dtype=record)
+            corners = mesh.vertices[mesh.triangles]
+            normal = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+            length = np.linalg.norm(normal, axis=1, keepdims=True)
+            np.divide(normal, length, out=normal, where=length > 0)
+            data['normal'] = normal
+            data['vertices'] = corners
+            data.tofile(stream)
+    logger.info(f"STL 写入完成: {file_path}，{total} 个三角形")
+    return 84 + 50 * total
+
+
+def _padded(length, alignment=4):
+    return (length + alignment - 1) // alignment * alignment
+
+
+def write_glb(file_path, meshes, colors=None, unit_scale=DEFAULT_UNIT_SCALE):
+    """
+    把 {名称: TriangleMesh} 写为二进制 glTF（.glb），每个网格一个节点和一种材质
+
+    colors 为 {名称: (r, g, b)}（0~1）；顶点、法向、索引数组按顺序直接写入 BIN 块。返回写入的字节数。
+    """
+    colors = colors or {}
+    gltf = {
+        "asset": {"version": "2.0", "generator": "harness_mesh"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"name": "harness", "rotation": _Z_UP_TO_Y_UP, "scale": [unit_scale] * 3, "children": []}],
+        "meshes": [],
+        "materials": [],
+        "accessors": [],
+        "bufferViews": [],
+        "buffers": [],
+    }
+    chunks = []
+    offset = 0
+
+    def add_view(array, target):
+        nonlocal offset
+        gltf["bufferViews"].append({"buffer": 0, "byteOffset": offset, "byteLength": array.nbytes, "target": target})
+        chunks.append(array)
+        offset += _padded(array.nbytes)
+        return len(gltf["bufferViews"]) - 1
+
+    def add_accessor(view, component_type, count, accessor_type, **extra):
+        gltf["accessors"].append({"bufferView": view, "componentType": component_type, "count": count,
+                                  "type": accessor_type, **extra})
+        return len(gltf["accessors"]) - 1
+
+    for name, mesh in meshes.items():
+        if not len(mesh):
+            continue
+        vertices = np.ascontiguousarray(mesh.vertices, dtype='<f4')
+        normals = np.ascontiguousarray(mesh.normals, dtype='<f4')
+        indices = np.ascontiguousarray(mesh.triangles, dtype='<u4')
+        position = add_accessor(add_view(vertices, _GL_ARRAY_BUFFER), _GL_FLOAT, len(vertices), "VEC3",
+                                min=vertices.min(axis=0).tolist(), max=vertices.max(axis=0).tolist())
+        normal = add_accessor(add_view(normals, _GL_ARRAY_BUFFER), _GL_FLOAT, len(normals), "VEC3")
+        index = add_accessor(add_view(indices, _GL_ELEMENT_ARRAY_BUFFER), _GL_UNSIGNED_INT, indices.size, "SCALAR")
+
+        r, g, b = colors.get(name, (0.8, 0.8, 0.8))
+        gltf["materials"].append({"name": name, "pbrMetallicRoughness": {
+            "baseColorFactor": [r, g, b, 1.0], "metallicFactor": 0.0, "roughnessFactor": 0.8}})
+        gltf["meshes"].append({"name": name, "primitives": [{
+            "attributes": {"POSITION": position, "NORMAL": normal},
+            "indices": index, "material": len(gltf["materials"]) - 1}]})
+        gltf["nodes"].append({"name": name, "mesh": len(gltf["meshes"]) - 1})
+        gltf["nodes"][0]["children"].append(len(gltf["nodes"]) - 1)
+
+    if offset:
+        gltf["buffers"].append({"byteLength": offset})
+    # glTF 不允许空数组，没有网格时只写出空场景
+    if not gltf["nodes"][0]["children"]:
+        del gltf["nodes"][0]["children"]
+    for key in ("meshes", "materials", "accessors", "bufferViews", "buffers"):
+        if not gltf[key]:
+            del gltf[key]
+    header = json.dumps(gltf, separators=(',', ':')).encode("utf-8")
+    header += b" " * (_padded(len(header)) - len(header))
+    total = 12 + 8 + len(header) + (8 + offset if offset else 0)
+
+    with open(file_path, "wb") as stream:
+        stream.write(struct.pack("<III", _GLB_MAGIC, 2, total))
+        stream.write(struct.pack("<II", len(header), _GLB_JSON))
+        stream.write(header)
+        if offset:
+            stream.write(struct.pack("<II", offset, _GLB_BIN))
+        for array in chunks:
+            stream.write(memoryview(array).cast("B"))
+            stream.write(b"\0" * (_padded(array.nbytes) - array.nbytes))
+    logger.info(f"glTF 写入完成: {file_path}，{total} 字节")
+    return total
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+线束统计（几何长度、声明长度、质量和链接数按分组汇总，NumPy / pandas）
+
+每条链接是一行：几何长度为两端坐标之间的直线距离，声明长度为 Excel 的 Length 列，
+质量为声明长度 × Density（单位与这两列一致），XML 没有这两列，只统计几何长度和链接数。
+构建时先按（图层, 分组）做一次 group-by 得到部分和；图层（Excel 的 Section、XML 的 Net）被隐藏或重新显示时，
+只从当前合计中减去或加回这些图层的部分和，不需要重新扫描全部链接。
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+# 全局日志器
+logger = logging.getLogger("harness_metrics")
+
+# 统计量列名 -> 表头
+METRIC_LABELS = {
+    'links': "链接数",
+    'geometric_length': "几何长度",
+    'declared_length': "声明长度",
+    'mass': "质量",
+}
+
+# 分组名称 -> 链接表中的列
+XLSX_METRIC_GROUPS = {"Section": 'section', "Route": 'route', "Safety": 'safety'}
+XML_METRIC_GROUPS = {"Net": 'net', "SubNet": 'subnet'}
+
+# 分组值为空时显示的名称
+EMPTY_GROUP = "(空)"
+
+
+def _labels(values):
+    """把分组列规范为字符串（缺失值和空字符串显示为 EMPTY_GROUP）"""
+    labels = pd.Series(values, dtype=object).fillna("").astype(str)
+    return labels.where(labels != "", EMPTY_GROUP).to_numpy(dtype=object)
+
+
+def xlsx_link_frame(columns, count=None):
+    """
+    由 harness_columns 取出的列构建链接表（每条链接一行）
+
+    count 为实际构建的链接数（解析被取消时只取前 count 行）。
+    """
+    coords = columns['coords']
+    count = len(coords) if count is None else count
+    coords = coords[:count]
+    declared = pd.to_numeric(pd.Series(columns['lengths'][:count], dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+    density = pd.to_numeric(pd.Series(columns['densities'][:count], dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+    return pd.DataFrame({
+        'section': _labels(columns['sections'][:count]),
+        'route': _labels(columns['routes'][:count]),
+        'safety': _labels(columns['safeties'][:count]),
+        'links': np.ones(count, dtype=np.int64),
+        'geometric_length': np.linalg.norm(coords[:, 3:] - coords[:, :3], axis=1),
+        'declared_length': declared,
+        'mass': declared * density,
+    })
+
+
+def xml_link_frame(link_data):
+    """由 XML 的 link_data 构建链接表；SubNet 以 “Net / SubNet” 区分不同 Net 下的同名子网"""
+    links = list(link_data.values())
+    starts = np.array([link['start_pos'] for link in links], dtype=np.float64).reshape(-1, 3)
+    ends = np.array([link['end_pos'] for link in links], dtype=np.float64).reshape(-1, 3)
+    nets = _labels([link.get('net') for link in links])
+    parents = _labels([link.get('parent') for link in links])
+    return pd.DataFrame({
+        'net': nets,
+        'subnet': nets + " / " + parents,
+        'links': np.ones(len(links), dtype=np.int64),
+        'geometric_length': np.linalg.norm(ends - starts, axis=1),
+    })
+
+
+class HarnessMetrics:
+    """
+    按分组汇总的统计量，支持按图层增量更新
+
+    Parameters:
+    -----------
+    frame : pandas.DataFrame
+        链接表（xlsx_link_frame / xml_link_frame 的返回值）
+    groups : dict
+        分组名称 -> frame 中的列（XLSX_METRIC_GROUPS / XML_METRIC_GROUPS）
+    layer_column : str
+        图层所在的列，与分层显示中的图层名称一致
+    """
+
+    def __init__(self, frame, groups, layer_column):
+        self.groups = dict(groups)
+        self.metrics = [column for column in METRIC_LABELS if column in frame.columns]
+        self.layers = set(frame[layer_column].tolist())
+        self.hidden = set()
+
+        frame = frame.assign(_layer=frame[layer_column])
+        self._partials = {}  # 分组列 -> 按 (图层, 分组) 汇总的部分和
+        self._full = {}  # 分组列 -> 全部图层的合计
+        for column in self.groups.values():
+            partial = frame.groupby(['_layer', column], sort=False)[self.metrics].sum()
+            self._partials[column] = partial
+            self._full[column] = partial.groupby(level=column, sort=False).sum()
+        self._totals = dict(self._full)
+        logger.info(f"线束统计完成: {len(frame)} 条链接，{len(self.layers)} 个图层，分组 {', '.join(self.groups)}")
+
+    def set_hidden(self, hidden):
+        """
+        设置被隐藏的图层，只对变化的图层做增量更新；返回统计结果是否变化
+
+        hidden 为显示中的图层名称，先按链接表的规则转换（空名称即 EMPTY_GROUP）再与图层比较。
+        """
+        hidden = set(_labels(list(hidden)).tolist()) & self.layers
+        removed = hidden - self.hidden
+        restored = self.hidden - hidden
+        if not removed and not restored:
+            return False
+        self.hidden = hidden
+        for column, partial in self._partials.items():
+            if not hidden:
+                # 全部显示时直接使用预先算好的合计，避免加减累积的舍入误差
+                self._totals[column] = self._full[column]
+                continue
+            totals = self._totals[column]
+            layers = partial.index.get_level_values('_layer')
+            if removed:
+                totals = totals.sub(partial[layers.isin(removed)].groupby(level=column).sum(), fill_value=0)
+            if restored:
+                totals = totals.add(partial[layers.isin(restored)].groupby(level=column).sum(), fill_value=0)
+            self._totals[column] = totals
+        logger.debug(f"统计增量更新: 隐藏 {len(removed)} 个图层，恢复 {len(restored)} 个图层")
+        return True
+
+    def table(self, group):
+        """
+        分组名称对应的统计表：每行一个分组（不含已全部隐藏的分组），列为 METRIC_LABELS 中的表头
+        """
+        column = self.groups[group]
+        totals = self._totals[column]
+        totals = totals[totals['links'] > 0].sort_index()
+        totals = totals.astype({'links': np.int64})
+        totals.index.name = group
+        return totals.rename(columns=METRIC_LABELS)
+
+    def summary(self):
+        """当前可见链接的合计（统计量列名 -> 值）"""
+        totals = self._totals[next(iter(self._partials))].sum()
+        return {METRIC_LABELS[column]: int(totals[column]) if column == 'links' else float(totals[column])
+                for column in self.metrics}
+
+
+def write_metrics_csv(table, file_path):
+    """把统计表写为 CSV（UTF-8 带 BOM，Excel 可直接打开中文表头）"""
+    table.to_csv(file_path, encoding="utf-8-sig")
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+线束节点的空间索引（均匀哈希网格，NumPy）
+
+节点坐标按所在网格单元排序，每个非空单元对应排序后数组中的一段连续区间；
+查询时只检查与查询范围相交的单元，最近邻查询从所在单元逐圈向外扩展，直到结果不会再变化。
+所有查询都接受多个查询点，返回数组下标（与构建索引时的节点顺序一致，即 'node_i' 中的 i）。
+pairs_within / cluster_labels 用于按容差合并重合节点：单元边长不小于容差时，
+距离在容差内的两点一定位于相同或相邻的单元，只需比较每个单元与其一半邻居（13 个）和自身中的点。
+"""
+import logging
+import math
+
+import numpy as np
+
+from harness_graph import connected_labels
+
+# 全局日志器
+logger = logging.getLogger("harness_spatial")
+
+# 自动选择单元大小时，每个单元平均包含的节点数
+DEFAULT_POINTS_PER_CELL = 4
+
+# 相邻单元中的一半（另一半由对称性覆盖），不含自身
+_HALF_NEIGHBOURS = np.array([
+    (dx, dy, dz)
+    for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)
+    if (dx, dy, dz) > (0, 0, 0)
+], dtype=np.int64)
+
+
+class NodeSpatialIndex:
+    """
+    节点坐标的均匀网格索引
+
+    Parameters:
+    -----------
+    coords : array_like, (n, 3)
+        节点坐标；包含 NaN 的节点不参与任何查询
+    cell_size : float, optional
+        网格单元边长，默认根据包围盒和节点数自动选择
+    """
+
+    def __init__(self, coords, cell_size=None):
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+        self.coords = coords
+        valid = np.flatnonzero(np.isfinite(coords).all(axis=1))
+        points = coords[valid]
+
+        if len(points):
+            self.origin = points.min(axis=0)
+            extent = points.max(axis=0) - self.origin
+        else:
+            self.origin = np.zeros(3)
+            extent = np.zeros(3)
+        self.cell_size = float(cell_size) if cell_size else self._auto_cell_size(extent, len(points))
+
+        # 单元坐标按各轴实际出现的取值编号后再线性化，单元很小、范围很大时键也不会溢出
+        cells = self._cells(points)
+        self._axis_cells = [np.unique(cells[:, axis]) for axis in range(3)]
+        self.shape = np.array([max(len(values), 1) for values in self._axis_cells], dtype=np.int64)
+        keys = self._keys(self._ranks(cells))
+        order = np.argsort(keys, kind="stable")
+        self._order = valid[order]  # 排序后的位置 -> 节点下标
+        self._sorted_points = points[order]
+        self._keys_sorted, self._starts, self._counts = np.unique(keys[order], return_index=True, return_counts=True)
+        self._cell_ranks = np.stack(np.unravel_index(self._keys_sorted, self.shape), axis=1) \
+            if len(self._keys_sorted) else np.empty((0, 3), dtype=np.int64)
+        logger.info(f"节点空间索引建立完成: {len(points)} 个节点，{len(self._keys_sorted)} 个非空单元，"
+                    f"单元大小 {self.cell_size:.3f}")
+
+    def __len__(self):
+        return len(self._order)
+
+    @staticmethod
+    def _auto_cell_size(extent, count):
+        """按非退化坐标轴的包围盒体积（面积、长度）估计单元大小，使每个单元平均约 DEFAULT_POINTS_PER_CELL 个节点"""
+        spans = extent[extent > 0]
+        if count == 0 or len(spans) == 0:
+            return 1.0
+        measure = float(np.prod(spans))
+        return (measure * DEFAULT_POINTS_PER_CELL / count) ** (1.0 / len(spans))
+
+    def _cells(self, points):
+        return np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+
+    def _ranks(self, cells):
+        """单元坐标 -> 各轴取值编号（只对确实出现过的取值有意义）"""
+        return np.stack([np.searchsorted(self._axis_cells[axis], cells[:, axis]) for axis in range(3)], axis=1)
+
+    def _keys(self, ranks):
+        return np.ravel_multi_index(ranks.T, self.shape) if len(ranks) else np.empty(0, dtype=np.int64)
+
+    def _cells_in_range(self, low, high):
+        """与单元坐标范围 [low, high]（含两端）相交的非空单元编号"""
+        low = [np.searchsorted(self._axis_cells[axis], low[axis], side="left") for axis in range(3)]
+        high = [np.searchsorted(self._axis_cells[axis], high[axis], side="right") - 1 for axis in range(3)]
+        low, high = np.array(low), np.array(high)
+        if (high < low).any():
+            return np.empty(0, dtype=np.int64)
+        if int(np.prod(high - low + 1)) <= len(self._keys_sorted):
+            # 范围内的单元不多时逐个查找
+            grid = np.stack(np.meshgrid(*(np.arange(l, h + 1) for l, h in zip(low, high)), indexing="ij"), axis=-1)
+            return self._match(self._keys(grid.reshape(-1, 3)))
+        # 范围很大时直接筛选非空单元
+        inside = ((self._cell_ranks >= low) & (self._cell_ranks <= high)).all(axis=1)
+        return np.flatnonzero(inside)
+
+    def _match(self, keys):
+        """已排序的非空单元键中与 keys 相同的位置"""
+        positions = np.searchsorted(self._keys_sorted, keys)
+        found = positions < len(self._keys_sorted)
+        positions = positions[found]
+        return positions[self._keys_sorted[positions] == keys[found]]
+
+    def _candidates(self, low, high):
+        """单元范围内所有节点在排序数组中的位置"""
+        cells = self._cells_in_range(low, high)
+        if not len(cells):
+            return np.empty(0, dtype=np.int64)
+        starts = self._starts[cells]
+        counts = self._counts[cells]
+        # 把若干连续区间展开为位置数组
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        return offsets + np.arange(counts.sum())
+
+    # --- 查询 ---
+    def box(self, lows, highs):
+        """轴对齐包围盒查询：返回每个盒子 [lows[i], highs[i]] 内的节点下标数组列表"""
+        lows = np.asarray(lows, dtype=np.float64).reshape(-1, 3)
+        highs = np.asarray(highs, dtype=np.float64).reshape(-1, 3)
+        results = []
+        for low, high in zip(lows, highs):
+            candidates = self._candidates(self._cells(low), self._cells(high))
+            points = self._sorted_points[candidates]
+            inside = ((points >= low) & (points <= high)).all(axis=1)
+            results.append(self._order[candidates[inside]])
+        return results
+
+    def radius(self, centers, radius):
+        """半径查询：返回每个查询点 radius 范围内的 (节点下标, 距离)，按距离从小到大排序"""
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 3)
+        results = []
+        empty = np.empty(0, dtype=np.int64)
+        for center in centers:
+            if not np.isfinite(center).all():
+                results.append((empty, np.empty(0)))
+                continue
+            candidates = self._candidates(self._cells(center - radius), self._cells(center + radius))
+            distances = np.linalg.norm(self._sorted_points[candidates] - center, axis=1)
+            inside = distances <= radius
+            candidates, distances = candidates[inside], distances[inside]
+            order = np.argsort(distances, kind="stable")
+            results.append((self._order[candidates[order]], distances[order]))
+        return results
+
+    def nearest(self, centers, k=1):
+        """
+        最近邻查询：返回 (下标, 距离) 两个 (查询数, k) 数组，节点不足 k 个时以 -1 和 inf 补齐
+
+        从查询点所在单元开始逐圈扩大范围；第 k 近的距离不超过已检查范围到查询点的最小距离时结果即为精确值。
+        """
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 3)
+        indices = np.full((len(centers), k), -1, dtype=np.int64)
+        distances = np.full((len(centers), k), np.inf)
+        if not len(self) or k <= 0:
+            return indices, distances
+        for row, center in enumerate(centers):
+            if not np.isfinite(center).all():
+                continue
+            cell = self._cells(center)
+            # 查询点在网格外时，从能接触到网格的圈数开始；达到 full_ring 时已覆盖整个网格
+            first = np.array([values[0] for values in self._axis_cells])
+            last = np.array([values[-1] for values in self._axis_cells])
+            ring = int(max(0, (first - cell).max(), (cell - last).max()))
+            full_ring = int(max(0, (cell - first).max(), (last - cell).max()))
+            while True:
+                candidates = self._candidates(cell - ring, cell + ring)
+                found = np.linalg.norm(self._sorted_points[candidates] - center, axis=1)
+                covered = ring >= full_ring
+                if len(found) >= k or covered:
+                    order = np.argsort(found, kind="stable")[:k]
+                    # 已检查的立方体到查询点的最小距离
+                    low = self.origin + (cell - ring) * self.cell_size
+                    high = self.origin + (cell + ring + 1) * self.cell_size
+                    reach = min((center - low).min(), (high - center).min())
+                    if covered or found[order[-1]] <= reach:
+                        count = len(order)
+                        indices[row, :count] = self._order[candidates[order]]
+                        distances[row, :count] = found[order]
+                        break
+                    # 第 k 近的候选可能在更外圈，直接扩展到能覆盖该距离的圈数
+                    ring = min(full_ring, max(ring + 1, int(math.ceil(found[order[-1]] / self.cell_size))))
+                else:
+                    ring += 1
+        return indices, distances
+
+    def pairs_within(self, distance):
+        """
+        返回距离不超过 distance 的所有节点对 (i, j)（i < j）两个下标数组
+
+        要求单元边长不小于 distance（用 NodeSpatialIndex(coords, cell_size=distance) 建立）。
+        """
+        if distance > self.cell_size:
+            raise ValueError(f"查询距离 {distance} 大于单元大小 {self.cell_size}")
+        cell_pairs = [np.stack([np.arange(len(self._keys_sorted))] * 2, axis=1)]
+        # 各轴上相邻取值的编号：坐标相差 1 的取值若存在，编号一定也相差 1
+        steps = {}
+        for axis in range(3):
+            values = self._axis_cells[axis]
+            ranks = self._cell_ranks[:, axis]
+            for delta in (-1, 0, 1):
+                neighbour = ranks + delta
+                exists = (neighbour >= 0) & (neighbour < len(values))
+                exists[exists] = values[neighbour[exists]] == values[ranks[exists]] + delta
+                steps[axis, delta] = neighbour, exists
+        for offset in _HALF_NEIGHBOURS:
+            (rx, ex), (ry, ey), (rz, ez) = (steps[axis, int(delta)] for axis, delta in enumerate(offset))
+            cells = np.flatnonzero(ex & ey & ez)
+            keys = self._keys(np.stack([rx[cells], ry[cells], rz[cells]], axis=1))
+            positions = np.searchsorted(self._keys_sorted, keys)
+            found = positions < len(self._keys_sorted)
+            found[found] = self._keys_sorted[positions[found]] == keys[found]
+            cell_pairs.append(np.stack([cells[found], positions[found]], axis=1))
+        cell_pairs = np.concatenate(cell_pairs)
+
+        # 展开每对单元中所有点的组合
+        counts_a = self._counts[cell_pairs[:, 0]]
+        counts_b = self._counts[cell_pairs[:, 1]]
+        sizes = counts_a * counts_b
+        pair_of = np.repeat(np.arange(len(cell_pairs)), sizes)
+        within = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        a = self._starts[cell_pairs[pair_of, 0]] + within // counts_b[pair_of]
+        b = self._starts[cell_pairs[pair_of, 1]] + within % counts_b[pair_of]
+        # 同一单元内的组合只保留一次，并去掉点与自身
+        same = cell_pairs[pair_of, 0] == cell_pairs[pair_of, 1]
+        keep = ~same | (a < b)
+        a, b = a[keep], b[keep]
+        close = np.linalg.norm(self._sorted_points[a] - self._sorted_points[b], axis=1) <= distance
+        i, j = self._order[a[close]], self._order[b[close]]
+        return np.minimum(i, j), np.maximum(i, j)
+
+
+def cluster_labels(coords, tolerance):
+    """
+    按容差把节点聚类（距离在容差内的节点相连，取连通分量）
+
+    返回每个节点所属簇中最小的节点下标；坐标无效或容差不为正时每个节点自成一簇。
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+    if tolerance <= 0 or len(coords) < 2:
+        return np.arange(len(coords))
+    i, j = NodeSpatialIndex(coords, cell_size=tolerance).pairs_within(tolerance)
+    return connected_labels(len(coords), i, j)
@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""
+按需加载的树模型（QAbstractItemModel），用于替代一次性创建全部条目的 QTreeWidget，
+以及显示 pandas 数据框的只读表格模型（DataFrameTableModel）
+"""
+import logging
+import traceback
+
+from PyQt5.QtCore import Qt, QAbstractItemModel, QAbstractTableModel, QModelIndex
+
+# 全局日志器
+logger = logging.getLogger("tree_model")
+
+
+class TreeNode:
+    """
+    树模型中的一个节点
+
+    text 为显示文本，payload 通过 Qt.UserRole 返回（与 QTreeWidgetItem.data(0, Qt.UserRole) 相同），
+    loader 为可选的回调 loader(node) -> [TreeNode, ...]，只在用户第一次展开该节点时调用。
+    """
+    __slots__ = ("text", "payload", "parent", "children", "loader", "row")
+
+    def __init__(self, text, payload=None, loader=None):
+        self.text = text
+        self.payload = payload
+        self.parent = None
+        self.children = []
+        self.loader = loader
+        self.row = 0
+
+    def child_count(self):
+        return len(self.children)
+
+
+class TreeItemIndex:
+    """
+    条目 ID -> 树条目的反向索引
+
+    items 记录 ID 对应的条目（同一 ID 以最先登记的条目为准），
+    groups 记录 ID 所属的分组条目（payload 为 ID 列表的条目，取层级最深的一个），
+    用于在 3D 视图中点击后以常数时间定位树中的条目，而不是遍历整棵树。
+    条目可以是 TreeNode 或 QTreeWidgetItem。
+    """
+
+    def __init__(self):
+        self._items = {}  # ID -> 条目
+        self._groups = {}  # ID -> (层级, 分组条目)
+
+    def clear(self):
+        self._items = {}
+        self._groups = {}
+
+    def add_item(self, item_id, item):
+        self._items.setdefault(item_id, item)
+
+    def add_group(self, item_ids, group, depth):
+        """登记分组包含的 ID；已属于更深层分组的 ID 保持不变"""
+        groups = self._groups
+        for item_id in item_ids:
+            current = groups.get(item_id)
+            if current is None or current[0] < depth:
+                groups[item_id] = (depth, group)
+
+    def remove(self, item_id, item):
+        """移除 ID 与条目（或分组）的登记；ID 已登记到其他条目时不变"""
+        if self._items.get(item_id) is item:
+            del self._items[item_id]
+        entry = self._groups.get(item_id)
+        if entry is not None and entry[1] is item:
+            del self._groups[item_id]
+
+    def item(self, item_id):
+        return self._items.get(item_id)
+
+    def group(self, item_id):
+        entry = self._groups.get(item_id)
+        return entry[1] if entry is not None else None
+
+    def find(self, item_id):
+        """返回 ID 对应的条目，没有单独的条目时返回其所属分组，都没有时返回 None"""
+        item = self._items.get(item_id)
+        return item if item is not None else self.group(item_id)
+
+
+class LazyTreeModel(QAbstractItemModel):
+    """只保存已展开部分的树模型：子节点在 fetchMore 中才被创建和格式化"""
+
+    def __init__(self, header, parent=None):
+        super().__init__(parent)
+        self._header = header
+        self._root = TreeNode(header)
+        self.id_index = TreeItemIndex()  # payload 中的 ID -> 已加载的节点
+
+    # --- 构建接口 ---
+    def root(self):
+        """不可见的根节点"""
+        return self._root
+
+    def clear(self):
+        """清空整个模型（只需丢弃根节点的引用）"""
+        self.beginResetModel()
+        self._root = TreeNode(self._header)
+        self.id_index.clear()
+        self.endResetModel()
+
+    def add_node(self, parent_node, text, payload=None, loader=None):
+        """在 parent_node 下追加一个节点并返回它（parent_node 为 None 时添加到顶层）"""
+        node = TreeNode(text, payload, loader)
+        self.append_nodes(parent_node, [node])
+        return node
+
+    def append_nodes(self, parent_node, nodes):
+        """在 parent_node 下批量追加节点"""
+        if parent_node is None:
+            parent_node = self._root
+        if not nodes:
+            return
+        first = len(parent_node.children)
+        self.beginInsertRows(self.index_for_node(parent_node), first, first + len(nodes) - 1)
+        self._attach(parent_node, nodes)
+        self.endInsertRows()
+
+    def update_node(self, node, text=None, payload=None):
+        """修改节点的文本或数据"""
+        if text is not None:
+            node.text = text
+        if payload is not None:
+            node.payload = payload
+            self._register(node)
+        index = self.index_for_node(node)
+        self.dataChanged.emit(index, index)
+
+    def ensure_loaded(self, node):
+        """确保节点的子节点已加载（例如需要定位到尚未展开的条目时）"""
+        if node.loader is not None:
+            self.fetchMore(self.index_for_node(node))
+
+    def unload(self, node, loader):
+        """
+        丢弃节点已加载的子节点（包括它们在 ID 索引中的登记），下次展开时重新调用 loader
+
+        用于限制按需加载的树所占用的内存，通常只对已折叠的节点调用。
+        """
+        if not node.children:
+            node.loader = loader
+            return
+        self.beginRemoveRows(self.index_for_node(node), 0, len(node.children) - 1)
+        stack = list(node.children)
+        while stack:
+            child = stack.pop()
+            self._unregister(child)
+            stack.extend(child.children)
+        node.children = []
+        node.loader = loader
+        self.endRemoveRows()
+
+    def find_node(self, item_id):
+        """
+        返回 payload 为 item_id 的节点
+
+        节点尚未加载时逐级加载包含该 ID 的分组（只加载路径上的分组），
+        仍找不到时返回包含它的最深分组，都没有时返回 None。
+        """
+        index = self.id_index
+        node = index.item(item_id)
+        while node is None:
+            group = index.group(item_id)
+            if group is None or group.loader is None:
+                return group
+            self.ensure_loaded(group)
+            node = index.item(item_id)
+        return node
+
+    def node_from_index(self, index):
+        if index.isValid():
+            return index.internalPointer()
+        return self._root
+
+    def index_for_node(self, node):
+        if node is None or node is self._root or node.parent is None:
+            return QModelIndex()
+        return self.createIndex(node.row, 0, node)
+
+    def walk_loaded(self):
+        """按广度优先顺序遍历已加载的节点"""
+        queue = list(self._root.children)
+        position = 0
+        while position < len(queue):
+            node = queue[position]
+            position += 1
+            yield node
+            queue.extend(node.children)
+
+    def _attach(self, parent_node, nodes):
+        first = len(parent_node.children)
+        for offset, node in enumerate(nodes):
+            node.parent = parent_node
+            node.row = first + offset
+            self._register(node)
+        parent_node.children.extend(nodes)
+
+    def _register(self, node):
+        """把节点登记到 ID 索引：列表 payload 为分组，其余为单个条目"""
+        payload = node.payload
+        if payload is None:
+            return
+        if isinstance(payload, (list, tuple, set)):
+            depth = 0
+            parent = node.parent
+            while parent is not None:
+                depth += 1
+                parent = parent.parent
+            self.id_index.add_group(payload, node, depth)
+        else:
+            try:
+                self.id_index.add_item(payload, node)
+            except TypeError:
+                pass  # 不可哈希的 payload（例如字典）不参与索引
+
+    def _unregister(self, node):
+        payload = node.payload
+        if payload is None:
+            return
+        if isinstance(payload, (list, tuple, set)):
+            for item_id in payload:
+                self.id_index.remove(item_id, node)
+        else:
+            try:
+                self.id_index.remove(payload, node)
+            except TypeError:
+                pass
+
+    # --- QAbstractItemModel 接口 ---
+    def index(self, row, column, parent=QModelIndex()):
+        if column != 0:
+            return QModelIndex()
+        parent_node = self.node_from_index(parent)
+        if 0 <= row < len(parent_node.children):
+            return self.createIndex(row, column, parent_node.children[row])
+        return QModelIndex()
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        return self.index_for_node(index.internalPointer().parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self.node_from_index(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.DisplayRole:
+            return node.text
+        if role == Qt.UserRole:
+            return node.payload
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and section == 0:
+            return self._header
+        return None
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self.node_from_index(parent)
+        return bool(node.children) or node.loader is not None
+
+    def canFetchMore(self, parent):
+        return self.node_from_index(parent).loader is not None
+
+    def fetchMore(self, parent):
+        node = self.node_from_index(parent)
+        loader = node.loader
+        if loader is None:
+            return
+        node.loader = None  # 只加载一次
+        try:
+            children = loader(node)
+        except Exception as e:
+            logger.error(f"加载树节点 {node.text} 的子节点时出错: {e}")
+            logger.error(traceback.format_exc())
+            return
+        if children:
+            self.beginInsertRows(parent, len(node.children), len(node.children) + len(children) - 1)
+            self._attach(node, children)
+            self.endInsertRows()
+
+
+class DataFrameTableModel(QAbstractTableModel):
+    """
+    只读的数据框表格模型：第一列为行索引，其余为数据框的列
+
+    浮点数按 float_format 格式化显示，排序在数据框上完成（点击表头时由视图调用 sort）。
+    """
+
+    def __init__(self, parent=None, float_format="{:,.2f}"):
+        super().__init__(parent)
+        self._frame = None
+        self._float_format = float_format
+
+    def frame(self):
+        return self._frame
+
+    def set_frame(self, frame):
+        """替换显示的数据框（None 表示清空）"""
+        self.beginResetModel()
+        self._frame = frame
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or self._frame is None:
+            return 0
+        return len(self._frame)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid() or self._frame is None:
+            return 0
+        return len(self._frame.columns) + 1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or self._frame is None:
+            return None
+        column = index.column()
+        if column == 0:
+            value = self._frame.index[index.row()]
+        else:
+            value = self._frame.iat[index.row(), column - 1]
+        if role == Qt.DisplayRole:
+            if isinstance(value, float):
+                return self._float_format.format(value)
+            return str(value)
+        if role == Qt.TextAlignmentRole and column > 0:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or self._frame is None:
+            return None
+        if orientation == Qt.Horizontal:
+            if section == 0:
+                return str(self._frame.index.name or "")
+            return str(self._frame.columns[section - 1])
+        return str(section + 1)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        if self._frame is None:
+            return
+        ascending = order == Qt.AscendingOrder
+        self.layoutAboutToBeChanged.emit()
+        if column == 0:
+            self._frame = self._frame.sort_index(ascending=ascending)
+        else:
+            self._frame = self._frame.sort_values(self._frame.columns[column - 1], ascending=ascending, kind="stable")
+        self.layoutChanged.emit()
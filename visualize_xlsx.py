@@ -1,17 +1,19 @@
 # -*- coding: utf-8 -*-
 import sys
 import os
+import math
 import argparse
 import logging
+import multiprocessing
+import time
 import traceback
 from datetime import datetime
 from OCC.Core.Quantity import Quantity_Color
 from OCC.Core._Quantity import Quantity_TOC_RGB
 from PyQt5.QtCore import QT_VERSION_STR
-from OCC.Core.gp import gp_Pnt, gp_Vec, gp_Dir, gp_Ax2
 from OCC.Display.backend import load_backend
-from OCC.Core.STEPControl import STEPControl_Writer, STEPControl_Reader, STEPControl_AsIs
-from OCC.Core.IGESControl import IGESControl_Reader, IGESControl_Writer
+from OCC.Core.STEPControl import STEPControl_Writer, STEPControl_AsIs
+from OCC.Core.IGESControl import IGESControl_Writer
 from OCC.Core.Interface import Interface_Static_SetCVal
 from OCC.Core.IFSelect import IFSelect_RetDone
 from OCC.Core.BRep import BRep_Tool, BRep_Builder
@@ -22,8 +24,8 @@ load_backend("qt-pyqt5")
 from OCC.Display.qtDisplay import qtViewer3d
 from PyQt5.QtWidgets import (
     QApplication,
-    QTreeWidget,
-    QTreeWidgetItem,
+    QTreeView,
+    QAbstractItemView,
     QWidget,
     QHBoxLayout,
     QVBoxLayout,
@@ -36,24 +38,47 @@ from PyQt5.QtWidgets import (
     QLabel,
     QGroupBox,
     QTextEdit,
-    QStatusBar
+    QStatusBar,
+    QMenu,
+    QSpinBox,
+    QDoubleSpinBox,
+    QTableView,
+    QCheckBox
 )
-from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeCylinder, BRepPrimAPI_MakeSphere
-import pandas as pd
 from PyQt5.QtGui import QFont
 from PyQt5.QtCore import Qt, QTimer, QCoreApplication
 
+from harness_data import build_harness, read_excel_file
+from harness_cache import HarnessCache
+from cad_import import (
+    CadImportWorker, ShapeCache, merge_shapes, shape_type_name, MESH_PRESETS, DEFAULT_MESH_PRESET
+)
+from cad_structure import (
+    STEP_STRUCTURE_FORMAT, StepStructureWorker, StepTransferWorker, parse_product_id, product_id
+)
+from cad_topology import TopologyBrowser, has_subshapes
+from harness_export import (
+    CENTERLINE_STEP_FORMAT, CENTERLINE_IGES_FORMAT, build_centerline_document,
+    write_centerline_step, write_centerline_iges
+)
+from harness_geometry import PrimitiveInstancer, ShapeIndex
+from harness_mesh import MESH_GLTF_FORMAT, MESH_STL_FORMAT, harness_meshes, segment_arrays, write_glb, write_stl
+from harness_spatial import NodeSpatialIndex
+from harness_metrics import XLSX_METRIC_GROUPS, HarnessMetrics, write_metrics_csv, xlsx_link_frame
+from harness_graph import graph_from_endpoints, graph_from_node_links
+from harness_diff import diff_harness
+from file_watch import SourceFileWatcher
+from tree_model import DataFrameTableModel, LazyTreeModel, TreeNode
+from harness_display import (
+    LayeredShapeDisplay, CenterlineDisplay, CadModelDisplay, HighlightState, NODE_LAYER,
+    DISPLAY_MODES, DISPLAY_MODE_LAYERED, DISPLAY_MODE_SHAPES, DISPLAY_MODE_CENTERLINE, CAD_SELECTION_MODES, DEFAULT_CAD_SELECTION_MODE
+)
+
 # 添加以下导入用于STEP文件解析
 from OCC.Core.TopoDS import TopoDS_Shape, TopoDS_Edge, topods_Edge, TopoDS_Compound, topods_Compound, topods
-from OCC.Core.TopExp import TopExp_Explorer
-from OCC.Core.TopAbs import (
-    TopAbs_EDGE, TopAbs_VERTEX, TopAbs_FACE, TopAbs_SOLID,
-    TopAbs_SHELL, TopAbs_COMPOUND, TopAbs_COMPSOLID, TopAbs_WIRE
-)
 from OCC.Core.TopLoc import TopLoc_Location
 from OCC.Core.BRepAdaptor import BRepAdaptor_Curve
 from OCC.Core.GeomAbs import GeomAbs_Line
-from OCC.Core.TopTools import TopTools_IndexedMapOfShape
 from OCC.Core.BRepTools import breptools_OuterWire
 from OCC.Core.ShapeAnalysis import ShapeAnalysis_Edge
 from OCC.Core.AIS import AIS_Shape, AIS_InteractiveContext # Import AIS_InteractiveContext
@@ -111,7 +136,7 @@ def setup_logging():
 logger = logging.getLogger("visualize_xlsx")
 
 class MainWindow(QWidget):
-    def __init__(self, df=None):
+    def __init__(self, columns=None, xlsx_file=None):
         super().__init__()
         self.setWindowTitle("基于公共数据源的航电系统布线架构与集成系统")
 
@@ -130,12 +155,31 @@ class MainWindow(QWidget):
 
         # 高亮和颜色管理
         self.ais_shapes = {}  # 存储所有AIS对象，用于颜色管理 {shape_id: AIS_Shape}
+        self.shape_index = ShapeIndex()  # AIS对象的 TopoDS_Shape -> shape_id，用于点击时查找
         self.highlighted_shapes = []  # 当前高亮的形状IDs
+        # 高亮状态：颜色编号 1 为线段/导入形状，2 为节点（0 为默认颜色）
+        self.highlight_state = HighlightState(
+            {1: Quantity_Color(Quantity_NOC_YELLOW), 2: Quantity_Color(Quantity_NOC_GREEN)},
+            self.highlight_code)
+        self.default_colors = {
+            'node': Quantity_Color(Quantity_NOC_RED),
+            'segment': Quantity_Color(Quantity_NOC_BLUE),
+            'imported': Quantity_Color(0.8, 0.8, 0.8, Quantity_TOC_RGB),
+        }
 
         # 节点相关数据结构
         self.unique_nodes = {}  # 存储唯一节点信息，使用ref作为键，(x, y, z)作为值
         self.node_shapes = []  # 存储节点的 TopoDS_Shape 对象
+        self.node_shape_refs = []  # 与 node_shapes 对应的节点 ref
         self.node_id_map = {} # Map node_ref to node_index ('node_0', 'node_1', etc.)
+        self.node_index = None  # 节点坐标的空间索引（加载数据时建立）
+        self.node_index_refs = []  # 空间索引中的下标 i（即 'node_i'）-> 节点 ref
+        self.node_graph = None  # 节点拓扑的 CSR 图（下标与空间索引一致）
+        self.path_source = None  # 最短路径起点的节点下标
+        self.harness_metrics = None  # 按分组汇总的长度、质量和链接数（加载数据时建立）
+        self.source_file = xlsx_file  # 当前线束数据的 Excel 文件（监视模式下变化后增量重新加载）
+        self.reloading = False  # 正在重新加载源文件
+        self.reload_pending = False  # 重新加载期间源文件又发生了变化
 
         # 存储链接相关的数据，用于查询
         self.link_data = {}  # 存储链接数据，使用索引作为键
@@ -157,8 +201,11 @@ class MainWindow(QWidget):
         left_layout = QVBoxLayout()
 
         # 树状结构
-        self.tree = QTreeWidget()
-        self.tree.setHeaderLabels(["模型结构"])
+        # 树状结构（模型/视图，子节点在展开时才创建）
+        self.tree_model = LazyTreeModel("模型结构", self)
+        self.tree = QTreeView()
+        self.tree.setModel(self.tree_model)
+        self.tree.setUniformRowHeights(True)
         self.tree.setColumnWidth(0, 300)
         left_layout.addWidget(self.tree)
 
@@ -170,8 +217,18 @@ class MainWindow(QWidget):
         import_layout = QHBoxLayout()
         import_layout.addWidget(QLabel("导入文件:"))
         self.file_format_combo = QComboBox()
-        self.file_format_combo.addItems(["STEP", "IGES"])
+        self.file_format_combo.addItems(["STEP", "IGES", STEP_STRUCTURE_FORMAT])
         import_layout.addWidget(self.file_format_combo)
+        import_layout.addWidget(QLabel("网格精度:"))
+        self.mesh_preset_combo = QComboBox()
+        self.mesh_preset_combo.addItems(list(MESH_PRESETS))
+        self.mesh_preset_combo.setCurrentText(DEFAULT_MESH_PRESET)
+        import_layout.addWidget(self.mesh_preset_combo)
+        import_layout.addWidget(QLabel("拾取:"))
+        self.pick_mode_combo = QComboBox()
+        self.pick_mode_combo.addItems(list(CAD_SELECTION_MODES))
+        self.pick_mode_combo.setCurrentText(DEFAULT_CAD_SELECTION_MODE)
+        import_layout.addWidget(self.pick_mode_combo)
         self.import_button = QPushButton("导入文件")
         self.import_button.clicked.connect(self.import_file)
         import_layout.addWidget(self.import_button)
@@ -181,13 +238,22 @@ class MainWindow(QWidget):
         export_layout = QHBoxLayout()
         export_layout.addWidget(QLabel("导出文件:"))
         self.export_format_combo = QComboBox()
-        self.export_format_combo.addItems(["STEP", "IGES"])
+        self.export_format_combo.addItems(["STEP", "IGES", CENTERLINE_STEP_FORMAT, CENTERLINE_IGES_FORMAT,
+                                           MESH_GLTF_FORMAT, MESH_STL_FORMAT])
         export_layout.addWidget(self.export_format_combo)
         self.export_button = QPushButton("导出文件")
         self.export_button.clicked.connect(self.export_file)
         export_layout.addWidget(self.export_button)
         file_layout.addLayout(export_layout)
 
+        # 监视源文件：Excel 保存后重新解析，只更新有变化的形状
+        self.watch_check = QCheckBox("监视源文件（变化后增量重新加载）")
+        self.watch_check.setEnabled(self.source_file is not None)
+        self.watch_check.toggled.connect(self.on_watch_toggled)
+        file_layout.addWidget(self.watch_check)
+        self.source_watcher = SourceFileWatcher(self)
+        self.source_watcher.changed.connect(self.reload_source_file)
+
         file_group.setLayout(file_layout)
         left_layout.addWidget(file_group)
         
@@ -206,6 +272,13 @@ class MainWindow(QWidget):
         # 右视图按钮
         self.right_view_button = QPushButton("右视图")
         layout_layout.addWidget(self.right_view_button)
+        # 显示模式：分层复合体（每个 Section 一个显示对象）或独立形状
+        display_mode_layout = QHBoxLayout()
+        display_mode_layout.addWidget(QLabel("显示模式:"))
+        self.display_mode_combo = QComboBox()
+        self.display_mode_combo.addItems(DISPLAY_MODES)
+        display_mode_layout.addWidget(self.display_mode_combo)
+        layout_layout.addLayout(display_mode_layout)
         
         layout_group.setLayout(layout_layout)
         left_layout.addWidget(layout_group)
@@ -220,6 +293,74 @@ class MainWindow(QWidget):
         info_group.setLayout(info_layout)
         left_layout.addWidget(info_group)
 
+        # 邻近节点查询（基于节点空间索引，以当前选中的节点为中心）
+        neighbour_group = QGroupBox("邻近节点")
+        neighbour_layout = QHBoxLayout()
+        neighbour_layout.addWidget(QLabel("数量:"))
+        self.neighbour_count_spin = QSpinBox()
+        self.neighbour_count_spin.setRange(1, 1000)
+        self.neighbour_count_spin.setValue(5)
+        neighbour_layout.addWidget(self.neighbour_count_spin)
+        neighbour_layout.addWidget(QLabel("半径:"))
+        self.neighbour_radius_spin = QDoubleSpinBox()
+        self.neighbour_radius_spin.setRange(0.1, 1e7)
+        self.neighbour_radius_spin.setDecimals(1)
+        self.neighbour_radius_spin.setValue(500.0)
+        neighbour_layout.addWidget(self.neighbour_radius_spin)
+        self.nearest_button = QPushButton("最近节点")
+        self.nearest_button.clicked.connect(self.find_nearest_nodes)
+        neighbour_layout.addWidget(self.nearest_button)
+        self.radius_button = QPushButton("半径内节点")
+        self.radius_button.clicked.connect(self.find_nodes_in_radius)
+        neighbour_layout.addWidget(self.radius_button)
+        neighbour_group.setLayout(neighbour_layout)
+        left_layout.addWidget(neighbour_group)
+
+        # 拓扑查询（基于 node_to_links 建立的 CSR 图，以当前选中的节点为中心或终点）
+        graph_group = QGroupBox("拓扑查询")
+        graph_layout = QHBoxLayout()
+        self.path_source_button = QPushButton("设为起点")
+        self.path_source_button.clicked.connect(self.set_path_source)
+        graph_layout.addWidget(self.path_source_button)
+        self.shortest_path_button = QPushButton("最短路径")
+        self.shortest_path_button.clicked.connect(self.find_shortest_path)
+        graph_layout.addWidget(self.shortest_path_button)
+        graph_layout.addWidget(QLabel("跳数:"))
+        self.hop_count_spin = QSpinBox()
+        self.hop_count_spin.setRange(1, 100)
+        self.hop_count_spin.setValue(2)
+        graph_layout.addWidget(self.hop_count_spin)
+        self.k_hop_button = QPushButton("K 跳邻域")
+        self.k_hop_button.clicked.connect(self.find_k_hop_nodes)
+        graph_layout.addWidget(self.k_hop_button)
+        self.component_button = QPushButton("连通分量")
+        self.component_button.clicked.connect(self.find_connected_component)
+        graph_layout.addWidget(self.component_button)
+        graph_group.setLayout(graph_layout)
+        left_layout.addWidget(graph_group)
+
+        # 线束统计（按分组汇总长度、质量和链接数，隐藏的分组不计入）
+        metrics_group = QGroupBox("线束统计")
+        metrics_layout = QVBoxLayout()
+        metrics_bar = QHBoxLayout()
+        metrics_bar.addWidget(QLabel("分组:"))
+        self.metrics_group_combo = QComboBox()
+        self.metrics_group_combo.addItems(list(XLSX_METRIC_GROUPS))
+        self.metrics_group_combo.currentTextChanged.connect(self.refresh_metrics_table)
+        metrics_bar.addWidget(self.metrics_group_combo)
+        self.metrics_export_button = QPushButton("导出 CSV")
+        self.metrics_export_button.clicked.connect(self.export_metrics_csv)
+        metrics_bar.addWidget(self.metrics_export_button)
+        metrics_layout.addLayout(metrics_bar)
+        self.metrics_model = DataFrameTableModel(self)
+        self.metrics_table = QTableView()
+        self.metrics_table.setModel(self.metrics_model)
+        self.metrics_table.setSortingEnabled(True)
+        self.metrics_table.setMinimumHeight(120)
+        metrics_layout.addWidget(self.metrics_table)
+        metrics_group.setLayout(metrics_layout)
+        left_layout.addWidget(metrics_group)
+
         horizontal_layout.addLayout(left_layout, 1)
 
         # 3D 视图
@@ -230,6 +371,14 @@ class MainWindow(QWidget):
         # self.context.SetBackground(bg_color)
         self.viewer._display.View.SetBackgroundColor(bg_color) # Deprecated way
         horizontal_layout.addWidget(self.viewer, 2)
+
+        # 分层显示：每个 Section 合并为一个 AIS_ColoredShape，或者（中心线模式）一个线段图元数组
+        self.shape_layers = LayeredShapeDisplay(self.context)
+        self.centerline_display = CenterlineDisplay(self.viewer._display.View)
+        self.layer_display = self.shape_layers  # 当前使用的分层显示
+        # 导入的 CAD 模型：每个顶层实体一个对象，面和边按拾取模式选择
+        self.cad_display = CadModelDisplay(self.context)
+        self.pick_mode_combo.currentTextChanged.connect(self.on_pick_mode_changed)
         
          # 布局操作绑定
         self.layout_button.clicked.connect(self.viewer._display.FitAll)
@@ -239,6 +388,8 @@ class MainWindow(QWidget):
         self.top_view_button.clicked.connect(self.set_top_view)
         # 右视图
         self.right_view_button.clicked.connect(self.set_right_view)
+        # 切换显示模式后重新绘制
+        self.display_mode_combo.currentIndexChanged.connect(self.on_display_mode_changed)
 
         # 添加主水平布局
         main_layout.addLayout(horizontal_layout)
@@ -250,25 +401,36 @@ class MainWindow(QWidget):
 
         self.setLayout(main_layout)
 
+        # 节点球体（半径 40）和线段圆柱体（半径 30）的原型实例化
+        self.primitives = PrimitiveInstancer(sphere_radius=40.0, cylinder_radius=30.0)
+
         # 存储线段形状和原始颜色
         self.segment_shapes = [] # Store TopoDS_Shape for segments
         self.segments = [] # Store segment start/end points
 
         # 保存导入的模型
-        self.step_shapes = {}  # 形状ID到形状对象的映射 {shape_id: TopoDS_Shape}
+        self.step_shapes = {}  # 形状ID到形状对象的映射，导入后为 TopologyBrowser（按需枚举子形状）
         self.main_shape = None # Store the main imported shape
+        self.step_structure = None  # 只读取了产品结构的STEP文件 (StepStructure)，几何按需转换
+        self.import_worker = None  # 正在进行的后台导入 (CadImportWorker)
+        self.shape_cache = ShapeCache()  # 转换后 CAD 形状的磁盘缓存
+        self.import_progress = None
+        self.import_topologies = {}  # 文件序号 -> 后台建立的拓扑索引 (ShapeTopology)
 
         # 树项点击事件
-        self.tree.itemClicked.connect(self.on_tree_item_clicked)
+        self.tree.clicked.connect(self.on_tree_item_clicked)
+        # 树项右键菜单（隐藏/显示分组）
+        self.tree.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.tree.customContextMenuRequested.connect(self.show_tree_context_menu)
         self.selected_item = None
 
         # 设置交互功能
         self.setup_interaction()
 
         # 如果有数据，则解析并显示
-        if df is not None:
+        if columns is not None:
             try:
-                self.parse_df_and_populate_tree(df)
+                self.parse_columns_and_populate_tree(columns)
                 # 在布局完成后绘制模型
                 QTimer.singleShot(100, self.draw_segments)  # 延迟100毫秒确保UI完全初始化
                 logger.info("数据加载和初始化完成")
@@ -292,15 +454,76 @@ class MainWindow(QWidget):
         self.viewer._display.View.SetProj(V3d_Xneg)
         self.viewer._display.FitAll()
 
-    def parse_df_and_populate_tree(self, df):
-        """Parse dataframe and populate the tree widget with hierarchical structure."""
-        logger.info(f"开始解析数据框，行数: {len(df)}")
-        self.tree.clear()  # 清空树
-        self.segment_shapes = []
+    def on_display_mode_changed(self, index):
+        """切换显示模式后重新绘制线段和节点"""
+        logger.info(f"显示模式切换为: {self.display_mode_combo.currentText()}")
+        if self.segments or self.unique_nodes:
+            self.draw_segments()
+            self.refresh_metrics_table()
+
+    def show_tree_context_menu(self, pos):
+        """树项右键菜单：隐藏、单独显示所在的分组（分层显示模式下可用）"""
+        index = self.tree.indexAt(pos)
+        shape_data = index.data(Qt.UserRole) if index.isValid() else None
+        if shape_data is None:
+            shape_ids = []
+        elif isinstance(shape_data, list):
+            shape_ids = shape_data
+        else:
+            shape_ids = [shape_data]
+        layers = self.layer_display.layers_of(shape_ids)
+        product_path = parse_product_id(shape_data) if self.step_structure is not None else None
+
+        menu = QMenu(self)
+        load_action = None
+        if product_path is not None:
+            load_action = menu.addAction("加载几何")
+            load_action.setEnabled(product_path not in self.step_structure.loaded)
+            menu.addSeparator()
+        hide_action = menu.addAction("隐藏所在分组")
+        isolate_action = menu.addAction("仅显示所在分组")
+        show_all_action = menu.addAction("显示全部分组")
+        hide_action.setEnabled(bool(layers))
+        isolate_action.setEnabled(bool(layers))
+        show_all_action.setEnabled(bool(self.layer_display.hidden))
+
+        action = menu.exec_(self.tree.viewport().mapToGlobal(pos))
+        if action is None:
+            return
+        if action == load_action:
+            self.load_product_geometry(product_path)
+            return
+        if action == hide_action:
+            self.layer_display.hide(layers)
+            self.status_bar.showMessage(f"已隐藏 {len(layers)} 个分组")
+        elif action == isolate_action:
+            self.layer_display.isolate(layers)
+            self.status_bar.showMessage(f"仅显示 {len(layers)} 个分组")
+        elif action == show_all_action:
+            self.layer_display.show_all()
+            self.status_bar.showMessage("已显示全部分组")
+        self.refresh_metrics_table()
+        self.context.UpdateCurrentViewer()
+
+    def parse_columns_and_populate_tree(self, columns, reload=False):
+        """
+        Parse harness columns (see harness_data.harness_columns) and populate the tree with hierarchical structure.
+
+        reload 为 True 时（源文件变化后重新加载）保留当前的显示对象，由 update_scene 按差异更新。
+        """
+        row_count = len(columns['coords'])
+        logger.info(f"开始解析数据，行数: {row_count}")
+        self.tree_model.clear()  # 清空树
+        self.selected_item = None
         self.segments = []
-        self.ais_shapes = {}  # 清空AIS形状字典
-        self.step_shapes = {} # Clear imported shapes
-        self.main_shape = None
+        if not reload:
+            self.segment_shapes = []
+            self.ais_shapes = {}  # 清空AIS形状字典
+            self.shape_index.clear()
+            self.layer_display.clear()
+            self.cad_display.clear()
+            self.step_shapes = {} # Clear imported shapes
+            self.main_shape = None
 
         # 存储唯一节点信息
         self.unique_nodes = {}  # 使用ref作为键，(x, y, z)作为值
@@ -312,188 +535,52 @@ class MainWindow(QWidget):
         self.node_to_links = {}
         self.shape_to_info = {} # Clear shape info mapping
 
-        # 显示进度对话框
-        progress = QProgressDialog("正在解析Excel数据...", "取消", 0, len(df), self)
-        progress.setWindowModality(Qt.WindowModal)
-        progress.setMinimumDuration(500)  # 设置最小显示时间为500ms
-        progress.show()
-        QCoreApplication.processEvents()
-
-        main_root = QTreeWidgetItem(self.tree)
-        main_root.setText(0, "NETWORK AIRPLANE")
-        main_root.setData(0, Qt.UserRole, [])  # 将用于存储所有子节点的索引
-
-        # 添加节点根节点
-        nodes_root = QTreeWidgetItem(main_root)
-        nodes_root.setText(0, "Network Nodes")
-        nodes_root.setData(0, Qt.UserRole, [])  # 初始化节点索引列表
-
-        section_groups = {}
-        section_indices = {}  # 记录每个section包含的线段索引
-
-        for index, row in df.iterrows():
-            try:
-                # 更新进度条
-                progress.setValue(index)
-                QCoreApplication.processEvents()
-
-                # 如果用户取消了操作
-                if progress.wasCanceled():
-                    logger.info("用户取消了Excel数据解析")
-                    break
-
-                # 检查并安全获取各列数据
-                try:
-                    link_name = str(row.get('Link Name', f"Link_{index}"))
-                    ref_origine = str(row.get('refOrigine', f"Origin_{index}"))
-                    x_origine = float(row.get('Xorigine', 0.0))
-                    y_origine = float(row.get('Yorigine', 0.0))
-                    z_origine = float(row.get('Zorigine', 0.0))
-                    ref_extremite = str(row.get('RefExtremite', f"Extremite_{index}"))
-                    x_extremite = float(row.get('Xextremite', 0.0))
-                    y_extremite = float(row.get('Yextremite', 0.0))
-                    z_extremite = float(row.get('Zextremite', 0.0))
-                    length = row.get('Length', 0.0)
-                    density = row.get('Density', 0.0)
-                    safety = row.get('Safety', '')
-                    route = row.get('Route', '')
-                    action_number = row.get('Action Number', '')
-                    section = str(row.get('Section', 'Default'))
-                except (ValueError, TypeError) as e:
-                    logger.warning(f"在行 {index} 处理列数据时出错: {e}")
-                    # 使用默认值继续
-                    if 'link_name' not in locals(): link_name = f"Link_{index}"
-                    if 'ref_origine' not in locals(): ref_origine = f"Origin_{index}"
-                    if 'x_origine' not in locals(): x_origine = 0.0
-                    if 'y_origine' not in locals(): y_origine = 0.0
-                    if 'z_origine' not in locals(): z_origine = 0.0
-                    if 'ref_extremite' not in locals(): ref_extremite = f"Extremite_{index}"
-                    if 'x_extremite' not in locals(): x_extremite = 0.0
-                    if 'y_extremite' not in locals(): y_extremite = 0.0
-                    if 'z_extremite' not in locals(): z_extremite = 0.0
-                    if 'length' not in locals(): length = 0.0
-                    if 'density' not in locals(): density = 0.0
-                    if 'safety' not in locals(): safety = ''
-                    if 'route' not in locals(): route = ''
-                    if 'action_number' not in locals(): action_number = ''
-                    if 'section' not in locals(): section = 'Default'
-
-                # 添加唯一节点信息
-                if ref_origine not in self.unique_nodes:
-                    self.unique_nodes[ref_origine] = (x_origine, y_origine, z_origine)
-
-                if ref_extremite not in self.unique_nodes:
-                    self.unique_nodes[ref_extremite] = (x_extremite, y_extremite, z_extremite)
-
-                # 创建或获取section组
-                if section not in section_groups:
-                    section_group_item = QTreeWidgetItem(main_root)
-                    section_group_item.setText(0, f"Network Geometry {section}")
-                    section_groups[section] = section_group_item
-                    section_indices[section] = []  # 初始化该section的索引列表
-                else:
-                    section_group_item = section_groups[section]
-
-                link_item = QTreeWidgetItem(section_group_item)
-                link_item.setText(0, link_name)
-
-                # 添加 origin 信息
-                origin_item = QTreeWidgetItem(link_item)
-                origin_item.setText(0, "Origin")
-                ref_origine_subitem = QTreeWidgetItem(origin_item)
-                ref_origine_subitem.setText(0, f"refOrigine= {ref_origine}")
-                x_origine_subitem = QTreeWidgetItem(origin_item)
-                x_origine_subitem.setText(0, f"Xorigine= {x_origine}")
-                y_origine_subitem = QTreeWidgetItem(origin_item)
-                y_origine_subitem.setText(0, f"Yorigine= {y_origine}")
-                z_origine_subitem = QTreeWidgetItem(origin_item)
-                z_origine_subitem.setText(0, f"Zorigine= {z_origine}")
-
-                # 添加 Extremite 信息
-                extremite_item = QTreeWidgetItem(link_item)
-                extremite_item.setText(0, "Extremite")
-                ref_extremite_subitem = QTreeWidgetItem(extremite_item)
-                ref_extremite_subitem.setText(0, f"RefExtremite= {ref_extremite}")
-                x_extremite_subitem = QTreeWidgetItem(extremite_item)
-                x_extremite_subitem.setText(0, f"Xextremite= {x_extremite}")
-                y_extremite_subitem = QTreeWidgetItem(extremite_item)
-                y_extremite_subitem.setText(0, f"Yextremite= {y_extremite}")
-                z_extremite_subitem = QTreeWidgetItem(extremite_item)
-                z_extremite_subitem.setText(0, f"Zextremite= {z_extremite}")
-
-                # 添加其他信息
-                other_info_item = QTreeWidgetItem(link_item)
-                other_info_item.setText(0, "Other Info")
-                length_subitem = QTreeWidgetItem(other_info_item)
-                length_subitem.setText(0, f"Length= {length}")
-                density_subitem = QTreeWidgetItem(other_info_item)
-                density_subitem.setText(0, f"Density= {density}")
-                safety_subitem = QTreeWidgetItem(other_info_item)
-                safety_subitem.setText(0, f"Safety= {safety}")
-                route_subitem = QTreeWidgetItem(other_info_item)
-                route_subitem.setText(0, f"Route= {route}")
-                action_number_subitem = QTreeWidgetItem(other_info_item)
-                action_number_subitem.setText(0, f"Action Number= {action_number}")
-                section_subitem = QTreeWidgetItem(other_info_item)
-                section_subitem.setText(0, f"Section= {section}")
-
-                start_point = (x_origine, y_origine, z_origine)
-                end_point = (x_extremite, y_extremite, z_extremite)
-                self.segments.append((start_point, end_point))
-
-                # 存储当前线段的索引 (Use integer index as shape_id for segments)
-                segment_index = len(self.segments) - 1
-                link_item.setData(0, Qt.UserRole, segment_index)
-
-                # 将索引添加到对应的section索引列表中
-                section_indices[section].append(segment_index)
-
-                # 存储链接数据，用于查询
-                self.link_data[segment_index] = {
-                    'name': link_name,
-                    'origin': {
-                        'ref': ref_origine,
-                        'coordinates': (x_origine, y_origine, z_origine)
-                    },
-                    'extremite': {
-                        'ref': ref_extremite,
-                        'coordinates': (x_extremite, y_extremite, z_extremite)
-                    },
-                    'length': length,
-                    'density': density,
-                    'safety': safety,
-                    'route': route,
-                    'action_number': action_number,
-                    'section': section
-                }
-
-                # 存储形状信息 (using segment index as key)
-                self.shape_to_info[segment_index] = self.link_data[segment_index]
-
-                # 更新节点到链接的映射 (using node ref as key)
-                if ref_origine not in self.node_to_links:
-                    self.node_to_links[ref_origine] = []
-                self.node_to_links[ref_origine].append(segment_index)
+        # 显示进度对话框（重新加载时不显示：取消后只有部分链接，差异会把其余链接当作删除）
+        progress = None
+        if not reload:
+            progress = QProgressDialog("正在解析Excel数据...", "取消", 0, row_count, self)
+            progress.setWindowModality(Qt.WindowModal)
+            progress.setMinimumDuration(500)  # 设置最小显示时间为500ms
+            progress.show()
+            QCoreApplication.processEvents()
 
-                if ref_extremite not in self.node_to_links:
-                    self.node_to_links[ref_extremite] = []
-                self.node_to_links[ref_extremite].append(segment_index)
-            except Exception as e:
-                logger.error(f"处理行 {index} 时出错: {str(e)}")
-                logger.error(traceback.format_exc())
-                continue
+        def report_progress(done, total):
+            progress.setValue(done)
+            QCoreApplication.processEvents()
+            return not progress.wasCanceled()
+
+        # --- 按列解析数据（批量转换坐标，按批次汇报进度） ---
+        harness = build_harness(columns, progress_callback=None if reload else report_progress)
+        if harness['cancelled']:
+            logger.info("用户取消了Excel数据解析")
+
+        self.segments = harness['segments']
+        self.link_data = harness['link_data']
+        self.node_to_links = harness['node_to_links']
+        self.unique_nodes = harness['unique_nodes']
+        self.build_node_index(harness['node_coords'])
+        self.build_node_graph(harness['origin_index'], harness['extremite_index'])
+        self.build_metrics(xlsx_link_frame(columns, len(self.segments)))
+        section_indices = harness['section_indices']
+        self.shape_to_info.update(self.link_data)  # 线段使用整数索引作为 shape_id
+
+        if harness['bad_cells']:
+            bad_cells = harness['bad_cells']
+            details = "\n".join(f"行 {row + 2} 列 {column}: {value}" for row, column, value in bad_cells[:10])
+            if len(bad_cells) > 10:
+                details += f"\n... 以及其他 {len(bad_cells) - 10} 个单元格"
+            if reload:
+                # 每次保存都会重新加载，不弹出对话框，由 reload_source_file 在状态栏报告
+                logger.warning(f"有 {len(bad_cells)} 个坐标单元格无法解析为数字:\n{details}")
+            else:
+                QMessageBox.warning(self, "数据警告", f"有 {len(bad_cells)} 个坐标单元格无法解析为数字，相应线段将不会绘制:\n{details}")
 
         try:
-            # 现在添加节点到树中
+            # 节点 shape_id 与查询信息（树中的节点条目在展开时才创建）
             node_indices_for_tree = [] # Store node shape_ids ('node_0', 'node_1'...)
-
             for i, (node_ref, node_pos) in enumerate(self.unique_nodes.items()):
-                node_item = QTreeWidgetItem(nodes_root)
-                node_item.setText(0, f"Node: {node_ref}")
-
                 # 使用 'node_i' 格式作为 shape_id
                 node_shape_id = f"node_{i}"
-                node_item.setData(0, Qt.UserRole, node_shape_id)
                 node_indices_for_tree.append(node_shape_id)
 
                 # 保存节点 ref 到 shape_id 的映射
@@ -506,36 +593,31 @@ class MainWindow(QWidget):
                     'connected_links': self.node_to_links.get(node_ref, [])
                 }
 
-                # 添加节点坐标信息
-                x_item = QTreeWidgetItem(node_item)
-                x_item.setText(0, f"X= {node_pos[0]}")
-                y_item = QTreeWidgetItem(node_item)
-                y_item.setText(0, f"Y= {node_pos[1]}")
-                z_item = QTreeWidgetItem(node_item)
-                z_item.setText(0, f"Z= {node_pos[2]}")
-
-            # 设置节点根节点的索引列表
-            nodes_root.setData(0, Qt.UserRole, node_indices_for_tree)
-
-            # 设置每个section组的索引列表
-            for section, section_item in section_groups.items():
-                section_item.setData(0, Qt.UserRole, section_indices[section])
-
             # 将所有索引添加到根节点 (包括线段和节点 shape_ids)
             all_indices = []
             for indices in section_indices.values():
                 all_indices.extend(indices) # Add segment indices (integers)
             all_indices.extend(node_indices_for_tree) # Add node shape_ids (strings)
-            main_root.setData(0, Qt.UserRole, all_indices)
+
+            main_root = TreeNode("NETWORK AIRPLANE", all_indices)
+            nodes_root = TreeNode("Network Nodes", node_indices_for_tree, self.load_node_items)
+            section_items = [
+                TreeNode(f"Network Geometry {section}", indices, self.load_link_items)
+                for section, indices in section_indices.items()
+            ]
+            self.tree_model.append_nodes(None, [main_root])
+            self.tree_model.append_nodes(main_root, [nodes_root] + section_items)
 
             # 关闭进度对话框
-            progress.setValue(len(df))
+            if progress is not None:
+                progress.setValue(row_count)
 
             # 显示成功消息
-            self.show_success_message(f"Excel数据解析完成! 提取了 {len(self.unique_nodes)} 个唯一节点。")
+            if not reload:
+                self.show_success_message(f"Excel数据解析完成! 提取了 {len(self.unique_nodes)} 个唯一节点。")
 
             # 展开第一层节点
-            self.tree.expandItem(main_root)
+            self.tree.expand(self.tree_model.index_for_node(main_root))
 
             logger.info(f"解析完成，共 {len(self.segments)} 条线段和 {len(self.unique_nodes)} 个节点")
 
@@ -544,23 +626,94 @@ class MainWindow(QWidget):
             logger.error(traceback.format_exc())
             QMessageBox.warning(self, "解析错误", f"构建树时出现错误: {str(e)}")
 
-    def create_node_shapes(self):
-        """创建代表节点的球体形状 (TopoDS_Shape)"""
+    def load_node_items(self, nodes_root):
+        """展开 Network Nodes 时创建节点条目"""
+        return [
+            TreeNode(f"Node: {node_ref}", self.node_id_map[node_ref], self.load_node_details)
+            for node_ref in self.unique_nodes
+        ]
+
+    def load_node_details(self, node_item):
+        """展开节点时格式化其坐标"""
+        node_pos = self.shape_to_info[node_item.payload]['coordinates']
+        return [
+            TreeNode(f"X= {node_pos[0]}"),
+            TreeNode(f"Y= {node_pos[1]}"),
+            TreeNode(f"Z= {node_pos[2]}"),
+        ]
+
+    def load_link_items(self, section_group_item):
+        """展开 section 分组时创建链接条目"""
+        return [
+            TreeNode(self.link_data[segment_index]['name'], segment_index, self.load_link_details)
+            for segment_index in section_group_item.payload
+        ]
+
+    def load_link_details(self, link_item):
+        """展开链接时创建 Origin / Extremite / Other Info 分组"""
+        return [
+            TreeNode("Origin", None, self.load_link_origin),
+            TreeNode("Extremite", None, self.load_link_extremite),
+            TreeNode("Other Info", None, self.load_link_other_info),
+        ]
+
+    def load_link_origin(self, origin_item):
+        """展开 Origin 时格式化起点信息"""
+        origin = self.link_data[origin_item.parent.payload]['origin']
+        return [
+            TreeNode(f"refOrigine= {origin['ref']}"),
+            TreeNode(f"Xorigine= {origin['coordinates'][0]}"),
+            TreeNode(f"Yorigine= {origin['coordinates'][1]}"),
+            TreeNode(f"Zorigine= {origin['coordinates'][2]}"),
+        ]
+
+    def load_link_extremite(self, extremite_item):
+        """展开 Extremite 时格式化终点信息"""
+        extremite = self.link_data[extremite_item.parent.payload]['extremite']
+        return [
+            TreeNode(f"RefExtremite= {extremite['ref']}"),
+            TreeNode(f"Xextremite= {extremite['coordinates'][0]}"),
+            TreeNode(f"Yextremite= {extremite['coordinates'][1]}"),
+            TreeNode(f"Zextremite= {extremite['coordinates'][2]}"),
+        ]
+
+    def load_link_other_info(self, other_info_item):
+        """展开 Other Info 时格式化其他属性"""
+        link = self.link_data[other_info_item.parent.payload]
+        return [
+            TreeNode(f"Length= {link['length']}"),
+            TreeNode(f"Density= {link['density']}"),
+            TreeNode(f"Safety= {link['safety']}"),
+            TreeNode(f"Route= {link['route']}"),
+            TreeNode(f"Action Number= {link['action_number']}"),
+            TreeNode(f"Section= {link['section']}"),
+        ]
+
+    def create_node_shapes(self, reuse=None):
+        """
+        创建代表节点的球体形状 (TopoDS_Shape)
+
+        reuse 为节点 ref -> 已有的球体，重新加载时位置未变的节点直接复用。
+        """
         logger.info(f"创建节点形状，节点数量: {len(self.unique_nodes)}")
         self.node_shapes = []  # 重置节点 TopoDS_Shape 列表
-
-        # 设置球体的半径
-        radius = 40.0  # 球体的半径，可以根据需要调整
+        self.node_shape_refs = []  # 与 node_shapes 一一对应的节点 ref
+        reuse = reuse or {}
 
         for i, (node_ref, node_pos) in enumerate(self.unique_nodes.items()):
             try:
-                # 创建球体
-                center = gp_Pnt(*node_pos)
-                sphere = BRepPrimAPI_MakeSphere(center, radius).Shape()
-                if sphere.IsNull():
-                    logger.warning(f"创建节点 {node_ref} 的球体失败")
-                    continue
+                sphere = reuse.get(node_ref)
+                if sphere is None:
+                    if not all(math.isfinite(v) for v in node_pos):
+                        logger.warning(f"节点 {node_ref} 坐标无效，跳过创建球体")
+                        continue
+                    # 球体实例（所有节点共享同一个原型球体）
+                    sphere = self.primitives.sphere(node_pos)
+                    if sphere.IsNull():
+                        logger.warning(f"创建节点 {node_ref} 的球体失败")
+                        continue
                 self.node_shapes.append(sphere)
+                self.node_shape_refs.append(node_ref)
                 # Note: We store the TopoDS_Shape here.
                 # The AIS_Shape will be created in draw_segments.
             except Exception as e:
@@ -603,61 +756,55 @@ class MainWindow(QWidget):
             if args:
                 logger.debug(f"附加参数: {args}")
 
-            if not shape_list:
+            # 中心线模式下图元不参与 AIS 选择，根据点击位置计算拾取
+            picked_shape_id = None
+            if len(args) >= 2:
+                picked_shape_id = self.layer_display.pick(self.viewer._display.View, args[0], args[1])
+
+            if not shape_list and picked_shape_id is None:
                 logger.debug("没有选中任何形状 (shape_list is empty)")
                 # Optionally clear selection/info here if nothing is clicked
                 if self.highlighted_shapes:
-                   self.highlight_shapes(self.highlighted_shapes, False)
-                   self.highlighted_shapes = []
+                   self.highlight_shapes([])
                    self.clear_info()
                 return
 
-            # We usually care about the first selected shape
-            # The object in the list should be a TopoDS_Shape
-            selected_shape = shape_list[0]
-            if not isinstance(selected_shape, TopoDS_Shape) or selected_shape.IsNull():
-                logger.warning(f"选择回调收到的不是有效的 TopoDS_Shape: {type(selected_shape)}")
-                return
-
-            logger.debug(f"选中的 TopoDS_Shape 类型: {self.get_shape_type_name(selected_shape)}")
-
-            # --- Find the shape_id by comparing TopoDS_Shapes ---
-            found_shape_id = None
-            for shape_id, ais_obj in self.ais_shapes.items():
-                try:
-                    # Get the underlying TopoDS_Shape from the AIS_Shape
-                    ais_topo_shape = ais_obj.Shape()
-                    if not ais_topo_shape.IsNull():
-                        # Use IsSame() for robust comparison
-                        if ais_topo_shape.IsSame(selected_shape):
-                            found_shape_id = shape_id
-                            logger.debug(f"找到匹配的形状ID: {found_shape_id} (通过 IsSame 比较)")
-                            break
-                except Exception as e:
-                    logger.warning(f"比较形状 {shape_id} 时出错: {e}")
-                    continue
+            found_shape_id = picked_shape_id
+            if found_shape_id is None:
+                # We usually care about the first selected shape
+                # The object in the list should be a TopoDS_Shape
+                selected_shape = shape_list[0]
+                if not isinstance(selected_shape, TopoDS_Shape) or selected_shape.IsNull():
+                    logger.warning(f"选择回调收到的不是有效的 TopoDS_Shape: {type(selected_shape)}")
+                    return
+
+                logger.debug(f"选中的 TopoDS_Shape 类型: {self.get_shape_type_name(selected_shape)}")
+
+                # --- Find the shape_id by comparing TopoDS_Shapes ---
+                # 分层显示时选中的是复合体中的单个实体
+                found_shape_id = self.layer_display.shape_id(selected_shape)
+                if found_shape_id is None:
+                    # 独立显示的 AIS 对象（线段、节点、导入形状）通过形状索引常数时间查找
+                    found_shape_id = self.shape_index.get(selected_shape)
+                    if found_shape_id is not None:
+                        logger.debug(f"找到匹配的形状ID: {found_shape_id} (通过形状索引)")
+                if found_shape_id is None:
+                    # 导入模型按拾取模式选中的实体、面或边，通过拓扑索引解析为树中的形状ID
+                    found_shape_id = self.cad_display.shape_id(selected_shape)
 
             if found_shape_id is None:
                 logger.debug("未找到与选择形状匹配的ID")
                 self.status_bar.showMessage("已选择形状，但无法在内部映射中找到它")
                  # Optionally clear selection/info here
                 if self.highlighted_shapes:
-                   self.highlight_shapes(self.highlighted_shapes, False)
-                   self.highlighted_shapes = []
+                   self.highlight_shapes([])
                    self.clear_info()
                 return
 
             # --- Process the found shape ---
 
-            # Clear previous highlight BEFORE applying new one
-            if self.highlighted_shapes:
-                # Avoid de-highlighting if clicking the same shape again
-                if self.highlighted_shapes != [found_shape_id]:
-                    self.highlight_shapes(self.highlighted_shapes, False)
-
-            # Highlight the current selection
-            self.highlight_shapes([found_shape_id], True)
-            self.highlighted_shapes = [found_shape_id] # Store the *found* ID
+            # Highlight the current selection (only shapes whose color changes are recolored)
+            self.highlight_shapes([found_shape_id])
 
             # Display info based on the type of ID found
             if isinstance(found_shape_id, str) and found_shape_id.startswith('node_'):
@@ -666,7 +813,7 @@ class MainWindow(QWidget):
                 self.display_link_info(found_shape_id)
             elif isinstance(found_shape_id, str): # Imported STEP/IGES shapes use string IDs
                 logger.info(f"选中了导入的形状: {found_shape_id}")
-                shape_info = self.shape_to_info.get(found_shape_id, {'type': 'Imported Shape'})
+                shape_info = {'type': self.imported_shape_type(found_shape_id)}
                 info_text = f"选中的形状 ID: {found_shape_id}\n"
                 info_text += f"类型: {shape_info.get('type', '未知')}"
                 # Add more details if available in shape_to_info for imported shapes
@@ -691,43 +838,26 @@ class MainWindow(QWidget):
     def find_and_select_tree_item(self, shape_id):
         """根据形状ID查找并选择树中对应的项"""
         try:
-            # Use an iterative approach to avoid deep recursion issues
-            items_to_check = []
-            root = self.tree.invisibleRootItem()
-            for i in range(root.childCount()):
-                items_to_check.append(root.child(i))
-
-            found_item = None
-            while items_to_check:
-                current_item = items_to_check.pop(0) # Process like a queue
-                item_data = current_item.data(0, Qt.UserRole)
-
-                match = False
-                if item_data == shape_id:
-                    match = True
-                elif isinstance(item_data, list) and shape_id in item_data:
-                     # If data is a list, we need to find the specific child
-                     # For now, let's just select the parent group item
-                     match = True # Select the group if the ID is in its list
-
-                if match:
-                    found_item = current_item
-                    break # Found it
-
-                # Add children to the check list
-                for i in range(current_item.childCount()):
-                    items_to_check.append(current_item.child(i))
-
-            if found_item:
+            # 导入形状：先逐级加载它在拓扑层级中的祖先节点
+            if shape_id in self.step_shapes:
+                for ancestor_id in self.step_shapes.path(shape_id):
+                    ancestor = self.tree_model.find_node(ancestor_id)
+                    if ancestor is not None:
+                        self.tree_model.ensure_loaded(ancestor)
+            # 通过模型的 ID 索引定位（必要时只加载包含该 ID 的分组）
+            found_node = self.tree_model.find_node(shape_id)
+
+            if found_node:
                 # Select and expand to the item
-                self.tree.setCurrentItem(found_item)
-                self.tree.scrollToItem(found_item, QTreeWidget.ScrollHint.PositionAtCenter) # Better scrolling
+                found_index = self.tree_model.index_for_node(found_node)
+                self.tree.setCurrentIndex(found_index)
+                self.tree.scrollTo(found_index, QAbstractItemView.PositionAtCenter) # Better scrolling
                 # Ensure all parent items are expanded
-                parent = found_item.parent()
-                while parent and parent != self.tree.invisibleRootItem(): # Check parent is valid
-                    self.tree.expandItem(parent)
+                parent = found_index.parent()
+                while parent.isValid():
+                    self.tree.expand(parent)
                     parent = parent.parent()
-                logger.debug(f"在树中找到并选择了项: {found_item.text(0)} for ID {shape_id}")
+                logger.debug(f"在树中找到并选择了项: {found_node.text} for ID {shape_id}")
             else:
                 logger.debug(f"未找到与形状ID {shape_id} 对应的树项")
         except Exception as e:
@@ -826,6 +956,175 @@ class MainWindow(QWidget):
             logger.error(traceback.format_exc())
             self.status_bar.showMessage(f"显示链接信息时出错: {str(e)}")
 
+    def build_node_index(self, coords=None):
+        """为当前的唯一节点建立空间索引（下标与 'node_i' 一致）"""
+        self.node_index_refs = list(self.unique_nodes)
+        if coords is None:
+            coords = list(self.unique_nodes.values())
+        self.node_index = NodeSpatialIndex(coords)
+
+    def build_node_graph(self, heads=None, tails=None):
+        """
+        建立节点拓扑图（下标与空间索引一致，边权为链接两端节点之间的长度）
+
+        heads / tails 为每条链接起点、终点的节点下标（build_harness 的 origin_index / extremite_index），
+        未给出时由 node_to_links 构建。
+        """
+        if heads is None or tails is None:
+            self.node_graph = graph_from_node_links(self.node_index_refs, self.node_to_links, self.node_index.coords)
+        else:
+            self.node_graph = graph_from_endpoints(heads, tails, self.node_index.coords)
+        self.path_source = None
+
+    def selected_node_number(self):
+        """当前选中的节点在空间索引中的下标；没有选中节点时返回 None"""
+        for shape_id in self.highlighted_shapes[:1]:
+            if isinstance(shape_id, str) and shape_id.startswith('node_'):
+                return int(shape_id.split('_')[1])
+        return None
+
+    def find_nearest_nodes(self):
+        """高亮并列出与选中节点最近的若干个节点"""
+        number = self.selected_node_number()
+        if number is None or self.node_index is None:
+            self.status_bar.showMessage("请先在视图或树中选择一个节点")
+            return
+        k = self.neighbour_count_spin.value()
+        indices, distances = self.node_index.nearest(self.node_index.coords[number], k + 1)
+        found = [(i, d) for i, d in zip(indices[0].tolist(), distances[0].tolist()) if i >= 0 and i != number]
+        self.show_neighbour_nodes(number, found[:k], f"最近的 {k} 个节点")
+
+    def find_nodes_in_radius(self):
+        """高亮并列出选中节点指定半径内的所有节点"""
+        number = self.selected_node_number()
+        if number is None or self.node_index is None:
+            self.status_bar.showMessage("请先在视图或树中选择一个节点")
+            return
+        radius = self.neighbour_radius_spin.value()
+        indices, distances = self.node_index.radius(self.node_index.coords[number], radius)[0]
+        found = [(i, d) for i, d in zip(indices.tolist(), distances.tolist()) if i != number]
+        self.show_neighbour_nodes(number, found, f"半径 {radius:g} 内的节点")
+
+    def build_metrics(self, frame):
+        """由链接表建立线束统计并刷新统计表"""
+        self.harness_metrics = HarnessMetrics(frame, XLSX_METRIC_GROUPS, 'section')
+        self.refresh_metrics_table()
+
+    def refresh_metrics_table(self):
+        """按当前分组显示统计表；隐藏的分组只做增量扣除，不重新统计全部链接"""
+        if self.harness_metrics is None:
+            self.metrics_model.set_frame(None)
+            return
+        self.harness_metrics.set_hidden(self.layer_display.hidden)
+        self.metrics_model.set_frame(self.harness_metrics.table(self.metrics_group_combo.currentText()))
+        # 保持用户点击表头选择的排序
+        header = self.metrics_table.horizontalHeader()
+        self.metrics_model.sort(header.sortIndicatorSection(), header.sortIndicatorOrder())
+
+    def export_metrics_csv(self):
+        """把当前显示的统计表导出为 CSV 文件"""
+        if self.harness_metrics is None:
+            self.status_bar.showMessage("没有可导出的统计数据")
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self, "保存统计表为 CSV 文件", "", "CSV 文件 (*.csv)")
+        if not file_path:
+            logger.info("用户取消了统计表导出")
+            return
+        try:
+            write_metrics_csv(self.metrics_model.frame(), file_path)
+            self.status_bar.showMessage(f"统计表已导出到 {file_path}")
+            logger.info(f"统计表已导出到 {file_path}")
+        except Exception as e:
+            logger.error(f"导出统计表时出错: {str(e)}")
+            logger.error(traceback.format_exc())
+            QMessageBox.critical(self, "导出错误", f"导出统计表时出错: {str(e)}")
+
+    def set_path_source(self):
+        """把当前选中的节点设为最短路径的起点"""
+        number = self.selected_node_number()
+        if number is None or self.node_graph is None:
+            self.status_bar.showMessage("请先在视图或树中选择一个节点")
+            return
+        self.path_source = number
+        self.status_bar.showMessage(f"最短路径起点: {self.node_index_refs[number]}，请选择终点节点后点击“最短路径”")
+
+    def find_shortest_path(self):
+        """高亮起点到当前选中节点之间按长度最短的路径"""
+        number = self.selected_node_number()
+        if number is None or self.node_graph is None:
+            self.status_bar.showMessage("请先在视图或树中选择一个节点")
+            return
+        if self.path_source is None:
+            self.status_bar.showMessage("请先选择起点节点并点击“设为起点”")
+            return
+        source_name = self.node_index_refs[self.path_source]
+        target_name = self.node_index_refs[number]
+        started = time.perf_counter()
+        result = self.node_graph.shortest_path(self.path_source, number)
+        elapsed = (time.perf_counter() - started) * 1000
+        if result is None:
+            self.status_bar.showMessage(f"{source_name} 与 {target_name} 不连通")
+            logger.info(f"最短路径查询 {source_name} -> {target_name}: 不连通 ({elapsed:.1f} ms)")
+            return
+        nodes, links, length = result
+        lines = [f"最短路径 {source_name} -> {target_name}: {len(links)} 条链接，总长度 {length:.2f}"]
+        lines += [f"- {self.node_index_refs[i]}" for i in nodes[:20]]
+        if len(nodes) > 20:
+            lines.append(f"... 以及其他 {len(nodes) - 20} 个节点")
+        self.show_graph_result(number, nodes, links, lines)
+        logger.info(f"最短路径查询 {source_name} -> {target_name}: {len(links)} 条链接，"
+                    f"长度 {length:.2f} ({elapsed:.1f} ms)")
+
+    def find_k_hop_nodes(self):
+        """高亮选中节点 K 跳以内的节点和它们之间的链接"""
+        number = self.selected_node_number()
+        if number is None or self.node_graph is None:
+            self.status_bar.showMessage("请先在视图或树中选择一个节点")
+            return
+        k = self.hop_count_spin.value()
+        started = time.perf_counter()
+        nodes, hops, links = self.node_graph.k_hop([number], k)
+        elapsed = (time.perf_counter() - started) * 1000
+        lines = [f"{self.node_index_refs[number]} 的 {k} 跳邻域: {len(nodes) - 1} 个节点，{len(links)} 条链接"]
+        lines += [f"- 第 {hop} 跳: {int((hops == hop).sum())} 个节点" for hop in range(1, k + 1)]
+        self.show_graph_result(number, nodes.tolist(), links.tolist(), lines)
+        logger.info(f"K 跳邻域查询 {self.node_index_refs[number]}: k={k}，{len(nodes)} 个节点 ({elapsed:.1f} ms)")
+
+    def find_connected_component(self):
+        """高亮选中节点所在的连通分量"""
+        number = self.selected_node_number()
+        if number is None or self.node_graph is None:
+            self.status_bar.showMessage("请先在视图或树中选择一个节点")
+            return
+        started = time.perf_counter()
+        nodes, links = self.node_graph.component(number)
+        elapsed = (time.perf_counter() - started) * 1000
+        lines = [f"{self.node_index_refs[number]} 所在的连通分量: {len(nodes)} 个节点，{len(links)} 条链接"
+                 f"（全图共 {self.node_graph.component_count()} 个连通分量）"]
+        self.show_graph_result(number, nodes.tolist(), links.tolist(), lines)
+        logger.info(f"连通分量查询 {self.node_index_refs[number]}: {len(nodes)} 个节点 ({elapsed:.1f} ms)")
+
+    def show_graph_result(self, number, nodes, links, lines):
+        """一次性高亮拓扑查询得到的节点和链接（选中节点排在最前，便于继续查询），并在信息区域追加结果"""
+        node_shape_id = f"node_{number}"
+        self.highlight_shapes([node_shape_id] + [f"node_{i}" for i in nodes if i != number] + list(links))
+        self.display_node_info(node_shape_id)
+        self.info_text.append("\n".join(lines))
+        self.status_bar.showMessage(lines[0])
+
+    def show_neighbour_nodes(self, number, found, title):
+        """高亮选中节点及其邻近节点，并在信息区域追加列表（最多列出前 20 个）"""
+        node_shape_id = f"node_{number}"
+        self.highlight_shapes([node_shape_id] + [f"node_{i}" for i, _ in found])
+        self.display_node_info(node_shape_id)
+        lines = [f"{title}: 共 {len(found)} 个"]
+        lines += [f"- {self.node_index_refs[i]} (距离 {d:.2f})" for i, d in found[:20]]
+        if len(found) > 20:
+            lines.append(f"... 以及其他 {len(found) - 20} 个节点")
+        self.info_text.append("\n".join(lines))
+        self.status_bar.showMessage(f"{self.node_index_refs[number]}: {title}共 {len(found)} 个")
+        logger.info(f"邻近节点查询 {self.node_index_refs[number]}: {title}，找到 {len(found)} 个")
+
     def clear_info(self):
         """清除显示的信息"""
         self.info_text.clear()
@@ -840,14 +1139,24 @@ class MainWindow(QWidget):
             self.context.EraseAll(False) # Erase, but don't redraw yet
             self.segment_shapes = []  # Reset TopoDS_Shape list for segments
             self.ais_shapes = {}  # Clear AIS shape dictionary
+            self.shape_index.clear()
+            self.shape_layers.clear()
+            self.centerline_display.clear()
+            self.cad_display.clear()
             self.highlighted_shapes = []  # Clear highlight list
-
-            # Create node TopoDS_Shapes first (if not already done)
-            if not self.node_shapes and self.unique_nodes:
+            self.highlight_state.clear()
+            # 分层模式下每个 Section 只创建一个显示对象；中心线模式不创建实体
+            display_mode = self.display_mode_combo.currentText()
+            centerline = display_mode == DISPLAY_MODE_CENTERLINE
+            layered = display_mode == DISPLAY_MODE_LAYERED or centerline
+            self.layer_display = self.centerline_display if centerline else self.shape_layers
+
+            # Create node TopoDS_Shapes first (if not already done); 中心线模式只需要节点坐标，不创建球体
+            if not centerline and not self.node_shapes and self.unique_nodes:
                  self.create_node_shapes()
 
             # Determine total shapes for progress
-            total_shapes_to_draw = len(self.segments) + len(self.node_shapes)
+            total_shapes_to_draw = len(self.segments) + (len(self.unique_nodes) if centerline else len(self.node_shapes))
             if total_shapes_to_draw == 0:
                  logger.info("没有线段或节点可绘制")
                  self.viewer._display.Repaint()
@@ -864,80 +1173,61 @@ class MainWindow(QWidget):
             shape_counter = 0
 
             # Create and display nodes (Spheres)
-            # Map node ref to its index in self.node_shapes
-            node_ref_list = list(self.unique_nodes.keys())
-            for i, sphere_shape in enumerate(self.node_shapes):
-                if progress and progress.wasCanceled(): break
-                try:
-                    # Get the corresponding node_shape_id ('node_i')
-                    node_ref = node_ref_list[i] # Get ref using the index
-                    node_shape_id = self.node_id_map.get(node_ref) # Look up 'node_i' id
-                    if node_shape_id is None:
-                        logger.warning(f"无法找到节点 ref '{node_ref}' 的 shape_id 映射")
-                        node_shape_id = f"node_{i}" # Fallback ID
-
-                    # Create AIS_Shape for the node
-                    ais_sphere = AIS_Shape(sphere_shape)
-                    color = Quantity_Color(Quantity_NOC_RED)
-                    self.context.SetColor(ais_sphere, color, False)
-                    self.context.Display(ais_sphere, False) # Display without immediate update
-
-                    # Store AIS object with its shape_id
-                    self.ais_shapes[node_shape_id] = ais_sphere
-
+            if centerline:
+                # 中心线模式：节点直接作为点图元加入节点图层，按批次汇报进度
+                for node_shape_id, node_pos in self.centerline_node_points():
+                    if progress and progress.wasCanceled(): break
+                    self.layer_display.add_point(NODE_LAYER, node_shape_id, node_pos)
                     shape_counter += 1
-                    if progress: progress.setValue(shape_counter)
-                    QCoreApplication.processEvents()
+                    if progress and shape_counter % 500 == 0:
+                        progress.setValue(shape_counter)
+                        QCoreApplication.processEvents()
+            else:
+                # Map node ref to its index in self.node_shapes
+                node_ref_list = self.node_shape_refs
+                for i, sphere_shape in enumerate(self.node_shapes):
+                    if progress and progress.wasCanceled(): break
+                    try:
+                        # Get the corresponding node_shape_id ('node_i')
+                        node_ref = node_ref_list[i] # Get ref using the index
+                        node_shape_id = self.node_id_map.get(node_ref) # Look up 'node_i' id
+                        if node_shape_id is None:
+                            logger.warning(f"无法找到节点 ref '{node_ref}' 的 shape_id 映射")
+                            node_shape_id = f"node_{i}" # Fallback ID
 
-                except Exception as e:
-                    logger.error(f"显示节点 {i} (Ref: {node_ref}) 时出错: {str(e)}")
-                    continue
+                        self.display_node(node_shape_id, node_ref, sphere_shape, display_mode)
+
+                        shape_counter += 1
+                        if progress: progress.setValue(shape_counter)
+                        QCoreApplication.processEvents()
+
+                    except Exception as e:
+                        logger.error(f"显示节点 {i} (Ref: {node_ref}) 时出错: {str(e)}")
+                        continue
 
             if progress and progress.wasCanceled():
                  logger.info("用户取消了绘制操作")
+                 if layered:
+                     self.layer_display.build(Quantity_Color(Quantity_NOC_BLUE),
+                                              {NODE_LAYER: Quantity_Color(Quantity_NOC_RED)})
                  self.context.UpdateCurrentViewer() # Update viewer with what was drawn
                  return
 
             # Create and display segments (Cylinders)
             self.segment_shapes = [] # Rebuild segment TopoDS list
-            for i, (start, end) in enumerate(self.segments):
+            for i in range(len(self.segments)):
                 if progress and progress.wasCanceled(): break
                 try:
-                    start_pnt = gp_Pnt(*start)
-                    end_pnt = gp_Pnt(*end)
-                    height = start_pnt.Distance(end_pnt)
-                    # Handle zero-length segments gracefully
-                    if height < 1e-6: # Use a small tolerance
-                         logger.warning(f"线段 {i} 长度接近零，跳过绘制圆柱体")
-                         # Optionally draw a small sphere or point instead
-                         continue
-
-                    radius = 30.0 # Cylinder radius
-
-                    # Calculate direction, handle potential zero vector if points coincide (already checked by height)
-                    vec = gp_Vec(start_pnt, end_pnt)
-                    if vec.Magnitude() < 1e-6: continue # Double check
-                    direction = gp_Dir(vec)
-                    axis = gp_Ax2(start_pnt, direction)
-
-                    # Create cylinder
-                    cylinder = BRepPrimAPI_MakeCylinder(axis, radius, height).Shape()
-                    if cylinder.IsNull():
-                        logger.warning(f"创建线段 {i} 的圆柱体失败")
+                    if not self.display_link(i, display_mode):
                         continue
 
-                    self.segment_shapes.append(cylinder) # Store TopoDS_Shape
-
-                    # Create AIS_Shape for the segment
-                    ais_cylinder = AIS_Shape(cylinder)
-                    color = Quantity_Color(Quantity_NOC_BLUE)
-                    self.context.SetColor(ais_cylinder, color, False)
-                    self.context.Display(ais_cylinder, False) # Display without immediate update
-
-                    # Store AIS object using segment index as shape_id
-                    self.ais_shapes[i] = ais_cylinder
-
                     shape_counter += 1
+                    if centerline:
+                        # 中心线模式只记录端点，按批次汇报进度
+                        if progress and shape_counter % 500 == 0:
+                            progress.setValue(shape_counter)
+                            QCoreApplication.processEvents()
+                        continue
                     if progress: progress.setValue(shape_counter)
                     QCoreApplication.processEvents()
 
@@ -946,6 +1236,11 @@ class MainWindow(QWidget):
                     logger.error(traceback.format_exc())
                     continue
 
+            # 分层模式：每个 Section 一个复合体，节点单独一层
+            if layered:
+                self.layer_display.build(Quantity_Color(Quantity_NOC_BLUE),
+                                         {NODE_LAYER: Quantity_Color(Quantity_NOC_RED)})
+
             # Close progress dialog and update viewer once
             if progress:
                 progress.setValue(total_shapes_to_draw)
@@ -956,7 +1251,8 @@ class MainWindow(QWidget):
 
             self.first_draw = False # Mark as drawn
 
-            logger.info(f"完成绘制，线段数量: {len(self.segment_shapes)}，节点数量: {len(self.node_shapes)}")
+            node_count = len(self.unique_nodes) if centerline else len(self.node_shapes)
+            logger.info(f"完成绘制，线段数量: {len(self.segment_shapes)}，节点数量: {node_count}")
         except Exception as e:
             logger.error(f"绘制线段和节点时出错: {str(e)}")
             logger.error(traceback.format_exc())
@@ -966,121 +1262,324 @@ class MainWindow(QWidget):
             self.context.UpdateCurrentViewer()
 
 
-    def draw_imported_shapes(self, show_progress=True):
-        """显示导入的STEP/IGES形状，使用AIS_Shape进行管理。"""
+    def centerline_node_points(self):
+        """中心线模式下节点的 (shape_id, 坐标)，跳过坐标无效的节点（不创建球体）"""
+        for node_ref, node_pos in self.unique_nodes.items():
+            if all(math.isfinite(v) for v in node_pos):
+                yield self.node_id_map[node_ref], node_pos
+
+    def display_node(self, node_shape_id, node_ref, sphere_shape, display_mode):
+        """把一个节点的球体加入显示：分层模式下加入节点图层（build 时才显示），独立形状模式下直接显示"""
+        if display_mode == DISPLAY_MODE_LAYERED:
+            self.layer_display.add(NODE_LAYER, node_shape_id, sphere_shape)
+        else:
+            # Create AIS_Shape for the node
+            ais_sphere = AIS_Shape(sphere_shape)
+            self.context.SetColor(ais_sphere, self.default_colors['node'], False)
+            self.context.Display(ais_sphere, False) # Display without immediate update
+
+            # Store AIS object with its shape_id
+            self.ais_shapes[node_shape_id] = ais_sphere
+            self.shape_index.add(sphere_shape, node_shape_id)
+
+    def display_link(self, i, display_mode, cylinder=None):
+        """
+        把线段 i 加入显示，返回是否加入（坐标无效或长度接近零时跳过）
+
+        cylinder 为已有的圆柱体（重新加载时位置未变的线段直接复用）。
+        """
+        start, end = self.segments[i]
+        # 坐标中包含 NaN（解析失败的单元格）时跳过
+        if not all(math.isfinite(v) for v in (*start, *end)):
+            logger.warning(f"线段 {i} 坐标无效，跳过绘制")
+            return False
+
+        section = self.link_data.get(i, {}).get('section', 'Default')
+        if display_mode == DISPLAY_MODE_CENTERLINE:
+            # 只记录端点，由图层统一生成线段图元数组
+            self.layer_display.add_segment(section, i, start, end)
+            return True
+
+        if cylinder is None:
+            # 圆柱体实例（共享同一长度桶的原型）
+            cylinder = self.primitives.segment_cylinder(start, end, i)
+            if cylinder is None:
+                return False
+
+        self.segment_shapes.append(cylinder) # Store TopoDS_Shape
+
+        if display_mode == DISPLAY_MODE_LAYERED:
+            self.layer_display.add(section, i, cylinder)
+        else:
+            # Create AIS_Shape for the segment
+            ais_cylinder = AIS_Shape(cylinder)
+            self.context.SetColor(ais_cylinder, self.default_colors['segment'], False)
+            self.context.Display(ais_cylinder, False) # Display without immediate update
+
+            # Store AIS object using segment index as shape_id
+            self.ais_shapes[i] = ais_cylinder
+            self.shape_index.add(cylinder, i)
+        return True
+
+    def on_watch_toggled(self, checked):
+        """开启或关闭源文件监视"""
+        if checked and self.source_file:
+            self.source_watcher.watch(self.source_file)
+            self.status_bar.showMessage(f"正在监视源文件: {os.path.basename(self.source_file)}")
+        else:
+            self.source_watcher.stop()
+
+    def reload_source_file(self, file_path=None):
+        """
+        源文件变化后重新加载（见 apply_source_reload）
+
+        解析和更新场景时会处理界面事件，期间再次收到变化只做记录，本次完成后再重新加载一次。
+        """
+        if self.reloading:
+            self.reload_pending = True
+            return
+        self.reloading = True
         try:
-            logger.info(f"开始显示导入的形状，形状数量: {len(self.step_shapes)}")
-            self.context.EraseAll(False)  # 清除现有显示, no update yet
-            self.ais_shapes = {}  # 清空AIS形状字典
-            self.highlighted_shapes = []  # 清空高亮列表
+            self.apply_source_reload(file_path or self.source_file)
+        finally:
+            self.reloading = False
+        if self.reload_pending:
+            self.reload_pending = False
+            QTimer.singleShot(0, self.reload_source_file)
 
-            if not self.step_shapes:
-                 logger.info("没有导入的形状可显示")
-                 self.context.UpdateCurrentViewer()
-                 return
+    def apply_source_reload(self, file_path):
+        """
+        重新解析源文件，并按差异更新场景（见 update_scene）
 
-            progress = None
-            if show_progress:
-                total_shapes = len(self.step_shapes)
-                progress = QProgressDialog("正在显示导入的形状...", "取消", 0, total_shapes, self)
-                progress.setWindowModality(Qt.WindowModal)
-                progress.setMinimumDuration(500)
-                progress.show()
-                QCoreApplication.processEvents()
+        相机保持不变；保留下来的链接和节点即使 shape_id 变化也保持高亮，对应的树项重新选中。
+        """
+        if not file_path:
+            return
+        logger.info(f"重新加载源文件: {file_path}")
+        started = time.perf_counter()
+        try:
+            columns = HarnessCache().load_harness_columns(file_path, read_excel_file)
+        except Exception as e:
+            # 文件可能还没有写完，保持当前模型，下一次变化时再加载
+            logger.error(f"重新读取Excel文件时出错: {str(e)}")
+            logger.error(traceback.format_exc())
+            self.status_bar.showMessage(f"重新加载失败，保持当前模型: {str(e)}")
+            return
 
-            shapes_displayed = 0
-            for i, (shape_id, topo_shape) in enumerate(self.step_shapes.items()):
-                if progress and progress.wasCanceled(): break
-                try:
-                    if topo_shape.IsNull():
-                        logger.warning(f"跳过空的导入形状: {shape_id}")
-                        continue
+        try:
+            old_links = self.link_data
+            old_nodes = {ref: (self.node_id_map[ref], pos) for ref, pos in self.unique_nodes.items()}
+            old_spheres = dict(zip(self.node_shape_refs, self.node_shapes))
+            highlighted = list(self.highlighted_shapes)
+            path_source = self.path_source
+            # 按旧的 shape_id 恢复默认颜色，更新场景之后再按新的 shape_id 高亮
+            self.highlight_state.select([], self.apply_highlight_color)
+            self.highlight_state.clear()
+            self.highlighted_shapes = []
 
-                    # Create AIS_Shape for the imported shape
-                    ais_imported = AIS_Shape(topo_shape)
+            self.parse_columns_and_populate_tree(columns, reload=True)
+            new_nodes = {ref: (self.node_id_map[ref], pos) for ref, pos in self.unique_nodes.items()}
+            diff = diff_harness(old_links, self.link_data, old_nodes, new_nodes)
+            mapping = diff.shape_map()
 
-                    # Set default color (e.g., gray or white for imported base models)
-                    color = Quantity_Color(0.8, 0.8, 0.8, Quantity_TOC_RGB) # Light Gray
-                    self.context.SetColor(ais_imported, color, False)
-                    self.context.Display(ais_imported, False) # Display without immediate update
+            if self.first_draw:
+                self.draw_segments()
+            else:
+                if self.display_mode_combo.currentText() == DISPLAY_MODE_CENTERLINE:
+                    # 中心线模式不需要球体，切换到其他模式时由 draw_segments 创建
+                    self.node_shape_refs = []
+                else:
+                    # 位置未变的节点复用原来的球体
+                    self.create_node_shapes({ref: sphere for ref, sphere in old_spheres.items()
+                                             if old_nodes[ref][0] in diff.node_map})
+                self.update_scene(diff, old_links)
+
+            if path_source is not None:
+                source = mapping.get(f"node_{path_source}")
+                self.path_source = None if source is None else int(source.split('_')[1])
+            highlighted = [mapping[shape_id] for shape_id in highlighted if shape_id in mapping]
+            self.highlight_shapes(highlighted)
+            if highlighted:
+                self.find_and_select_tree_item(highlighted[0])
+                if len(highlighted) == 1:
+                    if isinstance(highlighted[0], int):
+                        self.display_link_info(highlighted[0])
+                    else:
+                        self.display_node_info(highlighted[0])
+            self.refresh_metrics_table()
+
+            elapsed = time.perf_counter() - started
+            logger.info(f"重新加载完成，耗时 {elapsed:.3f}s")
+            message = f"已重新加载 {os.path.basename(file_path)}（{elapsed:.2f}s）: {diff.describe()}"
+            if columns['bad_cells']:
+                message += f"；{len(columns['bad_cells'])} 个坐标单元格无法解析，相应线段未绘制"
+            self.status_bar.showMessage(message)
+        except Exception as e:
+            logger.error(f"重新加载源文件时出错: {str(e)}")
+            logger.error(traceback.format_exc())
+            QMessageBox.warning(self, "重新加载错误", f"重新加载源文件时出现错误: {str(e)}")
 
-                    # Store AIS object
-                    self.ais_shapes[shape_id] = ais_imported
-                    shapes_displayed += 1
+    def update_scene(self, diff, old_links):
+        """
+        按重新加载的差异（harness_diff.HarnessDiff）更新显示，不重建未变化的部分
 
-                    if progress: progress.setValue(i + 1)
-                    QCoreApplication.processEvents()
+        分层和中心线模式下只重建包含新增、删除或改变了 Section 的链接的图层（有节点增删时重建节点图层），
+        其余图层只修改 shape_id，隐藏状态保持不变；独立形状模式下只移除和创建增删的 AIS 对象。
+        """
+        mapping = diff.shape_map()
+        display_mode = self.display_mode_combo.currentText()
+        section_of = lambda links, i: links.get(i, {}).get('section', 'Default')
+
+        if display_mode == DISPLAY_MODE_SHAPES:
+            for shape_id in diff.removed_links + diff.removed_nodes:
+                ais = self.ais_shapes.pop(shape_id, None)
+                if ais is not None:
+                    self.shape_index.remove(ais.Shape())
+                    self.context.Remove(ais, False)
+            self.ais_shapes = {mapping.get(shape_id, shape_id): ais for shape_id, ais in self.ais_shapes.items()}
+            self.shape_index.rekey(mapping)
+            for i in diff.added_links:
+                self.display_link(i, display_mode)
+            spheres = dict(zip(self.node_shape_refs, self.node_shapes))
+            for shape_id in diff.added_nodes:
+                node_ref = self.shape_to_info[shape_id]['ref']
+                if node_ref in spheres:
+                    self.display_node(shape_id, node_ref, spheres[node_ref], display_mode)
+            self.segment_shapes = [self.ais_shapes[i].Shape() for i in range(len(self.segments)) if i in self.ais_shapes]
+            logger.info(f"场景增量更新: 移除 {len(diff.removed_links) + len(diff.removed_nodes)} 个形状，"
+                        f"新增 {len(diff.added_links) + len(diff.added_nodes)} 个形状")
+        else:
+            affected = {section_of(old_links, i) for i in diff.removed_links}
+            affected.update(section_of(self.link_data, i) for i in diff.added_links)
+            previous = {new: old for old, new in diff.link_map.items()}
+            for i in diff.changed_links:
+                old_section, new_section = section_of(old_links, previous[i]), section_of(self.link_data, i)
+                if old_section != new_section:
+                    affected.update((old_section, new_section))
+            if diff.removed_nodes or diff.added_nodes:
+                affected.add(NODE_LAYER)
+            hidden = self.layer_display.hidden & affected
+
+            # 受影响图层中保留下来的线段复用原来的圆柱体
+            cylinders = {}
+            if display_mode == DISPLAY_MODE_LAYERED:
+                cylinders = {new: self.layer_display.shape_of(old) for old, new in diff.link_map.items()
+                             if self.layer_display.layer_of(old) in affected}
+            self.layer_display.remove_layers(affected)
+            self.layer_display.rekey(mapping)
+            for i in range(len(self.segments)):
+                if section_of(self.link_data, i) in affected:
+                    self.display_link(i, display_mode, cylinders.get(i))
+            if NODE_LAYER in affected and display_mode == DISPLAY_MODE_CENTERLINE:
+                for node_shape_id, node_pos in self.centerline_node_points():
+                    self.layer_display.add_point(NODE_LAYER, node_shape_id, node_pos)
+            elif NODE_LAYER in affected:
+                for node_ref, sphere in zip(self.node_shape_refs, self.node_shapes):
+                    self.display_node(self.node_id_map[node_ref], node_ref, sphere, display_mode)
+            self.layer_display.build(self.default_colors['segment'], {NODE_LAYER: self.default_colors['node']})
+            self.layer_display.hide(hidden)
+
+            if display_mode == DISPLAY_MODE_LAYERED:
+                shapes = (self.layer_display.shape_of(i) for i in range(len(self.segments)))
+                self.segment_shapes = [shape for shape in shapes if shape is not None]
+            else:
+                self.segment_shapes = []
+            logger.info(f"场景增量更新: 重建 {len(affected)} 个图层，当前共 {len(self.layer_display.layers)} 个图层")
 
-                except Exception as e:
-                    logger.error(f"无法显示形状 {shape_id}: {e}")
-                    logger.error(traceback.format_exc())
-                    continue
+        self.context.UpdateCurrentViewer()
 
-            # Close progress dialog and update viewer
-            if progress:
-                progress.setValue(len(self.step_shapes))
+    def draw_imported_shapes(self):
+        """显示导入的STEP/IGES模型：每个顶层实体一个 AIS 对象，子形状通过拾取模式选择"""
+        try:
+            logger.info(f"开始显示导入的形状，子形状数量: {len(self.step_shapes)}")
+            self.context.EraseAll(False)  # 清除现有显示, no update yet
+            self.ais_shapes = {}  # 清空AIS形状字典
+            self.shape_index.clear()
+            self.layer_display.clear()
+            self.cad_display.clear()
+            self.highlighted_shapes = []  # 清空高亮列表
+            self.highlight_state.clear()
+
+            if not self.step_shapes:
+                 logger.info("没有导入的形状可显示")
+                 self.context.UpdateCurrentViewer()
+                 return
+
+            self.cad_display.selection_type = CAD_SELECTION_MODES[self.pick_mode_combo.currentText()]
+            object_count = self.cad_display.build(self.step_shapes, self.default_colors['imported'])
 
             self.viewer._display.FitAll()
             self.context.UpdateCurrentViewer() # Update the viewer
 
-            logger.info(f"完成显示，成功显示 {shapes_displayed}/{len(self.step_shapes)} 个形状")
+            logger.info(f"完成显示，{len(self.step_shapes)} 个子形状显示为 {object_count} 个交互对象")
         except Exception as e:
             logger.error(f"显示导入形状时出错: {str(e)}")
             logger.error(traceback.format_exc())
             self.status_bar.showMessage(f"显示形状时出错: {str(e)}")
-            if progress: progress.close()
             self.context.UpdateCurrentViewer() # Ensure update on error
 
+    def on_pick_mode_changed(self, mode):
+        """切换导入模型的拾取模式（实体 / 面 / 边）"""
+        self.cad_display.set_selection_type(CAD_SELECTION_MODES[mode])
+        self.status_bar.showMessage(f"拾取模式: {mode}")
+
+
+    def highlight_code(self, shape_id):
+        """高亮颜色编号：节点为绿色 (2)，线段和导入形状为黄色 (1)"""
+        return 2 if isinstance(shape_id, str) and shape_id.startswith('node_') else 1
+
+    def default_color(self, shape_id):
+        """独立显示的 AIS 对象取消高亮后恢复的颜色"""
+        if isinstance(shape_id, str) and shape_id.startswith('node_'):
+            return self.default_colors['node']
+        if isinstance(shape_id, int):
+            return self.default_colors['segment']
+        return self.default_colors['imported']
+
+    def apply_highlight_color(self, shape_id, color):
+        """设置单个形状的颜色（color 为 None 时恢复默认颜色），不刷新视图"""
+        if shape_id in self.layer_display:
+            # 分层显示：只修改复合体中该形状的颜色，最后每个图层重新显示一次
+            if color is None:
+                self.layer_display.reset_color(shape_id)
+            else:
+                self.layer_display.set_color(shape_id, color)
+        elif shape_id in self.cad_display:
+            # 导入模型：只修改所属顶层对象中该子形状的颜色
+            if color is None:
+                self.cad_display.reset_color(shape_id)
+            else:
+                self.cad_display.set_color(shape_id, color)
+        elif shape_id in self.ais_shapes:
+            if color is None:
+                color = self.default_color(shape_id)
+            try:
+                self.context.SetColor(self.ais_shapes[shape_id], color, False)
+            except Exception as e:
+                logger.error(f"设置形状 {shape_id} 的高亮/颜色时出错: {e}")
+        else:
+            logger.warning(f"尝试高亮/取消高亮时找不到 shape_id: {shape_id}")
 
-    def highlight_shapes(self, shape_ids, highlight=True):
-        """高亮显示或取消高亮指定的形状 (Optimized)."""
+    def highlight_shapes(self, shape_ids):
+        """
+        把高亮集合设置为 shape_ids（空列表为取消全部高亮）
+
+        与上一次的选择做差集，只重新着色颜色有变化的形状，最后只刷新一次视图。
+        """
         try:
             if not isinstance(shape_ids, list):
                 shape_ids = [shape_ids]
 
-            logger.debug(f"{'高亮' if highlight else '取消高亮'} {len(shape_ids)} 个形状: {shape_ids[:5]}...") # Log first few
-
-            needs_update = False
-            for shape_id in shape_ids:
-                if shape_id in self.ais_shapes:
-                    ais_obj = self.ais_shapes[shape_id]
-                    try:
-                        if highlight:
-                            # Use context's highlight/selection methods for better visual distinction
-                            # self.context.ClearSelected(False) # Clear previous interactive selections if needed
-                            # self.context.AddOrRemoveSelected(ais_obj, True) # Select the object
-                            # Use color for now as selection might interfere with callbacks
-                            if isinstance(shape_id, str) and shape_id.startswith('node_'):
-                                                                               color = Quantity_Color(Quantity_NOC_GREEN)
-                            else: # Segments or imported shapes
-                                color = Quantity_Color(Quantity_NOC_YELLOW)
-                            self.context.SetColor(ais_obj, color, False)
-                        else:
-                            # Restore default color
-                            # self.context.RemoveSelected(ais_obj, False) # Deselect if using selection
-                            if isinstance(shape_id, str) and shape_id.startswith('node_'):
-                                color = Quantity_Color(Quantity_NOC_RED) # Default node color
-                            elif isinstance(shape_id, int): # Segment
-                                color = Quantity_Color(Quantity_NOC_BLUE) # Default segment color
-                            else: # Imported shape
-                                color = Quantity_Color(0.8, 0.8, 0.8, Quantity_TOC_RGB) # Default imported color
-                            self.context.SetColor(ais_obj, color, False)
-
-                        needs_update = True # Mark that viewer needs update
-                    except Exception as e:
-                        logger.error(f"设置形状 {shape_id} 的高亮/颜色时出错: {e}")
-                        continue
-                else:
-                    logger.warning(f"尝试高亮/取消高亮时找不到 shape_id: {shape_id}")
-
+            changed = self.highlight_state.select(shape_ids, self.apply_highlight_color)
+            self.highlighted_shapes = list(shape_ids)
+            logger.debug(f"高亮 {len(shape_ids)} 个形状，重新着色 {changed} 个")
 
             # Update the viewer only once after processing all IDs if changes were made
-            if needs_update:
+            redisplayed = self.layer_display.redisplay_changed()
+            redisplayed = self.cad_display.redisplay_changed() or redisplayed
+            if redisplayed or changed:
                 try:
-                    # Update only the presentation without recomputing structure
                     self.context.UpdateCurrentViewer()
-                    # For color changes, sometimes redisplay might be needed if Update doesn't work
-                    # self.context.Redisplay(ais_obj, True) # Do this inside the loop if UpdateCurrentViewer isn't enough
                 except Exception as e:
                     logger.error(f"更新查看器以应用高亮时出错: {e}")
 
@@ -1088,20 +1587,18 @@ class MainWindow(QWidget):
             logger.error(f"高亮形状时出错: {str(e)}")
             logger.error(traceback.format_exc())
 
-
-    def on_tree_item_clicked(self, item, column):
-        """Handle tree item clicks to highlight shapes."""
+    def on_tree_item_clicked(self, item):
+        """Handle tree item clicks (QModelIndex) to highlight shapes."""
         try:
-            shape_data = item.data(0, Qt.UserRole)
+            shape_data = item.data(Qt.UserRole)
 
-            logger.debug(f"点击了树项: {item.text(0)}, 数据: {shape_data}")
+            logger.debug(f"点击了树项: {item.data(Qt.DisplayRole)}, 数据: {shape_data}")
 
             if shape_data is None:
                 logger.debug("树项没有关联的形状数据")
                 # Option: Clear selection if clicking an item with no data
                 if self.highlighted_shapes:
-                    self.highlight_shapes(self.highlighted_shapes, False)
-                    self.highlighted_shapes = []
+                    self.highlight_shapes([])
                     self.clear_info()
                 return
 
@@ -1112,13 +1609,13 @@ class MainWindow(QWidget):
                 ids_to_highlight.append(shape_data)
 
             # Filter out invalid IDs before proceeding
-            valid_ids_to_highlight = [sid for sid in ids_to_highlight if sid in self.ais_shapes]
+            valid_ids_to_highlight = [sid for sid in ids_to_highlight
+                                      if sid in self.ais_shapes or sid in self.layer_display or sid in self.cad_display]
             if not valid_ids_to_highlight:
                  logger.debug(f"树项关联的ID {ids_to_highlight} 在ais_shapes中均未找到")
                  # Clear previous selection if clicking something non-highlightable
                  if self.highlighted_shapes:
-                    self.highlight_shapes(self.highlighted_shapes, False)
-                    self.highlighted_shapes = []
+                    self.highlight_shapes([])
                     self.clear_info()
                  return
 
@@ -1127,19 +1624,13 @@ class MainWindow(QWidget):
             # If clicking the same item/group, deselect
             if self.selected_item == item:
                  logger.debug("再次点击同一项目，取消高亮")
-                 self.highlight_shapes(self.highlighted_shapes, False)
-                 self.highlighted_shapes = []
+                 self.highlight_shapes([])
                  self.selected_item = None
                  self.clear_info()
                  self.tree.clearSelection() # Visually deselect in tree
             else:
-                # Clear previous highlight
-                if self.highlighted_shapes:
-                    self.highlight_shapes(self.highlighted_shapes, False)
-
-                # Highlight the new selection
-                self.highlight_shapes(valid_ids_to_highlight, True)
-                self.highlighted_shapes = valid_ids_to_highlight
+                # Highlight the new selection (diffed against the previous one)
+                self.highlight_shapes(valid_ids_to_highlight)
                 self.selected_item = item
 
                 # --- Display Info for the first highlighted item ---
@@ -1151,7 +1642,7 @@ class MainWindow(QWidget):
                         self.display_link_info(first_id)
                     elif isinstance(first_id, str): # Imported shape
                          logger.info(f"选中了导入的形状 (从树): {first_id}")
-                         shape_info = self.shape_to_info.get(first_id, {'type': 'Imported Shape'})
+                         shape_info = {'type': self.imported_shape_type(first_id)}
                          info_text = f"选中的形状 ID: {first_id}\n"
                          info_text += f"类型: {shape_info.get('type', '未知')}\n"
                          if len(valid_ids_to_highlight) > 1:
@@ -1175,6 +1666,12 @@ class MainWindow(QWidget):
         try:
             logger.info("正在关闭窗口，清理资源...")
 
+            # 0. 停止后台导入和源文件监视
+            if self.import_worker is not None:
+                self.import_worker.cancel()
+                self.import_worker.wait()
+            self.source_watcher.stop()
+
             # 1. 清除所有显示的图形 from context
             if hasattr(self, 'context') and self.context:
                 try:
@@ -1233,6 +1730,8 @@ class MainWindow(QWidget):
             self.import_step()
         elif file_format == "IGES":
             self.import_iges()
+        elif file_format == STEP_STRUCTURE_FORMAT:
+            self.import_step_structure()
         else:
             logger.warning(f"不支持的文件格式: {file_format}")
             QMessageBox.warning(self, "格式错误", f"不支持的文件格式: {file_format}")
@@ -1241,6 +1740,12 @@ class MainWindow(QWidget):
         """根据选择的格式导出文件"""
         file_format = self.export_format_combo.currentText()
         logger.info(f"用户选择导出文件格式: {file_format}")
+        if file_format in (CENTERLINE_STEP_FORMAT, CENTERLINE_IGES_FORMAT):
+            self.export_centerline(file_format)
+            return
+        if file_format in (MESH_GLTF_FORMAT, MESH_STL_FORMAT):
+            self.export_mesh(file_format)
+            return
 
         # Determine what to export
         shapes_to_export = []
@@ -1283,6 +1788,93 @@ class MainWindow(QWidget):
             logger.warning(f"不支持的文件格式: {file_format}")
             QMessageBox.warning(self, "格式错误", f"不支持的文件格式: {file_format}")
 
+    def export_centerline(self, file_format):
+        """把线束导出为中心线：每条链接一条直线边，节点为顶点，按 section 分组为复合体"""
+        if not self.link_data:
+            logger.warning("没有可导出的线束数据")
+            QMessageBox.information(self, "无内容", "中心线导出需要先加载线束数据。")
+            return
+
+        is_step = file_format == CENTERLINE_STEP_FORMAT
+        if is_step:
+            file_path, _ = QFileDialog.getSaveFileName(self, "保存中心线为 STEP 文件", "", "STEP 文件 (*.step *.stp)")
+        else:
+            file_path, _ = QFileDialog.getSaveFileName(self, "保存中心线为 IGES 文件", "", "IGES 文件 (*.igs *.iges)")
+        if not file_path:
+            logger.info("用户取消了中心线导出")
+            return
+
+        logger.info(f"导出 {len(self.link_data)} 条链接的中心线到: {file_path}")
+        progress = QProgressDialog("正在构建中心线...", "取消", 0, len(self.link_data), self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+        progress.show()
+        QCoreApplication.processEvents()
+
+        def report_progress(done, total):
+            progress.setValue(done)
+            QCoreApplication.processEvents()
+            return not progress.wasCanceled()
+
+        try:
+            result = build_centerline_document(self.link_data, "section", progress_callback=report_progress)
+            if result is None:
+                progress.close()
+                return
+            doc, edge_count, vertex_count = result
+
+            progress.setLabelText("正在写入文件...")
+            QCoreApplication.processEvents()
+            ok = write_centerline_step(doc, file_path) if is_step else write_centerline_iges(doc, file_path)
+            progress.close()
+
+            if ok:
+                logger.info(f"中心线导出成功: {file_path}")
+                self.show_success_message(f"已导出 {edge_count} 条中心线和 {vertex_count} 个节点到 {file_path}")
+            else:
+                logger.error(f"中心线导出失败: {file_path}")
+                QMessageBox.warning(self, "导出失败", "导出中心线过程中出现错误，请检查日志。")
+        except Exception as e:
+            progress.close()
+            logger.error(f"导出中心线时发生异常: {e}")
+            logger.error(traceback.format_exc())
+            QMessageBox.critical(self, "导出错误", f"导出过程中出现异常: {str(e)}")
+
+    def export_mesh(self, file_format):
+        """把线束的线段和节点直接生成三角网格，导出为二进制 glTF 或 STL（不经过 B-rep 和 OCCT 三角剖分）"""
+        if not self.segments and not self.unique_nodes:
+            logger.warning("没有可导出的线束数据")
+            QMessageBox.information(self, "无内容", "网格导出需要先加载线束数据。")
+            return
+
+        if file_format == MESH_GLTF_FORMAT:
+            file_path, _ = QFileDialog.getSaveFileName(self, "保存网格为 glTF 文件", "", "glTF 二进制文件 (*.glb)")
+        else:
+            file_path, _ = QFileDialog.getSaveFileName(self, "保存网格为 STL 文件", "", "STL 文件 (*.stl)")
+        if not file_path:
+            logger.info("用户取消了网格导出")
+            return
+
+        try:
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            try:
+                starts, ends = segment_arrays(self.segments)
+                meshes = harness_meshes(starts, ends, list(self.unique_nodes.values()),
+                                        self.primitives.cylinder_radius, self.primitives.sphere_radius)
+                if file_format == MESH_GLTF_FORMAT:
+                    write_glb(file_path, meshes, {"segments": (0.0, 0.0, 1.0), "nodes": (1.0, 0.0, 0.0)})
+                else:
+                    write_stl(file_path, list(meshes.values()))
+            finally:
+                QApplication.restoreOverrideCursor()
+            triangles = sum(len(mesh) for mesh in meshes.values())
+            logger.info(f"网格导出成功: {file_path}")
+            self.show_success_message(f"已导出 {triangles} 个三角形到 {file_path}")
+        except Exception as e:
+            logger.error(f"导出网格时发生异常: {e}")
+            logger.error(traceback.format_exc())
+            QMessageBox.critical(self, "导出错误", f"导出过程中出现异常: {str(e)}")
+
     def export_to_step(self, shapes, description):
         """导出提供的形状列表为 STEP 文件"""
         try:
@@ -1460,305 +2052,329 @@ class MainWindow(QWidget):
 
 
     def import_step(self):
-        """导入STEP文件并解析"""
-        file_path, _ = QFileDialog.getOpenFileName(self, "选择 STEP 文件", "", "STEP 文件 (*.step *.stp)")
-        if not file_path:
+        """导入一个或多个STEP文件并合并到同一场景"""
+        file_paths, _ = QFileDialog.getOpenFileNames(self, "选择 STEP 文件", "", "STEP 文件 (*.step *.stp)")
+        if not file_paths:
             logger.info("用户取消了STEP导入")
             return
 
-        logger.info(f"选择导入STEP文件: {file_path}")
-        self.import_cad_file(file_path, "STEP")
+        logger.info(f"选择导入{len(file_paths)}个STEP文件: {file_paths}")
+        self.import_cad_files([(file_path, "STEP") for file_path in file_paths])
 
     def import_iges(self):
-        """导入IGES文件并解析"""
-        file_path, _ = QFileDialog.getOpenFileName(self, "选择 IGES 文件", "", "IGES 文件 (*.iges *.igs)")
-        if not file_path:
+        """导入一个或多个IGES文件并合并到同一场景"""
+        file_paths, _ = QFileDialog.getOpenFileNames(self, "选择 IGES 文件", "", "IGES 文件 (*.iges *.igs)")
+        if not file_paths:
             logger.info("用户取消了IGES导入")
             return
 
-        logger.info(f"选择导入IGES文件: {file_path}")
-        self.import_cad_file(file_path, "IGES")
-
-    def import_cad_file(self, file_path, file_format):
-        """通用CAD文件导入函数"""
-        logger.info(f"开始导入 {file_format} 文件: {file_path}")
-        progress = QProgressDialog(f"正在导入 {file_format} 文件...", "取消", 0, 100, self)
-        progress.setWindowModality(Qt.WindowModal)
-        progress.setMinimumDuration(500)
-        progress.show()
-        progress.setValue(5)
-        QCoreApplication.processEvents()
-
-        try:
-            # --- Clear existing data ---
-            logger.info("清除现有数据...")
-            self.tree.clear()
-            self.segment_shapes = []
-            self.segments = []
-            self.node_shapes = []
-            self.unique_nodes = {}
-            self.node_id_map = {}
-            self.link_data = {}
-            self.node_to_links = {}
-            self.shape_to_info = {}
-            self.step_shapes = {} # Clear previously imported shapes
-            self.ais_shapes = {}  # Clear AIS objects
-            self.highlighted_shapes = []
-            self.main_shape = None
-            self.context.EraseAll(True) # Erase and update viewer
-            logger.info("现有数据清除完毕")
-            progress.setValue(10)
-            QCoreApplication.processEvents()
-
-            # --- Read File ---
-            logger.info(f"使用 {file_format} reader 读取文件...")
-            if file_format == "STEP":
-                reader = STEPControl_Reader()
-            elif file_format == "IGES":
-                reader = IGESControl_Reader()
-            else:
-                raise ValueError(f"不支持的文件格式: {file_format}")
+        logger.info(f"选择导入{len(file_paths)}个IGES文件: {file_paths}")
+        self.import_cad_files([(file_path, "IGES") for file_path in file_paths])
 
-            read_status = reader.ReadFile(file_path)
-            logger.info(f"ReadFile status: {read_status}")
-            progress.setValue(40)
-            QCoreApplication.processEvents()
-            if progress.wasCanceled(): raise InterruptedError("用户取消导入")
-
-            if read_status != IFSelect_RetDone:
-                # Try to get more error info if possible (might not always work)
-                fail_messages = reader.FailMessage()
-                error_msg = f"读取{file_format}文件失败 (状态: {read_status})"
-                if fail_messages:
-                     error_msg += f"\n错误信息:\n{fail_messages}"
-                     logger.error(f"{error_msg}")
-                else:
-                    logger.error(error_msg)
-                raise RuntimeError(error_msg)
-
-
-            # --- Transfer Roots ---
-            logger.info("转换文件根...")
-            # Check number of roots before transferring
-            num_roots = reader.NbRootsForTransfer()
-            logger.info(f"文件中根的数量: {num_roots}")
-            if num_roots == 0:
-                 raise RuntimeError(f"{file_format} 文件中没有找到可转换的根。文件可能为空或格式无效。")
-
-            transfer_ok = reader.TransferRoots()
-            logger.info(f"TransferRoots status: {transfer_ok}")
-            progress.setValue(60)
-            QCoreApplication.processEvents()
-            if progress.wasCanceled(): raise InterruptedError("用户取消导入")
-            if not transfer_ok:
-                raise RuntimeError(f"转换{file_format}文件根失败。")
-
-            # --- Get Shape ---
-            logger.info("获取主形状...")
-            # Check number of resulting shapes
-            num_shapes = reader.NbShapes()
-            logger.info(f"转换后的形状数量: {num_shapes}")
-            if num_shapes == 0:
-                raise RuntimeError(f"转换{file_format}文件后未生成任何形状。")
-            elif num_shapes == 1:
-                logger.info("获取单个主形状...")
-                shape = reader.Shape(1) # Get the first shape
-            else:
-                # If multiple shapes result, create a compound
-                logger.info(f"获取 {num_shapes} 个形状并创建复合体...")
-                shape = TopoDS_Compound()
-                builder = BRep_Builder()
-                builder.MakeCompound(shape)
-                for i in range(1, num_shapes + 1):
-                    sub_shape = reader.Shape(i)
-                    if sub_shape and not sub_shape.IsNull():
-                        builder.Add(shape, sub_shape)
-                    else:
-                        logger.warning(f"跳过转换结果中的空形状索引 {i}")
-
-
-            if shape.IsNull():
-                raise RuntimeError(f"从{file_format}文件获取的最终形状为空。")
+    def import_cad_files(self, files):
+        """
+        在后台并行导入一个或多个STEP/IGES文件 [(file_path, file_format), ...]
 
-            self.main_shape = shape # Store the main (possibly compound) shape
-            logger.info(f"主形状类型: {self.get_shape_type_name(self.main_shape)}")
-            progress.setValue(70)
-            QCoreApplication.processEvents()
-            if progress.wasCanceled(): raise InterruptedError("用户取消导入")
+        每个文件在单独的进程中读取，全部完成后合并到同一场景，每个文件一个树分支；
+        导入完成之前当前模型保持可见、可交互。
+        """
+        if self.import_worker is not None:
+            QMessageBox.information(self, "导入进行中", "已有文件正在导入，请等待完成或取消后再试。")
+            return
 
-            # --- Analyze and Build Tree ---
-            logger.info("分析形状并构建树...")
-            file_basename = os.path.basename(file_path)
-            root = QTreeWidgetItem(self.tree)
-            root.setText(0, f"{file_format} Model: {file_basename}")
+        logger.info(f"开始导入 {len(files)} 个CAD文件: {[file_path for file_path, _ in files]}")
+        progress = self.create_import_progress(f"正在导入 {len(files)} 个CAD文件...")
+        progress.setValue(5)
 
-            # Pass progress to allow cancellation during analysis
-            self.analyze_shape_and_build_tree(self.main_shape, root, progress)
-            if progress.wasCanceled(): raise InterruptedError("用户取消导入")
+        # 导入时按所选精度预先剖分，显示时不再计算三角剖分
+        deflection = MESH_PRESETS[self.mesh_preset_combo.currentText()]
+        worker = CadImportWorker(files, deflection=deflection, cache=self.shape_cache, parent=self)
+        worker.progress.connect(self.on_import_progress)
+        worker.shape_loaded.connect(self.on_import_shape_loaded)
+        worker.topology_ready.connect(self.on_import_topology)
+        worker.file_failed.connect(self.on_import_file_failed)
+        worker.completed.connect(self.on_import_completed)
+        worker.failed.connect(self.on_import_failed)
+        worker.cancelled.connect(self.on_import_cancelled)
+        worker.finished.connect(self.on_import_finished)
+        progress.canceled.connect(worker.cancel)
+
+        self.import_worker = worker
+        self.import_progress = progress
+        self.import_topologies = {}
+        self.status_bar.showMessage(f"正在后台导入 {len(files)} 个CAD文件（{worker.max_workers} 个进程）")
+        worker.start()
+
+    def create_import_progress(self, text):
+        """后台导入/转换使用的非模态进度对话框"""
+        progress = QProgressDialog(text, "取消", 0, 100, self)
+        progress.setWindowModality(Qt.NonModal)  # 不阻塞主窗口
+        progress.setMinimumDuration(500)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+        return progress
+
+    def clear_model_for_import(self):
+        """导入新模型之前清除当前的线束数据、导入形状和显示"""
+        logger.info("清除现有数据...")
+        # 线束数据被导入的模型替换，不再监视原来的 Excel 文件
+        self.watch_check.setChecked(False)
+        self.watch_check.setEnabled(False)
+        self.source_file = None
+        self.tree_model.clear()
+        self.selected_item = None
+        self.segment_shapes = []
+        self.segments = []
+        self.node_shapes = []
+        self.unique_nodes = {}
+        self.node_id_map = {}
+        self.node_index = None
+        self.node_index_refs = []
+        self.node_graph = None
+        self.path_source = None
+        self.harness_metrics = None
+        self.metrics_model.set_frame(None)
+        self.link_data = {}
+        self.node_to_links = {}
+        self.shape_to_info = {}
+        self.step_shapes = TopologyBrowser(on_evict=self.on_topology_evicted)
+        self.step_structure = None
+        self.main_shape = None
+        self.ais_shapes = {}  # Clear AIS objects
+        self.shape_index.clear()
+        self.layer_display.clear()
+        self.cad_display.clear()
+        self.highlighted_shapes = []
+        self.highlight_state.clear()
+        self.context.EraseAll(False)
+
+    def on_import_progress(self, value, text):
+        if self.import_progress is not None:
+            self.import_progress.setLabelText(text)
+            self.import_progress.setValue(value)
+
+    def on_import_topology(self, index, topology):
+        """按文件暂存后台建立的拓扑索引，导入完成后一次性替换当前模型"""
+        self.import_topologies[index] = topology
+
+    def on_import_shape_loaded(self, index, shape):
+        file_basename = os.path.basename(self.import_worker.files[index][0])
+        logger.info(f"{file_basename} 转换完成，主形状类型: {self.get_shape_type_name(shape)}")
+        self.status_bar.showMessage(f"{file_basename} 转换完成，正在分析形状结构...")
+
+    def on_import_file_failed(self, index, message):
+        self.status_bar.showMessage(f"{os.path.basename(self.import_worker.files[index][0])} 导入失败: {message}")
+
+    def on_import_completed(self, shapes):
+        """后台导入完成：用所有成功导入的文件替换当前模型，每个文件一个树分支"""
+        worker = self.import_worker
+        indices = sorted(shapes)
+        self.close_import_progress()
+        try:
+            self.clear_model_for_import()
+            # Store the main shape (a compound of all files when several were imported)
+            self.main_shape = merge_shapes(shapes[index] for index in indices)
 
-            self.tree.expandItem(root)
-            progress.setValue(90)
-            QCoreApplication.processEvents()
+            # --- Build Tree: one branch per file, sub-shapes are enumerated on expand ---
+            for index in indices:
+                file_path, file_format = worker.files[index]
+                self.step_shapes.add(self.import_topologies[index])
+                root = self.populate_imported_tree(index, f"{file_format} Model: {os.path.basename(file_path)}")
+                self.tree.expand(self.tree_model.index_for_node(root))
 
             # --- Draw Imported Shapes ---
             logger.info("绘制导入的形状...")
             self.first_draw = True # Ensure progress bar shows for drawing
-            self.draw_imported_shapes(show_progress=True) # Pass progress? No, draw has its own
-            if progress.wasCanceled(): raise InterruptedError("用户取消导入") # Check again after drawing
-
-            progress.setValue(100)
+            self.draw_imported_shapes()
 
             total_elements = len(self.step_shapes) # Count individual shapes stored
-            logger.info(f"{file_format}文件导入成功，包含 {total_elements} 个子元素")
-            self.show_success_message(f"已成功导入 {file_format} 文件 ({file_basename})，包含 {total_elements} 个元素。")
-
-        except InterruptedError:
-             logger.warning(f"用户取消了 {file_format} 导入")
-             progress.close()
-             # Clean up potentially partially loaded state
-             self.tree.clear()
-             self.context.EraseAll(True)
-             self.status_bar.showMessage(f"{file_format} 导入已取消")
+            logger.info(f"{len(indices)} 个CAD文件导入成功，包含 {total_elements} 个子元素")
+            if worker.errors:
+                QMessageBox.warning(self, "部分文件导入失败", "以下文件未能导入:\n" + "\n".join(worker.errors.values()))
+            self.show_success_message(f"已成功导入 {len(indices)} 个CAD文件，包含 {total_elements} 个元素。")
         except Exception as e:
-            progress.close()
-            logger.error(f"导入{file_format}文件时发生异常: {e}")
+            logger.error(f"显示导入的CAD文件时发生异常: {e}")
             logger.error(traceback.format_exc())
-            QMessageBox.critical(self, "导入错误", f"导入 {file_path} 时出现异常:\n\n{str(e)}\n\n请查看日志获取详细信息。")
-            # Clean up
-            self.tree.clear()
+            QMessageBox.critical(self, "导入错误", f"显示导入的CAD文件时出现异常:\n\n{str(e)}\n\n请查看日志获取详细信息。")
+            self.tree_model.clear()
             self.context.EraseAll(True)
 
+    def on_import_failed(self, message):
+        """后台导入失败：当前模型保持不变"""
+        worker = self.import_worker
+        self.close_import_progress()
+        QMessageBox.critical(self, "导入错误", f"导入 {len(worker.files)} 个CAD文件时出现异常:\n\n{message}\n\n请查看日志获取详细信息。")
+        self.status_bar.showMessage("CAD 文件导入失败")
+
+    def on_import_cancelled(self):
+        self.close_import_progress()
+        self.status_bar.showMessage("CAD 文件导入已取消")
+
+    def on_import_finished(self):
+        """工作线程结束（成功、失败或取消）后释放它"""
+        worker, self.import_worker = self.import_worker, None
+        self.import_topologies = {}
+        self.close_import_progress()
+        if worker is not None:
+            worker.deleteLater()
+
+    def close_import_progress(self):
+        if self.import_progress is not None:
+            self.import_progress.canceled.disconnect()
+            self.import_progress.close()
+            self.import_progress.deleteLater()
+            self.import_progress = None
+
+    def populate_imported_tree(self, file_index, title, parent=None):
+        """添加一个导入文件的树分支并返回其根节点；第一级在展开时创建，更深的层级在展开时才枚举"""
+        top_level = self.step_shapes.top_level(file_index)
+        # 分支根节点的数据为第一级形状的ID列表（点击时高亮整个文件）
+        root = self.tree_model.add_node(
+            parent, title, [shape_id for shape_id, _ in top_level], lambda node: self.topology_nodes(top_level))
+        logger.info(f"文件 {file_index} 的形状树第一级有 {len(top_level)} 个形状，"
+                    f"共 {self.step_shapes.topologies[file_index].count()} 个子形状")
+        return root
+
+    def topology_nodes(self, children):
+        """为子形状 [(ID, 形状), ...] 创建树节点，非叶子节点在展开时枚举其子形状"""
+        return [TreeNode(f"{self.get_shape_type_name(shape)} ID: {shape_id}", shape_id,
+                         self.load_topology_children if has_subshapes(shape) else None)
+                for shape_id, shape in children]
+
+    def load_topology_children(self, node):
+        return self.topology_nodes(self.step_shapes.children(node.payload))
+
+    def on_topology_evicted(self, shape_id):
+        """子形状列表被淘汰出缓存时卸载对应的已折叠节点，限制树占用的内存"""
+        node = self.tree_model.id_index.item(shape_id)
+        if node is not None and node.children and not self.tree.isExpanded(self.tree_model.index_for_node(node)):
+            self.tree_model.unload(node, self.load_topology_children)
+
+    def imported_shape_type(self, shape_id):
+        """导入形状的类型名称"""
+        shape = self.step_shapes.get(shape_id)
+        return self.get_shape_type_name(shape) if shape is not None else 'Imported Shape'
+
+    # --- STEP 产品结构（只读取结构，几何按需转换） ---
+    def import_step_structure(self):
+        """只读取STEP文件的产品结构、名称和颜色并显示在树中，不转换几何"""
+        if self.import_worker is not None:
+            QMessageBox.information(self, "导入进行中", "已有文件正在导入，请等待完成或取消后再试。")
+            return
+        file_path, _ = QFileDialog.getOpenFileName(self, "选择 STEP 文件", "", "STEP 文件 (*.step *.stp)")
+        if not file_path:
+            logger.info("用户取消了STEP结构导入")
+            return
 
-    def analyze_shape_and_build_tree(self, shape, parent_item, progress=None):
-        """分析形状的层次结构并构建树视图 (Builds tree, populates self.step_shapes)."""
-        try:
-            logger.info("开始分析形状...")
-            if progress: progress.setLabelText("分析形状结构...")
-
-            # Clear previous imported shapes before populating
-            self.step_shapes = {}
-            all_shape_ids_in_tree = [] # Track IDs added to the tree structure
-
-            # --- Use TopExp_Explorer to iterate through sub-shapes ---
-            # We primarily care about Solids, Shells, Faces, Edges for visualization/selection
-            shape_types_to_explore = {
-                TopAbs_SOLID: "实体 (Solid)",
-                TopAbs_SHELL: "壳 (Shell)",
-                TopAbs_FACE: "面 (Face)",
-                # TopAbs_WIRE: "线框 (Wire)", # Often part of faces, might add noise
-                TopAbs_EDGE: "边 (Edge)"
-            }
-            type_nodes = {} # Store top-level type nodes in the tree
-
-            # Estimate total work for progress update
-            # Counting shapes beforehand can be slow for complex models.
-            # We'll update progress based on iteration.
-
-            processed_count = 0
-            unique_subshapes = TopTools_IndexedMapOfShape() # Use map to avoid duplicates
-
-            # First pass: Collect unique subshapes of relevant types
-            logger.debug("第一遍: 收集唯一子形状...")
-            for shape_type in shape_types_to_explore:
-                 explorer = TopExp_Explorer(shape, shape_type)
-                 while explorer.More():
-                     current_sub = explorer.Current()
-                     if not current_sub.IsNull():
-                          unique_subshapes.Add(current_sub)
-                     explorer.Next()
-            total_unique = unique_subshapes.Extent()
-            logger.debug(f"找到 {total_unique} 个唯一子形状 (相关类型)")
-            if progress: progress.setLabelText(f"分析 {total_unique} 个形状...")
-
-
-            # Second pass: Iterate unique shapes, create tree items, store shapes
-            logger.debug("第二遍: 创建树节点并存储形状...")
-            shape_counter = 0
-            for i in range(1, total_unique + 1):
-                if progress and progress.wasCanceled(): raise InterruptedError("用户取消分析")
-
-                current_shape = unique_subshapes.FindKey(i)
-                if current_shape.IsNull(): continue
-
-                shape_type = current_shape.ShapeType()
-                type_name = self.get_shape_type_name(current_shape) # Get user-friendly name
-                base_type_name = shape_types_to_explore.get(shape_type, "其他") # Get category name
-
-                # Get or create the category node in the tree
-                if base_type_name not in type_nodes:
-                    type_node = QTreeWidgetItem(parent_item)
-                    type_node.setText(0, base_type_name)
-                    type_nodes[base_type_name] = {"node": type_node, "ids": []}
-                else:
-                    type_node = type_nodes[base_type_name]["node"]
-
-                # Create item for the individual shape
-                shape_item = QTreeWidgetItem(type_node)
-                 # Generate a unique ID: type_index_hash
-                shape_id = f"{base_type_name.split(' ')[0].lower()}_{shape_counter}_{current_shape.HashCode(1000000)}"
-                shape_item.setText(0, f"{type_name} ID: {shape_id}")
-                shape_item.setData(0, Qt.UserRole, shape_id) # Store ID in item
-
-                # Store the actual TopoDS_Shape in our dictionary
-                self.step_shapes[shape_id] = current_shape
-                 # Store basic info (can be expanded later)
-                self.shape_to_info[shape_id] = {'type': type_name}
-
-                # Add ID to lists for group highlighting
-                type_nodes[base_type_name]["ids"].append(shape_id)
-                all_shape_ids_in_tree.append(shape_id)
-                shape_counter += 1
-
-
-                processed_count += 1
-                if progress and total_unique > 0:
-                     prog_val = 70 + int(20 * processed_count / total_unique) # Progress from 70% to 90%
-                     progress.setValue(prog_val)
-                     QCoreApplication.processEvents()
-
-
-            # Update count on type nodes and store ID lists in them
-            logger.debug("更新树节点计数和数据...")
-            for base_type_name, data in type_nodes.items():
-                 node = data["node"]
-                 ids = data["ids"]
-                 node.setText(0, f"{base_type_name} ({len(ids)})")
-                 node.setData(0, Qt.UserRole, ids)
-
-            # Store all collected IDs in the root item as well
-            parent_item.setData(0, Qt.UserRole, all_shape_ids_in_tree)
-
-            # Store the main shape itself if it wasn't broken down (e.g., a simple solid)
-            # We already stored self.main_shape during import
-
-            logger.info(f"形状分析完成，存储了 {len(self.step_shapes)} 个形状，创建了 {len(all_shape_ids_in_tree)} 个树条目")
-
-        except InterruptedError:
-             logger.warning("形状分析被用户取消")
-             raise # Re-raise to be caught by importer
-        except Exception as e:
-            logger.error(f"分析形状和构建树时出错: {e}")
-            logger.error(traceback.format_exc())
-            # Don't raise here, allow import to potentially finish but show warning
-            QMessageBox.warning(self, "分析警告", f"分析形状结构时出现错误:\n{e}\n导入结果可能不完整。")
+        logger.info(f"读取STEP产品结构: {file_path}")
+        progress = self.create_import_progress(f"正在读取 {os.path.basename(file_path)} 的产品结构...")
+        progress.setRange(0, 0)  # ReadFile 没有进度
+        worker = StepStructureWorker(file_path, parent=self)
+        worker.completed.connect(self.on_structure_loaded)
+        worker.failed.connect(self.on_structure_failed)
+        worker.cancelled.connect(self.on_import_cancelled)
+        worker.finished.connect(self.on_import_finished)
+        progress.canceled.connect(worker.cancel)
+
+        self.import_worker = worker
+        self.import_progress = progress
+        self.status_bar.showMessage(f"正在后台读取 {os.path.basename(file_path)} 的产品结构")
+        worker.start()
+
+    def on_structure_loaded(self, structure):
+        """产品结构读取完成：替换当前模型，树中按装配关系列出产品（组件在展开时创建）"""
+        self.close_import_progress()
+        self.clear_model_for_import()
+        self.step_structure = structure
+        self.context.UpdateCurrentViewer()
+
+        title = f"STEP 结构: {os.path.basename(structure.file_path)}"
+        root = self.tree_model.add_node(None, title, loader=lambda node: self.product_nodes(
+            [(None, (product.number,), product) for product in structure.roots]))
+        self.tree.expand(self.tree_model.index_for_node(root))
+        self.show_success_message(
+            f"已读取 {len(structure.products)} 个产品的结构，右键点击产品可加载其几何。")
+
+    def on_structure_failed(self, message):
+        self.close_import_progress()
+        QMessageBox.critical(self, "导入错误", f"读取STEP产品结构时出现异常:\n\n{message}\n\n请查看日志获取详细信息。")
+        self.status_bar.showMessage("STEP 产品结构读取失败")
+
+    def product_nodes(self, children):
+        """为 [(实例名称, 实例路径, StepProduct), ...] 创建树节点（每个实例一个），装配体的组件在展开时创建"""
+        structure = self.step_structure
+        return [TreeNode(product.label(instance_name, path in structure.loaded), product_id(path),
+                         (lambda node, path=path: self.product_nodes(structure.children(path)))
+                         if product.children else None)
+                for instance_name, path, product in children]
+
+    def load_product_geometry(self, path):
+        """
+        在后台转换一个产品实例（根或子装配）的几何并追加到场景中
 
+        所在装配体或其中的组件已经加载时不再加载，避免同一几何重复显示。
+        """
+        if self.import_worker is not None:
+            QMessageBox.information(self, "导入进行中", "已有文件正在导入，请等待完成或取消后再试。")
+            return
+        product = self.step_structure.product(path)
+        name = product.name or f"#{product.number}"
+        overlapping = self.step_structure.overlapping(path)
+        if overlapping:
+            loaded = self.step_structure.product(overlapping[0])
+            loaded_name = loaded.name or f"#{loaded.number}"
+            if len(overlapping[0]) <= len(path):
+                message = f"{name} 所在的 {loaded_name} 已加载，其中已包含 {name} 的几何。"
+            else:
+                message = (f"{name} 的 {len(overlapping)} 个组件（{loaded_name} 等）已单独加载，"
+                           f"再加载 {name} 会重复显示这些组件。")
+            logger.info(f"拒绝加载 {name}: 与已加载的实例重叠 {overlapping}")
+            QMessageBox.information(self, "几何已加载", message)
+            return
+        progress = self.create_import_progress(f"正在转换 {name} 的几何...")
+        deflection = MESH_PRESETS[self.mesh_preset_combo.currentText()]
+        topology_index = len(self.step_shapes.topologies)
+        worker = StepTransferWorker(self.step_structure, [(path, topology_index)], deflection, parent=self)
+        worker.progress.connect(self.on_import_progress)
+        worker.product_loaded.connect(self.on_product_loaded)
+        worker.failed.connect(self.on_structure_failed)
+        worker.cancelled.connect(self.on_import_cancelled)
+        worker.finished.connect(self.on_import_finished)
+        progress.canceled.connect(worker.cancel)
+
+        self.import_worker = worker
+        self.import_progress = progress
+        worker.start()
+
+    def on_product_loaded(self, path, shape, topology):
+        """产品几何转换完成：在产品实例的节点下添加拓扑分支，并追加显示（使用产品的颜色）"""
+        product = self.step_structure.product(path)
+        name = product.name or f"#{product.number}"
+        first = not self.step_shapes.topologies
+        self.step_shapes.add(topology)
+        self.main_shape = shape if self.main_shape is None else merge_shapes([self.main_shape, shape])
+
+        node = self.tree_model.id_index.item(product_id(path))
+        if node is not None:
+            self.tree_model.update_node(node, text=node.text + " (已加载)")
+            # 先创建组件节点，几何分支排在组件之后
+            self.tree_model.ensure_loaded(node)
+            branch = self.populate_imported_tree(topology.file_index, "几何", parent=node)
+            self.tree.expand(self.tree_model.index_for_node(node))
+            self.tree.expand(self.tree_model.index_for_node(branch))
+
+        color = product.color if product.color is not None else self.default_colors['imported']
+        self.cad_display.selection_type = CAD_SELECTION_MODES[self.pick_mode_combo.currentText()]
+        self.cad_display.add_file(self.step_shapes, topology.file_index, color)
+        if first:
+            self.viewer._display.FitAll()
+        self.context.UpdateCurrentViewer()
+        logger.info(f"产品 {name} 的几何已加载，包含 {topology.count()} 个子形状")
+        self.status_bar.showMessage(f"已加载 {name} 的几何（{topology.count()} 个子形状）")
 
     def get_shape_type_name(self, shape):
         """获取形状类型的用户友好名称"""
-        try:
-            st = shape.ShapeType()
-            if st == TopAbs_COMPOUND: return "复合体 (Compound)"
-            if st == TopAbs_COMPSOLID: return "复合实体 (CompSolid)"
-            if st == TopAbs_SOLID: return "实体 (Solid)"
-            if st == TopAbs_SHELL: return "壳 (Shell)"
-            if st == TopAbs_FACE: return "面 (Face)"
-            if st == TopAbs_WIRE: return "线框 (Wire)"
-            if st == TopAbs_EDGE: return "边 (Edge)"
-            if st == TopAbs_VERTEX: return "顶点 (Vertex)"
-            return f"形状 (Type {st})"
-        except Exception as e:
-            # logger.warning(f"获取形状类型名称时出错: {e}") # Can be noisy
-            return "未知形状"
+        return shape_type_name(shape)
 
 
     def show_success_message(self, message):
@@ -1856,7 +2472,7 @@ def main(xlsx_file=None):
         logger.info("未指定Excel文件，将启动空窗口。")
 
 
-    df = None # Initialize df to None
+    columns = None # Initialize columns to None
     if xlsx_file:
         if not os.path.exists(xlsx_file):
             logger.error(f"指定的Excel文件不存在: {xlsx_file}")
@@ -1870,16 +2486,9 @@ def main(xlsx_file=None):
             xlsx_file = None # Proceed without the file
         else:
             try:
-                logger.info(f"正在读取Excel文件: {xlsx_file}")
-                # Try specifying engine if default fails on some xlsx files
-                try:
-                    df = pd.read_excel(xlsx_file, engine='openpyxl')
-                except ImportError:
-                    logger.warning("openpyxl 未安装，尝试默认引擎")
-                    df = pd.read_excel(xlsx_file)
-
-                logger.info(f"Excel读取成功，行数: {len(df)}, 列数: {len(df.columns)}")
-                logger.debug(f"列名: {df.columns.tolist()}")
+                # 文件内容未变化时直接使用缓存，跳过 openpyxl 解析
+                columns = HarnessCache().load_harness_columns(xlsx_file, read_excel_file)
+                logger.info(f"Excel数据就绪，行数: {len(columns['coords'])}")
             except Exception as e:
                 logger.error(f"读取Excel文件时出错: {str(e)}")
                 logger.error(traceback.format_exc())
@@ -1889,12 +2498,12 @@ def main(xlsx_file=None):
                 error_msg.setWindowTitle("Excel 读取错误")
                 error_msg.setText(f"无法读取Excel文件:\n{xlsx_file}\n\n错误: {str(e)}\n\n应用程序将以空状态启动。")
                 error_msg.exec_()
-                df = None # Ensure df is None if reading failed
+                columns = None # Ensure columns is None if reading failed
 
 
-    # Create the main window (pass df which might be None)
+    # Create the main window (pass columns which might be None)
     try:
-        window = MainWindow(df)
+        window = MainWindow(columns, xlsx_file if columns is not None else None)
 
         # Set window size and center
         window.resize(1200, 900) # Slightly larger default size
@@ -1928,6 +2537,9 @@ def main(xlsx_file=None):
 
 
 if __name__ == "__main__":
+    # 打包后的程序中，STEP/IGES 读取子进程从这里启动
+    multiprocessing.freeze_support()
+
     # Use argparse to parse command line arguments
     parser = argparse.ArgumentParser(description="基于公共数据源的航电系统布线架构与集成系统")
     parser.add_argument("xlsx_file", type=str, nargs='?', default=None,
@@ -3,14 +3,16 @@ import argparse
 import xml.etree.ElementTree as ET
 import os
 import logging
+import multiprocessing
+import time
 import traceback
 from datetime import datetime
 from OCC.Core.Quantity import Quantity_Color
 from OCC.Core._Quantity import Quantity_TOC_RGB
 from PyQt5.QtCore import QT_VERSION_STR
 from OCC.Display.backend import load_backend
-from OCC.Core.STEPControl import STEPControl_Writer, STEPControl_Reader, STEPControl_AsIs
-from OCC.Core.IGESControl import IGESControl_Reader, IGESControl_Writer
+from OCC.Core.STEPControl import STEPControl_Writer, STEPControl_AsIs
+from OCC.Core.IGESControl import IGESControl_Writer
 from OCC.Core.Interface import Interface_Static_SetCVal
 from OCC.Core.IFSelect import IFSelect_RetDone
 
@@ -23,17 +25,46 @@ from PyQt5.QtWidgets import (
     QApplication, QTreeWidget, QTreeWidgetItem, QWidget, QMainWindow,
     QHBoxLayout, QVBoxLayout, QDesktopWidget, QPushButton, QFileDialog,
     QLabel, QComboBox, QGroupBox, QMessageBox, QProgressDialog,
-    QTextEdit, QStatusBar
+    QTextEdit, QStatusBar, QMenu, QSpinBox, QDoubleSpinBox, QTableView, QCheckBox
 )
 from PyQt5.QtCore import Qt, QTimer, QCoreApplication
 from PyQt5.QtGui import QFont
-from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeCylinder, BRepPrimAPI_MakeSphere
-from OCC.Core.gp import gp_Pnt, gp_Dir, gp_Ax2, gp_Vec
 from OCC.Core.TopoDS import TopoDS_Shape, TopoDS_Compound
 from OCC.Core.BRep import BRep_Builder
 from OCC.Core.AIS import AIS_Shape, AIS_InteractiveContext
 from OCC.Core.Quantity import Quantity_NOC_BLUE, Quantity_NOC_YELLOW, Quantity_NOC_RED, Quantity_NOC_GREEN
 
+from harness_data import xml_root_tag, XmlHarnessAccumulator
+from harness_cache import HarnessCache
+from cad_import import (
+    CadImportWorker, ShapeCache, merge_shapes, shape_type_name, MESH_PRESETS, DEFAULT_MESH_PRESET
+)
+from cad_structure import (
+    STEP_STRUCTURE_FORMAT, StepStructureWorker, StepTransferWorker, parse_product_id, product_id
+)
+from cad_topology import TopologyBrowser, has_subshapes
+from harness_export import (
+    CENTERLINE_STEP_FORMAT, CENTERLINE_IGES_FORMAT, build_centerline_document,
+    write_centerline_step, write_centerline_iges
+)
+from harness_geometry import XML_MIN_SEGMENT_LENGTH, PrimitiveInstancer, ShapeIndex
+from harness_mesh import MESH_GLTF_FORMAT, MESH_STL_FORMAT, harness_meshes, segment_arrays, write_glb, write_stl
+from harness_spatial import NodeSpatialIndex
+from harness_metrics import XML_METRIC_GROUPS, HarnessMetrics, write_metrics_csv, xml_link_frame
+from harness_graph import graph_from_node_links
+from harness_merge import DEFAULT_MERGE_TOLERANCE, merge_nodes, find_route_gaps, format_merge_report
+from harness_diff import diff_harness
+from file_watch import SourceFileWatcher
+from tree_model import DataFrameTableModel, TreeItemIndex
+from harness_display import (
+    LayeredShapeDisplay, CenterlineDisplay, CadModelDisplay, HighlightState, NODE_LAYER,
+    DISPLAY_MODES, DISPLAY_MODE_LAYERED, DISPLAY_MODE_SHAPES, DISPLAY_MODE_CENTERLINE, CAD_SELECTION_MODES, DEFAULT_CAD_SELECTION_MODE
+)
+
+
+# 树项中保存“尚未创建的子项来源”的数据角色：文件序号（文件分支）、形状ID或产品ID，已展开后为 None
+LAZY_CHILDREN_ROLE = Qt.UserRole + 1
+
 
 def setup_logging():
     """设置日志记录"""
@@ -100,17 +131,43 @@ class MainWindow(QWidget):
         
         # 高亮和颜色管理
         self.ais_shapes = {}  # 存储所有AIS对象，用于颜色管理
+        self.shape_index = ShapeIndex()  # AIS对象的 TopoDS_Shape -> shape_id，用于点击时查找
+        self.tree_index = TreeItemIndex()  # 线段索引 / 节点名称 / 导入形状ID -> 树项，构建树时登记
         self.highlighted_shapes = []  # 当前高亮的形状IDs
+        # 高亮状态：颜色编号 1 为线段/导入形状，2 为节点（0 为默认颜色）
+        self.highlight_state = HighlightState(
+            {1: Quantity_Color(Quantity_NOC_YELLOW), 2: Quantity_Color(Quantity_NOC_GREEN)},
+            self.highlight_code)
+        self.default_colors = {
+            'node': Quantity_Color(Quantity_NOC_RED),
+            'segment': Quantity_Color(Quantity_NOC_BLUE),
+            'imported': Quantity_Color(0.8, 0.8, 0.8, Quantity_TOC_RGB),
+        }
         
         # 节点相关数据结构
         self.unique_nodes = {}  # 存储唯一节点信息，使用name作为键，(x, y, z)作为值
         self.node_shapes = []  # 存储节点的 TopoDS_Shape 对象
         self.node_id_map = {}  # Map node_name to node_index ('node_0', 'node_1', etc.)
+        self.node_index = None  # 节点坐标的空间索引（加载数据时建立）
+        self.node_index_refs = []  # 空间索引中的下标 i（即 'node_i'）-> 节点名称
+        self.node_graph = None  # 节点拓扑的 CSR 图（下标与空间索引一致）
+        self.path_source = None  # 最短路径起点的节点下标
+        self.harness_metrics = None  # 按分组汇总的长度、质量和链接数（加载数据时建立）
+        self.node_merge = merge_nodes({}, 0)  # 按容差合并坐标重合的节点（unique_nodes 为合并后的节点）
+        self.route_gaps = []  # 各 Segement 中相邻 Network 之间的断口
+        self.xml_builder = None  # 解析时累加的原始（未合并）节点和链接数据
+        self.xml_file_path = None  # 当前线束数据的 XML 文件（监视模式下变化后增量重新加载）
+        self.reloading = False  # 正在重新加载源文件
+        self.reload_pending = False  # 重新加载期间源文件又发生了变化
         
         # 存储链接相关的数据，用于查询
         self.link_data = {}  # 存储链接数据，使用索引作为键
         self.node_to_links = {}  # 存储节点关联的链接，使用节点name作为键
         self.shape_to_info = {}  # 存储形状ID到信息的映射 {shape_id: info_dict}
+
+        # 解析结果和转换后 CAD 形状的磁盘缓存
+        self.harness_cache = HarnessCache()
+        self.shape_cache = ShapeCache()
         
         # 设置字体
         font = QFont()
@@ -140,8 +197,18 @@ class MainWindow(QWidget):
         import_layout = QHBoxLayout()
         import_layout.addWidget(QLabel("导入文件:"))
         self.file_format_combo = QComboBox()
-        self.file_format_combo.addItems(["STEP", "IGES"])
+        self.file_format_combo.addItems(["STEP", "IGES", STEP_STRUCTURE_FORMAT])
         import_layout.addWidget(self.file_format_combo)
+        import_layout.addWidget(QLabel("网格精度:"))
+        self.mesh_preset_combo = QComboBox()
+        self.mesh_preset_combo.addItems(list(MESH_PRESETS))
+        self.mesh_preset_combo.setCurrentText(DEFAULT_MESH_PRESET)
+        import_layout.addWidget(self.mesh_preset_combo)
+        import_layout.addWidget(QLabel("拾取:"))
+        self.pick_mode_combo = QComboBox()
+        self.pick_mode_combo.addItems(list(CAD_SELECTION_MODES))
+        self.pick_mode_combo.setCurrentText(DEFAULT_CAD_SELECTION_MODE)
+        import_layout.addWidget(self.pick_mode_combo)
         self.import_button = QPushButton("导入文件")
         self.import_button.clicked.connect(self.import_file)
         import_layout.addWidget(self.import_button)
@@ -151,12 +218,21 @@ class MainWindow(QWidget):
         export_layout = QHBoxLayout()
         export_layout.addWidget(QLabel("导出文件:"))
         self.export_format_combo = QComboBox()
-        self.export_format_combo.addItems(["STEP", "IGES"])
+        self.export_format_combo.addItems(["STEP", "IGES", CENTERLINE_STEP_FORMAT, CENTERLINE_IGES_FORMAT,
+                                           MESH_GLTF_FORMAT, MESH_STL_FORMAT])
         export_layout.addWidget(self.export_format_combo)
         self.export_button = QPushButton("导出文件")
         self.export_button.clicked.connect(self.export_file)
         export_layout.addWidget(self.export_button)
         file_layout.addLayout(export_layout)
+
+        # 监视源文件：XML 保存后重新解析，只更新有变化的形状
+        self.watch_check = QCheckBox("监视源文件（变化后增量重新加载）")
+        self.watch_check.setEnabled(xml_file is not None)
+        self.watch_check.toggled.connect(self.on_watch_toggled)
+        file_layout.addWidget(self.watch_check)
+        self.source_watcher = SourceFileWatcher(self)
+        self.source_watcher.changed.connect(self.reload_source_file)
         
         file_group.setLayout(file_layout)
         left_layout.addWidget(file_group)
@@ -176,6 +252,24 @@ class MainWindow(QWidget):
         # 右视图按钮
         self.right_view_button = QPushButton("右视图")
         layout_layout.addWidget(self.right_view_button)
+        # 显示模式：分层复合体（每个 Net 一个显示对象）或独立形状
+        display_mode_layout = QHBoxLayout()
+        display_mode_layout.addWidget(QLabel("显示模式:"))
+        self.display_mode_combo = QComboBox()
+        self.display_mode_combo.addItems(DISPLAY_MODES)
+        display_mode_layout.addWidget(self.display_mode_combo)
+        layout_layout.addLayout(display_mode_layout)
+        # 重合节点合并容差：修改后重新合并并绘制
+        merge_layout = QHBoxLayout()
+        merge_layout.addWidget(QLabel("合并容差:"))
+        self.merge_tolerance_spin = QDoubleSpinBox()
+        self.merge_tolerance_spin.setRange(0.0, 1000.0)
+        self.merge_tolerance_spin.setDecimals(3)
+        self.merge_tolerance_spin.setValue(DEFAULT_MERGE_TOLERANCE)
+        merge_layout.addWidget(self.merge_tolerance_spin)
+        self.merge_report_button = QPushButton("合并报告")
+        merge_layout.addWidget(self.merge_report_button)
+        layout_layout.addLayout(merge_layout)
         
         layout_group.setLayout(layout_layout)
         left_layout.addWidget(layout_group)
@@ -190,6 +284,74 @@ class MainWindow(QWidget):
         info_group.setLayout(info_layout)
         left_layout.addWidget(info_group)
 
+        # 邻近节点查询（基于节点空间索引，以当前选中的节点为中心）
+        neighbour_group = QGroupBox("邻近节点")
+        neighbour_layout = QHBoxLayout()
+        neighbour_layout.addWidget(QLabel("数量:"))
+        self.neighbour_count_spin = QSpinBox()
+        self.neighbour_count_spin.setRange(1, 1000)
+        self.neighbour_count_spin.setValue(5)
+        neighbour_layout.addWidget(self.neighbour_count_spin)
+        neighbour_layout.addWidget(QLabel("半径:"))
+        self.neighbour_radius_spin = QDoubleSpinBox()
+        self.neighbour_radius_spin.setRange(0.1, 1e7)
+        self.neighbour_radius_spin.setDecimals(1)
+        self.neighbour_radius_spin.setValue(500.0)
+        neighbour_layout.addWidget(self.neighbour_radius_spin)
+        self.nearest_button = QPushButton("最近节点")
+        self.nearest_button.clicked.connect(self.find_nearest_nodes)
+        neighbour_layout.addWidget(self.nearest_button)
+        self.radius_button = QPushButton("半径内节点")
+        self.radius_button.clicked.connect(self.find_nodes_in_radius)
+        neighbour_layout.addWidget(self.radius_button)
+        neighbour_group.setLayout(neighbour_layout)
+        left_layout.addWidget(neighbour_group)
+
+        # 拓扑查询（基于 node_to_links 建立的 CSR 图，以当前选中的节点为中心或终点）
+        graph_group = QGroupBox("拓扑查询")
+        graph_layout = QHBoxLayout()
+        self.path_source_button = QPushButton("设为起点")
+        self.path_source_button.clicked.connect(self.set_path_source)
+        graph_layout.addWidget(self.path_source_button)
+        self.shortest_path_button = QPushButton("最短路径")
+        self.shortest_path_button.clicked.connect(self.find_shortest_path)
+        graph_layout.addWidget(self.shortest_path_button)
+        graph_layout.addWidget(QLabel("跳数:"))
+        self.hop_count_spin = QSpinBox()
+        self.hop_count_spin.setRange(1, 100)
+        self.hop_count_spin.setValue(2)
+        graph_layout.addWidget(self.hop_count_spin)
+        self.k_hop_button = QPushButton("K 跳邻域")
+        self.k_hop_button.clicked.connect(self.find_k_hop_nodes)
+        graph_layout.addWidget(self.k_hop_button)
+        self.component_button = QPushButton("连通分量")
+        self.component_button.clicked.connect(self.find_connected_component)
+        graph_layout.addWidget(self.component_button)
+        graph_group.setLayout(graph_layout)
+        left_layout.addWidget(graph_group)
+
+        # 线束统计（按分组汇总长度、质量和链接数，隐藏的 Net 不计入）
+        metrics_group = QGroupBox("线束统计")
+        metrics_layout = QVBoxLayout()
+        metrics_bar = QHBoxLayout()
+        metrics_bar.addWidget(QLabel("分组:"))
+        self.metrics_group_combo = QComboBox()
+        self.metrics_group_combo.addItems(list(XML_METRIC_GROUPS))
+        self.metrics_group_combo.currentTextChanged.connect(self.refresh_metrics_table)
+        metrics_bar.addWidget(self.metrics_group_combo)
+        self.metrics_export_button = QPushButton("导出 CSV")
+        self.metrics_export_button.clicked.connect(self.export_metrics_csv)
+        metrics_bar.addWidget(self.metrics_export_button)
+        metrics_layout.addLayout(metrics_bar)
+        self.metrics_model = DataFrameTableModel(self)
+        self.metrics_table = QTableView()
+        self.metrics_table.setModel(self.metrics_model)
+        self.metrics_table.setSortingEnabled(True)
+        self.metrics_table.setMinimumHeight(120)
+        metrics_layout.addWidget(self.metrics_table)
+        metrics_group.setLayout(metrics_layout)
+        left_layout.addWidget(metrics_group)
+
         horizontal_layout.addLayout(left_layout, 1)
 
         # 3D 视图
@@ -199,6 +361,14 @@ class MainWindow(QWidget):
         self.context: AIS_InteractiveContext = self.viewer._display.Context
         self.viewer._display.View.SetBackgroundColor(bg_color)
         horizontal_layout.addWidget(self.viewer, 2)
+
+        # 分层显示：每个 Net 合并为一个 AIS_ColoredShape，或者（中心线模式）一个线段图元数组
+        self.shape_layers = LayeredShapeDisplay(self.context)
+        self.centerline_display = CenterlineDisplay(self.viewer._display.View)
+        self.layer_display = self.shape_layers  # 当前使用的分层显示
+        # 导入的 CAD 模型：每个顶层实体一个对象，面和边按拾取模式选择
+        self.cad_display = CadModelDisplay(self.context)
+        self.pick_mode_combo.currentTextChanged.connect(self.on_pick_mode_changed)
         
         # 添加主水平布局
         main_layout.addLayout(horizontal_layout)
@@ -218,16 +388,32 @@ class MainWindow(QWidget):
         self.top_view_button.clicked.connect(self.set_top_view)
         # 右视图
         self.right_view_button.clicked.connect(self.set_right_view)
+        # 切换显示模式后重新绘制
+        self.display_mode_combo.currentIndexChanged.connect(self.on_display_mode_changed)
+        self.merge_tolerance_spin.editingFinished.connect(self.on_merge_tolerance_changed)
+        self.merge_report_button.clicked.connect(self.show_merge_report)
+        # 节点球体（半径 25）和线段圆柱体（半径 5）的原型实例化
+        self.primitives = PrimitiveInstancer(sphere_radius=25.0, cylinder_radius=5.0, min_length=XML_MIN_SEGMENT_LENGTH)
+
         # 存储线段形状和原始颜色
         self.segment_shapes = []
         self.segments = []
         
         # 保存导入的STEP/IGES模型
-        self.step_shapes = {}  # 形状ID到形状对象的映射
+        self.step_shapes = {}  # 形状ID到形状对象的映射，导入后为 TopologyBrowser（按需枚举子形状）
         self.main_shape = None
+        self.step_structure = None  # 只读取了产品结构的STEP文件 (StepStructure)，几何按需转换
+        self.import_worker = None  # 正在进行的后台导入 (CadImportWorker)
+        self.import_progress = None
+        self.import_topologies = {}  # 文件序号 -> 后台建立的拓扑索引 (ShapeTopology)
         
         # 树项点击事件
         self.tree.itemClicked.connect(self.on_tree_item_clicked)
+        # 展开导入形状的树项时才枚举其子形状
+        self.tree.itemExpanded.connect(self.load_tree_children)
+        # 树项右键菜单（隐藏/显示 Net）
+        self.tree.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.tree.customContextMenuRequested.connect(self.show_tree_context_menu)
         self.selected_item = None
         
         # 设置交互功能
@@ -260,142 +446,213 @@ class MainWindow(QWidget):
         self.viewer._display.View.SetProj(V3d_Xneg)
         self.viewer._display.FitAll()
 
-    def parse_xml_and_populate_tree(self, file_path):
-        """解析XML文件并构建树结构，支持多种XML格式"""
+    def on_display_mode_changed(self, index):
+        """切换显示模式后重新绘制线段和节点"""
+        logger.info(f"显示模式切换为: {self.display_mode_combo.currentText()}")
+        if self.segments:
+            self.draw_segments()
+            self.refresh_metrics_table()
+
+    def show_tree_context_menu(self, pos):
+        """树项右键菜单：隐藏、单独显示所在的 Net（分层显示模式下可用）"""
+        item = self.tree.itemAt(pos)
+        # 向上查找所在的 Net
+        net_name = None
+        while item is not None:
+            data = item.data(0, Qt.UserRole)
+            if isinstance(data, dict) and data.get("type") == "net":
+                net_name = data.get("name")
+                break
+            item = item.parent()
+        layers = [net_name] if net_name in self.layer_display.layers else []
+        clicked = self.tree.itemAt(pos)
+        product_path = None
+        if clicked is not None and self.step_structure is not None:
+            product_path = parse_product_id(clicked.data(0, Qt.UserRole))
+
+        menu = QMenu(self)
+        load_action = None
+        if product_path is not None:
+            load_action = menu.addAction("加载几何")
+            load_action.setEnabled(product_path not in self.step_structure.loaded)
+            menu.addSeparator()
+        hide_action = menu.addAction("隐藏所在 Net")
+        isolate_action = menu.addAction("仅显示所在 Net")
+        show_all_action = menu.addAction("显示全部 Net")
+        hide_action.setEnabled(bool(layers))
+        isolate_action.setEnabled(bool(layers))
+        show_all_action.setEnabled(bool(self.layer_display.hidden))
+
+        action = menu.exec_(self.tree.viewport().mapToGlobal(pos))
+        if action is None:
+            return
+        if action == load_action:
+            self.load_product_geometry(product_path)
+            return
+        if action == hide_action:
+            self.layer_display.hide(layers)
+            self.status_bar.showMessage(f"已隐藏 Net: {net_name}")
+        elif action == isolate_action:
+            self.layer_display.isolate(layers)
+            self.status_bar.showMessage(f"仅显示 Net: {net_name}")
+        elif action == show_all_action:
+            self.layer_display.show_all()
+            self.status_bar.showMessage("已显示全部 Net")
+        self.refresh_metrics_table()
+        self.context.UpdateCurrentViewer()
+
+    def parse_xml_and_populate_tree(self, file_path, reload=False):
+        """
+        流式解析XML文件并构建树结构，支持多种XML格式（每个 Net 读完即处理并释放）
+
+        reload 为 True 时（源文件变化后重新加载）保留当前的显示对象，由 update_scene 按差异更新。
+        """
         try:
             self.xml_file_path = file_path
             logger.info(f"正在解析XML文件: {file_path}")
             self.status_bar.showMessage(f"正在解析XML文件: {file_path}")
             QApplication.processEvents()
-            
-            # 解析XML文件
-            try:
-                tree = ET.parse(file_path)
-                self.root = tree.getroot()
-            except Exception as e:
-                logger.error(f"XML解析错误: {str(e)}")
-                QMessageBox.critical(self, "解析错误", f"解析XML文件时出错: {str(e)}")
-                return
-            
+
             # 清空之前的数据
             self.tree.clear()
-            self.segments.clear()
-            self.unique_nodes.clear()
-            self.link_data.clear()
-            self.node_to_links.clear()
-            self.segment_shapes.clear()
-            self.viewer._display.EraseAll()
+            self.tree_index.clear()
+            if not reload:
+                self.segment_shapes.clear()
+                self.viewer._display.EraseAll()
+                self.ais_shapes = {}
+                self.shape_index.clear()
+                self.layer_display.clear()
+                self.cad_display.clear()
             self.shape_to_info.clear()
             self.node_shapes.clear()
             self.node_id_map.clear()
-            
-            self.status_bar.showMessage("正在构建树形结构...")
-            QApplication.processEvents()
-            
-            # 检测XML格式（根据根节点名称）
-            root_tag = self.root.tag
-            logger.info(f"检测到XML格式: {root_tag}")
-            
-            # 创建根节点
-            root_item = QTreeWidgetItem(self.tree, [f"{root_tag}: {os.path.basename(file_path)}"])
-            root_item.setExpanded(True)
-            
-            # 根据不同格式解析
-            if root_tag == "MultiDeviceNet":
-                self.parse_multi_device_net(root_item)
-            elif root_tag == "TwoDeviceNet":
-                self.parse_two_device_net(root_item)
-            else:
-                logger.warning(f"未知的XML格式: {root_tag}")
-                QMessageBox.warning(self, "格式警告", f"未知的XML格式: {root_tag}，将尝试通用解析")
-                # 回退到通用解析
-                self.parse_generic_format(root_item)
-            
+
+            # 节点、线段、链接数据在读取过程中逐个 Net 累加
+            self.xml_builder = XmlHarnessAccumulator()
+            self.unique_nodes = self.xml_builder.unique_nodes
+            self.segments = self.xml_builder.segments
+            self.link_data = self.xml_builder.link_data
+            self.node_to_links = self.xml_builder.node_to_links
+
+            file_size = max(os.path.getsize(file_path), 1)
+            root_item = None
+            root_tag = None
+            net_count = 0
+            try:
+                # 文件内容未变化时从缓存读取 Net 记录，跳过 XML 解析
+                for root_tag, net, bytes_read in self.harness_cache.iter_xml_nets(file_path):
+                    if root_item is None:
+                        root_item = self.create_xml_root_item(root_tag, file_path, warn=not reload)
+
+                    # 节点和链接由 XmlHarnessAccumulator 汇总，这里只按不同格式构建树
+                    links = iter(self.xml_builder.add_net(root_tag, net))
+                    if root_tag == "MultiDeviceNet":
+                        self.parse_multi_device_net(net, root_item, links)
+                    elif root_tag == "TwoDeviceNet":
+                        self.parse_two_device_net(net, root_item, links)
+                    else:
+                        self.parse_generic_format(net, root_item, links)
+
+                    net_count += 1
+                    if net_count % 20 == 0:
+                        self.status_bar.showMessage(
+                            f"正在解析XML文件: 已读取 {net_count} 个 Net ({100 * bytes_read // file_size}%)")
+                        QApplication.processEvents()
+            except ET.ParseError as e:
+                logger.error(f"XML解析错误: {str(e)}")
+                QMessageBox.critical(self, "解析错误", f"解析XML文件时出错: {str(e)}\n已读取的 {net_count} 个 Net 将被保留。")
+
+            if root_item is None:
+                # 文件中没有 Net，仍然显示根节点
+                root_tag = xml_root_tag(file_path)
+                root_item = self.create_xml_root_item(root_tag, file_path, warn=not reload)
+
+            # 合并坐标重合的节点，之后的索引、节点形状和绘制都使用合并后的拓扑
+            self.apply_node_merge()
+            self.build_node_index()
+            self.build_node_graph()
+            self.build_metrics(xml_link_frame(self.link_data))
+
             # 创建节点的3D形状
             self.create_node_shapes()
-            
+
             self.status_bar.showMessage(f"文件 {os.path.basename(file_path)} 加载完成")
-            logger.info(f"XML文件解析完成，包含 {len(self.unique_nodes)} 个节点和 {len(self.segments)} 条连接")
-        
+            logger.info(f"XML文件解析完成，包含 {net_count} 个 Net、{len(self.unique_nodes)} 个节点和 {len(self.segments)} 条连接")
+
         except Exception as e:
             logger.error(f"解析XML和构建树时发生错误: {str(e)}")
             logger.error(traceback.format_exc())
             QMessageBox.critical(self, "处理错误", f"处理XML文件时出错: {str(e)}")
 
-    def parse_multi_device_net(self, root_item):
-        """解析MultiDeviceNet格式的XML"""
-        logger.info("解析MultiDeviceNet格式")
-        
-        for net in self.root.findall("./Net"):
-            net_name = net.get("name", "未命名网络")
-            net_item = QTreeWidgetItem(root_item, [f"Net: {net_name}"])
-            net_item.setData(0, Qt.UserRole, {"type": "net", "name": net_name})
-            
-            # 处理设备信息
-            self.parse_devices(net, net_item)
-            
-            # 处理等电位点
-            self.parse_isoelectric_points(net, net_item)
-            
-            # 检查是否有TotalNetwork
-            total_network = net.find("TotalNetwork")
-            if total_network is not None:
-                logger.info(f"发现TotalNetwork in Net: {net_name}")
-                self.parse_total_network(total_network, net_item)
-            else:
-                logger.info(f"未发现TotalNetwork in Net: {net_name}，解析SubNet")
-                self.parse_subnets(net, net_item)
+    def create_xml_root_item(self, root_tag, file_path, warn=True):
+        """创建树的根节点，并检查XML格式（根据根节点名称；warn 为 False 时只记录日志，不弹出对话框）"""
+        logger.info(f"检测到XML格式: {root_tag}")
+        root_item = QTreeWidgetItem(self.tree, [f"{root_tag}: {os.path.basename(file_path)}"])
+        root_item.setExpanded(True)
+        if root_tag not in ("MultiDeviceNet", "TwoDeviceNet"):
+            logger.warning(f"未知的XML格式: {root_tag}")
+            if warn:
+                QMessageBox.warning(self, "格式警告", f"未知的XML格式: {root_tag}，将尝试通用解析")
+        return root_item
 
-    def parse_two_device_net(self, root_item):
-        """解析TwoDeviceNet格式的XML"""
-        logger.info("解析TwoDeviceNet格式")
-        
-        for net in self.root.findall("./Net"):
-            net_name = net.get("name", "未命名网络")
-            net_item = QTreeWidgetItem(root_item, [f"Net: {net_name}"])
-            net_item.setData(0, Qt.UserRole, {"type": "net", "name": net_name})
-            
-            # 检查是否有TotalNetwork
-            total_network = net.find("TotalNetwork")
-            if total_network is not None:
-                logger.info(f"发现TotalNetwork in Net: {net_name}")
-                self.parse_total_network(total_network, net_item)
-            else:
-                logger.info(f"未发现TotalNetwork in Net: {net_name}，解析SubNet")
-                self.parse_subnets(net, net_item)
+    def create_net_item(self, net, root_item):
+        """为一个 Net 记录创建树节点"""
+        net_name = net['name']
+        net_item = QTreeWidgetItem(root_item, [f"Net: {net_name}"])
+        net_item.setData(0, Qt.UserRole, {"type": "net", "name": net_name})
+        return net_item
 
-    def parse_generic_format(self, root_item):
-        """通用格式解析（回退方案）"""
-        logger.info("使用通用格式解析")
-        
-        for net in self.root.findall(".//Net"):
-            net_name = net.get("name", "未命名网络")
-            net_item = QTreeWidgetItem(root_item, [f"Net: {net_name}"])
-            net_item.setData(0, Qt.UserRole, {"type": "net", "name": net_name})
-            
-            # 尝试解析各种可能的结构
-            self.parse_devices(net, net_item)
-            self.parse_isoelectric_points(net, net_item)
-            
-            total_network = net.find("TotalNetwork")
-            if total_network is not None:
-                self.parse_total_network(total_network, net_item)
-            else:
-                self.parse_subnets(net, net_item)
+    def parse_multi_device_net(self, net, root_item, links):
+        """解析MultiDeviceNet格式的一个 Net；links 为 add_net 返回的链接索引"""
+        net_item = self.create_net_item(net, root_item)
+
+        # 处理设备信息
+        self.parse_devices(net, net_item)
+
+        # 处理等电位点
+        self.parse_isoelectric_points(net, net_item)
+
+        # 检查是否有TotalNetwork
+        if net['total_network'] is not None:
+            logger.info(f"发现TotalNetwork in Net: {net['name']}")
+            self.parse_total_network(net, net_item, links)
+        else:
+            logger.info(f"未发现TotalNetwork in Net: {net['name']}，解析SubNet")
+            self.parse_subnets(net, net_item, links)
+
+    def parse_two_device_net(self, net, root_item, links):
+        """解析TwoDeviceNet格式的一个 Net；links 为 add_net 返回的链接索引"""
+        net_item = self.create_net_item(net, root_item)
+
+        # 检查是否有TotalNetwork
+        if net['total_network'] is not None:
+            logger.info(f"发现TotalNetwork in Net: {net['name']}")
+            self.parse_total_network(net, net_item, links)
+        else:
+            logger.info(f"未发现TotalNetwork in Net: {net['name']}，解析SubNet")
+            self.parse_subnets(net, net_item, links)
+
+    def parse_generic_format(self, net, root_item, links):
+        """通用格式解析（回退方案）；links 为 add_net 返回的链接索引"""
+        net_item = self.create_net_item(net, root_item)
+
+        # 尝试解析各种可能的结构
+        self.parse_devices(net, net_item)
+        self.parse_isoelectric_points(net, net_item)
+
+        if net['total_network'] is not None:
+            self.parse_total_network(net, net_item, links)
+        else:
+            self.parse_subnets(net, net_item, links)
 
     def parse_devices(self, net, net_item):
         """解析设备信息"""
-        devices = net.find("Devices")
-        if devices is not None:
+        if net['devices'] is not None:
             devices_item = QTreeWidgetItem(net_item, ["设备"])
             devices_item.setData(0, Qt.UserRole, {"type": "devices"})
-            
-            for device in devices.findall("Device"):
-                device_name = device.get("name", "未命名设备")
-                x = float(device.get("X", 0))
-                y = float(device.get("Y", 0))
-                z = float(device.get("Z", 0))
-                
+
+            for device in net['devices']:
+                device_name, x, y, z = device
                 device_item = QTreeWidgetItem(devices_item, [f"设备: {device_name}"])
                 device_item.setData(0, Qt.UserRole, {
                     "type": "device",
@@ -404,24 +661,17 @@ class MainWindow(QWidget):
                     "y": y,
                     "z": z
                 })
-                
-                # 添加设备到唯一节点列表
-                self.unique_nodes[device_name] = (x, y, z)
+                self.tree_index.add_item(device_name, device_item)
                 logger.debug(f"添加设备节点: {device_name} at ({x}, {y}, {z})")
 
     def parse_isoelectric_points(self, net, net_item):
         """解析等电位点信息"""
-        iso_points = net.find("IsoelectricPoints")
-        if iso_points is not None:
+        if net['isoelectric_points'] is not None:
             isoe_item = QTreeWidgetItem(net_item, ["等电位点"])
             isoe_item.setData(0, Qt.UserRole, {"type": "isoe"})
-            
-            for iso_point in iso_points.findall("IsoelePt"):
-                point_name = iso_point.get("name", "未命名等电位点")
-                x = float(iso_point.get("X", 0))
-                y = float(iso_point.get("Y", 0))
-                z = float(iso_point.get("Z", 0))
-                
+
+            for iso_point in net['isoelectric_points']:
+                point_name, x, y, z = iso_point
                 point_item = QTreeWidgetItem(isoe_item, [f"等电位点: {point_name}"])
                 point_item.setData(0, Qt.UserRole, {
                     "type": "isopt",
@@ -430,204 +680,93 @@ class MainWindow(QWidget):
                     "y": y,
                     "z": z
                 })
-                
-                # 添加等电位点到唯一节点列表
-                self.unique_nodes[point_name] = (x, y, z)
+                self.tree_index.add_item(point_name, point_item)
                 logger.debug(f"添加等电位点节点: {point_name} at ({x}, {y}, {z})")
 
-    def parse_total_network(self, total_network, net_item):
+    def parse_total_network(self, net, net_item, links):
         """解析TotalNetwork节点"""
         total_network_item = QTreeWidgetItem(net_item, ["TotalNetwork"])
         total_network_item.setData(0, Qt.UserRole, {
             "type": "total_network",
             "name": "TotalNetwork"
         })
-        
+
         # 存储所有TotalNetwork下的链接形状ID
         self.total_network_shapes = []
-        segment_idx = len(self.segments)  # 当前段的起始索引
-        
+
         # 处理TotalNetwork下的Network节点
-        for network in total_network.findall("Network"):
-            network_name = network.get("name", f"未命名网络{segment_idx}")
-            network_item = QTreeWidgetItem(total_network_item, [f"Network: {network_name}"])
-            network_item.setData(0, Qt.UserRole, {
-                "type": "network",
-                "name": network_name,
-                "index": segment_idx
-            })
-            
-            # 处理起点和终点
-            start_point = network.find("StartPoint")
-            end_point = network.find("EndPoint")
-            
-            if start_point is not None and end_point is not None:
-                start_name = start_point.get("name", "未命名起点")
-                start_x = float(start_point.get("x", 0))
-                start_y = float(start_point.get("y", 0))
-                start_z = float(start_point.get("z", 0))
-                
-                end_name = end_point.get("name", "未命名终点")
-                end_x = float(end_point.get("x", 0))
-                end_y = float(end_point.get("y", 0))
-                end_z = float(end_point.get("z", 0))
-                
-                # 添加Start点和End点到节点列表
-                self.unique_nodes[start_name] = (start_x, start_y, start_z)
-                self.unique_nodes[end_name] = (end_x, end_y, end_z)
-                
-                # 添加连接信息
-                link_info = {
-                    "type": "link",
-                    "start_node": start_name,
-                    "end_node": end_name,
-                    "start_pos": (start_x, start_y, start_z),
-                    "end_pos": (end_x, end_y, end_z),
-                    "network_name": network_name,
-                    "parent": "TotalNetwork"
-                }
-                
-                self.segments.append((
-                    (start_x, start_y, start_z),
-                    (end_x, end_y, end_z),
-                    segment_idx
-                ))
-                
-                # 存储链接数据
-                self.link_data[segment_idx] = link_info
-                
-                # 记录节点相关的链接
-                if start_name not in self.node_to_links:
-                    self.node_to_links[start_name] = []
-                self.node_to_links[start_name].append(segment_idx)
-                
-                if end_name not in self.node_to_links:
-                    self.node_to_links[end_name] = []
-                self.node_to_links[end_name].append(segment_idx)
-                
-                logger.debug(f"添加TotalNetwork链接: {network_name} ({start_name} -> {end_name})")
-                segment_idx += 1
-            else:
-                logger.warning(f"Network {network_name} 缺少起点或终点")
-                error_item = QTreeWidgetItem(network_item, ["错误: 缺少起点或终点"])
+        for network in net['total_network']:
+            self.add_network_item(network, total_network_item, next(links))
 
-    def parse_subnets(self, net, net_item):
+    def add_network_item(self, network, parent_item, segment_idx):
+        """添加一条 Network 的树节点（segment_idx 为 add_net 返回的链接索引，缺少起点或终点时为 None）"""
+        if segment_idx is not None:
+            network_name = self.link_data[segment_idx]['network_name']
+        else:
+            network_name = network['name'] or "未命名网络"
+        network_item = QTreeWidgetItem(parent_item, [f"Network: {network_name}"])
+        network_item.setData(0, Qt.UserRole, {
+            "type": "network",
+            "name": network_name,
+            "index": segment_idx
+        })
+
+        if segment_idx is not None:
+            link_info = self.link_data[segment_idx]
+            self.tree_index.add_item(segment_idx, network_item)
+            # 没有设备条目的端点节点定位到第一条与之相连的 Network
+            self.tree_index.add_group((link_info['start_node'], link_info['end_node']), network_item, 0)
+            logger.debug(f"添加{link_info['parent']}链接: {network_name} ({link_info['start_node']} -> {link_info['end_node']})")
+        else:
+            logger.warning(f"Network {network_name} 缺少起点或终点")
+            QTreeWidgetItem(network_item, ["错误: 缺少起点或终点"])
+        return network_item
+
+    def parse_subnets(self, net, net_item, links):
         """解析SubNet节点（无TotalNetwork情况）"""
         logger.info("解析SubNet结构")
-        segment_idx = len(self.segments)  # 当前段的起始索引
-        
+
         # 首先解析FromDeviceOrConnector和ToDeviceOrConnector（TwoDeviceNet格式）
-        self.parse_device_connectors(net, net_item)
-        
-        for subnet in net.findall("SubNet"):
-            subnet_name = subnet.get("name", "未命名子网")
+        self.parse_device_connectors(net['connectors'], net_item)
+
+        for subnet in net['subnets']:
+            subnet_name = subnet['name']
             subnet_item = QTreeWidgetItem(net_item, [f"SubNet: {subnet_name}"])
             subnet_item.setData(0, Qt.UserRole, {"type": "subnet", "name": subnet_name})
-            
+
             # 解析FromDeviceOrConnector和ToDeviceOrConnector（如果在SubNet级别）
-            self.parse_device_connectors(subnet, subnet_item)
-            
+            self.parse_device_connectors(subnet['connectors'], subnet_item)
+
             # 解析Segement
-            for segement in subnet.findall("Segement"):
-                segement_name = segement.get("name", "未命名段")
+            for segement in subnet['segements']:
+                segement_name = segement['name']
                 segement_item = QTreeWidgetItem(subnet_item, [f"Segement: {segement_name}"])
                 segement_item.setData(0, Qt.UserRole, {"type": "segement", "name": segement_name})
-                
+
                 # 解析NetStartPoint和NetEndPoint
-                net_start = segement.find("NetStartPoint")
-                net_end = segement.find("NetEndPoint")
-                
-                if net_start is not None and net_end is not None:
-                    start_device = net_start.get("name", "未知起始设备")
-                    end_device = net_end.get("name", "未知终止设备")
-                    
+                if segement['route'] is not None:
+                    start_device, end_device = segement['route']
                     info_item = QTreeWidgetItem(segement_item, [f"路径: {start_device} -> {end_device}"])
                     info_item.setData(0, Qt.UserRole, {
                         "type": "route_info",
                         "start": start_device,
                         "end": end_device
                     })
-                
+
                 # 解析Network节点
-                for network in segement.findall("Network"):
-                    network_name = network.get("name", f"未命名网络{segment_idx}")
-                    network_item = QTreeWidgetItem(segement_item, [f"Network: {network_name}"])
-                    network_item.setData(0, Qt.UserRole, {
-                        "type": "network",
-                        "name": network_name,
-                        "index": segment_idx
-                    })
-                    
-                    # 处理起点和终点
-                    start_point = network.find("StartPoint")
-                    end_point = network.find("EndPoint")
-                    
-                    if start_point is not None and end_point is not None:
-                        start_name = start_point.get("name", "未命名起点")
-                        start_x = float(start_point.get("x", 0))
-                        start_y = float(start_point.get("y", 0))
-                        start_z = float(start_point.get("z", 0))
-                        
-                        end_name = end_point.get("name", "未命名终点")
-                        end_x = float(end_point.get("x", 0))
-                        end_y = float(end_point.get("y", 0))
-                        end_z = float(end_point.get("z", 0))
-                        
-                        # 添加Start点和End点到节点列表
-                        self.unique_nodes[start_name] = (start_x, start_y, start_z)
-                        self.unique_nodes[end_name] = (end_x, end_y, end_z)
-                        
-                        # 添加连接信息
-                        link_info = {
-                            "type": "link",
-                            "start_node": start_name,
-                            "end_node": end_name,
-                            "start_pos": (start_x, start_y, start_z),
-                            "end_pos": (end_x, end_y, end_z),
-                            "network_name": network_name,
-                            "parent": f"SubNet:{subnet_name}",
-                            "segement": segement_name
-                        }
-                        
-                        self.segments.append((
-                            (start_x, start_y, start_z),
-                            (end_x, end_y, end_z),
-                            segment_idx
-                        ))
-                        
-                        # 存储链接数据
-                        self.link_data[segment_idx] = link_info
-                        
-                        # 记录节点相关的链接
-                        if start_name not in self.node_to_links:
-                            self.node_to_links[start_name] = []
-                        self.node_to_links[start_name].append(segment_idx)
-                        
-                        if end_name not in self.node_to_links:
-                            self.node_to_links[end_name] = []
-                        self.node_to_links[end_name].append(segment_idx)
-                        
-                        logger.debug(f"添加SubNet链接: {network_name} ({start_name} -> {end_name})")
-                        segment_idx += 1
-                    else:
-                        logger.warning(f"Network {network_name} in SubNet 缺少起点或终点")
-                        error_item = QTreeWidgetItem(network_item, ["错误: 缺少起点或终点"])
+                for network in segement['networks']:
+                    self.add_network_item(network, segement_item, next(links))
 
-    def parse_device_connectors(self, parent_element, parent_item):
+    def parse_device_connectors(self, connectors, parent_item):
         """解析FromDeviceOrConnector和ToDeviceOrConnector节点"""
-        from_device = parent_element.find("FromDeviceOrConnector")
-        to_device = parent_element.find("ToDeviceOrConnector")
-        
+        from_device, to_device = connectors
+
         if from_device is not None or to_device is not None:
             connectors_item = QTreeWidgetItem(parent_item, ["设备连接器"])
             connectors_item.setData(0, Qt.UserRole, {"type": "connectors"})
-            
+
             if from_device is not None:
-                device_name = from_device.get("name", "未命名起始设备")
-                x = float(from_device.get("x", 0))
-                y = float(from_device.get("y", 0))
-                z = float(from_device.get("z", 0))
-                
+                device_name, x, y, z = from_device
                 from_item = QTreeWidgetItem(connectors_item, [f"起始设备: {device_name}"])
                 from_item.setData(0, Qt.UserRole, {
                     "type": "from_device",
@@ -636,17 +775,11 @@ class MainWindow(QWidget):
                     "y": y,
                     "z": z
                 })
-                
-                # 添加到唯一节点列表
-                self.unique_nodes[device_name] = (x, y, z)
+                self.tree_index.add_item(device_name, from_item)
                 logger.debug(f"添加起始设备节点: {device_name} at ({x}, {y}, {z})")
-            
+
             if to_device is not None:
-                device_name = to_device.get("name", "未命名终止设备")
-                x = float(to_device.get("x", 0))
-                y = float(to_device.get("y", 0))
-                z = float(to_device.get("z", 0))
-                
+                device_name, x, y, z = to_device
                 to_item = QTreeWidgetItem(connectors_item, [f"终止设备: {device_name}"])
                 to_item.setData(0, Qt.UserRole, {
                     "type": "to_device",
@@ -655,9 +788,7 @@ class MainWindow(QWidget):
                     "y": y,
                     "z": z
                 })
-                
-                # 添加到唯一节点列表
-                self.unique_nodes[device_name] = (x, y, z)
+                self.tree_index.add_item(device_name, to_item)
                 logger.debug(f"添加终止设备节点: {device_name} at ({x}, {y}, {z})")
 
     def create_node_shapes(self):
@@ -665,15 +796,12 @@ class MainWindow(QWidget):
         logger.info(f"创建节点形状，节点数量: {len(self.unique_nodes)}")
         self.node_shapes = []  # 重置节点形状列表
         self.node_id_map = {}  # 重置节点ID映射
-
-        # 设置球体的半径
-        radius = 25.0  # 球体的半径，可以根据需要调整
+        aliases = self.node_merge.aliases()
 
         for i, (node_name, node_pos) in enumerate(self.unique_nodes.items()):
             try:
-                # 创建球体
-                center = gp_Pnt(*node_pos)
-                sphere = BRepPrimAPI_MakeSphere(center, radius).Shape()
+                # 球体实例（所有节点共享同一个原型球体）
+                sphere = self.primitives.sphere(node_pos)
                 if sphere.IsNull():
                     logger.warning(f"创建节点 {node_name} 的球体失败")
                     continue
@@ -692,7 +820,8 @@ class MainWindow(QWidget):
                     "type": "node",
                     "name": node_name,
                     "coordinates": node_pos,
-                    "connected_links": self.node_to_links.get(node_name, [])
+                    "connected_links": self.node_to_links.get(node_name, []),
+                    "merged": aliases.get(node_name, [])
                 }
                 
             except Exception as e:
@@ -714,13 +843,24 @@ class MainWindow(QWidget):
             self.status_bar.showMessage(f"正在绘制 {len(self.segments)} 条线段...")
             QApplication.processEvents()
 
-            # 清除之前的线段
-            for shape in self.segment_shapes:
-                if self.viewer._display.IsDisplayed(shape):
-                    self.viewer._display.Erase(shape)
+            # 清除之前的线段和节点
+            for shape_id in self.segment_shapes + [f"node_{i}" for i in range(len(self.node_shapes))]:
+                ais_obj = self.ais_shapes.pop(shape_id, None)
+                if ais_obj is not None:
+                    self.shape_index.remove(ais_obj.Shape())
+                    self.context.Remove(ais_obj, False)
+            self.shape_layers.clear()
+            self.centerline_display.clear()
+            self.highlighted_shapes = []
+            self.highlight_state.clear()
 
             self.segment_shapes.clear()
             self.total_network_shapes = []  # 清除TotalNetwork相关的形状
+            # 分层模式下每个 Net 只创建一个显示对象；中心线模式不创建实体
+            display_mode = self.display_mode_combo.currentText()
+            centerline = display_mode == DISPLAY_MODE_CENTERLINE
+            layered = display_mode == DISPLAY_MODE_LAYERED or centerline
+            self.layer_display = self.centerline_display if centerline else self.shape_layers
 
             # 为进度显示预处理
             progress = QProgressDialog("绘制线段...", None, 0, len(self.segments), self)
@@ -736,50 +876,8 @@ class MainWindow(QWidget):
                 QApplication.processEvents()
                 
                 try:
-                    # 创建起点和终点
-                    p1 = gp_Pnt(start[0], start[1], start[2])
-                    p2 = gp_Pnt(end[0], end[1], end[2])
-                    
-                    # 创建方向和轴
-                    v = gp_Vec(p1, p2)
-                    direction = gp_Dir(v)
-                    
-                    # 计算长度和半径
-                    length = v.Magnitude()
-                    radius = 5.0  # 默认半径
-                    
-                    # 检查长度，防止太短
-                    if length < 1e-5:
-                        logger.warning(f"线段 {idx} 长度为 {length}，太短无法绘制")
-                        continue
-                    
-                    # 创建圆柱体作为线段
-                    axis = gp_Ax2(p1, direction)
-                    cylinder = BRepPrimAPI_MakeCylinder(axis, radius, length).Shape()
-                    
-                    # 创建AIS对象
-                    ais_shape = AIS_Shape(cylinder)
-                    ais_shape.SetColor(Quantity_Color(0, 0, 1, Quantity_TOC_RGB))  # 蓝色
-                    
-                    # 将形状添加到Interactive Context
-                    self.context.Display(ais_shape, False)
-                    
-                    # 直接使用索引作为形状ID（而不是尝试获取Handle）
-                    shape_id = idx  # 使用线段的索引作为ID
-                    self.segment_shapes.append(shape_id)
-                    # 存储AIS对象，用于后续访问
-                    self.ais_shapes[shape_id] = ais_shape
-                    self.shape_to_info[shape_id] = {
-                        "type": "link",
-                        "index": idx,
-                        **self.link_data.get(idx, {})
-                    }
-                    
-                    # 如果这个线段是TotalNetwork的子网络，将其添加到total_network_shapes
-                    link_info = self.link_data.get(idx, {})
-                    if link_info.get("parent") == "TotalNetwork":
-                        self.total_network_shapes.append(shape_id)
-                        
+                    if self.display_link(start, end, idx, display_mode):
+                        self.register_link(idx)
                 except Exception as e:
                     logger.error(f"绘制线段 {idx} 时出错: {str(e)}")
                     logger.error(traceback.format_exc())
@@ -789,26 +887,13 @@ class MainWindow(QWidget):
             # 绘制节点（如果有）
             if self.node_shapes:
                 logger.info("开始绘制节点...")
-                
-                for i, sphere in enumerate(self.node_shapes):
-                    try:
-                        # 获取节点ID
-                        node_shape_id = f"node_{i}"
-                        
-                        # 创建AIS形状用于显示
-                        ais_sphere = AIS_Shape(sphere)
-                        ais_sphere.SetColor(Quantity_Color(Quantity_NOC_RED))  # 设置为红色
-                        
-                        # 显示球体
-                        self.context.Display(ais_sphere, False)
-                        
-                        # 存储AIS对象，用于后续访问
-                        self.ais_shapes[node_shape_id] = ais_sphere
-                    except Exception as e:
-                        logger.error(f"绘制节点 {i} 时出错: {str(e)}")
-                        logger.error(traceback.format_exc())
-                
+                self.display_nodes(display_mode)
                 logger.info(f"成功绘制 {len(self.node_shapes)} 个节点")
+
+            # 分层模式：每个 Net 一个复合体，节点单独一层
+            if layered:
+                self.layer_display.build(Quantity_Color(0, 0, 1, Quantity_TOC_RGB),
+                                         {NODE_LAYER: Quantity_Color(Quantity_NOC_RED)})
             
             # 更新显示
             self.viewer._display.View.Update()
@@ -824,121 +909,324 @@ class MainWindow(QWidget):
             logger.error(traceback.format_exc())
             QMessageBox.critical(self, "绘制错误", f"绘制线段时出错: {str(e)}")
 
-    def draw_imported_shapes(self, show_progress=True):
-        """显示导入的STEP/IGES形状"""
+    def display_link(self, start, end, idx, display_mode, cylinder=None):
+        """
+        把线段 idx 按所属 Net 加入显示，返回是否加入（线段太短时跳过）
+
+        cylinder 为已有的圆柱体（重新加载时位置未变的线段直接复用）。
+        """
+        net_name = self.link_data.get(idx, {}).get("net", "未命名网络")
+        if display_mode == DISPLAY_MODE_CENTERLINE:
+            # 只记录端点，由图层统一生成线段图元数组
+            self.layer_display.add_segment(net_name, idx, start, end)
+            return True
+
+        if cylinder is None:
+            # 圆柱体实例（共享同一长度桶的原型）
+            cylinder = self.primitives.segment_cylinder(start, end, idx)
+            if cylinder is None:
+                return False
+        if display_mode == DISPLAY_MODE_LAYERED:
+            # 按所属 Net 放入图层
+            self.layer_display.add(net_name, idx, cylinder)
+        else:
+            # 创建AIS对象（直接使用线段的索引作为形状ID）
+            ais_shape = AIS_Shape(cylinder)
+            ais_shape.SetColor(self.default_colors['segment'])
+
+            # 将形状添加到Interactive Context
+            self.context.Display(ais_shape, False)
+            # 存储AIS对象，用于后续访问
+            self.ais_shapes[idx] = ais_shape
+            self.shape_index.add(cylinder, idx)
+        return True
+
+    def register_link(self, idx):
+        """登记已显示的线段：形状ID列表、查询信息，以及 TotalNetwork 下的线段"""
+        link_info = self.link_data.get(idx, {})
+        self.segment_shapes.append(idx)
+        self.shape_to_info[idx] = {
+            "type": "link",
+            "index": idx,
+            **link_info
+        }
+        # 如果这个线段是TotalNetwork的子网络，将其添加到total_network_shapes
+        if link_info.get("parent") == "TotalNetwork":
+            self.total_network_shapes.append(idx)
+
+    def display_nodes(self, display_mode, node_ids=None):
+        """把节点（node_ids 为 None 时为全部节点）加入显示：分层和中心线模式下加入节点图层，独立形状模式下直接显示"""
+        if display_mode == DISPLAY_MODE_CENTERLINE:
+            # 中心线模式下节点绘制为点图元
+            for node_name, node_shape_id in self.node_id_map.items():
+                if node_ids is None or node_shape_id in node_ids:
+                    self.layer_display.add_point(NODE_LAYER, node_shape_id, self.unique_nodes[node_name])
+            return
+
+        for i, sphere in enumerate(self.node_shapes):
+            # 获取节点ID
+            node_shape_id = f"node_{i}"
+            if node_ids is not None and node_shape_id not in node_ids:
+                continue
+            try:
+                if display_mode == DISPLAY_MODE_LAYERED:
+                    self.layer_display.add(NODE_LAYER, node_shape_id, sphere)
+                    continue
+
+                # 创建AIS形状用于显示
+                ais_sphere = AIS_Shape(sphere)
+                ais_sphere.SetColor(self.default_colors['node'])  # 设置为红色
+
+                # 显示球体
+                self.context.Display(ais_sphere, False)
+
+                # 存储AIS对象，用于后续访问
+                self.ais_shapes[node_shape_id] = ais_sphere
+                self.shape_index.add(sphere, node_shape_id)
+            except Exception as e:
+                logger.error(f"绘制节点 {i} 时出错: {str(e)}")
+                logger.error(traceback.format_exc())
+
+    def on_watch_toggled(self, checked):
+        """开启或关闭源文件监视"""
+        if checked and self.xml_file_path:
+            self.source_watcher.watch(self.xml_file_path)
+            self.status_bar.showMessage(f"正在监视源文件: {os.path.basename(self.xml_file_path)}")
+        else:
+            self.source_watcher.stop()
+
+    def reload_source_file(self, file_path=None):
+        """
+        源文件变化后重新加载（见 apply_source_reload）
+
+        解析和更新场景时会处理界面事件，期间再次收到变化只做记录，本次完成后再重新加载一次。
+        """
+        if self.reloading:
+            self.reload_pending = True
+            return
+        self.reloading = True
+        try:
+            self.apply_source_reload(file_path or self.xml_file_path)
+        finally:
+            self.reloading = False
+        if self.reload_pending:
+            self.reload_pending = False
+            QTimer.singleShot(0, self.reload_source_file)
+
+    def apply_source_reload(self, file_path):
+        """
+        重新解析源文件，并按差异更新场景（见 update_scene）
+
+        相机保持不变；保留下来的链接和节点即使 shape_id 变化也保持高亮，对应的树项重新选中。
+        """
+        if not file_path:
+            return
+        logger.info(f"重新加载源文件: {file_path}")
+        started = time.perf_counter()
+        try:
+            # 先完整读取一遍：文件还没有写完（XML 不完整）时保持当前模型，
+            # 否则只读到的部分 Net 会让差异把其余链接当作删除；读取成功后写入缓存，下面的解析直接从缓存读取
+            for _ in self.harness_cache.iter_xml_nets(file_path):
+                pass
+        except Exception as e:
+            logger.error(f"重新读取XML文件时出错: {str(e)}")
+            logger.error(traceback.format_exc())
+            self.status_bar.showMessage(f"重新加载失败，保持当前模型: {str(e)}")
+            return
+
+        try:
+            old_links = self.link_data
+            old_nodes = {name: (self.node_id_map[name], pos) for name, pos in self.unique_nodes.items()
+                         if name in self.node_id_map}
+            old_cylinders = {idx: self.shape_layers.shape_of(idx) for idx in self.segment_shapes}
+            highlighted = list(self.highlighted_shapes)
+            path_source = self.path_source
+            drawn = bool(self.segment_shapes)
+            # 按旧的 shape_id 恢复默认颜色，更新场景之后再按新的 shape_id 高亮
+            self.highlight_state.select([], self.apply_highlight_color)
+            self.highlight_state.clear()
+            self.highlighted_shapes = []
+
+            self.parse_xml_and_populate_tree(file_path, reload=True)
+            new_nodes = {name: (node_shape_id, self.unique_nodes[name]) for name, node_shape_id in self.node_id_map.items()}
+            diff = diff_harness(old_links, self.link_data, old_nodes, new_nodes)
+            mapping = diff.shape_map()
+
+            if drawn:
+                self.update_scene(diff, old_links, old_cylinders)
+            else:
+                self.draw_segments()
+
+            if path_source is not None:
+                source = mapping.get(f"node_{path_source}")
+                self.path_source = None if source is None else int(source.split('_')[1])
+            highlighted = [mapping[shape_id] for shape_id in highlighted if shape_id in mapping]
+            self.highlight_shapes(highlighted)
+            if highlighted:
+                self.find_and_select_tree_item(highlighted[0])
+                if len(highlighted) == 1:
+                    if isinstance(highlighted[0], int):
+                        self.display_link_info(highlighted[0])
+                    else:
+                        self.display_node_info(highlighted[0])
+            self.refresh_metrics_table()
+
+            elapsed = time.perf_counter() - started
+            logger.info(f"重新加载完成，耗时 {elapsed:.3f}s")
+            self.status_bar.showMessage(f"已重新加载 {os.path.basename(file_path)}（{elapsed:.2f}s）: {diff.describe()}")
+        except Exception as e:
+            logger.error(f"重新加载源文件时出错: {str(e)}")
+            logger.error(traceback.format_exc())
+            QMessageBox.warning(self, "重新加载错误", f"重新加载源文件时出现错误: {str(e)}")
+
+    def update_scene(self, diff, old_links, old_cylinders):
+        """
+        按重新加载的差异（harness_diff.HarnessDiff）更新显示，不重建未变化的部分
+
+        分层和中心线模式下只重建包含新增、删除或改变了 Net 的链接的图层（有节点增删时重建节点图层），
+        其余图层只修改 shape_id，隐藏状态保持不变；独立形状模式下只移除和创建增删的 AIS 对象。
+        old_cylinders 为重新加载前分层显示中各线段的圆柱体（旧 shape_id -> TopoDS_Shape）。
+        """
+        mapping = diff.shape_map()
+        display_mode = self.display_mode_combo.currentText()
+        net_of = lambda links, idx: links.get(idx, {}).get("net", "未命名网络")
+        segments = {idx: (start, end) for start, end, idx in self.segments}
+
+        if display_mode == DISPLAY_MODE_SHAPES:
+            for shape_id in diff.removed_links + diff.removed_nodes:
+                ais_obj = self.ais_shapes.pop(shape_id, None)
+                if ais_obj is not None:
+                    self.shape_index.remove(ais_obj.Shape())
+                    self.context.Remove(ais_obj, False)
+            self.ais_shapes = {mapping.get(shape_id, shape_id): ais for shape_id, ais in self.ais_shapes.items()}
+            self.shape_index.rekey(mapping)
+            for idx in diff.added_links:
+                self.display_link(*segments[idx], idx, display_mode)
+            self.display_nodes(display_mode, set(diff.added_nodes))
+            logger.info(f"场景增量更新: 移除 {len(diff.removed_links) + len(diff.removed_nodes)} 个形状，"
+                        f"新增 {len(diff.added_links) + len(diff.added_nodes)} 个形状")
+        else:
+            affected = {net_of(old_links, idx) for idx in diff.removed_links}
+            affected.update(net_of(self.link_data, idx) for idx in diff.added_links)
+            previous = {new: old for old, new in diff.link_map.items()}
+            for idx in diff.changed_links:
+                old_net, new_net = net_of(old_links, previous[idx]), net_of(self.link_data, idx)
+                if old_net != new_net:
+                    affected.update((old_net, new_net))
+            if diff.removed_nodes or diff.added_nodes:
+                affected.add(NODE_LAYER)
+            hidden = self.layer_display.hidden & affected
+
+            self.layer_display.remove_layers(affected)
+            self.layer_display.rekey(mapping)
+            for idx, (start, end) in segments.items():
+                if net_of(self.link_data, idx) in affected:
+                    self.display_link(start, end, idx, display_mode, old_cylinders.get(previous.get(idx)))
+            if NODE_LAYER in affected:
+                self.display_nodes(display_mode)
+            self.layer_display.build(self.default_colors['segment'], {NODE_LAYER: self.default_colors['node']})
+            self.layer_display.hide(hidden)
+            logger.info(f"场景增量更新: 重建 {len(affected)} 个图层，当前共 {len(self.layer_display.layers)} 个图层")
+
+        # 重新登记仍在显示中的线段
+        self.segment_shapes = []
+        self.total_network_shapes = []
+        for idx in segments:
+            if idx in self.layer_display or idx in self.ais_shapes:
+                self.register_link(idx)
+        self.context.UpdateCurrentViewer()
+
+    def draw_imported_shapes(self):
+        """显示导入的STEP/IGES模型：每个顶层实体一个 AIS 对象，子形状通过拾取模式选择"""
         self.viewer._display.EraseAll()  # 清除现有显示
         self.ais_shapes = {}  # 清空AIS形状字典
+        self.shape_index.clear()
+        self.layer_display.clear()
+        self.cad_display.clear()
         self.highlighted_shapes = []  # 清空高亮列表
+        self.highlight_state.clear()
         
         if not self.step_shapes:
             return
-            
-        # 显示进度对话框
-        progress = None
-        if show_progress:
-            total_shapes = len(self.step_shapes)
-            progress = QProgressDialog("正在显示导入的形状...", "取消", 0, total_shapes, self)
-            progress.setWindowModality(Qt.WindowModal)
-            progress.setMinimumDuration(500)  # 设置最小显示时间为500ms
-            progress.show()
-        
-        # 批量处理形状
-        shapes_batch = []
-        batch_size = 50
-        count = 0
-        
-        for shape_id, shape in self.step_shapes.items():
-            # 更新进度条
-            if progress:
-                progress.setValue(count)
-                QCoreApplication.processEvents()
-                
-                # 如果用户取消了操作
-                if progress.wasCanceled():
-                    break
-                    
-            count += 1
-            
-            try:
-                # 使用AIS_Shape创建可视化对象
-                ais_shape = AIS_Shape(shape)
-                shapes_batch.append((shape_id, ais_shape))
-                
-                # 如果达到批处理大小或是最后一个元素，处理当前批次
-                if len(shapes_batch) >= batch_size or count == len(self.step_shapes):
-                    # 批量设置颜色和显示
-                    for id, shape in shapes_batch:
-                        # 设置默认颜色为蓝色
-                        color = Quantity_Color(Quantity_NOC_BLUE)
-                        self.viewer._display.Context.SetColor(shape, color, False)
-                        
-                        # 显示形状
-                        self.viewer._display.Context.Display(shape, False)
-                        
-                        # 存储AIS对象
-                        self.ais_shapes[id] = shape
-                    
-                    # 清空批处理列表
-                    shapes_batch = []
-                    # 更新视图
-                    self.viewer._display.Context.UpdateCurrentViewer()
-            
-            except Exception as e:
-                print(f"无法显示形状 {shape_id}: {e}")
-                continue
-        
-        # 关闭进度对话框并适配视图
-        if progress:
-            progress.setValue(len(self.step_shapes))
-            
+
+        try:
+            self.cad_display.selection_type = CAD_SELECTION_MODES[self.pick_mode_combo.currentText()]
+            object_count = self.cad_display.build(self.step_shapes, Quantity_Color(Quantity_NOC_BLUE))
+            logger.info(f"完成显示，{len(self.step_shapes)} 个子形状显示为 {object_count} 个交互对象")
+        except Exception as e:
+            logger.error(f"显示导入形状时出错: {e}")
+            logger.error(traceback.format_exc())
+            self.status_bar.showMessage(f"显示形状时出错: {str(e)}")
+
         self.viewer._display.FitAll()
         self.viewer._display.Repaint()
 
-    def highlight_shapes(self, shape_ids, highlight=True):
-        """高亮显示或取消高亮指定的形状"""
+    def on_pick_mode_changed(self, mode):
+        """切换导入模型的拾取模式（实体 / 面 / 边）"""
+        self.cad_display.set_selection_type(CAD_SELECTION_MODES[mode])
+        self.status_bar.showMessage(f"拾取模式: {mode}")
+
+    def highlight_code(self, shape_id):
+        """高亮颜色编号：节点为绿色 (2)，线段和导入形状为黄色 (1)"""
+        return 2 if isinstance(shape_id, str) and shape_id.startswith('node_') else 1
+
+    def default_color(self, shape_id):
+        """独立显示的AIS对象取消高亮后恢复的颜色"""
+        if isinstance(shape_id, str) and shape_id.startswith('node_'):
+            return self.default_colors['node']
+        if isinstance(shape_id, int):
+            return self.default_colors['segment']
+        return self.default_colors['imported']
+
+    def apply_highlight_color(self, shape_id, color):
+        """设置单个形状的颜色（color 为 None 时恢复默认颜色），不刷新视图"""
+        if shape_id in self.layer_display:
+            # 分层显示：只修改复合体中该形状的颜色，最后每个图层重新显示一次
+            if color is None:
+                self.layer_display.reset_color(shape_id)
+            else:
+                self.layer_display.set_color(shape_id, color)
+        elif shape_id in self.cad_display:
+            # 导入模型：只修改所属顶层对象中该子形状的颜色
+            if color is None:
+                self.cad_display.reset_color(shape_id)
+            else:
+                self.cad_display.set_color(shape_id, color)
+        elif shape_id in self.ais_shapes:
+            if color is None:
+                color = self.default_color(shape_id)
+            try:
+                self.context.SetColor(self.ais_shapes[shape_id], color, False)
+            except Exception as e:
+                logger.error(f"设置形状 {shape_id} 的高亮/颜色时出错: {e}")
+        else:
+            logger.warning(f"尝试高亮/取消高亮时找不到 shape_id: {shape_id}")
+
+    def highlight_shapes(self, shape_ids, update=True):
+        """
+        把高亮集合设置为 shape_ids（空列表为取消全部高亮）
+
+        与上一次的选择做差集，只重新着色颜色有变化的形状，最后只刷新一次视图
+        （update 为 False 时由调用者刷新）。
+        """
         try:
             # 确保shape_ids是列表
             if not isinstance(shape_ids, list):
                 shape_ids = [shape_ids]
-                
-            logger.debug(f"{'高亮' if highlight else '取消高亮'} {len(shape_ids)} 个形状: {shape_ids[:5]}...")
-            
-            needs_update = False
-            for shape_id in shape_ids:
-                if shape_id in self.ais_shapes:
-                    ais_obj = self.ais_shapes[shape_id]
-                    try:
-                        if highlight:
-                            # 根据形状类型设置不同的高亮颜色
-                            if isinstance(shape_id, str) and shape_id.startswith('node_'):
-                                color = Quantity_Color(Quantity_NOC_GREEN)
-                            else: # 线段或导入形状
-                                color = Quantity_Color(Quantity_NOC_YELLOW)
-                            self.context.SetColor(ais_obj, color, False)
-                        else:
-                            # 恢复默认颜色
-                            if isinstance(shape_id, str) and shape_id.startswith('node_'):
-                                color = Quantity_Color(Quantity_NOC_RED) # 默认节点颜色
-                            elif isinstance(shape_id, int): # 线段
-                                color = Quantity_Color(Quantity_NOC_BLUE) # 默认线段颜色
-                            else: # 导入形状
-                                color = Quantity_Color(0.8, 0.8, 0.8, Quantity_TOC_RGB) # 默认导入颜色
-                            self.context.SetColor(ais_obj, color, False)
-                            
-                        needs_update = True # 标记需要更新视图
-                    except Exception as e:
-                        logger.error(f"设置形状 {shape_id} 的高亮/颜色时出错: {e}")
-                        continue
-                else:
-                    logger.warning(f"尝试高亮/取消高亮时找不到 shape_id: {shape_id}")
-                    
+
+            changed = self.highlight_state.select(shape_ids, self.apply_highlight_color)
+            self.highlighted_shapes = list(shape_ids)
+            logger.debug(f"高亮 {len(shape_ids)} 个形状，重新着色 {changed} 个")
+
             # 如果有更改，只更新一次视图
-            if needs_update:
+            redisplayed = self.layer_display.redisplay_changed()
+            redisplayed = self.cad_display.redisplay_changed() or redisplayed
+            if update and (redisplayed or changed):
                 try:
                     self.context.UpdateCurrentViewer()
                 except Exception as e:
                     logger.error(f"更新视图以应用高亮时出错: {e}")
-                    
+
         except Exception as e:
             logger.error(f"高亮形状时出错: {str(e)}")
             logger.error(traceback.format_exc())
@@ -949,19 +1237,19 @@ class MainWindow(QWidget):
         if not item:
             return
 
-        # 清除之前的高亮
-        if hasattr(self, 'highlighted_shapes') and self.highlighted_shapes:
-            self.highlight_shapes(self.highlighted_shapes, False)
-        
         # 清空信息面板
         self.clear_info()
         
         # 获取项目数据
         data = item.data(0, Qt.UserRole)
-        if data is None:
+        if not isinstance(data, dict):
+            # 导入形状的条目保存形状ID（文件分支的根条目保存第一级形状的ID列表）
+            ids = data if isinstance(data, list) else [] if data is None else [data]
+            self.highlight_shapes([shape_id for shape_id in ids if shape_id in self.ais_shapes or shape_id in self.cad_display])
             return
         
         item_type = data.get("type")
+        ids_to_highlight = []
         
         # 处理TotalNetwork点击 - 显示/隐藏所有子网络
         if item_type == "total_network":
@@ -969,21 +1257,33 @@ class MainWindow(QWidget):
             if hasattr(self, 'total_network_shapes') and self.total_network_shapes:
                 # 检查第一个形状的可见性来确定当前状态
                 first_shape = self.total_network_shapes[0] if self.total_network_shapes else None
-                if first_shape:
-                    # 获取当前可见性状态
-                    current_visibility = not self.viewer._display.IsDisplayed(first_shape)
-                    
-                    # 显示或隐藏所有相关形状
-                    for shape_id in self.total_network_shapes:
-                        # 获取与ID对应的AIS_Shape对象
-                        if shape_id in self.ais_shapes:
-                            ais_obj = self.ais_shapes[shape_id]
-                            if current_visibility:
-                                self.context.Display(ais_obj, False)  # 显示，不立即更新
-                            else:
-                                self.context.Erase(ais_obj, False)    # 隐藏，不立即更新
+                if first_shape is not None:
+                    if first_shape in self.layer_display:
+                        # 分层显示：TotalNetwork 所在的 Net 图层整体显示或隐藏
+                        layers = self.layer_display.layers_of(self.total_network_shapes)
+                        current_visibility = any(layer in self.layer_display.hidden for layer in layers)
+                        if current_visibility:
+                            self.layer_display.show(layers)
+                        else:
+                            self.layer_display.hide(layers)
+                    else:
+                        # 获取当前可见性状态
+                        first_ais = self.ais_shapes.get(first_shape)
+                        current_visibility = first_ais is not None and not self.context.IsDisplayed(first_ais)
+                        
+                        # 显示或隐藏所有相关形状
+                        for shape_id in self.total_network_shapes:
+                            # 获取与ID对应的AIS_Shape对象
+                            if shape_id in self.ais_shapes:
+                                ais_obj = self.ais_shapes[shape_id]
+                                if current_visibility:
+                                    self.context.Display(ais_obj, False)  # 显示，不立即更新
+                                else:
+                                    self.context.Erase(ais_obj, False)    # 隐藏，不立即更新
                     
-                    self.viewer._display.Repaint()
+                    # 清除之前的高亮（与可见性变化一起刷新视图）
+                    self.highlight_shapes([], update=False)
+                    self.context.UpdateCurrentViewer()
                     
                     # 更新状态栏
                     status = "显示" if current_visibility else "隐藏"
@@ -1000,19 +1300,20 @@ class MainWindow(QWidget):
             if network_idx is not None and network_idx in self.link_data:
                 self.display_link_info(network_idx)
                 
-                # 如果在segment_shapes中找到对应的形状，则高亮显示
-                if network_idx < len(self.segment_shapes):
-                    shape_id = self.segment_shapes[network_idx]
-                    self.highlight_shapes([shape_id])
+                # 线段使用链接索引作为形状ID
+                if network_idx in self.ais_shapes or network_idx in self.layer_display:
+                    ids_to_highlight = [network_idx]
         
         # 处理device或isopt点击，显示节点信息
         elif item_type in ["device", "isopt"]:
-            node_name = data.get("name")
+            node_name = self.node_merge.resolve(data.get("name"))
             if node_name in self.node_id_map:
-                node_idx = self.node_id_map[node_name]
-                shape_id = self.node_shapes[node_idx]
+                shape_id = self.node_id_map[node_name]
                 self.display_node_info(shape_id)
-                self.highlight_shapes([shape_id])
+                ids_to_highlight = [shape_id]
+
+        # 与之前的高亮做差集，只重新着色变化的形状
+        self.highlight_shapes(ids_to_highlight)
 
     def display_node_info(self, node_shape_id):
         """显示节点信息"""
@@ -1031,6 +1332,8 @@ class MainWindow(QWidget):
             info_text = f"节点名称: {node_name}\n"
             info_text += f"(内部 ID: {node_shape_id})\n"
             info_text += f"坐标: X={coords[0]:.2f}, Y={coords[1]:.2f}, Z={coords[2]:.2f}\n"
+            if node_info.get('merged'):
+                info_text += f"合并的重合节点: {', '.join(node_info['merged'])}\n"
             info_text += f"连接的链接数: {len(connected_links)}\n\n"
 
             # 添加连接的链接信息
@@ -1103,6 +1406,204 @@ class MainWindow(QWidget):
             logger.error(traceback.format_exc())
             self.status_bar.showMessage(f"显示链接信息时出错: {str(e)}")
             
+    def apply_node_merge(self):
+        """按当前容差合并解析得到的节点，并在合并后的拓扑上检测 Segement 断口"""
+        builder = self.xml_builder
+        self.node_merge = merge_nodes(builder.unique_nodes, self.merge_tolerance_spin.value())
+        self.unique_nodes = self.node_merge.nodes
+        self.node_to_links = self.node_merge.merge_links(builder.node_to_links)
+        self.route_gaps = find_route_gaps(self.link_data, self.node_merge.resolve)
+        message = f"合并了 {len(self.node_merge.representative)} 个重合节点，发现 {len(self.route_gaps)} 个路径断口"
+        logger.info(message)
+        self.status_bar.showMessage(message)
+        if self.node_merge.clusters or self.route_gaps:
+            logger.info(format_merge_report(self.node_merge, self.route_gaps))
+
+    def on_merge_tolerance_changed(self):
+        """修改合并容差后重新合并节点并重绘"""
+        if self.xml_builder is None or not self.xml_builder.unique_nodes:
+            return
+        if self.merge_tolerance_spin.value() == self.node_merge.tolerance:
+            return
+        # 先移除按旧拓扑创建的节点显示对象和信息
+        for i in range(len(self.node_shapes)):
+            node_shape_id = f"node_{i}"
+            ais_obj = self.ais_shapes.pop(node_shape_id, None)
+            if ais_obj is not None:
+                self.shape_index.remove(ais_obj.Shape())
+                self.context.Remove(ais_obj, False)
+            self.shape_to_info.pop(node_shape_id, None)
+        self.node_shapes = []
+        self.apply_node_merge()
+        self.build_node_index()
+        self.build_node_graph()
+        self.create_node_shapes()
+        self.draw_segments()
+
+    def show_merge_report(self):
+        """在信息区域显示重合节点簇和路径断口"""
+        self.info_text.setText(format_merge_report(self.node_merge, self.route_gaps))
+
+    def build_node_index(self):
+        """为当前的唯一节点建立空间索引（下标与 'node_i' 一致）"""
+        self.node_index_refs = list(self.unique_nodes)
+        coords = list(self.unique_nodes.values())
+        self.node_index = NodeSpatialIndex(coords)
+
+    def build_node_graph(self):
+        """由 node_to_links 建立节点拓扑图（下标与空间索引一致，边权为链接两端节点之间的长度）"""
+        self.node_graph = graph_from_node_links(self.node_index_refs, self.node_to_links, self.node_index.coords)
+        self.path_source = None
+
+    def selected_node_number(self):
+        """当前选中的节点在空间索引中的下标；没有选中节点时返回 None"""
+        for shape_id in self.highlighted_shapes[:1]:
+            if isinstance(shape_id, str) and shape_id.startswith('node_'):
+                return int(shape_id.split('_')[1])
+        return None
+
+    def find_nearest_nodes(self):
+        """高亮并列出与选中节点最近的若干个节点"""
+        number = self.selected_node_number()
+        if number is None or self.node_index is None:
+            self.status_bar.showMessage("请先在视图或树中选择一个节点")
+            return
+        k = self.neighbour_count_spin.value()
+        indices, distances = self.node_index.nearest(self.node_index.coords[number], k + 1)
+        found = [(i, d) for i, d in zip(indices[0].tolist(), distances[0].tolist()) if i >= 0 and i != number]
+        self.show_neighbour_nodes(number, found[:k], f"最近的 {k} 个节点")
+
+    def find_nodes_in_radius(self):
+        """高亮并列出选中节点指定半径内的所有节点"""
+        number = self.selected_node_number()
+        if number is None or self.node_index is None:
+            self.status_bar.showMessage("请先在视图或树中选择一个节点")
+            return
+        radius = self.neighbour_radius_spin.value()
+        indices, distances = self.node_index.radius(self.node_index.coords[number], radius)[0]
+        found = [(i, d) for i, d in zip(indices.tolist(), distances.tolist()) if i != number]
+        self.show_neighbour_nodes(number, found, f"半径 {radius:g} 内的节点")
+
+    def build_metrics(self, frame):
+        """由链接表建立线束统计并刷新统计表"""
+        self.harness_metrics = HarnessMetrics(frame, XML_METRIC_GROUPS, 'net')
+        self.refresh_metrics_table()
+
+    def refresh_metrics_table(self):
+        """按当前分组显示统计表；隐藏的 Net 只做增量扣除，不重新统计全部链接"""
+        if self.harness_metrics is None:
+            self.metrics_model.set_frame(None)
+            return
+        self.harness_metrics.set_hidden(self.layer_display.hidden)
+        self.metrics_model.set_frame(self.harness_metrics.table(self.metrics_group_combo.currentText()))
+        # 保持用户点击表头选择的排序
+        header = self.metrics_table.horizontalHeader()
+        self.metrics_model.sort(header.sortIndicatorSection(), header.sortIndicatorOrder())
+
+    def export_metrics_csv(self):
+        """把当前显示的统计表导出为 CSV 文件"""
+        if self.harness_metrics is None:
+            self.status_bar.showMessage("没有可导出的统计数据")
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self, "保存统计表为 CSV 文件", "", "CSV 文件 (*.csv)")
+        if not file_path:
+            logger.info("用户取消了统计表导出")
+            return
+        try:
+            write_metrics_csv(self.metrics_model.frame(), file_path)
+            self.status_bar.showMessage(f"统计表已导出到 {file_path}")
+            logger.info(f"统计表已导出到 {file_path}")
+        except Exception as e:
+            logger.error(f"导出统计表时出错: {str(e)}")
+            logger.error(traceback.format_exc())
+            QMessageBox.critical(self, "导出错误", f"导出统计表时出错: {str(e)}")
+
+    def set_path_source(self):
+        """把当前选中的节点设为最短路径的起点"""
+        number = self.selected_node_number()
+        if number is None or self.node_graph is None:
+            self.status_bar.showMessage("请先在视图或树中选择一个节点")
+            return
+        self.path_source = number
+        self.status_bar.showMessage(f"最短路径起点: {self.node_index_refs[number]}，请选择终点节点后点击“最短路径”")
+
+    def find_shortest_path(self):
+        """高亮起点到当前选中节点之间按长度最短的路径"""
+        number = self.selected_node_number()
+        if number is None or self.node_graph is None:
+            self.status_bar.showMessage("请先在视图或树中选择一个节点")
+            return
+        if self.path_source is None:
+            self.status_bar.showMessage("请先选择起点节点并点击“设为起点”")
+            return
+        source_name = self.node_index_refs[self.path_source]
+        target_name = self.node_index_refs[number]
+        started = time.perf_counter()
+        result = self.node_graph.shortest_path(self.path_source, number)
+        elapsed = (time.perf_counter() - started) * 1000
+        if result is None:
+            self.status_bar.showMessage(f"{source_name} 与 {target_name} 不连通")
+            logger.info(f"最短路径查询 {source_name} -> {target_name}: 不连通 ({elapsed:.1f} ms)")
+            return
+        nodes, links, length = result
+        lines = [f"最短路径 {source_name} -> {target_name}: {len(links)} 条链接，总长度 {length:.2f}"]
+        lines += [f"- {self.node_index_refs[i]}" for i in nodes[:20]]
+        if len(nodes) > 20:
+            lines.append(f"... 以及其他 {len(nodes) - 20} 个节点")
+        self.show_graph_result(number, nodes, links, lines)
+        logger.info(f"最短路径查询 {source_name} -> {target_name}: {len(links)} 条链接，"
+                    f"长度 {length:.2f} ({elapsed:.1f} ms)")
+
+    def find_k_hop_nodes(self):
+        """高亮选中节点 K 跳以内的节点和它们之间的链接"""
+        number = self.selected_node_number()
+        if number is None or self.node_graph is None:
+            self.status_bar.showMessage("请先在视图或树中选择一个节点")
+            return
+        k = self.hop_count_spin.value()
+        started = time.perf_counter()
+        nodes, hops, links = self.node_graph.k_hop([number], k)
+        elapsed = (time.perf_counter() - started) * 1000
+        lines = [f"{self.node_index_refs[number]} 的 {k} 跳邻域: {len(nodes) - 1} 个节点，{len(links)} 条链接"]
+        lines += [f"- 第 {hop} 跳: {int((hops == hop).sum())} 个节点" for hop in range(1, k + 1)]
+        self.show_graph_result(number, nodes.tolist(), links.tolist(), lines)
+        logger.info(f"K 跳邻域查询 {self.node_index_refs[number]}: k={k}，{len(nodes)} 个节点 ({elapsed:.1f} ms)")
+
+    def find_connected_component(self):
+        """高亮选中节点所在的连通分量"""
+        number = self.selected_node_number()
+        if number is None or self.node_graph is None:
+            self.status_bar.showMessage("请先在视图或树中选择一个节点")
+            return
+        started = time.perf_counter()
+        nodes, links = self.node_graph.component(number)
+        elapsed = (time.perf_counter() - started) * 1000
+        lines = [f"{self.node_index_refs[number]} 所在的连通分量: {len(nodes)} 个节点，{len(links)} 条链接"
+                 f"（全图共 {self.node_graph.component_count()} 个连通分量）"]
+        self.show_graph_result(number, nodes.tolist(), links.tolist(), lines)
+        logger.info(f"连通分量查询 {self.node_index_refs[number]}: {len(nodes)} 个节点 ({elapsed:.1f} ms)")
+
+    def show_graph_result(self, number, nodes, links, lines):
+        """一次性高亮拓扑查询得到的节点和链接（选中节点排在最前，便于继续查询），并在信息区域追加结果"""
+        node_shape_id = f"node_{number}"
+        self.highlight_shapes([node_shape_id] + [f"node_{i}" for i in nodes if i != number] + list(links))
+        self.display_node_info(node_shape_id)
+        self.info_text.append("\n".join(lines))
+        self.status_bar.showMessage(lines[0])
+
+    def show_neighbour_nodes(self, number, found, title):
+        """高亮选中节点及其邻近节点，并在信息区域追加列表（最多列出前 20 个）"""
+        node_shape_id = f"node_{number}"
+        self.highlight_shapes([node_shape_id] + [f"node_{i}" for i, _ in found])
+        self.display_node_info(node_shape_id)
+        lines = [f"{title}: 共 {len(found)} 个"]
+        lines += [f"- {self.node_index_refs[i]} (距离 {d:.2f})" for i, d in found[:20]]
+        if len(found) > 20:
+            lines.append(f"... 以及其他 {len(found) - 20} 个节点")
+        self.info_text.append("\n".join(lines))
+        self.status_bar.showMessage(f"{self.node_index_refs[number]}: {title}共 {len(found)} 个")
+        logger.info(f"邻近节点查询 {self.node_index_refs[number]}: {title}，找到 {len(found)} 个")
+
     def clear_info(self):
         """清除显示的信息"""
         self.info_text.clear()
@@ -1111,31 +1612,14 @@ class MainWindow(QWidget):
     def find_and_select_tree_item(self, shape_id):
         """根据形状ID查找并选择树中对应的项"""
         try:
-            # 使用迭代方法避免深度递归问题
-            items_to_check = []
-            root = self.tree.invisibleRootItem()
-            for i in range(root.childCount()):
-                items_to_check.append(root.child(i))
-
-            found_item = None
-            while items_to_check:
-                current_item = items_to_check.pop(0)  # 像队列一样处理
-                item_data = current_item.data(0, Qt.UserRole)
-
-                match = False
-                if item_data == shape_id:
-                    match = True
-                elif isinstance(item_data, list) and shape_id in item_data:
-                     # 如果是组节点，选择包含该ID的组
-                     match = True
-
-                if match:
-                    found_item = current_item
-                    break # 找到了
-
-                # 添加子项到检查列表
-                for i in range(current_item.childCount()):
-                    items_to_check.append(current_item.child(i))
+            # 节点在树中以名称登记（设备、等电位点、连接器），其余ID直接查找
+            item_id = shape_id
+            if isinstance(shape_id, str) and shape_id.startswith("node_"):
+                item_id = self.shape_to_info.get(shape_id, {}).get("name", shape_id)
+            if shape_id in self.step_shapes:
+                # 导入形状：逐级创建它在拓扑层级中的祖先树项
+                self.reveal_imported_item(shape_id)
+            found_item = self.tree_index.find(item_id)
 
             if found_item:
                 # 选择并滚动到项
@@ -1155,23 +1639,7 @@ class MainWindow(QWidget):
             
     def get_shape_type_name(self, shape):
         """获取形状类型的用户友好名称"""
-        from OCC.Core.TopAbs import (
-            TopAbs_COMPOUND, TopAbs_COMPSOLID, TopAbs_SOLID,
-            TopAbs_SHELL, TopAbs_FACE, TopAbs_WIRE, TopAbs_EDGE, TopAbs_VERTEX
-        )
-        try:
-            st = shape.ShapeType()
-            if st == TopAbs_COMPOUND: return "复合体 (Compound)"
-            if st == TopAbs_COMPSOLID: return "复合实体 (CompSolid)"
-            if st == TopAbs_SOLID: return "实体 (Solid)"
-            if st == TopAbs_SHELL: return "壳 (Shell)"
-            if st == TopAbs_FACE: return "面 (Face)"
-            if st == TopAbs_WIRE: return "线框 (Wire)"
-            if st == TopAbs_EDGE: return "边 (Edge)"
-            if st == TopAbs_VERTEX: return "顶点 (Vertex)"
-            return f"形状 (Type {st})"
-        except Exception as e:
-            return "未知形状"
+        return shape_type_name(shape)
 
     def setup_interaction(self):
         """设置3D视图的交互功能"""
@@ -1191,57 +1659,50 @@ class MainWindow(QWidget):
         try:
             logger.debug(f"选择回调被触发，shape_list类型: {type(shape_list)}, 内容: {shape_list}")
             
-            if not shape_list:
+            # 中心线模式下图元不参与 AIS 选择，根据点击位置计算拾取
+            picked_shape_id = None
+            if len(args) >= 2:
+                picked_shape_id = self.layer_display.pick(self.viewer._display.View, args[0], args[1])
+
+            if not shape_list and picked_shape_id is None:
                 logger.debug("没有选中任何形状")
                 # 清除选择/信息
                 if self.highlighted_shapes:
-                   self.highlight_shapes(self.highlighted_shapes, False)
-                   self.highlighted_shapes = []
+                   self.highlight_shapes([])
                    self.clear_info()
                 return
 
-            # 通常我们关心第一个选择的形状
-            selected_shape = shape_list[0]
-            if not isinstance(selected_shape, TopoDS_Shape) or selected_shape.IsNull():
-                logger.warning(f"选择回调收到的不是有效的TopoDS_Shape: {type(selected_shape)}")
-                return
+            found_shape_id = picked_shape_id
+            if found_shape_id is None:
+                # 通常我们关心第一个选择的形状
+                selected_shape = shape_list[0]
+                if not isinstance(selected_shape, TopoDS_Shape) or selected_shape.IsNull():
+                    logger.warning(f"选择回调收到的不是有效的TopoDS_Shape: {type(selected_shape)}")
+                    return
 
-            logger.debug(f"选中的TopoDS_Shape类型: {self.get_shape_type_name(selected_shape)}")
+                logger.debug(f"选中的TopoDS_Shape类型: {self.get_shape_type_name(selected_shape)}")
 
-            # 通过比较TopoDS_Shapes找到shape_id
-            found_shape_id = None
-            for shape_id, ais_obj in self.ais_shapes.items():
-                try:
-                    # 获取AIS_Shape中的TopoDS_Shape
-                    ais_topo_shape = ais_obj.Shape()
-                    if not ais_topo_shape.IsNull():
-                        # 使用IsSame()进行比较
-                        if ais_topo_shape.IsSame(selected_shape):
-                            found_shape_id = shape_id
-                            logger.debug(f"找到匹配的形状ID: {found_shape_id}")
-                            break
-                except Exception as e:
-                    logger.warning(f"比较形状 {shape_id} 时出错: {e}")
-                    continue
+                # 通过比较TopoDS_Shapes找到shape_id（分层显示时选中的是复合体中的单个实体）
+                found_shape_id = self.layer_display.shape_id(selected_shape)
+                if found_shape_id is None:
+                    # 独立显示的AIS对象（线段、节点、导入形状）通过形状索引常数时间查找
+                    found_shape_id = self.shape_index.get(selected_shape)
+                    if found_shape_id is not None:
+                        logger.debug(f"找到匹配的形状ID: {found_shape_id}")
+                if found_shape_id is None:
+                    # 导入模型按拾取模式选中的实体、面或边，通过拓扑索引解析为树中的形状ID
+                    found_shape_id = self.cad_display.shape_id(selected_shape)
 
             if found_shape_id is None:
                 logger.debug("未找到与选择形状匹配的ID")
                 self.status_bar.showMessage("已选择形状，但无法在内部映射中找到它")
                 if self.highlighted_shapes:
-                   self.highlight_shapes(self.highlighted_shapes, False)
-                   self.highlighted_shapes = []
+                   self.highlight_shapes([])
                    self.clear_info()
                 return
 
-            # 在应用新高亮前清除之前的高亮
-            if self.highlighted_shapes:
-                # 避免在再次点击相同形状时取消高亮
-                if self.highlighted_shapes != [found_shape_id]:
-                    self.highlight_shapes(self.highlighted_shapes, False)
-
-            # 高亮当前选择
-            self.highlight_shapes([found_shape_id], True)
-            self.highlighted_shapes = [found_shape_id] # 存储找到的ID
+            # 高亮当前选择（只重新着色与上一次选择不同的形状）
+            self.highlight_shapes([found_shape_id])
 
             # 根据ID类型显示信息
             if isinstance(found_shape_id, str) and found_shape_id.startswith('node_'):
@@ -1250,7 +1711,7 @@ class MainWindow(QWidget):
                 self.display_link_info(found_shape_id)
             elif isinstance(found_shape_id, str): # 导入的STEP/IGES形状使用字符串ID
                 logger.info(f"选中了导入的形状: {found_shape_id}")
-                shape_info = self.shape_to_info.get(found_shape_id, {'type': 'Imported Shape'})
+                shape_info = {'type': self.imported_shape_type(found_shape_id)}
                 info_text = f"选中的形状 ID: {found_shape_id}\n"
                 info_text += f"类型: {shape_info.get('type', '未知')}"
                 # 添加更多导入形状的详细信息
@@ -1274,6 +1735,12 @@ class MainWindow(QWidget):
         try:
             logger.info("正在关闭窗口，清理资源...")
 
+            # 停止后台导入和源文件监视
+            if self.import_worker is not None:
+                self.import_worker.cancel()
+                self.import_worker.wait()
+            self.source_watcher.stop()
+
             # 1. 清除所有显示的图形
             if hasattr(self, 'context') and self.context:
                 try:
@@ -1327,6 +1794,8 @@ class MainWindow(QWidget):
             self.import_step()
         elif file_format == "IGES":
             self.import_iges()
+        elif file_format == STEP_STRUCTURE_FORMAT:
+            self.import_step_structure()
         else:
             logger.warning(f"不支持的文件格式: {file_format}")
             QMessageBox.warning(self, "格式错误", f"不支持的文件格式: {file_format}")
@@ -1396,6 +1865,12 @@ class MainWindow(QWidget):
         """根据选择的格式导出文件"""
         file_format = self.export_format_combo.currentText()
         logger.info(f"用户选择导出文件格式: {file_format}")
+        if file_format in (CENTERLINE_STEP_FORMAT, CENTERLINE_IGES_FORMAT):
+            self.export_centerline(file_format)
+            return
+        if file_format in (MESH_GLTF_FORMAT, MESH_STL_FORMAT):
+            self.export_mesh(file_format)
+            return
         
         # 确定要导出的内容
         shapes_to_export = []
@@ -1438,6 +1913,94 @@ class MainWindow(QWidget):
             logger.warning(f"不支持的文件格式: {file_format}")
             QMessageBox.warning(self, "格式错误", f"不支持的文件格式: {file_format}")
             
+    def export_centerline(self, file_format):
+        """把线束导出为中心线：每条链接一条直线边，节点为顶点，按 net 分组为复合体"""
+        if not self.link_data:
+            logger.warning("没有可导出的线束数据")
+            QMessageBox.information(self, "无内容", "中心线导出需要先加载线束数据。")
+            return
+
+        is_step = file_format == CENTERLINE_STEP_FORMAT
+        if is_step:
+            file_path, _ = QFileDialog.getSaveFileName(self, "保存中心线为 STEP 文件", "", "STEP 文件 (*.step *.stp)")
+        else:
+            file_path, _ = QFileDialog.getSaveFileName(self, "保存中心线为 IGES 文件", "", "IGES 文件 (*.igs *.iges)")
+        if not file_path:
+            logger.info("用户取消了中心线导出")
+            return
+
+        logger.info(f"导出 {len(self.link_data)} 条链接的中心线到: {file_path}")
+        progress = QProgressDialog("正在构建中心线...", "取消", 0, len(self.link_data), self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+        progress.show()
+        QCoreApplication.processEvents()
+
+        def report_progress(done, total):
+            progress.setValue(done)
+            QCoreApplication.processEvents()
+            return not progress.wasCanceled()
+
+        try:
+            result = build_centerline_document(self.link_data, "net", progress_callback=report_progress)
+            if result is None:
+                progress.close()
+                return
+            doc, edge_count, vertex_count = result
+
+            progress.setLabelText("正在写入文件...")
+            QCoreApplication.processEvents()
+            ok = write_centerline_step(doc, file_path) if is_step else write_centerline_iges(doc, file_path)
+            progress.close()
+
+            if ok:
+                logger.info(f"中心线导出成功: {file_path}")
+                self.show_success_message(f"已导出 {edge_count} 条中心线和 {vertex_count} 个节点到 {file_path}")
+            else:
+                logger.error(f"中心线导出失败: {file_path}")
+                QMessageBox.warning(self, "导出失败", "导出中心线过程中出现错误，请检查日志。")
+        except Exception as e:
+            progress.close()
+            logger.error(f"导出中心线时发生异常: {e}")
+            logger.error(traceback.format_exc())
+            QMessageBox.critical(self, "导出错误", f"导出过程中出现异常: {str(e)}")
+
+    def export_mesh(self, file_format):
+        """把线束的线段和节点直接生成三角网格，导出为二进制 glTF 或 STL（不经过 B-rep 和 OCCT 三角剖分）"""
+        if not self.segments and not self.unique_nodes:
+            logger.warning("没有可导出的线束数据")
+            QMessageBox.information(self, "无内容", "网格导出需要先加载线束数据。")
+            return
+
+        if file_format == MESH_GLTF_FORMAT:
+            file_path, _ = QFileDialog.getSaveFileName(self, "保存网格为 glTF 文件", "", "glTF 二进制文件 (*.glb)")
+        else:
+            file_path, _ = QFileDialog.getSaveFileName(self, "保存网格为 STL 文件", "", "STL 文件 (*.stl)")
+        if not file_path:
+            logger.info("用户取消了网格导出")
+            return
+
+        try:
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            try:
+                starts, ends = segment_arrays(self.segments)
+                meshes = harness_meshes(starts, ends, list(self.unique_nodes.values()),
+                                        self.primitives.cylinder_radius, self.primitives.sphere_radius,
+                                        min_length=self.primitives.min_length)
+                if file_format == MESH_GLTF_FORMAT:
+                    write_glb(file_path, meshes, {"segments": (0.0, 0.0, 1.0), "nodes": (1.0, 0.0, 0.0)})
+                else:
+                    write_stl(file_path, list(meshes.values()))
+            finally:
+                QApplication.restoreOverrideCursor()
+            triangles = sum(len(mesh) for mesh in meshes.values())
+            logger.info(f"网格导出成功: {file_path}")
+            self.show_success_message(f"已导出 {triangles} 个三角形到 {file_path}")
+        except Exception as e:
+            logger.error(f"导出网格时发生异常: {e}")
+            logger.error(traceback.format_exc())
+            QMessageBox.critical(self, "导出错误", f"导出过程中出现异常: {str(e)}")
+
     def export_to_step(self, shapes, description):
         """导出提供的形状列表为 STEP 文件"""
         try:
@@ -1613,288 +2176,382 @@ class MainWindow(QWidget):
             QMessageBox.critical(self, "导出错误", f"导出过程中发生未预期的错误: {str(e)}")
             
     def import_step(self):
-        """导入STEP文件并解析"""
-        file_path, _ = QFileDialog.getOpenFileName(self, "选择 STEP 文件", "", "STEP 文件 (*.step *.stp)")
-        if not file_path:
+        """导入一个或多个STEP文件并合并到同一场景"""
+        file_paths, _ = QFileDialog.getOpenFileNames(self, "选择 STEP 文件", "", "STEP 文件 (*.step *.stp)")
+        if not file_paths:
             logger.info("用户取消了STEP导入")
             return
-            
-        logger.info(f"选择导入STEP文件: {file_path}")
-        self.import_cad_file(file_path, "STEP")
+
+        logger.info(f"选择导入{len(file_paths)}个STEP文件: {file_paths}")
+        self.import_cad_files([(file_path, "STEP") for file_path in file_paths])
         
     def import_iges(self):
-        """导入IGES文件并解析"""
-        file_path, _ = QFileDialog.getOpenFileName(self, "选择 IGES 文件", "", "IGES 文件 (*.igs *.iges)")
-        if not file_path:
+        """导入一个或多个IGES文件并合并到同一场景"""
+        file_paths, _ = QFileDialog.getOpenFileNames(self, "选择 IGES 文件", "", "IGES 文件 (*.igs *.iges)")
+        if not file_paths:
             logger.info("用户取消了IGES导入")
             return
-            
-        logger.info(f"选择导入IGES文件: {file_path}")
-        self.import_cad_file(file_path, "IGES")
+
+        logger.info(f"选择导入{len(file_paths)}个IGES文件: {file_paths}")
+        self.import_cad_files([(file_path, "IGES") for file_path in file_paths])
         
-    def import_cad_file(self, file_path, file_format):
-        """通用CAD文件导入函数"""
-        logger.info(f"开始导入 {file_format} 文件: {file_path}")
-        progress = QProgressDialog(f"正在导入 {file_format} 文件...", "取消", 0, 100, self)
-        progress.setWindowModality(Qt.WindowModal)
-        progress.setMinimumDuration(500)
-        progress.show()
+    def import_cad_files(self, files):
+        """
+        在后台并行导入一个或多个STEP/IGES文件 [(file_path, file_format), ...]
+
+        每个文件在单独的进程中读取，全部完成后合并到同一场景，每个文件一个树分支；
+        导入完成之前当前模型保持可见、可交互。
+        """
+        if self.import_worker is not None:
+            QMessageBox.information(self, "导入进行中", "已有文件正在导入，请等待完成或取消后再试。")
+            return
+
+        logger.info(f"开始导入 {len(files)} 个CAD文件: {[file_path for file_path, _ in files]}")
+        progress = self.create_import_progress(f"正在导入 {len(files)} 个CAD文件...")
         progress.setValue(5)
-        QCoreApplication.processEvents()
-        
+
+        # 导入时按所选精度预先剖分，显示时不再计算三角剖分
+        deflection = MESH_PRESETS[self.mesh_preset_combo.currentText()]
+        worker = CadImportWorker(files, deflection=deflection, cache=self.shape_cache, parent=self)
+        worker.progress.connect(self.on_import_progress)
+        worker.shape_loaded.connect(self.on_import_shape_loaded)
+        worker.topology_ready.connect(self.on_import_topology)
+        worker.file_failed.connect(self.on_import_file_failed)
+        worker.completed.connect(self.on_import_completed)
+        worker.failed.connect(self.on_import_failed)
+        worker.cancelled.connect(self.on_import_cancelled)
+        worker.finished.connect(self.on_import_finished)
+        progress.canceled.connect(worker.cancel)
+
+        self.import_worker = worker
+        self.import_progress = progress
+        self.import_topologies = {}
+        self.status_bar.showMessage(f"正在后台导入 {len(files)} 个CAD文件（{worker.max_workers} 个进程）")
+        worker.start()
+
+    def create_import_progress(self, text):
+        """后台导入/转换使用的非模态进度对话框"""
+        progress = QProgressDialog(text, "取消", 0, 100, self)
+        progress.setWindowModality(Qt.NonModal)  # 不阻塞主窗口
+        progress.setMinimumDuration(500)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+        return progress
+
+    def clear_model_for_import(self):
+        """导入新模型之前清除当前的线束数据、导入形状和显示"""
+        logger.info("清除现有数据...")
+        # 线束数据被导入的模型替换，不再监视原来的 XML 文件
+        self.watch_check.setChecked(False)
+        self.watch_check.setEnabled(False)
+        self.xml_file_path = None
+        self.tree.clear()
+        self.tree_index.clear()
+        self.segment_shapes = []
+        self.segments = []
+        self.node_shapes = []
+        self.unique_nodes = {}
+        self.node_id_map = {}
+        self.node_index = None
+        self.node_index_refs = []
+        self.node_graph = None
+        self.path_source = None
+        self.harness_metrics = None
+        self.metrics_model.set_frame(None)
+        self.node_merge = merge_nodes({}, 0)
+        self.route_gaps = []
+        self.xml_builder = None
+        self.link_data = {}
+        self.node_to_links = {}
+        self.shape_to_info = {}
+        self.step_shapes = TopologyBrowser(on_evict=self.on_topology_evicted)
+        self.step_structure = None
+        self.main_shape = None
+        self.ais_shapes = {}  # 清除AIS对象
+        self.shape_index.clear()
+        self.layer_display.clear()
+        self.cad_display.clear()
+        self.highlighted_shapes = []
+        self.highlight_state.clear()
+        self.context.EraseAll(False)
+
+    def on_import_progress(self, value, text):
+        if self.import_progress is not None:
+            self.import_progress.setLabelText(text)
+            self.import_progress.setValue(value)
+
+    def on_import_topology(self, index, topology):
+        """按文件暂存后台建立的拓扑索引，导入完成后一次性替换当前模型"""
+        self.import_topologies[index] = topology
+
+    def on_import_shape_loaded(self, index, shape):
+        file_basename = os.path.basename(self.import_worker.files[index][0])
+        logger.info(f"{file_basename} 转换完成，主形状类型: {self.get_shape_type_name(shape)}")
+        self.status_bar.showMessage(f"{file_basename} 转换完成，正在分析形状结构...")
+
+    def on_import_file_failed(self, index, message):
+        self.status_bar.showMessage(f"{os.path.basename(self.import_worker.files[index][0])} 导入失败: {message}")
+
+    def on_import_completed(self, shapes):
+        """后台导入完成：用所有成功导入的文件替换当前模型，每个文件一个树分支"""
+        worker = self.import_worker
+        indices = sorted(shapes)
+        self.close_import_progress()
         try:
-            # 清除现有数据
-            logger.info("清除现有数据...")
-            self.tree.clear()
-            self.segment_shapes = []
-            self.segments = []
-            self.node_shapes = []
-            self.unique_nodes = {}
-            self.node_id_map = {}
-            self.link_data = {}
-            self.node_to_links = {}
-            self.shape_to_info = {}
-            self.step_shapes = {} # 清除先前导入的形状
-            self.ais_shapes = {}  # 清除AIS对象
-            self.highlighted_shapes = []
-            self.main_shape = None
-            self.context.EraseAll(True) # 清除视图
-            logger.info("现有数据清除完毕")
-            progress.setValue(10)
-            QCoreApplication.processEvents()
-            
-            # 读取文件
-            logger.info(f"使用 {file_format} reader 读取文件...")
-            if file_format == "STEP":
-                reader = STEPControl_Reader()
-            elif file_format == "IGES":
-                reader = IGESControl_Reader()
-            else:
-                raise ValueError(f"不支持的文件格式: {file_format}")
-                
-            read_status = reader.ReadFile(file_path)
-            logger.info(f"ReadFile 状态: {read_status}")
-            progress.setValue(40)
-            QCoreApplication.processEvents()
-            if progress.wasCanceled(): raise InterruptedError("用户取消导入")
-            
-            if read_status != IFSelect_RetDone:
-                # 尝试获取更多错误信息（可能不总是有效）
-                fail_messages = reader.FailMessage() if hasattr(reader, 'FailMessage') else ""
-                error_msg = f"读取{file_format}文件失败 (状态: {read_status})"
-                if fail_messages:
-                    error_msg += f"\n错误信息:\n{fail_messages}"
-                    logger.error(f"{error_msg}")
-                else:
-                    logger.error(error_msg)
-                raise RuntimeError(error_msg)
-                
-            # 转换根
-            logger.info("转换文件根...")
-            # 检查根数量
-            num_roots = reader.NbRootsForTransfer()
-            logger.info(f"文件中根的数量: {num_roots}")
-            if num_roots == 0:
-                raise RuntimeError(f"{file_format} 文件中没有找到可转换的根。文件可能为空或格式无效。")
-                
-            transfer_ok = reader.TransferRoots()
-            logger.info(f"TransferRoots 状态: {transfer_ok}")
-            progress.setValue(60)
-            QCoreApplication.processEvents()
-            if progress.wasCanceled(): raise InterruptedError("用户取消导入")
-            if not transfer_ok:
-                raise RuntimeError(f"转换{file_format}文件根失败。")
-                
-            # 获取形状
-            logger.info("获取主形状...")
-            # 检查结果形状数量
-            num_shapes = reader.NbShapes()
-            logger.info(f"转换后的形状数量: {num_shapes}")
-            if num_shapes == 0:
-                raise RuntimeError(f"转换{file_format}文件后未生成任何形状。")
-            elif num_shapes == 1:
-                logger.info("获取单个主形状...")
-                shape = reader.Shape(1) # 获取第一个形状
-            else:
-                # 如果有多个形状，创建一个复合体
-                logger.info(f"获取 {num_shapes} 个形状并创建复合体...")
-                shape = TopoDS_Compound()
-                builder = BRep_Builder()
-                builder.MakeCompound(shape)
-                for i in range(1, num_shapes + 1):
-                    sub_shape = reader.Shape(i)
-                    if sub_shape and not sub_shape.IsNull():
-                        builder.Add(shape, sub_shape)
-                    else:
-                        logger.warning(f"跳过转换结果中的空形状索引 {i}")
-                        
-            if shape.IsNull():
-                raise RuntimeError(f"从{file_format}文件获取的最终形状为空。")
-                
-            self.main_shape = shape # 存储主形状
-            logger.info(f"主形状类型: {self.get_shape_type_name(shape)}")
-            progress.setValue(70)
-            QCoreApplication.processEvents()
-            if progress.wasCanceled(): raise InterruptedError("用户取消导入")
-            
-            # 分析并构建树
-            logger.info("分析形状并构建树...")
-            file_basename = os.path.basename(file_path)
-            root = QTreeWidgetItem(self.tree)
-            root.setText(0, f"{file_format} Model: {file_basename}")
-            
-            # 传递进度对话框以允许在分析期间取消
-            self.analyze_shape_and_build_tree(self.main_shape, root, progress)
-            if progress.wasCanceled(): raise InterruptedError("用户取消导入")
-            
-            self.tree.expandItem(root)
-            progress.setValue(90)
-            QCoreApplication.processEvents()
-            
+            self.clear_model_for_import()
+            # 存储主形状（导入多个文件时为所有文件的复合体）
+            self.main_shape = merge_shapes(shapes[index] for index in indices)
+
+            # 构建树：每个文件一个分支，子形状在展开时才枚举
+            for index in indices:
+                file_path, file_format = worker.files[index]
+                self.step_shapes.add(self.import_topologies[index])
+                root = QTreeWidgetItem(self.tree)
+                root.setText(0, f"{file_format} Model: {os.path.basename(file_path)}")
+                self.populate_imported_tree(index, root)
+                self.tree.expandItem(root)
+
             # 绘制导入的形状
             logger.info("绘制导入的形状...")
-            self.draw_imported_shapes(show_progress=True) # 绘制有自己的进度
-            if progress.wasCanceled(): raise InterruptedError("用户取消导入")
-            
-            progress.setValue(100)
-            
+            self.draw_imported_shapes()
+
             total_elements = len(self.step_shapes) # 计算单个形状数量
-            logger.info(f"{file_format}文件导入成功，包含 {total_elements} 个子元素")
-            self.show_success_message(f"已成功导入 {file_format} 文件 ({file_basename})，包含 {total_elements} 个元素。")
-            
-        except InterruptedError:
-            logger.warning(f"用户取消了 {file_format} 导入")
-            progress.close()
-            # 清理可能部分加载的状态
-            self.tree.clear()
-            self.context.EraseAll(True)
-            self.status_bar.showMessage(f"{file_format} 导入已取消")
+            logger.info(f"{len(indices)} 个CAD文件导入成功，包含 {total_elements} 个子元素")
+            if worker.errors:
+                QMessageBox.warning(self, "部分文件导入失败", "以下文件未能导入:\n" + "\n".join(worker.errors.values()))
+            self.show_success_message(f"已成功导入 {len(indices)} 个CAD文件，包含 {total_elements} 个元素。")
         except Exception as e:
-            progress.close()
-            logger.error(f"导入{file_format}文件时发生异常: {e}")
+            logger.error(f"显示导入的CAD文件时发生异常: {e}")
             logger.error(traceback.format_exc())
-            QMessageBox.critical(self, "导入错误", f"导入 {file_path} 时出现异常:\n\n{str(e)}\n\n请查看日志获取详细信息。")
+            QMessageBox.critical(self, "导入错误", f"显示导入的CAD文件时出现异常:\n\n{str(e)}\n\n请查看日志获取详细信息。")
             # 清理
             self.tree.clear()
+            self.tree_index.clear()
             self.context.EraseAll(True)
-            
-    def analyze_shape_and_build_tree(self, shape, parent_item, progress=None):
-        """分析形状的层次结构并构建树视图"""
-        from OCC.Core.TopAbs import (
-            TopAbs_COMPOUND, TopAbs_COMPSOLID, TopAbs_SOLID,
-            TopAbs_SHELL, TopAbs_FACE, TopAbs_WIRE, TopAbs_EDGE, TopAbs_VERTEX
-        )
-        from OCC.Core.TopExp import TopExp_Explorer
-        from OCC.Core.TopTools import TopTools_IndexedMapOfShape
-        
-        try:
-            logger.info("开始分析形状...")
-            if progress: progress.setLabelText("分析形状结构...")
-            
-            # 清除先前导入的形状
-            self.step_shapes = {}
-            all_shape_ids_in_tree = [] # 跟踪添加到树中的ID
-            
-            # 使用TopExp_Explorer遍历子形状
-            # 我们主要关注实体、壳、面、边进行可视化/选择
-            shape_types_to_explore = {
-                TopAbs_SOLID: "实体 (Solid)",
-                TopAbs_SHELL: "壳 (Shell)",
-                TopAbs_FACE: "面 (Face)",
-                # TopAbs_WIRE: "线框 (Wire)", # 通常是面的一部分，可能添加噪声
-                TopAbs_EDGE: "边 (Edge)"
-            }
-            type_nodes = {} # 存储树中的顶级类型节点
-            
-            # 估计总工作量以更新进度
-            # 预先计算形状可能对复杂模型很慢
-            # 我们将基于迭代更新进度
-            
-            processed_count = 0
-            unique_subshapes = TopTools_IndexedMapOfShape() # 使用映射避免重复
-            
-            # 第一遍：收集相关类型的唯一子形状
-            logger.debug("第一遍: 收集唯一子形状...")
-            for shape_type in shape_types_to_explore:
-                explorer = TopExp_Explorer(shape, shape_type)
-                while explorer.More():
-                    current_sub = explorer.Current()
-                    if not current_sub.IsNull():
-                        unique_subshapes.Add(current_sub)
-                    explorer.Next()
-            total_unique = unique_subshapes.Extent()
-            logger.debug(f"找到 {total_unique} 个唯一子形状 (相关类型)")
-            if progress: progress.setLabelText(f"分析 {total_unique} 个形状...")
-            
-            # 第二遍：迭代唯一形状，创建树项，存储形状
-            logger.debug("第二遍: 创建树节点并存储形状...")
-            shape_counter = 0
-            for i in range(1, total_unique + 1):
-                if progress and progress.wasCanceled(): raise InterruptedError("用户取消分析")
-                
-                current_shape = unique_subshapes.FindKey(i)
-                if current_shape.IsNull(): continue
-                
-                shape_type = current_shape.ShapeType()
-                type_name = self.get_shape_type_name(current_shape) # 获取用户友好名称
-                base_type_name = shape_types_to_explore.get(shape_type, "其他") # 获取类别名称
-                
-                # 获取或创建树中的类别节点
-                if base_type_name not in type_nodes:
-                    type_node = QTreeWidgetItem(parent_item)
-                    type_node.setText(0, base_type_name)
-                    type_nodes[base_type_name] = {"node": type_node, "ids": []}
-                else:
-                    type_node = type_nodes[base_type_name]["node"]
-                    
-                # 为单个形状创建项
-                shape_item = QTreeWidgetItem(type_node)
-                # 生成唯一ID: type_index_hash
-                shape_id = f"{base_type_name.split(' ')[0].lower()}_{shape_counter}_{current_shape.HashCode(1000000)}"
-                shape_item.setText(0, f"{type_name} ID: {shape_id}")
-                shape_item.setData(0, Qt.UserRole, shape_id) # 存储ID
-                
-                # 在字典中存储实际TopoDS_Shape
-                self.step_shapes[shape_id] = current_shape
-                # 存储基本信息（稍后可以扩展）
-                self.shape_to_info[shape_id] = {'type': type_name}
-                
-                # 将ID添加到组高亮列表
-                type_nodes[base_type_name]["ids"].append(shape_id)
-                all_shape_ids_in_tree.append(shape_id)
-                shape_counter += 1
-                
-                processed_count += 1
-                if progress and total_unique > 0:
-                    prog_val = 70 + int(20 * processed_count / total_unique) # 进度从70%到90%
-                    progress.setValue(prog_val)
-                    QCoreApplication.processEvents()
-                    
-            # 更新类型节点上的计数并存储ID列表
-            logger.debug("更新树节点计数和数据...")
-            for base_type_name, data in type_nodes.items():
-                node = data["node"]
-                ids = data["ids"]
-                node.setText(0, f"{base_type_name} ({len(ids)})")
-                node.setData(0, Qt.UserRole, ids)
-                
-            # 同样在根项中存储所有收集的ID
-            parent_item.setData(0, Qt.UserRole, all_shape_ids_in_tree)
-            
-            # 自身存储主形状（如果没有拆分，例如简单实体）
-            # 我们已经在导入过程中存储了self.main_shape
-            
-            logger.info(f"形状分析完成，存储了 {len(self.step_shapes)} 个形状，创建了 {len(all_shape_ids_in_tree)} 个树条目")
-            
-        except InterruptedError:
-            logger.warning("形状分析被用户取消")
-            raise # 重新抛出以被导入器捕获
-        except Exception as e:
-            logger.error(f"分析形状和构建树时出错: {e}")
-            logger.error(traceback.format_exc())
-            # 不在此处抛出，让导入有机会完成但显示警告
-            QMessageBox.warning(self, "分析警告", f"分析形状结构时出现错误:\n{e}\n导入结果可能不完整。")
 
+    def on_import_failed(self, message):
+        """后台导入失败：当前模型保持不变"""
+        worker = self.import_worker
+        self.close_import_progress()
+        QMessageBox.critical(self, "导入错误", f"导入 {len(worker.files)} 个CAD文件时出现异常:\n\n{message}\n\n请查看日志获取详细信息。")
+        self.status_bar.showMessage("CAD 文件导入失败")
+
+    def on_import_cancelled(self):
+        self.close_import_progress()
+        self.status_bar.showMessage("CAD 文件导入已取消")
+
+    def on_import_finished(self):
+        """工作线程结束（成功、失败或取消）后释放它"""
+        worker, self.import_worker = self.import_worker, None
+        self.import_topologies = {}
+        self.close_import_progress()
+        if worker is not None:
+            worker.deleteLater()
+
+    def close_import_progress(self):
+        if self.import_progress is not None:
+            self.import_progress.canceled.disconnect()
+            self.import_progress.close()
+            self.import_progress.deleteLater()
+            self.import_progress = None
+
+    def populate_imported_tree(self, file_index, parent_item):
+        """为一个导入文件的树分支登记第一级子形状；树项在展开时才创建，更深的层级在展开时才枚举"""
+        top_level = self.step_shapes.top_level(file_index)
+        # 根项保存第一级形状的ID列表（点击时高亮整个文件）
+        top_level_ids = [shape_id for shape_id, _ in top_level]
+        parent_item.setData(0, Qt.UserRole, top_level_ids)
+        parent_item.setData(0, LAZY_CHILDREN_ROLE, file_index)
+        parent_item.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+        self.tree_index.add_group(top_level_ids, parent_item, 1)
+        logger.info(f"文件 {file_index} 的形状树第一级有 {len(top_level)} 个形状，"
+                    f"共 {self.step_shapes.topologies[file_index].count()} 个子形状")
+
+    def load_tree_children(self, item):
+        """树项展开时创建其子形状（或产品组件）的树项（只枚举一次，直到被 LRU 缓存淘汰后卸载）"""
+        source = item.data(0, LAZY_CHILDREN_ROLE)
+        if source is None:
+            return
+        item.setData(0, LAZY_CHILDREN_ROLE, None)
+        product_path = parse_product_id(source)
+        if product_path is not None:
+            self.add_product_items(item, self.step_structure.children(product_path))
+            return
+        if isinstance(source, int):
+            children = self.step_shapes.top_level(source)
+        else:
+            children = self.step_shapes.children(source)
+
+        child_items = []
+        for shape_id, shape in children:
+            child_item = QTreeWidgetItem()
+            child_item.setText(0, f"{self.get_shape_type_name(shape)} ID: {shape_id}")
+            child_item.setData(0, Qt.UserRole, shape_id)
+            if has_subshapes(shape):
+                child_item.setData(0, LAZY_CHILDREN_ROLE, shape_id)
+                child_item.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+            self.tree_index.add_item(shape_id, child_item)
+            child_items.append(child_item)
+        item.addChildren(child_items)
+
+    def on_topology_evicted(self, shape_id):
+        """子形状列表被淘汰出缓存时卸载对应的已折叠树项，限制树占用的内存"""
+        item = self.tree_index.item(shape_id)
+        if item is None or item.childCount() == 0 or item.isExpanded():
+            return
+        stack = item.takeChildren()
+        while stack:
+            child = stack.pop()
+            self.tree_index.remove(child.data(0, Qt.UserRole), child)
+            stack.extend(child.takeChildren())
+        item.setData(0, LAZY_CHILDREN_ROLE, shape_id)
+
+    def reveal_imported_item(self, shape_id):
+        """逐级创建导入形状在拓扑层级中的祖先树项，返回该形状的树项（找不到时返回 None）"""
+        path = self.step_shapes.path(shape_id)
+        for item_id in path + [shape_id]:
+            if self.tree_index.item(item_id) is None:
+                # 所在文件分支的第一级尚未创建
+                group = self.tree_index.group(item_id)
+                if group is not None:
+                    self.load_tree_children(group)
+            item = self.tree_index.item(item_id)
+            if item is None:
+                return None
+            if item_id != shape_id:
+                self.load_tree_children(item)
+        return item
+
+    def imported_shape_type(self, shape_id):
+        """导入形状的类型名称"""
+        shape = self.step_shapes.get(shape_id)
+        return self.get_shape_type_name(shape) if shape is not None else 'Imported Shape'
+
+    # --- STEP 产品结构（只读取结构，几何按需转换） ---
+    def import_step_structure(self):
+        """只读取STEP文件的产品结构、名称和颜色并显示在树中，不转换几何"""
+        if self.import_worker is not None:
+            QMessageBox.information(self, "导入进行中", "已有文件正在导入，请等待完成或取消后再试。")
+            return
+        file_path, _ = QFileDialog.getOpenFileName(self, "选择 STEP 文件", "", "STEP 文件 (*.step *.stp)")
+        if not file_path:
+            logger.info("用户取消了STEP结构导入")
+            return
+
+        logger.info(f"读取STEP产品结构: {file_path}")
+        progress = self.create_import_progress(f"正在读取 {os.path.basename(file_path)} 的产品结构...")
+        progress.setRange(0, 0)  # ReadFile 没有进度
+        worker = StepStructureWorker(file_path, parent=self)
+        worker.completed.connect(self.on_structure_loaded)
+        worker.failed.connect(self.on_structure_failed)
+        worker.cancelled.connect(self.on_import_cancelled)
+        worker.finished.connect(self.on_import_finished)
+        progress.canceled.connect(worker.cancel)
+
+        self.import_worker = worker
+        self.import_progress = progress
+        self.status_bar.showMessage(f"正在后台读取 {os.path.basename(file_path)} 的产品结构")
+        worker.start()
+
+    def on_structure_loaded(self, structure):
+        """产品结构读取完成：替换当前模型，树中按装配关系列出产品（组件在展开时创建）"""
+        self.close_import_progress()
+        self.clear_model_for_import()
+        self.step_structure = structure
+        self.context.UpdateCurrentViewer()
+
+        root = QTreeWidgetItem(self.tree)
+        root.setText(0, f"STEP 结构: {os.path.basename(structure.file_path)}")
+        self.add_product_items(root, [(None, (product.number,), product) for product in structure.roots])
+        self.tree.expandItem(root)
+        self.show_success_message(
+            f"已读取 {len(structure.products)} 个产品的结构，右键点击产品可加载其几何。")
+
+    def on_structure_failed(self, message):
+        self.close_import_progress()
+        QMessageBox.critical(self, "导入错误", f"读取STEP产品结构时出现异常:\n\n{message}\n\n请查看日志获取详细信息。")
+        self.status_bar.showMessage("STEP 产品结构读取失败")
+
+    def add_product_items(self, parent_item, children):
+        """为 [(实例名称, 实例路径, StepProduct), ...] 创建树项（每个实例一项），装配体的组件在展开时创建"""
+        child_items = []
+        for instance_name, path, product in children:
+            item_id = product_id(path)
+            child_item = QTreeWidgetItem()
+            child_item.setText(0, product.label(instance_name, path in self.step_structure.loaded))
+            child_item.setData(0, Qt.UserRole, item_id)
+            if product.children:
+                child_item.setData(0, LAZY_CHILDREN_ROLE, item_id)
+                child_item.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+            self.tree_index.add_item(item_id, child_item)
+            child_items.append(child_item)
+        parent_item.addChildren(child_items)
+
+    def load_product_geometry(self, path):
+        """
+        在后台转换一个产品实例（根或子装配）的几何并追加到场景中
+
+        所在装配体或其中的组件已经加载时不再加载，避免同一几何重复显示。
+        """
+        if self.import_worker is not None:
+            QMessageBox.information(self, "导入进行中", "已有文件正在导入，请等待完成或取消后再试。")
+            return
+        product = self.step_structure.product(path)
+        name = product.name or f"#{product.number}"
+        overlapping = self.step_structure.overlapping(path)
+        if overlapping:
+            loaded = self.step_structure.product(overlapping[0])
+            loaded_name = loaded.name or f"#{loaded.number}"
+            if len(overlapping[0]) <= len(path):
+                message = f"{name} 所在的 {loaded_name} 已加载，其中已包含 {name} 的几何。"
+            else:
+                message = (f"{name} 的 {len(overlapping)} 个组件（{loaded_name} 等）已单独加载，"
+                           f"再加载 {name} 会重复显示这些组件。")
+            logger.info(f"拒绝加载 {name}: 与已加载的实例重叠 {overlapping}")
+            QMessageBox.information(self, "几何已加载", message)
+            return
+        progress = self.create_import_progress(f"正在转换 {name} 的几何...")
+        deflection = MESH_PRESETS[self.mesh_preset_combo.currentText()]
+        topology_index = len(self.step_shapes.topologies)
+        worker = StepTransferWorker(self.step_structure, [(path, topology_index)], deflection, parent=self)
+        worker.progress.connect(self.on_import_progress)
+        worker.product_loaded.connect(self.on_product_loaded)
+        worker.failed.connect(self.on_structure_failed)
+        worker.cancelled.connect(self.on_import_cancelled)
+        worker.finished.connect(self.on_import_finished)
+        progress.canceled.connect(worker.cancel)
+
+        self.import_worker = worker
+        self.import_progress = progress
+        worker.start()
+
+    def on_product_loaded(self, path, shape, topology):
+        """产品几何转换完成：在产品实例的树项下添加拓扑分支，并追加显示（使用产品的颜色）"""
+        product = self.step_structure.product(path)
+        name = product.name or f"#{product.number}"
+        first = not self.step_shapes.topologies
+        self.step_shapes.add(topology)
+        self.main_shape = shape if self.main_shape is None else merge_shapes([self.main_shape, shape])
+
+        item = self.tree_index.item(product_id(path))
+        if item is not None:
+            item.setText(0, item.text(0) + " (已加载)")
+            # 先创建组件树项，几何分支排在组件之后
+            self.load_tree_children(item)
+            branch = QTreeWidgetItem(item)
+            branch.setText(0, "几何")
+            self.populate_imported_tree(topology.file_index, branch)
+            self.tree.expandItem(item)
+            self.tree.expandItem(branch)
+
+        color = product.color if product.color is not None else Quantity_Color(Quantity_NOC_BLUE)
+        self.cad_display.selection_type = CAD_SELECTION_MODES[self.pick_mode_combo.currentText()]
+        self.cad_display.add_file(self.step_shapes, topology.file_index, color)
+        if first:
+            self.viewer._display.FitAll()
+        self.context.UpdateCurrentViewer()
+        logger.info(f"产品 {name} 的几何已加载，包含 {topology.count()} 个子形状")
+        self.status_bar.showMessage(f"已加载 {name} 的几何（{topology.count()} 个子形状）")
 
 def main(xml_file=None):
     # 设置日志系统
@@ -1964,6 +2621,9 @@ def main(xml_file=None):
 
 
 if __name__ == "__main__":
+    # 打包后的程序中，STEP/IGES 读取子进程从这里启动
+    multiprocessing.freeze_support()
+
     # 使用 argparse 解析命令行参数
     parser = argparse.ArgumentParser(description="航电布线可视化系统")
     parser.add_argument("xml_file", type=str, nargs='?', default=None, help="XML 文件路径")